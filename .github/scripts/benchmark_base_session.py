@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""A/B benchmark of pre-explored base sessions on the offline SDK simulator.
+
+Runs the same simulated issues one after another in one checkout, starting
+cold (A) and forking a base session explored once up front (B), and reports
+turns-to-first-edit, turns and cost per run. The simulated agent spends its
+first --explore-turns turns of any session exploring, so a forked session
+continues straight into edits.
+
+The simulator only shows the plumbing works; for real numbers compare the
+turns_to_first_edit logged by run_claude.py with BASE_SESSION on and off.
+
+Example:
+    uv run python .github/scripts/benchmark_base_session.py --runs 10 --explore-turns 6
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from claude_agent_sdk.types import ResultMessage
+
+from base_session import FirstEditCounter, explore_base_session
+from budget import BudgetGovernor
+from claude_runner import run_claude_chunked, CALL_EXPLORE
+from sdk_simulator import SdkSimulator, SimulatorConfig, set_simulator
+
+
+def init_repo(cwd: str) -> None:
+    (Path(cwd) / "app.py").write_text("print('hello')\n")
+    for args in (["init", "-q"], ["add", "."], ["-c", "user.name=bench", "-c", "user.email=bench@example.com",
+                                                 "commit", "-q", "-m", "init"]):
+        subprocess.run(["git", *args], cwd=cwd, check=True)
+
+
+async def run_variant(args, use_base: bool) -> tuple[list[tuple[int | None, int]], BudgetGovernor]:
+    """Run all issues. Returns (turns to first edit, turns) per run and the shared budget."""
+    pattern = ["Glob", "Grep"] + ["Read"] * (args.explore_turns - 2) + ["Edit"]
+    set_simulator(SdkSimulator(SimulatorConfig(
+        message_latency=args.latency,
+        tool_pattern=pattern,
+        complete_after_turns=args.explore_turns + args.work_turns,
+        seed=args.seed,
+    )))
+    budget = BudgetGovernor()
+    results = []
+    with tempfile.TemporaryDirectory() as cwd, tempfile.TemporaryDirectory() as cache_dir:
+        init_repo(cwd)
+        base = None
+        if use_base:
+            base = await explore_base_session(cwd, args.explore_turns, budget, Path(cache_dir))
+        for index in range(args.runs):
+            counter = FirstEditCounter()
+            turns = 0
+            async for message in run_claude_chunked(
+                f"Simulated issue {index}",
+                "Benchmark body",
+                cwd,
+                budget=budget,
+                base_session_id=base.session_id if base else None,
+            ):
+                counter.observe(message)
+                if isinstance(message, ResultMessage):
+                    turns += message.num_turns
+            results.append((counter.first_edit_turn, turns))
+    return results, budget
+
+
+def report(name: str, results: list[tuple[int | None, int]], budget: BudgetGovernor) -> None:
+    first_edits = [first for first, _ in results if first is not None]
+    explore = budget.usage.get(CALL_EXPLORE)
+    print(f"\n{name}")
+    print(f"turns to first edit: {statistics.mean(first_edits):.1f}" if first_edits else "turns to first edit: n/a")
+    print(f"turns per run:       {statistics.mean(turns for _, turns in results):.1f}")
+    print(f"exploration cost:    ${explore.cost_usd if explore else 0.0:.4f}")
+    print(f"total cost:          ${budget.total_cost_usd:.4f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--explore-turns", type=int, default=6, help="Turns a session spends exploring")
+    parser.add_argument("--work-turns", type=int, default=6, help="Turns of actual work per issue")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds between simulated messages")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.explore_turns < 3:
+        parser.error("--explore-turns must be at least 3")
+
+    os.environ["CLAUDE_SDK_BACKEND"] = "simulator"
+    cold, cold_budget = await run_variant(args, use_base=False)
+    forked, forked_budget = await run_variant(args, use_base=True)
+
+    report("A: cold sessions", cold, cold_budget)
+    report("B: forked base session", forked, forked_budget)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
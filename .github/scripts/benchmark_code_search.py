@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Benchmark the indexed search tools against plain tree scans on a synthetic repo.
+
+Generates a repository of --files Python files, builds a CodeSearchIndex once
+and times code and path searches answered from the index against a full scan
+(walk, read, match), as the built-in tools do on every call. When ripgrep or
+grep is installed, it is timed as well.
+
+Example:
+    uv run python .github/scripts/benchmark_code_search.py --files 5000 --lines 100
+"""
+
+import argparse
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from change_tracker import SKIP_DIRS
+from code_search import CodeSearchIndex, glob_to_regex
+
+
+CODE_QUERIES = [r"def handler_\d+_7\(", "RareMarker42", r"class Model\d+Config", "import os"]
+PATH_QUERIES = ["**/*.py", "pkg_3/**/module_1*.py", "**/README.md"]
+
+
+def generate_repo(root: Path, files: int, lines: int, seed: int) -> None:
+    rng = random.Random(seed)
+    for i in range(files):
+        directory = root / f"pkg_{i % 50}" / f"sub_{i % 7}"
+        directory.mkdir(parents=True, exist_ok=True)
+        body = ["import os", f"class Model{i}Config:", "    pass"]
+        for j in range(lines):
+            body.append(f"def handler_{i}_{j}(value):\n    return value * {rng.randint(0, 1000)}")
+        if i % 997 == 0:
+            body.append("# RareMarker42")
+        (directory / f"module_{i}.py").write_text("\n".join(body) + "\n")
+    (root / "README.md").write_text("# Synthetic repo\n")
+
+
+def walk(root: Path):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for filename in filenames:
+            yield Path(dirpath) / filename
+
+
+def scan_code(root: Path, pattern: str) -> int:
+    regex = re.compile(pattern)
+    count = 0
+    for path in walk(root):
+        try:
+            text = path.read_text()
+        except (OSError, UnicodeDecodeError):
+            continue
+        count += sum(1 for line in text.splitlines() if regex.search(line))
+    return count
+
+
+def scan_paths(root: Path, pattern: str) -> int:
+    regex = glob_to_regex(pattern)
+    return sum(1 for path in walk(root) if regex.match(path.relative_to(root).as_posix()))
+
+
+def external_grep(root: Path, pattern: str) -> int | None:
+    if shutil.which("rg"):
+        command = ["rg", "-n", "--no-heading", pattern, str(root)]
+    elif shutil.which("grep"):
+        command = ["grep", "-rnE", pattern.replace(r"\d", "[0-9]"), str(root)]
+    else:
+        return None
+    result = subprocess.run(command, capture_output=True, text=True)
+    return len(result.stdout.splitlines())
+
+
+def timed(fn, *args, repeat: int) -> tuple[float, object]:
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--lines", type=int, default=100, help="Functions per file")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        generate_repo(root, args.files, args.lines, args.seed)
+
+        start = time.perf_counter()
+        index = CodeSearchIndex.build(tmpdir)
+        print(f"Indexed {index.file_count} files ({index.trigram_count:,} trigrams) "
+              f"in {time.perf_counter() - start:.2f}s")
+
+        print(f"\n{'code query':<28} {'matches':>8} {'scan ms':>9} {'grep ms':>9} {'index ms':>9}")
+        for query in CODE_QUERIES:
+            scan_ms, scanned = timed(scan_code, root, query, repeat=args.repeat)
+            grep_ms, _ = timed(external_grep, root, query, repeat=args.repeat)
+            index_ms, found = timed(index.search, query, None, False, 10 ** 9, repeat=args.repeat)
+            assert len(found) == scanned, f"{query}: index found {len(found)}, scan found {scanned}"
+            print(f"{query:<28} {scanned:>8} {scan_ms:>9.1f} {grep_ms:>9.1f} {index_ms:>9.1f}")
+
+        print(f"\n{'path query':<28} {'matches':>8} {'scan ms':>9} {'index ms':>9}")
+        for query in PATH_QUERIES:
+            scan_ms, scanned = timed(scan_paths, root, query, repeat=args.repeat)
+            index_ms, found = timed(index.find_files, query, 10 ** 9, repeat=args.repeat)
+            assert len(found) == scanned, f"{query}: index found {len(found)}, scan found {scanned}"
+            print(f"{query:<28} {scanned:>8} {scan_ms:>9.1f} {index_ms:>9.1f}")
+
+        edited = root / "pkg_0" / "sub_0" / "module_0.py"
+        edited.write_text(edited.read_text() + "# EditedMarker\n")
+        update_ms, _ = timed(index.update, [str(edited)], repeat=1)
+        assert index.search("EditedMarker"), "incremental update missed the edit"
+        print(f"\nIncremental update after an edit: {update_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""A/B benchmark of context compaction on the offline SDK simulator.
+
+Runs the same simulated issues with plain session resume (A) and with
+compaction every K chunks (B), and reports per-chunk latency per turn and
+input tokens. The simulator's --context-latency models the slowdown of long
+sessions.
+
+Example:
+    uv run python .github/scripts/benchmark_compaction.py --runs 20 --compact-after 2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from claude_agent_sdk.types import ResultMessage
+
+from claude_runner import run_claude_chunked
+from sdk_simulator import SdkSimulator, SimulatorConfig, set_simulator
+
+
+async def run_one(index: int, args, compact_after: int | None) -> list[tuple[float, int]]:
+    """Run one simulated issue. Returns (seconds per turn, input tokens) per chunk."""
+    chunks = []
+    with tempfile.TemporaryDirectory() as cwd:
+        start = time.monotonic()
+        async for message in run_claude_chunked(
+            f"Simulated issue {index}",
+            "Benchmark body",
+            cwd,
+            turns_per_chunk=args.turns_per_chunk,
+            max_chunks=args.chunks,
+            compact_after_chunks=compact_after,
+        ):
+            if isinstance(message, ResultMessage):
+                elapsed = time.monotonic() - start
+                chunks.append((elapsed / max(message.num_turns, 1), (message.usage or {}).get("input_tokens", 0)))
+                start = time.monotonic()
+    return chunks
+
+
+async def run_variant(args, compact_after: int | None) -> list[list[tuple[float, int]]]:
+    set_simulator(SdkSimulator(SimulatorConfig(
+        message_latency=args.latency,
+        context_latency=args.context_latency,
+        # Never finish early, so every run uses all its chunks
+        complete_after_turns=args.turns_per_chunk * args.chunks + 1,
+        seed=args.seed,
+    )))
+    return await asyncio.gather(*(run_one(i, args, compact_after) for i in range(args.runs)))
+
+
+def report(name: str, results: list[list[tuple[float, int]]]) -> None:
+    print(f"\n{name}")
+    print(f"{'chunk':>5}  {'s/turn':>8}  {'input tokens':>12}")
+    for chunk in range(max(len(r) for r in results)):
+        rows = [r[chunk] for r in results if len(r) > chunk]
+        latency = statistics.mean(row[0] for row in rows)
+        tokens = statistics.mean(row[1] for row in rows)
+        print(f"{chunk + 1:>5}  {latency:>8.3f}  {tokens:>12,.0f}")
+    total_tokens = statistics.mean(sum(row[1] for row in r) for r in results)
+    print(f"total input tokens per run: {total_tokens:,.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=5)
+    parser.add_argument("--turns-per-chunk", type=int, default=10)
+    parser.add_argument("--compact-after", type=int, default=2, help="Compact every K chunks in variant B")
+    parser.add_argument("--latency", type=float, default=0.002, help="Base seconds between simulated messages")
+    parser.add_argument("--context-latency", type=float, default=0.0002,
+                        help="Extra seconds per turn per 1000 tokens of session context")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ["CLAUDE_SDK_BACKEND"] = "simulator"
+    baseline = await run_variant(args, None)
+    compacted = await run_variant(args, args.compact_after)
+
+    report("A: resume every chunk", baseline)
+    report(f"B: compact every {args.compact_after} chunk(s)", compacted)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Compile the summary and PR description prompt programs from recorded examples.
+
+Examples are recorded by agent runs with PROMPT_EXAMPLES_DIR set (one JSONL file
+per program). Compilation makes no model calls: the newest examples become the
+programs' few-shot demos. Each program is saved as
+<name>-v<version>-<examples digest>.json in the program directory and selected
+in its programs.json, which runs with PROMPT_PROGRAMS=true load from
+PROMPT_PROGRAM_DIR.
+
+Requires the dspy extra (uv sync --extra dspy).
+
+Example:
+    uv run python .github/scripts/compile_prompt_programs.py --examples-dir prompt-examples --max-demos 3
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from prompt_programs import (
+    PROGRAM_SPECS,
+    DEFAULT_MAX_DEMOS,
+    compile_program,
+    default_cache_dir,
+    dspy_available,
+    load_examples,
+    program_path,
+    select_compiled_program,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples-dir", type=Path, default=os.environ.get("PROMPT_EXAMPLES_DIR"),
+                        help="Directory of recorded <program>.jsonl examples (default: PROMPT_EXAMPLES_DIR)")
+    parser.add_argument("--program-dir", type=Path, default=None,
+                        help="Where compiled programs are written (default: PROMPT_PROGRAM_DIR or the user cache)")
+    parser.add_argument("--max-demos", type=int, default=DEFAULT_MAX_DEMOS)
+    parser.add_argument("--program", choices=sorted(PROGRAM_SPECS), action="append",
+                        help="Only compile these programs (default: all)")
+    args = parser.parse_args()
+
+    if args.examples_dir is None:
+        parser.error("--examples-dir or PROMPT_EXAMPLES_DIR is required")
+    if not dspy_available():
+        print("Error: dspy is not installed; run uv sync --extra dspy", file=sys.stderr)
+        sys.exit(1)
+
+    program_dir = args.program_dir or default_cache_dir()
+    for name in args.program or sorted(PROGRAM_SPECS):
+        examples = load_examples(name, args.examples_dir)
+        if not examples:
+            print(f"{name}: no recorded examples, skipped")
+            continue
+        path = program_path(name, examples, args.max_demos, program_dir)
+        if path.exists():
+            select_compiled_program(name, path)
+            print(f"{name}: up to date ({path})")
+            continue
+        path = compile_program(name, examples, args.max_demos, program_dir)
+        print(f"{name}: compiled from {len(examples)} example(s) to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,9 @@ import sys
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
 
-from claude_runner import build_pr_description_prompt, run_claude
+from claude_runner import run_pr_description
+from budget import BudgetGovernor, BUDGET_HARD
+from prompt_programs import PromptPrograms
 
 
 async def main():
@@ -18,7 +20,8 @@ async def main():
     diff = os.environ.get("GIT_DIFF", "")
     api_key = os.environ.get("ANTHROPIC_API_KEY")
 
-    if not api_key:
+    # The offline simulator backend does not call the API
+    if not api_key and os.environ.get("CLAUDE_SDK_BACKEND") != "simulator":
         print("Error: ANTHROPIC_API_KEY environment variable is required", file=sys.stderr)
         sys.exit(1)
 
@@ -32,12 +35,31 @@ async def main():
 
     try:
         cwd = os.getcwd()
-        prompt = build_pr_description_prompt(issue_title, issue_body, diff, int(issue_number), cwd)
 
-        # Use fewer turns for this simpler task
-        async for message in run_claude(prompt, cwd, max_turns=3):
+        # Share the budget recorded by the implementation run
+        budget = BudgetGovernor.load(cwd)
+        if budget.state == BUDGET_HARD:
+            print("Budget hard limit reached, skipping PR description generation")
+            return
+
+        # Resume the implementing session unless disabled; falls back to the diff,
+        # written by the compiled pr_description program when PROMPT_PROGRAMS is set
+        resume = os.environ.get("PR_DESCRIPTION_RESUME", "true").lower() not in ("0", "false", "no")
+        async for message in run_pr_description(
+            issue_title,
+            issue_body,
+            diff,
+            int(issue_number),
+            cwd,
+            budget=budget,
+            resume=resume,
+            prompt_programs=PromptPrograms.from_env(),
+        ):
             print(json.dumps(message, default=str))
 
+        budget.save(cwd)
+        print(f"Total cost: ${budget.total_cost_usd:.4f} ({budget.total_tokens:,} tokens)")
+
     except Exception as e:
         print(f"Error generating PR description: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Submit, watch and serve plan/implement jobs from the local job queue.
+
+Examples:
+    uv run python .github/scripts/job_queue_cli.py serve --concurrency 4 --per-repo 1
+    uv run python .github/scripts/job_queue_cli.py submit owner/repo 42 implement "Fix the bug" --cwd ~/src/repo
+    uv run python .github/scripts/job_queue_cli.py watch
+    uv run python .github/scripts/job_queue_cli.py cancel 7
+
+The database lives at JOB_QUEUE_DB (default ~/.cache/rome/jobs.db). Each job runs in
+its own worktree under JOB_WORKTREE_DIR; with GITHUB_TOKEN set, implement jobs open a
+pull request and plan jobs post the plan comment.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from job_queue import (
+    ACTIVE_STATUSES,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_PER_REPO_LIMIT,
+    JOB_KINDS,
+    STATUS_CANCELLED,
+    JobQueue,
+    JobStore,
+    default_db_path,
+)
+
+
+def format_jobs(jobs) -> str:
+    lines = [f"{'ID':>5}  {'STATUS':<10} {'KIND':<10} {'PRI':>3}  {'REPO#ISSUE':<30} TITLE"]
+    for job in jobs:
+        ref = f"{job.repo}#{job.issue_number}"
+        lines.append(f"{job.id:>5}  {job.status:<10} {job.kind:<10} {job.priority:>3}  {ref:<30} {job.title[:60]}")
+    return "\n".join(lines)
+
+
+def parse_repo_limits(values: list[str]) -> dict[str, int]:
+    limits = {}
+    for value in values:
+        repo, _, limit = value.rpartition("=")
+        if not repo or not limit.isdigit():
+            raise SystemExit(f"Invalid --repo-limit {value!r}, expected owner/repo=N")
+        limits[repo] = int(limit)
+    return limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help="Queue database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="Queue a job")
+    submit.add_argument("repo")
+    submit.add_argument("issue", type=int)
+    submit.add_argument("kind", choices=JOB_KINDS)
+    submit.add_argument("title")
+    submit.add_argument("--body", default="")
+    submit.add_argument("--cwd", default=None, help="Checkout to run in (default: current directory)")
+    submit.add_argument("--priority", type=int, default=0, help="Higher runs sooner")
+
+    listing = commands.add_parser("list", help="Show recent jobs")
+    listing.add_argument("--limit", type=int, default=20)
+
+    watch = commands.add_parser("watch", help="Refresh the job list until no jobs are active")
+    watch.add_argument("--interval", type=float, default=2.0)
+    watch.add_argument("--limit", type=int, default=20)
+
+    cancel = commands.add_parser("cancel", help="Cancel a queued or running job")
+    cancel.add_argument("job_id", type=int)
+
+    serve = commands.add_parser("serve", help="Run queued jobs")
+    serve.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    serve.add_argument("--per-repo", type=int, default=DEFAULT_PER_REPO_LIMIT)
+    serve.add_argument("--repo-limit", action="append", default=[], help="Per-repo override, owner/repo=N")
+    serve.add_argument("--until-idle", action="store_true", help="Exit once the queue is empty")
+
+    args = parser.parse_args()
+    store = JobStore(args.db or default_db_path())
+
+    if args.command == "submit":
+        job, created = store.add(
+            args.repo,
+            args.issue,
+            args.kind,
+            args.title,
+            args.body,
+            os.path.abspath(args.cwd or os.getcwd()),
+            args.priority,
+        )
+        if created:
+            print(f"Queued job {job.id}")
+        else:
+            print(f"Job {job.id} is already {job.status} for {job.repo}#{job.issue_number} ({job.kind})")
+
+    elif args.command == "list":
+        print(format_jobs(store.list(args.limit)))
+
+    elif args.command == "watch":
+        try:
+            while True:
+                jobs = store.list(args.limit)
+                print("\033[2J\033[H" + format_jobs(jobs), flush=True)
+                if not any(job.status in ACTIVE_STATUSES for job in jobs):
+                    break
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
+
+    elif args.command == "cancel":
+        job = store.get(args.job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            print(f"Job {args.job_id} is not queued or running")
+            sys.exit(1)
+        # A serving worker notices the status change and stops the run cooperatively
+        store.set_status(job.id, STATUS_CANCELLED)
+        print(f"Cancelled job {job.id}")
+
+    elif args.command == "serve":
+        queue = JobQueue(
+            store,
+            max_concurrency=args.concurrency,
+            per_repo_limit=args.per_repo,
+            repo_limits=parse_repo_limits(args.repo_limit),
+        )
+        try:
+            asyncio.run(queue.run(stop_when_idle=args.until_idle))
+        except KeyboardInterrupt:
+            pass
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
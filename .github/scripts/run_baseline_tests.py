@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""Run the baseline test suite, skipping it when this tree already passed."""
+
+import os
+import sys
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from baseline_cache import run_baseline_tests
+
+
+def main():
+    # Extra arguments are passed through to pytest
+    command = [sys.executable, "-m", "pytest", *sys.argv[1:]]
+    sys.exit(run_baseline_tests(os.getcwd(), command))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,73 @@ import asyncio
 import json
 import os
 import sys
+import time
 
 # Add src to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
 
-from claude_runner import run_claude_chunked
-from github_api import post_issue_comment
+from claude_runner import (
+    append_plan,
+    run_claude_chunked,
+    run_claude_single,
+    CancellationToken,
+    install_signal_cancellation,
+    timeout_from_env,
+    STOP_STALLED,
+)
+from budget import BudgetGovernor
+from change_tracker import ChangeTracker
+from stall_detector import StallDetector
+from affected_tests import make_test_feedback, DEFAULT_TEST_WORKERS
+from github_api import post_issue_comment, GitHubClient
+from live_status import LiveStatus, github_comment_publisher, DEFAULT_MIN_INTERVAL
+from triage import triage_issue, format_tier_report, TriageResult, TIERS
+from base_session import ensure_base_session, build_changes_note, FirstEditCounter
+from code_search import get_search_index
+from prompt_programs import PromptPrograms
+from symbol_index import get_symbol_index, ReadCounter
+from finalise import create_branch, current_branch, finalise_run
+from parallel_steps import (
+    run_plan_steps,
+    parse_plan_steps,
+    build_step_graph,
+    is_parallelisable,
+    DEFAULT_MAX_PARALLEL_STEPS,
+)
+
+
+def choose_tier(title: str, body: str, plan: str | None) -> TriageResult:
+    """Triage the issue, unless ISSUE_TIER forces a tier."""
+    forced = os.environ.get("ISSUE_TIER", "").strip().lower()
+    if forced in TIERS:
+        return TriageResult(forced, ["set by ISSUE_TIER"])
+    if forced:
+        print(f"Warning: Ignoring unknown ISSUE_TIER {forced!r}")
+    return triage_issue(title, body, plan)
+
+
+def report_tier(
+    triage: TriageResult,
+    elapsed_seconds: float,
+    cost_usd: float,
+    turns_to_first_edit: int | None = None,
+    base_session: bool = False,
+    reads: ReadCounter | None = None,
+) -> None:
+    """Log the tier's latency and cost, and add them to the job summary."""
+    print(json.dumps({
+        "tier": triage.tier,
+        "latency_seconds": round(elapsed_seconds, 1),
+        "cost_usd": round(cost_usd, 4),
+        "turns_to_first_edit": turns_to_first_edit,
+        "base_session": base_session,
+        "read_calls": reads.reads if reads else None,
+        "ranged_reads": reads.ranged_reads if reads else None,
+    }))
+    summary_path = os.environ.get("GITHUB_STEP_SUMMARY")
+    if summary_path:
+        with open(summary_path, "a") as f:
+            f.write(f"{format_tier_report(triage, elapsed_seconds, cost_usd)}\n")
 
 
 async def main():
@@ -24,7 +85,8 @@ async def main():
     github_token = os.environ.get("GITHUB_TOKEN")
     github_repository = os.environ.get("GITHUB_REPOSITORY")  # format: "owner/repo"
 
-    if not api_key:
+    # The offline simulator backend does not call the API
+    if not api_key and os.environ.get("CLAUDE_SDK_BACKEND") != "simulator":
         print("Error: ANTHROPIC_API_KEY environment variable is required", file=sys.stderr)
         sys.exit(1)
 
@@ -49,6 +111,53 @@ async def main():
         except (ValueError, AttributeError):
             print("Warning: Could not parse GitHub repository info, progress comments disabled")
 
+    # Wall-clock limits and cancellation (SIGTERM from a cancelled job)
+    chunk_timeout = timeout_from_env("CHUNK_TIMEOUT_SECONDS")
+    run_timeout = timeout_from_env("RUN_TIMEOUT_SECONDS")
+    cancel_token = CancellationToken()
+    budget = BudgetGovernor.from_env()
+
+    # Run tests affected by the agent's changes between chunks
+    chunk_feedback = None
+    if os.environ.get("INCREMENTAL_TESTS", "").lower() in ("1", "true", "yes"):
+        try:
+            test_workers = int(os.environ.get("TEST_WORKERS", DEFAULT_TEST_WORKERS))
+        except ValueError:
+            test_workers = DEFAULT_TEST_WORKERS
+        chunk_feedback = make_test_feedback(workers=test_workers)
+
+    # Continue in a fresh session seeded with a state digest every K chunks
+    compact_after_chunks = None
+    if os.environ.get("COMPACT_AFTER_CHUNKS"):
+        try:
+            compact_after_chunks = int(os.environ["COMPACT_AFTER_CHUNKS"]) or None
+        except ValueError:
+            print("Warning: Ignoring invalid COMPACT_AFTER_CHUNKS")
+
+    # Exact per-chunk file changes; stop after STOP_AFTER_IDLE_CHUNKS chunks without any
+    change_tracker = ChangeTracker(os.getcwd())
+    try:
+        stop_after_idle_chunks = int(os.environ.get("STOP_AFTER_IDLE_CHUNKS", "2")) or None
+    except ValueError:
+        print("Warning: Ignoring invalid STOP_AFTER_IDLE_CHUNKS")
+        stop_after_idle_chunks = 2
+
+    # Nudge, then stop, an agent that loops without changing anything
+    stall_detector = None
+    if os.environ.get("STALL_DETECTION", "true").lower() not in ("0", "false", "no"):
+        stall_detector = StallDetector()
+
+    # Live status comment edited in place as the agent uses tools (no LLM calls)
+    live_status = None
+    if github_enabled and os.environ.get("LIVE_STATUS", "true").lower() not in ("0", "false", "no"):
+        min_interval = timeout_from_env("LIVE_STATUS_INTERVAL_SECONDS") or DEFAULT_MIN_INTERVAL
+        status_client = GitHubClient(repo_owner, repo_name, github_token)
+        live_status = LiveStatus(
+            github_comment_publisher(status_client, issue_number),
+            title="Agent is implementing this issue",
+            min_interval=min_interval,
+        )
+
     # Define callback for chunk completion
     async def on_chunk_complete(chunk_num: int, summary: str):
         """Post a progress update comment to the GitHub issue."""
@@ -76,15 +185,38 @@ async def main():
         if not github_enabled:
             return
 
-        num_chunks = len(all_summaries)
+        if triage.settings.single_session:
+            num_chunks = 1
+            run_length = "in a single session"
+        elif parallel_steps:
+            # One line per step, followed by any write conflicts
+            num_chunks = sum(1 for line in all_summaries if line.startswith("Step "))
+            run_length = "by implementing the plan's steps in parallel"
+        else:
+            num_chunks = len(all_summaries)
+            run_length = f"after {num_chunks} chunk(s)"
+
+        if cancel_token.reason == STOP_STALLED and stall_detector:
+            status = f"Stopped early: the agent stalled ({stall_detector.last_verdict.reason})"
+        elif cancel_token.cancelled:
+            status = f"Stopped early ({cancel_token.reason}); partial changes may have been made"
+        else:
+            status = "All requested changes have been implemented"
 
         comment_body = f"""## ✨ Implementation Complete
 
-The agent has finished working on this issue after {num_chunks} chunk(s).
+The agent has finished working on this issue {run_length}.
 
 ### 🎯 Total Progress
-- **Chunks completed:** {num_chunks}
-- **Status:** All requested changes have been implemented
+- **{"Steps" if parallel_steps else "Chunks"} completed:** {num_chunks}
+- **Status:** {status}
+- {format_tier_report(triage, time.monotonic() - started, budget.total_cost_usd)}
+
+### 📁 Files Changed
+{change_tracker.cumulative().format_markdown()}
+
+### 💰 Cost
+{budget.format_breakdown()}
 
 *Review the changes in the pull request and verify that everything works as expected.*"""
 
@@ -96,38 +228,180 @@ The agent has finished working on this issue after {num_chunks} chunk(s).
         else:
             print("Failed to post final completion summary")
 
+    started = time.monotonic()
+    parallel_steps = False
+
     try:
         cwd = os.getcwd()
+        install_signal_cancellation(cancel_token)
+
+        # Commit, push and open the PR from this process once the agent is done
+        finalise = os.environ.get("FINALISE_PR", "").lower() in ("1", "true", "yes")
+        if finalise:
+            if not github_enabled:
+                print("Error: FINALISE_PR needs ISSUE_NUMBER, GITHUB_TOKEN and GITHUB_REPOSITORY", file=sys.stderr)
+                sys.exit(1)
+            base_branch = current_branch(cwd)
+            branch = create_branch(cwd, issue_number, issue_title)
+            print(f"Working on branch {branch} (base {base_branch})")
 
         # If there's a plan, append it to the issue body with clear implementation instructions
+        issue_text = issue_body
+        plan_content = None
         if has_plan == "found":
             plan_file = os.path.join(cwd, ".plan-context.md")
             if os.path.exists(plan_file):
                 with open(plan_file, "r") as f:
                     plan_content = f.read()
-                issue_body = f"""{issue_body}
-
-## Implementation Plan
-
-{plan_content}
-
----
-
-**IMPORTANT**: You must IMPLEMENT this plan by making actual code changes using the file editing tools.
-Do not just describe what should be done - use Edit, Write, Read, Glob, and Grep to make the changes.
-Follow the implementation steps outlined in the plan above."""
+                issue_body = append_plan(issue_body, plan_content)
                 print("Found and included implementation plan in context")
 
-        # Run in chunks of 10 turns, up to 5 chunks (50 turns max)
-        # Pass callbacks if GitHub integration is enabled
-        async for message in run_claude_chunked(
-            issue_title,
-            issue_body,
-            cwd,
-            on_chunk_complete=on_chunk_complete if github_enabled else None,
-            on_final_complete=on_final_complete if github_enabled else None,
+        triage = choose_tier(issue_title, issue_text, plan_content)
+        print(f"Triage: {triage.tier} ({triage.reason})")
+
+        # Fork a pre-explored base session instead of rediscovering the repository
+        settings = triage.settings
+        base_session = None
+        if not settings.single_session and os.environ.get("BASE_SESSION", "").lower() in ("1", "true", "yes"):
+            base_session = await ensure_base_session(cwd, budget=budget)
+            if base_session and base_session.changed_files:
+                issue_body = f"{issue_body}\n\n{build_changes_note(base_session)}"
+
+        # Serve Glob/Grep-style search from an in-process index of the worktree
+        search_index = None
+        if os.environ.get("INDEXED_SEARCH", "").lower() in ("1", "true", "yes"):
+            search_index = await asyncio.to_thread(get_search_index, cwd)
+            print(f"Indexed {search_index.file_count} files for search")
+
+        # Answer definition/reference/outline questions from an ast symbol index
+        symbol_index = None
+        if os.environ.get("SYMBOL_TOOLS", "").lower() in ("1", "true", "yes"):
+            symbol_index = await asyncio.to_thread(get_symbol_index, cwd)
+            print(f"Indexed {symbol_index.symbol_count} symbols in {symbol_index.file_count} Python files")
+
+        # Run a plan's independent steps as concurrent sub-sessions, then integrate
+        if (
+            plan_content
+            and not settings.single_session
+            and os.environ.get("PARALLEL_STEPS", "").lower() in ("1", "true", "yes")
         ):
+            parallel_steps = is_parallelisable(build_step_graph(parse_plan_steps(plan_content, cwd)))
+            if not parallel_steps:
+                print("Plan steps all depend on each other, implementing them in chunks")
+
+        # Trivial issues get a lean single session: no completion marker,
+        # continuation chunks or summary sessions
+        if settings.single_session:
+            messages = run_claude_single(
+                issue_title,
+                issue_body,
+                cwd,
+                max_turns=settings.max_turns,
+                run_timeout=run_timeout,
+                cancel_token=cancel_token,
+                budget=budget,
+                change_tracker=change_tracker,
+                search_index=search_index,
+                symbol_index=symbol_index,
+            )
+        elif parallel_steps:
+            try:
+                max_parallel = max(1, int(os.environ.get("MAX_PARALLEL_STEPS", DEFAULT_MAX_PARALLEL_STEPS)))
+            except ValueError:
+                max_parallel = DEFAULT_MAX_PARALLEL_STEPS
+            messages = run_plan_steps(
+                issue_title,
+                issue_text,
+                plan_content,
+                cwd,
+                max_parallel=max_parallel,
+                turns_per_step=settings.turns_per_chunk,
+                on_final_complete=on_final_complete if github_enabled else None,
+                run_timeout=run_timeout,
+                cancel_token=cancel_token,
+                budget=budget,
+                change_tracker=change_tracker,
+                base_session_id=base_session.session_id if base_session else None,
+                search_index=search_index,
+                symbol_index=symbol_index,
+            )
+        else:
+            # Pass callbacks if GitHub integration is enabled
+            messages = run_claude_chunked(
+                issue_title,
+                issue_body,
+                cwd,
+                turns_per_chunk=settings.turns_per_chunk,
+                max_chunks=settings.max_chunks,
+                on_chunk_complete=on_chunk_complete if github_enabled else None,
+                on_final_complete=on_final_complete if github_enabled else None,
+                chunk_timeout=chunk_timeout,
+                run_timeout=run_timeout,
+                cancel_token=cancel_token,
+                budget=budget,
+                chunk_feedback=chunk_feedback,
+                compact_after_chunks=compact_after_chunks,
+                change_tracker=change_tracker,
+                stop_after_idle_chunks=stop_after_idle_chunks,
+                stall_detector=stall_detector,
+                base_session_id=base_session.session_id if base_session else None,
+                search_index=search_index,
+                symbol_index=symbol_index,
+                # Compiled DSPy programs write the summaries when PROMPT_PROGRAMS is set
+                prompt_programs=PromptPrograms.from_env(),
+            )
+
+        first_edit = FirstEditCounter()
+        reads = ReadCounter()
+        async for message in messages:
             print(json.dumps(message, default=str))
+            first_edit.observe(message)
+            reads.observe(message)
+            if live_status:
+                live_status.observe(message)
+
+        if settings.single_session and github_enabled:
+            await on_final_complete([])
+
+        if live_status:
+            await live_status.close(footer="*Agent finished. See the summary below.*")
+            await status_client.close()
+
+        # Persist usage so the PR description step shares the same budget, and
+        # the changed files so the commit step stages exactly those
+        budget.save(cwd)
+        change_tracker.save(cwd)
+        print(f"Total cost: ${budget.total_cost_usd:.4f} ({budget.total_tokens:,} tokens)")
+        report_tier(
+            triage,
+            time.monotonic() - started,
+            budget.total_cost_usd,
+            turns_to_first_edit=first_edit.first_edit_turn,
+            base_session=base_session is not None,
+            reads=reads,
+        )
+
+        if finalise:
+            # PRs opened with the default GITHUB_TOKEN do not trigger workflows
+            pr_token = os.environ.get("PR_TOKEN") or github_token
+            resume = os.environ.get("PR_DESCRIPTION_RESUME", "true").lower() not in ("0", "false", "no")
+            async with GitHubClient(repo_owner, repo_name, pr_token) as client:
+                result = await finalise_run(
+                    issue_title,
+                    issue_text,
+                    issue_number,
+                    cwd,
+                    branch,
+                    base_branch,
+                    client,
+                    changes=change_tracker.cumulative(),
+                    budget=budget,
+                    prompt_programs=PromptPrograms.from_env(),
+                    resume=resume,
+                )
+            if result.commit is not None and result.pull_request_url is None:
+                print("Error: Could not open the pull request", file=sys.stderr)
+                sys.exit(1)
 
     except Exception as e:
         print(f"Error running Claude: {e}", file=sys.stderr)
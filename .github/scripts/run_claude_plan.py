@@ -9,8 +9,20 @@ import sys
 # Add src to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
 
-from claude_runner import run_claude_plan_chunked
-from github_api import post_issue_comment
+from claude_runner import (
+    run_claude_plan_chunked,
+    CancellationToken,
+    install_signal_cancellation,
+    timeout_from_env,
+)
+from budget import BudgetGovernor
+from parallel_plan import run_claude_plan_parallel
+from base_session import ensure_base_session, build_changes_note
+from code_search import get_search_index
+from prompt_programs import PromptPrograms
+from symbol_index import get_symbol_index
+from github_api import post_issue_comment, GitHubClient
+from live_status import LiveStatus, github_comment_publisher, DEFAULT_MIN_INTERVAL
 
 
 async def main():
@@ -23,7 +35,8 @@ async def main():
     github_token = os.environ.get("GITHUB_TOKEN")
     github_repository = os.environ.get("GITHUB_REPOSITORY")  # format: "owner/repo"
 
-    if not api_key:
+    # The offline simulator backend does not call the API
+    if not api_key and os.environ.get("CLAUDE_SDK_BACKEND") != "simulator":
         print("Error: ANTHROPIC_API_KEY environment variable is required", file=sys.stderr)
         sys.exit(1)
 
@@ -48,6 +61,30 @@ async def main():
         except (ValueError, AttributeError):
             print("Warning: Could not parse GitHub repository info, progress comments disabled")
 
+    # Wall-clock limits and cancellation (SIGTERM from a cancelled job)
+    chunk_timeout = timeout_from_env("CHUNK_TIMEOUT_SECONDS")
+    run_timeout = timeout_from_env("RUN_TIMEOUT_SECONDS")
+    cancel_token = CancellationToken()
+    budget = BudgetGovernor.from_env()
+
+    # PLAN_CANDIDATES > 1 runs several short planning sessions in parallel
+    try:
+        plan_candidates = int(os.environ.get("PLAN_CANDIDATES", "1"))
+    except ValueError:
+        print("Warning: Ignoring invalid PLAN_CANDIDATES, using a single planner")
+        plan_candidates = 1
+
+    # Live status comment edited in place as the agent uses tools (no LLM calls)
+    live_status = None
+    if github_enabled and os.environ.get("LIVE_STATUS", "true").lower() not in ("0", "false", "no"):
+        min_interval = timeout_from_env("LIVE_STATUS_INTERVAL_SECONDS") or DEFAULT_MIN_INTERVAL
+        status_client = GitHubClient(repo_owner, repo_name, github_token)
+        live_status = LiveStatus(
+            github_comment_publisher(status_client, issue_number),
+            title="Agent is planning this issue",
+            min_interval=min_interval,
+        )
+
     # Define callback for chunk completion
     async def on_chunk_complete(chunk_num: int, summary: str):
         """Post a planning progress update comment to the GitHub issue."""
@@ -77,13 +114,21 @@ async def main():
 
         num_chunks = len(all_summaries)
 
+        if cancel_token.cancelled:
+            status = f"Stopped early ({cancel_token.reason}); the plan may be incomplete"
+        else:
+            status = "Implementation plan has been generated"
+
         comment_body = f"""## 🗺️ Planning Complete
 
 The planning agent has finished exploring the codebase after {num_chunks} chunk(s).
 
 ### 🎯 Planning Progress
 - **Chunks completed:** {num_chunks}
-- **Status:** Implementation plan has been generated
+- **Status:** {status}
+
+### 💰 Cost
+{budget.format_breakdown()}
 
 *The detailed plan has been posted in a separate comment. Review it and use `/apply` to start implementation.*"""
 
@@ -95,19 +140,116 @@ The planning agent has finished exploring the codebase after {num_chunks} chunk(
         else:
             print("Failed to post final planning summary")
 
+    # Define callback for parallel planning
+    async def on_plans_ranked(ranked):
+        """Post the candidate ranking to the GitHub issue."""
+        if not github_enabled:
+            return
+
+        if ranked:
+            rows = "\n".join(
+                f"| {candidate.index + 1} | {candidate.focus} | {len(candidate.files)} | {candidate.steps} |"
+                for candidate in ranked
+            )
+            ranking = f"""| Candidate | Focus | Files covered | Steps |
+|-----------|-------|---------------|-------|
+{rows}
+
+Candidate {ranked[0].index + 1} was selected."""
+        else:
+            ranking = "⚠️ None of the planning sessions produced a plan."
+
+        comment_body = f"""## 🗺️ Planning Complete
+
+{plan_candidates} planning sessions explored the codebase in parallel.
+
+### 🏆 Candidate Plans
+{ranking}
+
+### 💰 Cost
+{budget.format_breakdown()}
+
+*The detailed plan has been posted in a separate comment. Review it and use `/apply` to start implementation.*"""
+
+        success = await post_issue_comment(
+            repo_owner, repo_name, issue_number, comment_body, github_token
+        )
+        if success:
+            print("Posted plan ranking")
+        else:
+            print("Failed to post plan ranking")
+
     try:
         cwd = os.getcwd()
+        install_signal_cancellation(cancel_token)
+
+        # Fork a pre-explored base session instead of rediscovering the repository
+        base_session = None
+        if os.environ.get("BASE_SESSION", "").lower() in ("1", "true", "yes"):
+            base_session = await ensure_base_session(cwd, budget=budget)
+            if base_session and base_session.changed_files:
+                issue_body = f"{issue_body}\n\n{build_changes_note(base_session)}"
+        base_session_id = base_session.session_id if base_session else None
+
+        # Serve Glob/Grep-style search from an in-process index of the worktree
+        search_index = None
+        if os.environ.get("INDEXED_SEARCH", "").lower() in ("1", "true", "yes"):
+            search_index = await asyncio.to_thread(get_search_index, cwd)
+            print(f"Indexed {search_index.file_count} files for search")
+
+        # Answer definition/reference/outline questions from an ast symbol index
+        symbol_index = None
+        if os.environ.get("SYMBOL_TOOLS", "").lower() in ("1", "true", "yes"):
+            symbol_index = await asyncio.to_thread(get_symbol_index, cwd)
+            print(f"Indexed {symbol_index.symbol_count} symbols in {symbol_index.file_count} Python files")
 
-        # Run plan generation in chunks (10 turns per chunk, up to 3 chunks = 30 turns max)
-        # Pass callbacks if GitHub integration is enabled
-        async for message in run_claude_plan_chunked(
-            issue_title,
-            issue_body,
-            cwd,
-            on_chunk_complete=on_chunk_complete if github_enabled else None,
-            on_final_complete=on_final_complete if github_enabled else None,
-        ):
+        if plan_candidates > 1:
+            # Speculative planning: several short sessions with different focuses
+            messages = run_claude_plan_parallel(
+                issue_title,
+                issue_body,
+                cwd,
+                num_candidates=plan_candidates,
+                on_plans_ranked=on_plans_ranked if github_enabled else None,
+                run_timeout=run_timeout,
+                cancel_token=cancel_token,
+                budget=budget,
+                base_session_id=base_session_id,
+                search_index=search_index,
+                symbol_index=symbol_index,
+            )
+        else:
+            # Run plan generation in chunks (10 turns per chunk, up to 3 chunks = 30 turns max)
+            # Pass callbacks if GitHub integration is enabled
+            messages = run_claude_plan_chunked(
+                issue_title,
+                issue_body,
+                cwd,
+                on_chunk_complete=on_chunk_complete if github_enabled else None,
+                on_final_complete=on_final_complete if github_enabled else None,
+                chunk_timeout=chunk_timeout,
+                run_timeout=run_timeout,
+                cancel_token=cancel_token,
+                budget=budget,
+                base_session_id=base_session_id,
+                search_index=search_index,
+                symbol_index=symbol_index,
+                # Compiled DSPy programs write the summaries when PROMPT_PROGRAMS is set
+                prompt_programs=PromptPrograms.from_env(),
+            )
+
+        async for message in messages:
             print(json.dumps(message, default=str))
+            if live_status:
+                live_status.observe(message)
+
+        if live_status:
+            await live_status.close(footer="*Planning finished. See the plan below.*")
+            await status_client.close()
+
+        # Persist usage so the PR description step shares the same budget
+        budget.save(cwd)
+        print(f"Total cost: ${budget.total_cost_usd:.4f} ({budget.total_tokens:,} tokens)")
 
     except Exception as e:
         print(f"Error running Claude plan: {e}", file=sys.stderr)
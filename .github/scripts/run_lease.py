@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Claim or release an issue's run lease, so duplicate triggers exit early.
+
+claim writes claimed=true/false to $GITHUB_OUTPUT; a run that did not claim the
+issue should skip all further work. release deletes the run's lease comment.
+
+Environment: GITHUB_TOKEN, GITHUB_REPOSITORY, ISSUE_NUMBER, GITHUB_RUN_ID,
+LEASE_SECONDS (optional).
+
+Example:
+    uv run python .github/scripts/run_lease.py claim --label ai:in-progress --trigger-label ai:implement
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from github_api import GitHubClient, LeaseError, claim_run_lease, release_run_lease, DEFAULT_LEASE_SECONDS
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["claim", "release"])
+    parser.add_argument("--label", default="ai:in-progress", help="Label marking the issue as claimed")
+    parser.add_argument("--trigger-label", default=None, help="Label that triggered the run, removed on claim")
+    args = parser.parse_args()
+
+    token = os.environ.get("GITHUB_TOKEN")
+    repository = os.environ.get("GITHUB_REPOSITORY", "")
+    issue_number = os.environ.get("ISSUE_NUMBER", "")
+    run_id = os.environ.get("GITHUB_RUN_ID")
+    if not token or "/" not in repository or not issue_number.isdigit() or not run_id:
+        print("Error: GITHUB_TOKEN, GITHUB_REPOSITORY, ISSUE_NUMBER and GITHUB_RUN_ID are required", file=sys.stderr)
+        sys.exit(1)
+    try:
+        lease_seconds = int(os.environ.get("LEASE_SECONDS") or DEFAULT_LEASE_SECONDS)
+    except ValueError:
+        print("Warning: Ignoring invalid LEASE_SECONDS")
+        lease_seconds = DEFAULT_LEASE_SECONDS
+
+    owner, repo = repository.split("/", 1)
+    async with GitHubClient(owner, repo, token) as client:
+        if args.command == "release":
+            if not await release_run_lease(client, int(issue_number), run_id):
+                print("Warning: Could not release the run lease; it expires on its own")
+            return
+
+        try:
+            lease = await claim_run_lease(
+                client, int(issue_number), run_id, args.label, args.trigger_label, lease_seconds
+            )
+        except LeaseError as e:
+            print(f"Error claiming issue: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    output = os.environ.get("GITHUB_OUTPUT")
+    if output:
+        with open(output, "a") as f:
+            f.write(f"claimed={'true' if lease else 'false'}\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
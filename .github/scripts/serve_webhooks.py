@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Self-hosted webhook receiver: queue and run agent jobs without Actions cold starts.
+
+Point a GitHub webhook (issues + issue comments, content type application/json)
+at http://HOST:PORT/webhook.
+
+Environment variables:
+    WEBHOOK_SECRET: Webhook secret used to verify X-Hub-Signature-256 (recommended)
+    WEBHOOK_HOST / WEBHOOK_PORT: Listen address (default 127.0.0.1:8080)
+    REPO_CHECKOUTS: Comma-separated owner/repo=/path/to/checkout entries
+    GITHUB_TOKEN: Optional, used to reply on issues, fetch and post plan comments and open pull requests
+    JOB_QUEUE_DB, JOB_CONCURRENCY, JOB_PER_REPO_LIMIT: Job queue settings
+"""
+
+import asyncio
+import os
+import sys
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from job_queue import DEFAULT_MAX_CONCURRENCY, DEFAULT_PER_REPO_LIMIT, JobQueue, JobStore, default_db_path
+from webhook_server import JobDispatcher, start_webhook_server
+
+
+def parse_checkouts(value: str) -> dict[str, str]:
+    checkouts = {}
+    for entry in value.split(","):
+        repo, _, path = entry.strip().partition("=")
+        if repo and path:
+            checkouts[repo] = os.path.abspath(os.path.expanduser(path))
+    return checkouts
+
+
+async def main():
+    checkouts = parse_checkouts(os.environ.get("REPO_CHECKOUTS", ""))
+    if not checkouts:
+        print("Error: REPO_CHECKOUTS must list at least one owner/repo=/path entry")
+        sys.exit(1)
+
+    secret = os.environ.get("WEBHOOK_SECRET")
+    if not secret:
+        print("Warning: WEBHOOK_SECRET is not set, deliveries will not be verified")
+
+    store = JobStore(default_db_path())
+    queue = JobQueue(
+        store,
+        max_concurrency=int(os.environ.get("JOB_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+        per_repo_limit=int(os.environ.get("JOB_PER_REPO_LIMIT", DEFAULT_PER_REPO_LIMIT)),
+    )
+    dispatcher = JobDispatcher(queue, checkouts, github_token=os.environ.get("GITHUB_TOKEN"))
+
+    server = await start_webhook_server(
+        dispatcher.dispatch,
+        secret=secret,
+        host=os.environ.get("WEBHOOK_HOST", "127.0.0.1"),
+        port=int(os.environ.get("WEBHOOK_PORT", "8080")),
+    )
+    for sock in server.sockets:
+        print(f"Listening for webhooks on {sock.getsockname()}")
+
+    async with server:
+        await asyncio.gather(server.serve_forever(), queue.run())
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
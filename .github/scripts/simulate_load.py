@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Load-test the runner pipeline against the offline SDK simulator.
+
+Runs many concurrent run_claude_chunked (or run_claude_plan_chunked) runs,
+each in its own temporary directory, and reports latency percentiles,
+throughput and peak memory.
+
+Example:
+    uv run python .github/scripts/simulate_load.py --runs 200 --concurrency 100 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from claude_runner import run_claude_chunked, run_claude_plan_chunked
+from sdk_simulator import SdkSimulator, SimulatorConfig, set_simulator
+
+
+async def run_one(index: int, mode: str, summaries: bool, semaphore: asyncio.Semaphore) -> tuple[float, int]:
+    """Run one simulated issue. Returns (wall time, messages received)."""
+    async def on_chunk_complete(chunk_num: int, summary: str):
+        pass
+
+    runner = run_claude_plan_chunked if mode == "plan" else run_claude_chunked
+    async with semaphore:
+        with tempfile.TemporaryDirectory() as cwd:
+            start = time.monotonic()
+            messages = 0
+            async for _ in runner(
+                f"Simulated issue {index}",
+                "Load test body",
+                cwd,
+                on_chunk_complete=on_chunk_complete if summaries else None,
+            ):
+                messages += 1
+            return time.monotonic() - start, messages
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=100, help="Number of simulated issues")
+    parser.add_argument("--concurrency", type=int, default=50, help="Maximum concurrent runs")
+    parser.add_argument("--mode", choices=["implement", "plan"], default="implement")
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds between simulated messages")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Latency jitter fraction")
+    parser.add_argument("--complete-after", type=int, default=15, help="Turns before the agent finishes")
+    parser.add_argument("--result-size", type=int, default=2000, help="Characters per tool result")
+    parser.add_argument("--summaries", action="store_true", help="Also run simulated chunk summaries")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    simulator = SdkSimulator(SimulatorConfig(
+        message_latency=args.latency,
+        latency_jitter=args.jitter,
+        complete_after_turns=args.complete_after,
+        tool_result_size=args.result_size,
+        seed=args.seed,
+    ))
+    set_simulator(simulator)
+    os.environ["CLAUDE_SDK_BACKEND"] = "simulator"
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    start = time.monotonic()
+    results = await asyncio.gather(*(run_one(i, args.mode, args.summaries, semaphore) for i in range(args.runs)))
+    elapsed = time.monotonic() - start
+
+    durations = [duration for duration, _ in results]
+    total_messages = sum(messages for _, messages in results)
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"Runs:            {args.runs} ({args.concurrency} concurrent, mode={args.mode})")
+    print(f"Wall time:       {elapsed:.2f}s")
+    print(f"Throughput:      {args.runs / elapsed:.1f} runs/s, {total_messages / elapsed:.0f} messages/s")
+    print(f"Run latency:     p50={statistics.median(durations):.2f}s "
+          f"p95={percentile(durations, 0.95):.2f}s max={max(durations):.2f}s")
+    print(f"Queries issued:  {simulator.queries}")
+    print(f"Peak RSS:        {peak_rss_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
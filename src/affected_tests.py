@@ -0,0 +1,279 @@
+"""Map changed files to affected tests and run them between agent chunks."""
+
+import ast
+import asyncio
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable
+
+
+DEFAULT_TEST_WORKERS = 4
+DEFAULT_TEST_TIMEOUT = 300.0
+MAX_FAILURE_OUTPUT = 3000
+
+# Directories never scanned for Python files
+SKIP_DIRS = {"__pycache__", "node_modules", "venv", "build", "dist"}
+
+
+@dataclass
+class PytestResult:
+    """Outcome of running a set of test files, possibly across several shards."""
+
+    passed: bool
+    test_files: list[str] = field(default_factory=list)
+    failures: list[str] = field(default_factory=list)
+    output: str = ""
+
+
+def is_test_file(path: Path) -> bool:
+    """Return True for pytest-style test modules (test_*.py or *_test.py)."""
+    return path.suffix == ".py" and (path.name.startswith("test_") or path.stem.endswith("_test"))
+
+
+def iter_python_files(cwd: str):
+    """Yield Python files in the working tree, skipping hidden and build directories."""
+    for dirpath, dirnames, filenames in os.walk(cwd):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".") and d not in SKIP_DIRS]
+        for filename in filenames:
+            if filename.endswith(".py"):
+                yield Path(dirpath) / filename
+
+
+def build_module_index(cwd: str) -> dict[str, Path]:
+    """Map importable module names to files.
+
+    Modules are indexed relative to the repository root and to src/, since
+    tests here import src modules directly (e.g. `from claude_runner import ...`).
+    """
+    root = Path(cwd)
+    roots = [root] + ([root / "src"] if (root / "src").is_dir() else [])
+    index = {}
+    for path in iter_python_files(cwd):
+        for base in roots:
+            try:
+                relative = path.relative_to(base)
+            except ValueError:
+                continue
+            parts = list(relative.with_suffix("").parts)
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            if parts:
+                index.setdefault(".".join(parts), path)
+    return index
+
+
+def imported_module_names(path: Path, module_name: str | None = None) -> set[str]:
+    """Return the module names a file imports, including `from x import y` as x.y."""
+    try:
+        tree = ast.parse(path.read_text(), filename=str(path))
+    except (SyntaxError, UnicodeDecodeError, OSError):
+        return set()
+
+    package = module_name.rsplit(".", 1)[0] if module_name and "." in module_name else ""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                # Resolve relative imports against the file's package
+                anchor = package.split(".") if package else []
+                anchor = anchor[: len(anchor) - (node.level - 1)] if node.level > 1 else anchor
+                base = ".".join(part for part in anchor + ([base] if base else []) if part)
+            if base:
+                names.add(base)
+            names.update(f"{base}.{alias.name}" if base else alias.name for alias in node.names)
+    return names
+
+
+def build_import_graph(cwd: str) -> dict[Path, set[Path]]:
+    """Return a graph of file -> repository files it imports."""
+    index = build_module_index(cwd)
+    names_by_path = {}
+    for name, path in index.items():
+        names_by_path.setdefault(path, name)
+
+    graph = {}
+    for path in iter_python_files(cwd):
+        imports = set()
+        for name in imported_module_names(path, names_by_path.get(path)):
+            # Try the full name, then its parents (e.g. pkg.mod.func -> pkg.mod)
+            parts = name.split(".")
+            while parts:
+                target = index.get(".".join(parts))
+                if target is not None:
+                    if target != path:
+                        imports.add(target)
+                    break
+                parts.pop()
+        graph[path] = imports
+    return graph
+
+
+def affected_test_files(
+    changed_files: list[str],
+    cwd: str,
+    graph: dict[Path, set[Path]] | None = None,
+) -> list[str]:
+    """Return test files (relative to cwd) affected by the changed files.
+
+    A test is affected when it changed itself, transitively imports a changed
+    module, or lives under a directory whose conftest.py changed.
+    """
+    root = Path(cwd)
+    if graph is None:
+        graph = build_import_graph(cwd)
+
+    reverse: dict[Path, set[Path]] = {}
+    for path, imports in graph.items():
+        for target in imports:
+            reverse.setdefault(target, set()).add(path)
+
+    changed = {(root / f).resolve() for f in changed_files}
+    affected = set()
+    queue = [p for p in graph if p.resolve() in changed]
+    seen = set(queue)
+    while queue:
+        path = queue.pop()
+        if is_test_file(path):
+            affected.add(path)
+        for dependant in reverse.get(path, ()):
+            if dependant not in seen:
+                seen.add(dependant)
+                queue.append(dependant)
+
+    for changed_path in changed:
+        if changed_path.name == "conftest.py":
+            affected.update(p for p in graph if is_test_file(p) and changed_path.parent in p.resolve().parents)
+
+    return sorted(str(p.relative_to(root)) for p in affected)
+
+
+def shard_tests(test_files: list[str], num_shards: int) -> list[list[str]]:
+    """Split test files round-robin into at most num_shards non-empty shards."""
+    num_shards = max(1, min(num_shards, len(test_files)))
+    shards = [test_files[i::num_shards] for i in range(num_shards)]
+    return [shard for shard in shards if shard]
+
+
+def parse_pytest_failures(output: str) -> list[str]:
+    """Extract the short test summary lines (FAILED/ERROR) from pytest output."""
+    return [
+        line.strip()
+        for line in output.splitlines()
+        if line.startswith("FAILED ") or line.startswith("ERROR ")
+    ]
+
+
+async def _run_shard(shard: list[str], cwd: str, timeout: float) -> PytestResult:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "pytest", "-q", "-rfE", "-p", "no:cacheprovider", *shard,
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        return PytestResult(False, shard, [f"TIMEOUT {' '.join(shard)} (>{timeout:.0f}s)"])
+    finally:
+        # Also on cancellation (run timeout, cancel token), so no shard is orphaned
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+    output = stdout.decode(errors="replace")
+    # Exit code 5 means no tests were collected, which is not a failure
+    passed = process.returncode in (0, 5)
+    failures = parse_pytest_failures(output)
+    if not passed and not failures:
+        failures = [f"ERROR pytest exited with code {process.returncode} for {' '.join(shard)}"]
+    return PytestResult(passed, shard, failures, output)
+
+
+async def run_tests(
+    test_files: list[str],
+    cwd: str,
+    workers: int = DEFAULT_TEST_WORKERS,
+    timeout: float = DEFAULT_TEST_TIMEOUT,
+) -> PytestResult:
+    """Run test files with pytest, sharded across concurrent worker processes."""
+    if not test_files:
+        return PytestResult(True)
+
+    results = await asyncio.gather(*(_run_shard(shard, cwd, timeout) for shard in shard_tests(test_files, workers)))
+    return PytestResult(
+        passed=all(r.passed for r in results),
+        test_files=list(test_files),
+        failures=[f for r in results for f in r.failures],
+        output="\n".join(r.output for r in results if not r.passed),
+    )
+
+
+def git_changed_files(cwd: str) -> list[str]:
+    """Return files changed in the working tree (tracked and untracked) per git status."""
+    result = subprocess.run(
+        ["git", "status", "--porcelain", "--untracked-files=all"],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return []
+
+    files = []
+    for line in result.stdout.splitlines():
+        path = line[3:]
+        if " -> " in path:
+            path = path.split(" -> ", 1)[1]
+        files.append(path.strip('"'))
+    return files
+
+
+def format_test_feedback(result: PytestResult) -> str:
+    """Format a test run for the agent's continuation prompt."""
+    if result.passed:
+        return f"## Test Results\n\nThe {len(result.test_files)} test file(s) affected by your changes pass."
+
+    failures = "\n".join(f"- {failure}" for failure in result.failures)
+    output = result.output[-MAX_FAILURE_OUTPUT:]
+    return f"""## Test Results
+
+Tests affected by your changes are FAILING. Fix these before signalling completion:
+
+{failures}
+
+```
+{output}
+```"""
+
+
+def make_test_feedback(
+    workers: int = DEFAULT_TEST_WORKERS,
+    timeout: float = DEFAULT_TEST_TIMEOUT,
+    changed_files: Callable[[str], list[str]] = git_changed_files,
+) -> Callable[[str, list[str] | None], Awaitable[str | None]]:
+    """Create a chunk_feedback hook that runs tests affected by the agent's changes.
+
+    The hook selects tests from the paths the chunk changed, as reported by
+    the engine's change tracker; changed_files (git status by default) is only
+    asked when no paths are given. Returns None (no feedback) when nothing
+    relevant changed.
+    """
+    async def feedback(cwd: str, changed: list[str] | None = None) -> str | None:
+        if changed is None:
+            changed = await asyncio.to_thread(changed_files, cwd)
+        if not changed:
+            return None
+        test_files = await asyncio.to_thread(affected_test_files, changed, cwd)
+        if not test_files:
+            return None
+        print(f"Running {len(test_files)} affected test file(s): {', '.join(test_files)}")
+        result = await run_tests(test_files, cwd, workers, timeout)
+        return format_test_feedback(result)
+
+    return feedback
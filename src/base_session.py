@@ -0,0 +1,250 @@
+"""Pre-explored base sessions that plan and implement runs fork instead of starting cold.
+
+Once per repository tree an exploration session reads the layout and key
+modules; its session_id is cached with the tree hash and commit. Later runs
+fork it through the SDK's resume option. A base session expires when it is
+too old or when too many files have changed since its commit.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from claude_agent_sdk.types import AssistantMessage, ResultMessage, ToolUseBlock
+
+from baseline_cache import tree_hash
+from budget import BudgetGovernor, BUDGET_HARD
+from claude_runner import run_claude, extract_session_id, route_for, CALL_EXPLORE
+from stall_detector import EDITING_TOOLS
+
+
+OVERVIEW_FILE = ".claude-overview.md"
+EXPLORATION_TOOLS = ["Read", "Glob", "Grep", "Write"]
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "rome" / "base-sessions"
+DEFAULT_EXPLORATION_TURNS = 12
+DEFAULT_MAX_CHANGED_FILES = 25
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 3600
+MAX_ENTRIES_PER_REPO = 5
+MAX_LISTED_CHANGES = 20
+
+
+def default_cache_dir() -> Path:
+    """Return the cache directory (BASE_SESSION_CACHE_DIR or ~/.cache/rome/base-sessions)."""
+    return Path(os.environ.get("BASE_SESSION_CACHE_DIR") or DEFAULT_CACHE_DIR)
+
+
+@dataclass
+class BaseSession:
+    """An exploration session recorded for a repository checkout.
+
+    Attributes:
+        session_id: Session to fork
+        cwd: Checkout the session ran in (the CLI stores sessions per directory)
+        tree: Tree hash of HEAD when the session ran
+        commit: HEAD commit when the session ran
+        created_at: Unix time the session was recorded
+        exploration_turns: Turns the exploration took
+        changed_files: Files changed since the session's commit (set on lookup)
+    """
+
+    session_id: str
+    cwd: str
+    tree: str
+    commit: str
+    created_at: float = field(default_factory=time.time)
+    exploration_turns: int = 0
+    changed_files: list[str] = field(default_factory=list)
+
+
+def _git(cwd: str, *args: str) -> str | None:
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+
+def _entries_path(cwd: str, cache_dir: Path | None) -> Path:
+    checkout = hashlib.sha256(os.path.realpath(cwd).encode()).hexdigest()[:16]
+    return (cache_dir or default_cache_dir()) / f"{checkout}.json"
+
+
+def _load_entries(path: Path) -> list[BaseSession]:
+    if not path.exists():
+        return []
+    try:
+        return [BaseSession(**entry) for entry in json.loads(path.read_text())]
+    except (ValueError, TypeError) as e:
+        print(f"Warning: Could not read base sessions from {path}: {e}")
+        return []
+
+
+def changed_files_since(cwd: str, commit: str) -> list[str] | None:
+    """Return files changed (committed, uncommitted or untracked) since commit.
+
+    Returns None when the commit is unknown, e.g. after a force push.
+    """
+    diff = _git(cwd, "diff", "--name-only", commit)
+    if diff is None:
+        return None
+    untracked = _git(cwd, "ls-files", "--others", "--exclude-standard") or ""
+    paths = diff.splitlines() + [path for path in untracked.splitlines() if not Path(path).name.startswith(".")]
+    return sorted(set(paths))
+
+
+def find_base_session(
+    cwd: str,
+    max_changed_files: int = DEFAULT_MAX_CHANGED_FILES,
+    max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+    cache_dir: Path | None = None,
+) -> BaseSession | None:
+    """Return the newest usable base session for this checkout, or None.
+
+    A session is usable while it is younger than max_age_seconds and at most
+    max_changed_files files have changed since its commit.
+    """
+    now = time.time()
+    for session in reversed(_load_entries(_entries_path(cwd, cache_dir))):
+        if now - session.created_at > max_age_seconds:
+            continue
+        changed = changed_files_since(cwd, session.commit)
+        if changed is None or len(changed) > max_changed_files:
+            continue
+        session.changed_files = changed
+        return session
+    return None
+
+
+def record_base_session(session: BaseSession, cache_dir: Path | None = None) -> None:
+    """Record a base session, keeping the newest MAX_ENTRIES_PER_REPO per checkout."""
+    path = _entries_path(session.cwd, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    entries = [entry for entry in _load_entries(path) if entry.tree != session.tree]
+    entries.append(session)
+    data = []
+    for entry in entries[-MAX_ENTRIES_PER_REPO:]:
+        entry_dict = asdict(entry)
+        del entry_dict["changed_files"]
+        data.append(entry_dict)
+    path.write_text(json.dumps(data, indent=2))
+
+
+def build_exploration_prompt(cwd: str) -> str:
+    """Build the prompt for the read-only exploration session."""
+    return f"""You are exploring a repository so that later tasks in this session can start work immediately.
+
+Working directory: {cwd}
+
+Use Glob, Grep and Read to learn:
+- The directory layout and what each top-level package or module is for
+- The entry points, core modules and how they depend on each other
+- How tests are laid out and run
+- Naming, error handling and documentation conventions
+
+Do NOT modify any files. You have no task yet; only build an understanding of the codebase.
+
+When done, write a concise overview of the repository (under 300 words) to: {cwd}/{OVERVIEW_FILE}"""
+
+
+def build_changes_note(session: BaseSession) -> str:
+    """Describe files changed since the base session explored the repository."""
+    if not session.changed_files:
+        return ""
+    listed = "\n".join(f"- {path}" for path in session.changed_files[:MAX_LISTED_CHANGES])
+    more = len(session.changed_files) - MAX_LISTED_CHANGES
+    if more > 0:
+        listed += f"\n- ... and {more} more"
+    return f"""## Changes Since Exploration
+These files changed after you explored the repository; re-read them before relying on what you saw:
+{listed}"""
+
+
+async def explore_base_session(
+    cwd: str,
+    max_turns: int = DEFAULT_EXPLORATION_TURNS,
+    budget: BudgetGovernor | None = None,
+    cache_dir: Path | None = None,
+) -> BaseSession | None:
+    """Run an exploration session for the current tree and record it.
+
+    Returns None outside a git repository, once the budget is used up, or if the
+    session did not start.
+    """
+    tree = tree_hash(cwd)
+    commit = _git(cwd, "rev-parse", "HEAD")
+    if tree is None or commit is None:
+        return None
+
+    if budget is not None and budget.state == BUDGET_HARD:
+        print("Budget hard limit reached, skipping the exploration session")
+        return None
+
+    route = route_for(CALL_EXPLORE)
+    session_id = None
+    turns = 0
+    try:
+        async for message in run_claude(
+            build_exploration_prompt(cwd),
+            cwd,
+            route.turns(max_turns),
+            allowed_tools=EXPLORATION_TOOLS,
+            max_budget_usd=budget.remaining_usd if budget else None,
+            model=route.model,
+        ):
+            if session_id is None:
+                session_id = extract_session_id(message)
+            if isinstance(message, ResultMessage):
+                turns = message.num_turns
+            if budget is not None:
+                budget.record(CALL_EXPLORE, message)
+    except Exception as e:
+        print(f"Error running exploration session: {e}")
+    finally:
+        (Path(cwd) / OVERVIEW_FILE).unlink(missing_ok=True)
+
+    if session_id is None:
+        return None
+    session = BaseSession(session_id, os.path.realpath(cwd), tree, commit, exploration_turns=turns)
+    record_base_session(session, cache_dir)
+    print(f"Recorded base session {session_id} for tree {tree} ({turns} turns)")
+    return session
+
+
+async def ensure_base_session(
+    cwd: str,
+    max_turns: int = DEFAULT_EXPLORATION_TURNS,
+    max_changed_files: int = DEFAULT_MAX_CHANGED_FILES,
+    max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+    budget: BudgetGovernor | None = None,
+    cache_dir: Path | None = None,
+) -> BaseSession | None:
+    """Return a usable base session for cwd, exploring the repository if there is none."""
+    session = find_base_session(cwd, max_changed_files, max_age_seconds, cache_dir)
+    if session is not None:
+        print(f"Reusing base session {session.session_id} "
+              f"({len(session.changed_files)} file(s) changed since {session.commit[:12]})")
+        return session
+    return await explore_base_session(cwd, max_turns, budget, cache_dir)
+
+
+class FirstEditCounter:
+    """Counts agent turns until the first file edit in a message stream.
+
+    Attributes:
+        turns: Assistant turns observed so far
+        first_edit_turn: Turn of the first Edit/Write call, or None before it
+    """
+
+    def __init__(self):
+        self.turns = 0
+        self.first_edit_turn: int | None = None
+
+    def observe(self, message) -> None:
+        if self.first_edit_turn is not None or not isinstance(message, AssistantMessage):
+            return
+        self.turns += 1
+        if any(isinstance(block, ToolUseBlock) and block.name in EDITING_TOOLS for block in message.content):
+            self.first_edit_turn = self.turns
@@ -0,0 +1,107 @@
+"""Cache of passing baseline test runs, keyed by git tree hash and uv.lock hash."""
+
+import hashlib
+import json
+import os
+import subprocess
+import time
+from pathlib import Path
+
+
+LOCK_FILE = "uv.lock"
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "rome" / "baseline-tests"
+DEFAULT_MAX_ENTRIES = 200
+
+
+def default_cache_dir() -> Path:
+    """Return the cache directory (BASELINE_CACHE_DIR or ~/.cache/rome/baseline-tests)."""
+    return Path(os.environ.get("BASELINE_CACHE_DIR") or DEFAULT_CACHE_DIR)
+
+
+def _git(cwd: str, *args: str) -> str | None:
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+
+def tree_hash(cwd: str) -> str | None:
+    """Return the tree hash of HEAD, or None outside a git repository."""
+    return _git(cwd, "rev-parse", "HEAD^{tree}")
+
+
+def lock_hash(cwd: str) -> str:
+    """Return the sha256 of uv.lock, or "no-lock" when the project has none."""
+    lock_path = Path(cwd) / LOCK_FILE
+    if not lock_path.exists():
+        return "no-lock"
+    return hashlib.sha256(lock_path.read_bytes()).hexdigest()
+
+
+def baseline_key(cwd: str) -> str | None:
+    """Return the cache key for the current tree, or None when it cannot be cached.
+
+    A dirty working tree is never cached, since HEAD's tree would not describe it.
+    """
+    tree = tree_hash(cwd)
+    if tree is None:
+        return None
+    status = _git(cwd, "status", "--porcelain", "--untracked-files=normal")
+    if status is None or status:
+        return None
+    return f"{tree}-{lock_hash(cwd)[:16]}"
+
+
+def has_passing_baseline(key: str, cache_dir: Path | None = None) -> bool:
+    """Return True if a passing test run is recorded for key."""
+    entry_path = (cache_dir or default_cache_dir()) / f"{key}.json"
+    if not entry_path.exists():
+        return False
+    try:
+        return json.loads(entry_path.read_text()).get("passed") is True
+    except ValueError:
+        return False
+
+
+def record_baseline(key: str, passed: bool, duration_s: float, cache_dir: Path | None = None) -> None:
+    """Record a baseline test result for key. Only passing runs are ever reused."""
+    cache_dir = cache_dir or default_cache_dir()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    entry = {
+        "key": key,
+        "passed": passed,
+        "duration_s": round(duration_s, 2),
+        "recorded_at": time.time(),
+    }
+    (cache_dir / f"{key}.json").write_text(json.dumps(entry, indent=2))
+    prune_cache(cache_dir)
+
+
+def prune_cache(cache_dir: Path, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+    """Keep only the most recently recorded max_entries results."""
+    entries = sorted(cache_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[max_entries:]:
+        stale.unlink(missing_ok=True)
+
+
+def run_baseline_tests(cwd: str, command: list[str], cache_dir: Path | None = None) -> int:
+    """Run the test command unless a passing result is cached for this tree.
+
+    Returns the command's exit code (0 when skipped because of a cache hit).
+    """
+    key = baseline_key(cwd)
+    if key is not None and has_passing_baseline(key, cache_dir):
+        print(f"Baseline tests already passed for tree {key}, skipping")
+        return 0
+
+    if key is None:
+        print("Working tree is not cacheable (dirty or not a git repo), running tests")
+
+    start = time.monotonic()
+    returncode = subprocess.run(command, cwd=cwd).returncode
+    duration = time.monotonic() - start
+
+    if key is not None and returncode == 0:
+        record_baseline(key, True, duration, cache_dir)
+        print(f"Recorded passing baseline for tree {key} ({duration:.1f}s)")
+    return returncode
@@ -0,0 +1,185 @@
+"""Token and cost budget tracking across every agent call made for one issue."""
+
+import json
+import os
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from claude_agent_sdk.types import AssistantMessage, ResultMessage
+
+
+BUDGET_FILE = ".claude-budget.json"
+
+# Budget states, in increasing order of severity
+BUDGET_OK = "ok"
+BUDGET_SOFT = "soft"
+BUDGET_HARD = "hard"
+
+
+@dataclass
+class CallUsage:
+    """Accumulated usage for one call type (e.g. implement, chunk_summary)."""
+
+    calls: int = 0
+    cost_usd: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_creation_tokens: int = 0
+    duration_ms: int = 0
+    model: str | None = None
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens + self.cache_read_tokens + self.cache_creation_tokens
+
+    @property
+    def average_latency_s(self) -> float:
+        """Mean wall-clock seconds per call."""
+        return self.duration_ms / self.calls / 1000 if self.calls else 0.0
+
+
+class BudgetGovernor:
+    """Adds up cost and token usage from SDK result messages and enforces limits.
+
+    At the soft limit callers should switch to cheaper work (e.g. local summaries
+    instead of summary agent sessions); at the hard limit they should stop.
+    """
+
+    def __init__(self, soft_limit_usd: float | None = None, hard_limit_usd: float | None = None):
+        self.soft_limit_usd = soft_limit_usd
+        self.hard_limit_usd = hard_limit_usd
+        self.usage: dict[str, CallUsage] = {}
+
+    @classmethod
+    def from_env(cls) -> "BudgetGovernor":
+        """Create a governor from BUDGET_SOFT_LIMIT_USD / BUDGET_HARD_LIMIT_USD."""
+        return cls(
+            soft_limit_usd=_limit_from_env("BUDGET_SOFT_LIMIT_USD"),
+            hard_limit_usd=_limit_from_env("BUDGET_HARD_LIMIT_USD"),
+        )
+
+    def record(self, call_type: str, message) -> None:
+        """Record usage from a ResultMessage and the model from an AssistantMessage; ignore anything else."""
+        if isinstance(message, AssistantMessage):
+            if message.model:
+                self.usage.setdefault(call_type, CallUsage()).model = message.model
+            return
+        if not isinstance(message, ResultMessage):
+            return
+
+        tokens = message.usage or {}
+        self.record_usage(
+            call_type,
+            message.total_cost_usd or 0.0,
+            input_tokens=tokens.get("input_tokens", 0) or 0,
+            output_tokens=tokens.get("output_tokens", 0) or 0,
+            cache_read_tokens=tokens.get("cache_read_input_tokens", 0) or 0,
+            cache_creation_tokens=tokens.get("cache_creation_input_tokens", 0) or 0,
+            duration_ms=message.duration_ms or 0,
+        )
+
+    def record_usage(
+        self,
+        call_type: str,
+        cost_usd: float,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cache_read_tokens: int = 0,
+        cache_creation_tokens: int = 0,
+        duration_ms: int = 0,
+        model: str | None = None,
+    ) -> None:
+        """Record one call's usage directly, for calls made outside the agent SDK."""
+        usage = self.usage.setdefault(call_type, CallUsage())
+        usage.calls += 1
+        usage.duration_ms += duration_ms
+        if model:
+            usage.model = model
+        usage.cost_usd += cost_usd
+        usage.input_tokens += input_tokens
+        usage.output_tokens += output_tokens
+        usage.cache_read_tokens += cache_read_tokens
+        usage.cache_creation_tokens += cache_creation_tokens
+
+    @property
+    def total_cost_usd(self) -> float:
+        return sum(usage.cost_usd for usage in self.usage.values())
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(usage.total_tokens for usage in self.usage.values())
+
+    @property
+    def remaining_usd(self) -> float | None:
+        """Cost left before the hard limit, or None when there is no hard limit."""
+        if self.hard_limit_usd is None:
+            return None
+        return max(0.0, self.hard_limit_usd - self.total_cost_usd)
+
+    @property
+    def state(self) -> str:
+        """Return BUDGET_OK, BUDGET_SOFT or BUDGET_HARD."""
+        total = self.total_cost_usd
+        if self.hard_limit_usd is not None and total >= self.hard_limit_usd:
+            return BUDGET_HARD
+        if self.soft_limit_usd is not None and total >= self.soft_limit_usd:
+            return BUDGET_SOFT
+        return BUDGET_OK
+
+    def format_breakdown(self) -> str:
+        """Format the model, usage, latency and cost per call type as a markdown table."""
+        lines = [
+            "| Call | Calls | Model | Tokens | Avg latency (s) | Cost (USD) |",
+            "|------|-------|-------|--------|-----------------|------------|",
+        ]
+        for call_type, usage in sorted(self.usage.items()):
+            if not usage.calls:
+                continue
+            lines.append(
+                f"| {call_type} | {usage.calls} | {usage.model or 'default'} | {usage.total_tokens:,} "
+                f"| {usage.average_latency_s:.1f} | ${usage.cost_usd:.4f} |"
+            )
+        lines.append(f"| **Total** | | | **{self.total_tokens:,}** | | **${self.total_cost_usd:.4f}** |")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "soft_limit_usd": self.soft_limit_usd,
+            "hard_limit_usd": self.hard_limit_usd,
+            "usage": {call_type: asdict(usage) for call_type, usage in self.usage.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BudgetGovernor":
+        governor = cls(data.get("soft_limit_usd"), data.get("hard_limit_usd"))
+        for call_type, usage in data.get("usage", {}).items():
+            governor.usage[call_type] = CallUsage(**usage)
+        return governor
+
+    def save(self, cwd: str) -> None:
+        """Persist usage so later steps (e.g. PR description) share the same budget."""
+        (Path(cwd) / BUDGET_FILE).write_text(json.dumps(self.to_dict(), indent=2))
+
+    @classmethod
+    def load(cls, cwd: str) -> "BudgetGovernor":
+        """Load persisted usage, falling back to a fresh governor from the environment."""
+        path = Path(cwd) / BUDGET_FILE
+        if not path.exists():
+            return cls.from_env()
+        try:
+            return cls.from_dict(json.loads(path.read_text()))
+        except (ValueError, TypeError) as e:
+            print(f"Warning: Could not read {BUDGET_FILE}: {e}")
+            return cls.from_env()
+
+
+def _limit_from_env(name: str) -> float | None:
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Warning: Ignoring invalid {name}={value!r}")
+        return None
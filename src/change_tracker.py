@@ -0,0 +1,263 @@
+"""Cheap working-tree snapshots that give the exact files changed by each chunk."""
+
+import difflib
+import hashlib
+import json
+import os
+import stat as stat_module
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+
+CHANGES_FILE = ".claude-changes.json"
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_CACHED_BYTES = 64 * 1024 * 1024
+
+SKIP_DIRS = {
+    ".git", ".venv", "venv", "__pycache__", "node_modules", "build", "dist",
+    ".pytest_cache", ".mypy_cache", ".ruff_cache", ".tox", ".nox",
+}
+# Files the runners themselves write into the working tree
+RUN_STATE_FILES = {
+    ".claude-complete", ".claude-budget.json", CHANGES_FILE, ".claude-session.json", ".claude-overview.md",
+    ".plan-context.md", ".pr-description.md",
+}
+
+STATUS_ADDED = "added"
+STATUS_MODIFIED = "modified"
+STATUS_DELETED = "deleted"
+
+
+@dataclass(frozen=True)
+class FileState:
+    """Identity of a file at snapshot time."""
+
+    mtime_ns: int
+    size: int
+    digest: str
+
+
+@dataclass
+class FileChange:
+    """One changed file with line statistics (None for binary or uncached files)."""
+
+    path: str
+    status: str
+    added_lines: int | None = None
+    removed_lines: int | None = None
+
+
+@dataclass
+class ChangeSet:
+    """Files changed between two snapshots."""
+
+    changes: list[FileChange] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.changes)
+
+    @property
+    def paths(self) -> list[str]:
+        return [change.path for change in self.changes]
+
+    @property
+    def added_lines(self) -> int:
+        return sum(change.added_lines or 0 for change in self.changes)
+
+    @property
+    def removed_lines(self) -> int:
+        return sum(change.removed_lines or 0 for change in self.changes)
+
+    def format_markdown(self) -> str:
+        """Render as a markdown list, e.g. "- `src/app.py` (+3 -1)"."""
+        if not self.changes:
+            return "No file changes."
+        lines = []
+        for change in self.changes:
+            if change.added_lines is None:
+                stats = change.status
+            else:
+                stats = f"+{change.added_lines} -{change.removed_lines}"
+                if change.status != STATUS_MODIFIED:
+                    stats = f"{change.status}, {stats}"
+            lines.append(f"- `{change.path}` ({stats})")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "files": [asdict(change) for change in self.changes],
+            "added_lines": self.added_lines,
+            "removed_lines": self.removed_lines,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChangeSet":
+        return cls([FileChange(**change) for change in data.get("files", [])])
+
+
+def line_stats(old: str, new: str) -> tuple[int, int]:
+    """Return (added, removed) line counts between two texts."""
+    added = removed = 0
+    matcher = difflib.SequenceMatcher(None, old.splitlines(), new.splitlines())
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "delete"):
+            removed += i2 - i1
+        if tag in ("replace", "insert"):
+            added += j2 - j1
+    return added, removed
+
+
+def _read_file(path: Path) -> tuple[str, str | None]:
+    """Hash a file, also returning its text when it is not binary."""
+    data = path.read_bytes()
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    if b"\0" in data[:8192]:
+        return digest, None
+    try:
+        return digest, data.decode("utf-8")
+    except UnicodeDecodeError:
+        return digest, None
+
+
+class ChangeTracker:
+    """Tracks file changes in a working tree between snapshots.
+
+    Files whose mtime and size are unchanged since the previous snapshot are
+    not re-read; the rest are hashed in a thread pool. Text contents are kept
+    in memory (up to max_cached_bytes) so line statistics need no git history.
+    """
+
+    def __init__(
+        self,
+        cwd: str,
+        workers: int = DEFAULT_WORKERS,
+        max_cached_bytes: int = DEFAULT_MAX_CACHED_BYTES,
+    ):
+        self.cwd = Path(cwd)
+        self.workers = workers
+        self.max_cached_bytes = max_cached_bytes
+        self.started = False
+        self._states: dict[str, FileState] = {}
+        self._texts: dict[str, str] = {}
+        self._baseline_states: dict[str, FileState] = {}
+        self._baseline_texts: dict[str, str] = {}
+        self._cached_bytes = 0
+
+    def _walk(self) -> dict[str, os.stat_result]:
+        stats = {}
+        for dirpath, dirnames, filenames in os.walk(self.cwd):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.endswith(".egg-info")]
+            for filename in filenames:
+                path = Path(dirpath) / filename
+                rel = path.relative_to(self.cwd).as_posix()
+                if rel in RUN_STATE_FILES:
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                if stat_module.S_ISREG(stat.st_mode):
+                    stats[rel] = stat
+        return stats
+
+    def _scan(self) -> tuple[dict[str, FileState], dict[str, str]]:
+        stats = self._walk()
+        states: dict[str, FileState] = {}
+        texts: dict[str, str] = {}
+        to_read = []
+        for rel, stat in stats.items():
+            previous = self._states.get(rel)
+            if previous is not None and previous.mtime_ns == stat.st_mtime_ns and previous.size == stat.st_size:
+                states[rel] = previous
+                if rel in self._texts:
+                    texts[rel] = self._texts[rel]
+            else:
+                to_read.append(rel)
+
+        # Texts of deleted or re-read files are replaced in this snapshot
+        for rel in self._texts.keys() - stats.keys():
+            self._uncache(rel)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = pool.map(self._safe_read, to_read)
+            for rel, result in zip(to_read, results):
+                self._uncache(rel)
+                if result is None:
+                    continue
+                digest, text = result
+                stat = stats[rel]
+                states[rel] = FileState(stat.st_mtime_ns, stat.st_size, digest)
+                if text is not None and self._cached_bytes + len(text) <= self.max_cached_bytes:
+                    texts[rel] = text
+                    self._cached_bytes += len(text)
+        return states, texts
+
+    def _uncache(self, rel: str) -> None:
+        """Stop counting the previous snapshot's text of a file, unless the baseline still holds it."""
+        text = self._texts.get(rel)
+        if text is not None and self._baseline_texts.get(rel) is not text:
+            self._cached_bytes -= len(text)
+
+    def _safe_read(self, rel: str) -> tuple[str, str | None] | None:
+        try:
+            return _read_file(self.cwd / rel)
+        except OSError:
+            return None
+
+    def _diff(
+        self,
+        old_states: dict[str, FileState],
+        old_texts: dict[str, str],
+        new_states: dict[str, FileState],
+        new_texts: dict[str, str],
+    ) -> ChangeSet:
+        changes = []
+        for rel in sorted(old_states.keys() | new_states.keys()):
+            old, new = old_states.get(rel), new_states.get(rel)
+            if old is not None and new is not None and old.digest == new.digest:
+                continue
+            status = STATUS_ADDED if old is None else STATUS_DELETED if new is None else STATUS_MODIFIED
+            old_text = old_texts.get(rel) if old is not None else ""
+            new_text = new_texts.get(rel) if new is not None else ""
+            change = FileChange(rel, status)
+            if old_text is not None and new_text is not None:
+                change.added_lines, change.removed_lines = line_stats(old_text, new_text)
+            changes.append(change)
+        return ChangeSet(changes)
+
+    def start(self) -> None:
+        """Take the baseline snapshot."""
+        self._states, self._texts = self._scan()
+        self._baseline_states, self._baseline_texts = self._states, self._texts
+        self.started = True
+
+    def update(self) -> ChangeSet:
+        """Snapshot again and return the changes since the previous snapshot."""
+        if not self.started:
+            self.start()
+            return ChangeSet()
+        states, texts = self._scan()
+        changes = self._diff(self._states, self._texts, states, texts)
+        self._states, self._texts = states, texts
+        return changes
+
+    def cumulative(self) -> ChangeSet:
+        """Return the changes between the baseline and the latest snapshot."""
+        return self._diff(self._baseline_states, self._baseline_texts, self._states, self._texts)
+
+    def save(self, cwd: str | None = None) -> None:
+        """Write the cumulative changes to CHANGES_FILE for later workflow steps."""
+        path = Path(cwd) if cwd else self.cwd
+        (path / CHANGES_FILE).write_text(json.dumps(self.cumulative().to_dict(), indent=2))
+
+
+def load_changes(cwd: str) -> ChangeSet | None:
+    """Load the changes saved by a run, or None if no run recorded them."""
+    path = Path(cwd) / CHANGES_FILE
+    if not path.exists():
+        return None
+    try:
+        return ChangeSet.from_dict(json.loads(path.read_text()))
+    except (ValueError, TypeError) as e:
+        print(f"Warning: Could not read {CHANGES_FILE}: {e}")
+        return None
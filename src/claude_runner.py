@@ -1,40 +1,273 @@
 """Claude Agent SDK runner for GitHub Actions."""
 
+import asyncio
+import json
 import os
+import signal
+from contextlib import aclosing
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Callable, Awaitable
+from typing import AsyncIterator, Callable, Awaitable
 
 from claude_agent_sdk import query, ClaudeAgentOptions
-from claude_agent_sdk.types import SystemMessage, AssistantMessage, UserMessage
+from claude_agent_sdk.types import SystemMessage, AssistantMessage, UserMessage, HookMatcher
+
+from budget import BudgetGovernor, BUDGET_OK, BUDGET_HARD
+from compaction import build_state_digest
+from change_tracker import ChangeSet, ChangeTracker
+from stall_detector import StallDetector
+from message_records import ROLE_ASSISTANT, DEFAULT_HISTORY_SIZE, compact_message, compact_messages, message_history
+from sdk_simulator import get_simulator, BACKEND_SDK, BACKEND_SIMULATOR
+from code_search import (
+    CodeSearchIndex,
+    EDIT_TOOL_MATCHER,
+    create_search_server,
+    index_update_hooks,
+    SERVER_NAME as SEARCH_SERVER_NAME,
+    SEARCH_TOOLS,
+    REPLACED_TOOLS,
+)
+from symbol_index import (
+    SymbolIndex,
+    create_symbol_server,
+    symbol_update_hooks,
+    SERVER_NAME as SYMBOL_SERVER_NAME,
+    SYMBOL_TOOLS,
+)
+from prompt_programs import (
+    PromptPrograms,
+    record_example,
+    format_task,
+    format_chunk_summaries,
+    truncate_diff,
+    PROGRAM_CHUNK_SUMMARY,
+    PROGRAM_FINAL_SUMMARY,
+    PROGRAM_PR_DESCRIPTION,
+)
 
 
 FILE_EDITING_TOOLS = ["Read", "Edit", "Write", "Glob", "Grep"]
 COMPLETION_MARKER = ".claude-complete"
+SESSION_FILE = ".claude-session.json"
+PR_DESCRIPTION_FILE = ".pr-description.md"
+# Sessions run with bypassed permissions, where allowed_tools does not restrict
+# anything, so tools a session must not use are denied by PreToolUse hooks
+SHELL_TOOL_MATCHER = "Bash"
 DEFAULT_TURNS_PER_CHUNK = 10
 DEFAULT_MAX_CHUNKS = 5
+DEFAULT_SINGLE_SESSION_TURNS = 8
+
+# Reasons a chunked run can stop before the agent signals completion
+STOP_CANCELLED = "cancelled"
+STOP_RUN_TIMEOUT = "run_timeout"
+STOP_CHUNK_TIMEOUT = "chunk_timeout"
+STOP_BUDGET = "budget_exhausted"
+STOP_NO_CHANGES = "no_changes"
+STOP_STALLED = "stalled"
+
+# Call types used for budget accounting
+CALL_IMPLEMENT = "implement"
+CALL_PLAN = "plan"
+CALL_CHUNK_SUMMARY = "chunk_summary"
+CALL_FINAL_SUMMARY = "final_summary"
+CALL_PR_DESCRIPTION = "pr_description"
+CALL_EXPLORE = "explore"
+CALL_STEP = "step"
+CALL_INTEGRATE = "integrate"
+
+# Model alias for the lightweight calls: summaries and fresh PR descriptions
+FAST_MODEL = "haiku"
+MODEL_ROUTES_FILE_ENV = "MODEL_ROUTES_FILE"
+DEFAULT_MODEL = "default"
+
+
+@dataclass
+class CallRoute:
+    """Model and turn cap for the agent sessions of one call type.
+
+    Attributes:
+        model: Model name or alias (e.g. "haiku"), or None for the CLI default
+        max_turns: Turn cap for one session, or None to keep the caller's own
+    """
 
+    model: str | None = None
+    max_turns: int | None = None
+
+    def turns(self, requested: int | None) -> int | None:
+        """Return the turn cap for a session the caller asked requested turns for.
+
+        The route's cap applies on its own when the caller passed None, and
+        otherwise only lowers the caller's turns, so an explicit or tier-derived
+        turn budget is never raised by a route's default.
+        """
+        if requested is None or self.max_turns is None:
+            return self.max_turns if requested is None else requested
+        return min(self.max_turns, requested)
+
+
+# Sessions that are resumed or forked by later calls (implement, plan and the
+# explored base session) stay on the default model: switching models on resume
+# forfeits the prompt cache the resume exists to reuse.
+DEFAULT_ROUTES = {
+    CALL_IMPLEMENT: CallRoute(),
+    CALL_PLAN: CallRoute(),
+    CALL_EXPLORE: CallRoute(),
+    CALL_STEP: CallRoute(),
+    CALL_INTEGRATE: CallRoute(),
+    CALL_CHUNK_SUMMARY: CallRoute(FAST_MODEL, 3),
+    CALL_FINAL_SUMMARY: CallRoute(FAST_MODEL, 3),
+    CALL_PR_DESCRIPTION: CallRoute(FAST_MODEL, 3),
+}
+
+
+def _apply_route_override(route: CallRoute, source: str, model=None, max_turns=None) -> None:
+    if model is not None:
+        route.model = None if str(model).lower() == DEFAULT_MODEL else str(model)
+    if max_turns is not None:
+        try:
+            turns = int(max_turns)
+        except (TypeError, ValueError):
+            print(f"Warning: Ignoring invalid max_turns {max_turns!r} from {source}")
+            return
+        route.max_turns = turns if turns > 0 else None
 
-def build_prompt(title: str, body: str, cwd: str | None = None) -> str:
-    """Build the prompt for Claude with system instructions."""
-    if not title:
-        raise ValueError("Title is required")
 
-    # Allow empty body - title alone is sufficient
-    if body is None:
-        body = ""
+def load_routes(path: str | None = None) -> dict[str, CallRoute]:
+    """Build the routing table: DEFAULT_ROUTES, then a config file, then the environment.
 
-    if cwd is None:
-        cwd = os.getcwd()
+    The config file (path, or MODEL_ROUTES_FILE) is JSON mapping call types to
+    {"model": ..., "max_turns": ...}. MODEL_<CALL_TYPE> and MAX_TURNS_<CALL_TYPE>
+    (e.g. MODEL_CHUNK_SUMMARY=sonnet) then override single entries. A model of
+    "default" runs the call type on the CLI default model.
+    """
+    routes = {call_type: CallRoute(route.model, route.max_turns) for call_type, route in DEFAULT_ROUTES.items()}
 
-    completion_marker_path = f"{cwd}/{COMPLETION_MARKER}"
+    path = path or os.environ.get(MODEL_ROUTES_FILE_ENV)
+    if path:
+        try:
+            config = json.loads(Path(path).read_text())
+            if not isinstance(config, dict):
+                raise ValueError("expected a JSON object of call types")
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read model routes from {path}: {e}")
+            config = {}
+        for call_type, entry in config.items():
+            if not isinstance(entry, dict):
+                print(f"Warning: Ignoring model route for {call_type}: expected an object")
+                continue
+            route = routes.setdefault(call_type, CallRoute())
+            _apply_route_override(route, path, entry.get("model"), entry.get("max_turns"))
+
+    for call_type, route in routes.items():
+        name = call_type.upper()
+        _apply_route_override(route, f"MODEL_{name}", model=os.environ.get(f"MODEL_{name}") or None)
+        _apply_route_override(route, f"MAX_TURNS_{name}", max_turns=os.environ.get(f"MAX_TURNS_{name}") or None)
+    return routes
+
+
+_routes: dict[str, CallRoute] | None = None
+
+
+def get_routes() -> dict[str, CallRoute]:
+    """Return the process-wide routing table, loaded from the environment on first use."""
+    global _routes
+    if _routes is None:
+        _routes = load_routes()
+    return _routes
+
+
+def set_routes(routes: dict[str, CallRoute] | None) -> None:
+    """Replace the process-wide routing table (None reloads it on next use)."""
+    global _routes
+    _routes = routes
+
+
+def route_for(call_type: str) -> CallRoute:
+    """Return the route for a call type (the CLI default model when it has none)."""
+    return get_routes().get(call_type) or CallRoute()
+
+
+class CancellationToken:
+    """Cooperative cancellation flag shared between a runner and its caller.
+
+    Callers (signal handlers, batch runners) call cancel(); the chunked runners
+    stop at the next message boundary, close the SDK stream and still report
+    partial results through their callbacks.
+    """
+
+    def __init__(self) -> None:
+        self._event = asyncio.Event()
+        self.reason: str | None = None
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancel() has been called."""
+        return self._event.is_set()
+
+    def cancel(self, reason: str = STOP_CANCELLED) -> None:
+        """Request cancellation. Only the first reason is kept."""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    async def wait(self) -> None:
+        """Wait until cancellation is requested."""
+        await self._event.wait()
+
+
+def install_signal_cancellation(cancel_token: CancellationToken) -> None:
+    """Cancel the token on SIGTERM/SIGINT (e.g. when an Actions job is cancelled).
+
+    Must be called from within the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, cancel_token.cancel, STOP_CANCELLED)
+        except (NotImplementedError, RuntimeError):
+            # Signal handlers are unavailable on some platforms/threads
+            pass
+
+
+def timeout_from_env(name: str) -> float | None:
+    """Read an optional timeout in seconds from an environment variable."""
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        print(f"Warning: Ignoring invalid {name}={value!r}")
+        return None
+    return seconds if seconds > 0 else None
+
+
+class StreamInterrupted(Exception):
+    """Raised when a message stream is stopped by a deadline or cancellation."""
 
-    system_instructions = f"""You are a code editing agent. Your task is to make changes to the codebase.
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def search_tool_names(search_tools: bool) -> tuple[str, str]:
+    """Return the (find files, search code) tools offered to the agent.
+
+    With a search index, Glob and Grep are disallowed in favour of the indexed
+    search tools (see get_options), so prompts must name those instead.
+    """
+    return ("find_files", "search_code") if search_tools else ("Glob", "Grep")
+
+
+def _editing_instructions(cwd: str, search_tools: bool = False) -> str:
+    find_tool, search_tool = search_tool_names(search_tools)
+    return f"""You are a code editing agent. Your task is to make changes to the codebase.
 
 Working directory: {cwd}
 
-IMPORTANT: You MUST use the file editing tools (Read, Edit, Write, Glob, Grep) to complete your task.
-- Use Glob to find files by pattern
-- Use Grep to search for code
+IMPORTANT: You MUST use the file editing tools (Read, Edit, Write, {find_tool}, {search_tool}) to complete your task.
+- Use {find_tool} to find files by pattern
+- Use {search_tool} to search for code
 - Use Read to read file contents
 - Use Edit to modify existing files
 - Use Write to create new files
@@ -42,7 +275,41 @@ IMPORTANT: You MUST use the file editing tools (Read, Edit, Write, Glob, Grep) t
 All file paths must be absolute paths within the working directory.
 For example, to create a file called "hello.txt" in the root, use: {cwd}/hello.txt
 
-Do NOT just describe what changes should be made - actually make them using the tools.
+Do NOT just describe what changes should be made - actually make them using the tools."""
+
+
+SYMBOL_NAVIGATION_INSTRUCTIONS = """## CODE NAVIGATION
+
+Symbol tools answer from an index of the Python code, with line ranges:
+- find_definition: where a class, function, method or constant is defined
+- find_references: the lines that use a name
+- file_outline: the classes and functions of a file
+
+Locate code with these first, then Read only the lines you need (offset and limit) instead of whole files."""
+
+
+def build_prompt(title: str, body: str, cwd: str | None = None, symbol_tools: bool = False, search_tools: bool = False) -> str:
+    """Build the prompt for Claude with system instructions.
+
+    With symbol_tools, the agent is told to navigate with the symbol index
+    tools (see symbol_index) before reading files. With search_tools, it is
+    told to search with the indexed search tools (see code_search) instead of
+    Glob and Grep.
+    """
+    if not title:
+        raise ValueError("Title is required")
+
+    # Allow empty body - title alone is sufficient
+    if body is None:
+        body = ""
+
+    if cwd is None:
+        cwd = os.getcwd()
+
+    completion_marker_path = f"{cwd}/{COMPLETION_MARKER}"
+
+    navigation = f"\n\n{SYMBOL_NAVIGATION_INSTRUCTIONS}" if symbol_tools else ""
+    system_instructions = f"""{_editing_instructions(cwd, search_tools)}{navigation}
 
 ## COMPLETION SIGNAL
 
@@ -60,9 +327,49 @@ If you still have work to do, do NOT create this file."""
         return f"{system_instructions}\n\n# {title}"
 
 
-def build_continuation_prompt(title: str, body: str, cwd: str) -> str:
-    """Build a continuation prompt for when the agent needs more turns."""
+def append_plan(body: str, plan: str) -> str:
+    """Append an implementation plan to an issue body, with instructions to carry it out."""
+    return f"""{body}
+
+## Implementation Plan
+
+{plan}
+
+---
+
+**IMPORTANT**: You must IMPLEMENT this plan by making actual code changes using the file editing tools.
+Do not just describe what should be done - use the file editing tools to make the changes.
+Follow the implementation steps outlined in the plan above."""
+
+
+def build_lean_prompt(title: str, body: str, cwd: str | None = None, symbol_tools: bool = False, search_tools: bool = False) -> str:
+    """Build the prompt for a single-session run of a trivial issue.
+
+    There is no completion signal: the session simply ends when the agent stops.
+    """
+    if not title:
+        raise ValueError("Title is required")
+
+    if cwd is None:
+        cwd = os.getcwd()
+
+    navigation = f"\n\n{SYMBOL_NAVIGATION_INSTRUCTIONS}" if symbol_tools else ""
+    system_instructions = f"""{_editing_instructions(cwd, search_tools)}{navigation}
+
+This is a small, targeted change. Go straight to the relevant file, make the minimal edit that resolves the task, and stop. Do not refactor or explore unrelated code."""
+
+    if body and body.strip():
+        return f"{system_instructions}\n\n# {title}\n\n{body}"
+    return f"{system_instructions}\n\n# {title}"
+
+
+def build_continuation_prompt(title: str, body: str, cwd: str, search_tools: bool = False) -> str:
+    """Build a continuation prompt for when the agent needs more turns.
+
+    search_tools names the indexed search tools instead of Glob and Grep, as in build_prompt.
+    """
     completion_marker_path = f"{cwd}/{COMPLETION_MARKER}"
+    find_tool, search_tool = search_tool_names(search_tools)
 
     base_prompt = f"""Continue working on the task below. You were working on this but ran out of turns.
 
@@ -71,7 +378,7 @@ Review what has been done so far and continue from where you left off.
 Working directory: {cwd}
 
 Remember:
-- Use the file editing tools to make changes
+- Use the file editing tools (Read, Edit, Write, {find_tool}, {search_tool}) to make changes
 - When FULLY COMPLETE, write "DONE" to: {completion_marker_path}
 
 # {title}"""
@@ -97,7 +404,7 @@ def build_pr_description_prompt(title: str, body: str, diff: str, issue_number:
 
 Working directory: {cwd}
 
-Write the PR description to: {cwd}/.pr-description.md
+Write the PR description to: {cwd}/{PR_DESCRIPTION_FILE}
 
 The description should:
 1. Start with "Closes #{issue_number}" on its own line
@@ -116,10 +423,31 @@ Do NOT include a test plan section.
 {diff}
 ```
 
-Now write the PR description to {cwd}/.pr-description.md using the Write tool."""
+Now write the PR description to {cwd}/{PR_DESCRIPTION_FILE} using the Write tool."""
+
+
+def build_pr_description_resume_prompt(issue_number: int, cwd: str | None = None) -> str:
+    """Build the short prompt that asks the implementing session for a PR description.
+
+    The resumed session already knows the issue and the changes it made, so
+    neither the issue nor the diff is sent again.
+    """
+    if cwd is None:
+        cwd = os.getcwd()
+
+    return f"""The implementation is finished. Now write a pull request description for the changes you made.
+
+The description should:
+1. Start with "Closes #{issue_number}" on its own line
+2. Have a "## Summary" section with 2-3 bullet points describing what was done
+3. Be concise and factual
+
+Do NOT include a test plan section. Do not make any further code changes.
+
+Write the PR description to {cwd}/{PR_DESCRIPTION_FILE} using the Write tool."""
 
 
-def get_options(cwd: str | None = None, max_turns: int = 10, resume: str | None = None, allowed_tools: list[str] | None = FILE_EDITING_TOOLS) -> ClaudeAgentOptions:
+def get_options(cwd: str | None = None, max_turns: int = 10, resume: str | None = None, allowed_tools: list[str] | None = FILE_EDITING_TOOLS, max_budget_usd: float | None = None, fork_session: bool = False, search_index: CodeSearchIndex | None = None, prefer_indexed_search: bool = True, symbol_index: SymbolIndex | None = None, model: str | None = None, hooks: dict | None = None) -> ClaudeAgentOptions:
     """Get Claude agent options with file editing tools.
 
     Args:
@@ -127,6 +455,19 @@ def get_options(cwd: str | None = None, max_turns: int = 10, resume: str | None
         max_turns: Maximum number of turns
         resume: Session ID to resume from
         allowed_tools: List of allowed tools, or None for unrestricted. Defaults to FILE_EDITING_TOOLS.
+        max_budget_usd: Optional cost cap for this call, enforced by the CLI
+        fork_session: Continue a copy of the resumed session under a new
+            session_id, leaving the original untouched
+        search_index: Optional CodeSearchIndex served to the agent as in-process
+            MCP tools (search_code, find_files), kept current on edits
+        prefer_indexed_search: With a search_index, replace Glob and Grep with
+            the indexed tools instead of offering both
+        symbol_index: Optional SymbolIndex served as in-process MCP tools
+            (find_definition, find_references, file_outline) next to the
+            editing tools, kept current on edits
+        model: Model name or alias, or None for the CLI default; see route_for
+        hooks: Optional extra hooks (event name to HookMatcher list), merged
+            with the index update hooks
     """
     options_dict = {
         "permission_mode": "bypassPermissions",
@@ -139,10 +480,71 @@ def get_options(cwd: str | None = None, max_turns: int = 10, resume: str | None
     if allowed_tools is not None:
         options_dict["allowed_tools"] = allowed_tools
 
+    if max_budget_usd is not None:
+        options_dict["max_budget_usd"] = max_budget_usd
+
+    if fork_session:
+        options_dict["fork_session"] = True
+
+    if model is not None:
+        options_dict["model"] = model
+
+    mcp_servers, merged_hooks, extra_tools = {}, {}, []
+    if search_index is not None:
+        mcp_servers[SEARCH_SERVER_NAME] = create_search_server(search_index)
+        _merge_hooks(merged_hooks, index_update_hooks(search_index))
+        extra_tools += SEARCH_TOOLS
+        if prefer_indexed_search:
+            options_dict["disallowed_tools"] = list(REPLACED_TOOLS)
+            if allowed_tools is not None:
+                allowed_tools = [t for t in allowed_tools if t not in REPLACED_TOOLS]
+    if symbol_index is not None:
+        mcp_servers[SYMBOL_SERVER_NAME] = create_symbol_server(symbol_index)
+        _merge_hooks(merged_hooks, symbol_update_hooks(symbol_index))
+        extra_tools += SYMBOL_TOOLS
+    if hooks:
+        _merge_hooks(merged_hooks, hooks)
+    if merged_hooks:
+        options_dict["hooks"] = merged_hooks
+    if mcp_servers:
+        options_dict["mcp_servers"] = mcp_servers
+        if allowed_tools is not None:
+            options_dict["allowed_tools"] = allowed_tools + extra_tools
+
     return ClaudeAgentOptions(**options_dict)
 
 
-async def run_claude(prompt: str, cwd: str | None = None, max_turns: int = 10, resume: str | None = None, allowed_tools: list[str] | None = FILE_EDITING_TOOLS):
+def _merge_hooks(hooks: dict, extra: dict) -> None:
+    for event, matchers in extra.items():
+        hooks.setdefault(event, []).extend(matchers)
+
+
+def get_query(backend: str | None = None):
+    """Return the query function for the SDK backend.
+
+    Args:
+        backend: "sdk" (real Claude Agent SDK) or "simulator" (offline simulator).
+            Defaults to the CLAUDE_SDK_BACKEND environment variable, then "sdk".
+    """
+    backend = backend or os.environ.get("CLAUDE_SDK_BACKEND") or BACKEND_SDK
+    if backend == BACKEND_SIMULATOR:
+        return get_simulator().query
+    if backend != BACKEND_SDK:
+        raise ValueError(f"Unknown SDK backend: {backend}")
+    return query
+
+
+async def _prompt_stream(prompt: str):
+    """Yield the prompt as a streamed user message (required for in-process MCP tools)."""
+    yield {
+        "type": "user",
+        "message": {"role": "user", "content": prompt},
+        "parent_tool_use_id": None,
+        "session_id": "default",
+    }
+
+
+async def run_claude(prompt: str, cwd: str | None = None, max_turns: int = 10, resume: str | None = None, allowed_tools: list[str] | None = FILE_EDITING_TOOLS, max_budget_usd: float | None = None, backend: str | None = None, fork_session: bool = False, search_index: CodeSearchIndex | None = None, symbol_index: SymbolIndex | None = None, model: str | None = None, hooks: dict | None = None):
     """Run Claude with the given prompt. Returns an async iterator of messages.
 
     Args:
@@ -151,10 +553,104 @@ async def run_claude(prompt: str, cwd: str | None = None, max_turns: int = 10, r
         max_turns: Maximum number of turns
         resume: Session ID to resume from
         allowed_tools: List of allowed tools, or None for unrestricted. Defaults to FILE_EDITING_TOOLS.
+        max_budget_usd: Optional cost cap for this call, enforced by the CLI
+        backend: SDK backend ("sdk" or "simulator"); see get_query
+        fork_session: Fork the resumed session instead of continuing it
+        search_index: Optional CodeSearchIndex served as MCP tools; see get_options
+        symbol_index: Optional SymbolIndex served as MCP tools; see get_options
+        model: Model name or alias, or None for the CLI default
+        hooks: Optional extra hooks; see get_options
     """
-    options = get_options(cwd, max_turns, resume, allowed_tools)
-    async for message in query(prompt=prompt, options=options):
-        yield message
+    options = get_options(
+        cwd, max_turns, resume, allowed_tools, max_budget_usd, fork_session, search_index,
+        symbol_index=symbol_index, model=model, hooks=hooks,
+    )
+    # In-process MCP servers and hooks talk over the control protocol, which needs a streamed prompt
+    prompt_input = _prompt_stream(prompt) if options.mcp_servers or options.hooks else prompt
+    # Closing this generator early closes the query too, releasing its CLI process
+    async with aclosing(get_query(backend)(prompt=prompt_input, options=options)) as messages:
+        async for message in messages:
+            yield message
+
+
+async def stream_until(
+    stream: AsyncIterator,
+    deadline: float | None = None,
+    cancel_token: CancellationToken | None = None,
+):
+    """Yield messages from stream until it ends, a deadline passes or cancellation.
+
+    The stream is read in the consumer's own task: the SDK's query() enters an
+    anyio task group when it starts and must exit it from the same task. Each
+    read runs under a timeout that the deadline or cancellation expires. On
+    early exit the stream is closed, so the underlying SDK query releases its
+    CLI process, then StreamInterrupted is raised.
+
+    Args:
+        stream: Async iterator of messages (typically from run_claude)
+        deadline: Absolute event-loop time (loop.time()) to stop at, or None
+        cancel_token: Optional token that stops the stream when cancelled
+    """
+    loop = asyncio.get_running_loop()
+    reading: list[asyncio.Timeout] = []
+
+    def interrupt_read(_) -> None:
+        for timeout in reading:
+            if not timeout.expired():
+                timeout.reschedule(loop.time())
+
+    cancel_wait = None
+    if cancel_token is not None:
+        cancel_wait = asyncio.ensure_future(cancel_token.wait())
+        cancel_wait.add_done_callback(interrupt_read)
+
+    try:
+        while cancel_token is None or not cancel_token.cancelled:
+            timeout = asyncio.timeout_at(deadline)
+            reading.append(timeout)
+            try:
+                async with timeout:
+                    message = await anext(stream)
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                if not timeout.expired():
+                    raise
+                break
+            finally:
+                reading.remove(timeout)
+            yield message
+
+        # Deadline passed or cancellation requested
+        try:
+            await stream.aclose()
+        except Exception as e:
+            print(f"Error closing message stream: {e}")
+
+        if cancel_token is not None and cancel_token.cancelled:
+            raise StreamInterrupted(cancel_token.reason or STOP_CANCELLED)
+        raise StreamInterrupted(STOP_CHUNK_TIMEOUT)
+    finally:
+        if cancel_wait is not None:
+            cancel_wait.cancel()
+
+
+def remaining_time(deadline: float | None) -> float | None:
+    """Return seconds left until an event-loop deadline, or None if unbounded."""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - asyncio.get_running_loop().time())
+
+
+def chunk_deadline(
+    run_deadline: float | None,
+    chunk_timeout: float | None,
+) -> float | None:
+    """Return the deadline for the next chunk: the earlier of chunk and run deadlines."""
+    if chunk_timeout is None:
+        return run_deadline
+    deadline = asyncio.get_running_loop().time() + chunk_timeout
+    return deadline if run_deadline is None else min(deadline, run_deadline)
 
 
 def is_complete(cwd: str) -> bool:
@@ -177,57 +673,76 @@ def extract_session_id(message) -> str | None:
     return None
 
 
-def extract_turn_summary(messages: list) -> str:
-    """Extract a concise summary of turns from messages.
+def save_session_id(cwd: str, session_id: str) -> None:
+    """Persist the final session_id so a later step can resume the session."""
+    (Path(cwd) / SESSION_FILE).write_text(json.dumps({"session_id": session_id}))
+
+
+def load_session_id(cwd: str) -> str | None:
+    """Load the session_id saved by a run, or None if no run saved one."""
+    path = Path(cwd) / SESSION_FILE
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text()).get("session_id")
+    except (ValueError, AttributeError) as e:
+        print(f"Warning: Could not read {SESSION_FILE}: {e}")
+        return None
+
+
+def describe_tool_use(tool_name: str, tool_input: dict) -> str | None:
+    """Describe a file-editing tool call in a few words, e.g. "Modified app.py".
+
+    Returns None for tools outside FILE_EDITING_TOOLS.
+    """
+    if tool_name in ('Read', 'Write', 'Edit'):
+        file_path = tool_input.get('file_path', '')
+        if not file_path:
+            return None
+        file_name = file_path.split('/')[-1]
+        verb = {'Read': 'Read', 'Write': 'Created', 'Edit': 'Modified'}[tool_name]
+        return f"{verb} {file_name}"
+    if tool_name == 'Glob':
+        return f"Searched for files: {tool_input.get('pattern', '')}"
+    if tool_name == 'Grep':
+        return f"Searched code: {tool_input.get('pattern', '')}"
+    return None
+
+
+def extract_turn_summary(messages) -> str:
+    """Extract a concise summary of turns from messages or MessageRecords.
 
     Focuses on tool uses and key text responses, omitting verbose details.
     """
     summary_parts = []
 
-    for i, message in enumerate(messages, 1):
-        if isinstance(message, AssistantMessage):
-            # Extract tool uses
-            if hasattr(message, 'tool_uses') and message.tool_uses:
-                for tool_use in message.tool_uses:
-                    tool_name = tool_use.get('name', 'Unknown')
-                    # Add concise description of tool use
-                    if tool_name in ['Read', 'Edit', 'Write', 'Glob', 'Grep']:
-                        params = tool_use.get('params', {})
-                        if tool_name == 'Read':
-                            file_path = params.get('file_path', '')
-                            if file_path:
-                                file_name = file_path.split('/')[-1]
-                                summary_parts.append(f"- Read {file_name}")
-                        elif tool_name == 'Write':
-                            file_path = params.get('file_path', '')
-                            if file_path:
-                                file_name = file_path.split('/')[-1]
-                                summary_parts.append(f"- Created {file_name}")
-                        elif tool_name == 'Edit':
-                            file_path = params.get('file_path', '')
-                            if file_path:
-                                file_name = file_path.split('/')[-1]
-                                summary_parts.append(f"- Modified {file_name}")
-                        elif tool_name == 'Glob':
-                            pattern = params.get('pattern', '')
-                            summary_parts.append(f"- Searched for files: {pattern}")
-                        elif tool_name == 'Grep':
-                            pattern = params.get('pattern', '')
-                            summary_parts.append(f"- Searched code: {pattern}")
-
+    for record in compact_messages(messages):
+        if record.role != ROLE_ASSISTANT:
+            continue
+        if record.tool_name:
+            description = describe_tool_use(record.tool_name, record.tool_input or {})
+            if description:
+                summary_parts.append(f"- {description}")
+        else:
             # Extract key text (first 100 chars)
-            if hasattr(message, 'text') and message.text:
-                text_snippet = message.text[:100].replace('\n', ' ').strip()
-                if text_snippet:
-                    summary_parts.append(f"- Note: {text_snippet}...")
+            text_snippet = record.preview[:100].replace('\n', ' ').strip()
+            if text_snippet:
+                summary_parts.append(f"- Note: {text_snippet}...")
 
     return "\n".join(summary_parts) if summary_parts else "No significant activity recorded"
 
 
+def append_file_changes(summary: str, changes: ChangeSet | None) -> str:
+    """Append the exact files changed in a chunk to its summary."""
+    if changes is None:
+        return summary
+    return f"{summary}\n\n**Files changed:**\n{changes.format_markdown()}"
+
+
 def build_chunk_summary_prompt(
     title: str,
     body: str,
-    chunk_messages: list,
+    chunk_messages,
     chunk_num: int,
     cwd: str,
 ) -> str:
@@ -296,11 +811,24 @@ State whether the task was fully completed or if there are remaining items. Be f
 Keep your response clear and focused."""
 
 
-async def run_summary_agent(prompt: str, cwd: str, max_turns: int = 3) -> str:
+SUMMARY_NO_OUTPUT = "Summary generation did not produce output."
+SUMMARY_ERROR_PREFIX = "Error generating summary: "
+
+
+async def run_summary_agent(
+    prompt: str,
+    cwd: str,
+    max_turns: int | None = None,
+    budget: BudgetGovernor | None = None,
+    call_type: str = CALL_CHUNK_SUMMARY,
+) -> str:
     """Run a quick agent session to generate a summary.
 
-    Uses a limited number of turns to quickly generate a summary.
-    Returns the summary text or an error message.
+    Uses a limited number of turns to quickly generate a summary, on the
+    model and turn cap routed for call_type (see route_for), or 3 turns when
+    neither max_turns nor the route sets a cap.
+    Returns the summary text or an error message. Usage is recorded against
+    budget under call_type when a budget governor is given.
 
     Note: This function uses unrestricted tools (allowed_tools=None) to allow
     the agent to generate plain text responses without being forced to use
@@ -309,7 +837,12 @@ async def run_summary_agent(prompt: str, cwd: str, max_turns: int = 3) -> str:
     try:
         summary_text = ""
         # Use allowed_tools=None to allow unrestricted text generation
-        async for message in run_claude(prompt, cwd, max_turns, allowed_tools=None):
+        route = route_for(call_type)
+        async for message in run_claude(
+            prompt, cwd, route.turns(max_turns) or 3, allowed_tools=None, model=route.model
+        ):
+            if budget is not None:
+                budget.record(call_type, message)
             # Extract text from assistant messages
             if isinstance(message, AssistantMessage):
                 # Extract text from content blocks
@@ -317,12 +850,100 @@ async def run_summary_agent(prompt: str, cwd: str, max_turns: int = 3) -> str:
                     if hasattr(block, 'text') and block.text:
                         summary_text += block.text
 
-        return summary_text.strip() if summary_text else "Summary generation did not produce output."
+        return summary_text.strip() if summary_text else SUMMARY_NO_OUTPUT
     except Exception as e:
-        return f"Error generating summary: {e}"
+        return f"{SUMMARY_ERROR_PREFIX}{e}"
 
 
-async def run_claude_chunked(
+def record_summary_example(name: str, inputs: dict, summary: str) -> None:
+    """Record a summary session's output as a prompt program example, unless it failed."""
+    if summary == SUMMARY_NO_OUTPUT or summary.startswith(SUMMARY_ERROR_PREFIX):
+        return
+    record_example(name, inputs, summary)
+
+
+async def finalise_chunked_run(
+    title: str,
+    body: str,
+    cwd: str,
+    all_chunk_summaries: list[str],
+    on_final_complete: Callable[[list[str]], Awaitable[None]] | None,
+    on_final_summary: Callable[[str], Awaitable[None]] | None,
+    allow_summary_session: bool = True,
+    budget: BudgetGovernor | None = None,
+    prompt_programs: PromptPrograms | None = None,
+) -> None:
+    """Finalisation stage shared by the chunked runners.
+
+    The final summary agent session (or, with prompt_programs, the final
+    summary program) only runs when on_final_summary consumes its result, the
+    run was not stopped early and the budget allows it. Nothing is reported
+    when no chunk summaries were collected.
+    """
+    if not all_chunk_summaries:
+        return
+
+    if on_final_summary and allow_summary_session and (budget is None or budget.state == BUDGET_OK):
+        try:
+            if prompt_programs is not None:
+                final_summary = await prompt_programs.final_summary(
+                    title, body, all_chunk_summaries, CALL_FINAL_SUMMARY, budget
+                )
+            else:
+                final_prompt = build_final_summary_prompt(title, body, all_chunk_summaries, cwd)
+                final_summary = await run_summary_agent(
+                    final_prompt, cwd, budget=budget, call_type=CALL_FINAL_SUMMARY
+                )
+                record_summary_example(
+                    PROGRAM_FINAL_SUMMARY,
+                    {"task": format_task(title, body), "chunk_summaries": format_chunk_summaries(all_chunk_summaries)},
+                    final_summary,
+                )
+            await on_final_summary(final_summary)
+        except Exception as e:
+            print(f"Error generating/posting final summary: {e}")
+
+    if on_final_complete:
+        try:
+            await on_final_complete(all_chunk_summaries)
+        except Exception as e:
+            print(f"Error posting final completion: {e}")
+
+
+@dataclass
+class ChunkStrategy:
+    """Strategy objects that turn the generic chunk engine into a specific runner.
+
+    Attributes:
+        call_type: Call type used for budget accounting (e.g. CALL_IMPLEMENT)
+        build_prompt: (title, body, cwd) -> prompt for the first chunk; also called
+            with symbol_tools=True when a symbol index is offered and
+            search_tools=True when a search index is offered
+        build_continuation_prompt: (title, body, cwd) -> prompt for later chunks;
+            also called with search_tools=True when a search index is offered
+        is_complete: (cwd) -> True when the agent has signalled completion
+        build_summary_prompt: (title, body, chunk_messages, chunk_num, cwd) -> prompt
+            for the per-chunk summary session
+        on_start: Optional hook called with cwd before the first chunk
+        on_complete: Optional hook called with cwd once completion is detected
+        allowed_tools: Tools available to the agent, or None for unrestricted
+        persist_session: Save the final session_id to SESSION_FILE so a later
+            step (e.g. the PR description) can resume the session
+    """
+
+    call_type: str
+    build_prompt: Callable[[str, str, str], str]
+    build_continuation_prompt: Callable[[str, str, str], str]
+    is_complete: Callable[[str], bool]
+    build_summary_prompt: Callable[[str, str, list, int, str], str] = build_chunk_summary_prompt
+    on_start: Callable[[str], None] | None = None
+    on_complete: Callable[[str], None] | None = None
+    allowed_tools: list[str] | None = field(default_factory=lambda: list(FILE_EDITING_TOOLS))
+    persist_session: bool = False
+
+
+async def run_chunk_engine(
+    strategy: ChunkStrategy,
     title: str,
     body: str,
     cwd: str | None = None,
@@ -330,17 +951,37 @@ async def run_claude_chunked(
     max_chunks: int = DEFAULT_MAX_CHUNKS,
     on_chunk_complete: Callable[[int, str], Awaitable[None]] | None = None,
     on_final_complete: Callable[[list[str]], Awaitable[None]] | None = None,
+    on_final_summary: Callable[[str], Awaitable[None]] | None = None,
+    chunk_timeout: float | None = None,
+    run_timeout: float | None = None,
+    cancel_token: CancellationToken | None = None,
+    budget: BudgetGovernor | None = None,
+    chunk_feedback: Callable[[str, list[str] | None], Awaitable[str | None]] | None = None,
+    compact_after_chunks: int | None = None,
+    change_tracker: ChangeTracker | None = None,
+    stop_after_idle_chunks: int | None = None,
+    stall_detector: StallDetector | None = None,
+    history_size: int = DEFAULT_HISTORY_SIZE,
+    base_session_id: str | None = None,
+    search_index: CodeSearchIndex | None = None,
+    symbol_index: SymbolIndex | None = None,
+    prompt_programs: PromptPrograms | None = None,
 ):
-    """Run Claude in chunks, allowing more turns for complex tasks.
+    """Run an agent in chunks of turns, configured by a ChunkStrategy.
 
     Uses session resume to continue the conversation across chunks,
-    preserving context from previous turns.
+    preserving context from previous turns. Shared by run_claude_chunked and
+    run_claude_plan_chunked; new modes only need a new strategy.
 
     Yields messages from each chunk. Stops when:
-    - The completion marker file is created (agent signals done)
+    - strategy.is_complete reports completion
     - max_chunks is reached
+    - run_timeout elapses, cancel_token is cancelled or the budget's hard limit
+      is reached (partial results are still summarised and passed to
+      on_final_complete)
 
     Args:
+        strategy: Prompt building, completion detection, summarisation and hooks
         title: Task title
         body: Task description
         cwd: Working directory
@@ -348,77 +989,555 @@ async def run_claude_chunked(
         max_chunks: Maximum number of chunks
         on_chunk_complete: Optional callback called after each chunk with (chunk_num, summary)
         on_final_complete: Optional callback called at end with list of all summaries
+        on_final_summary: Optional callback called at end with a generated final
+            summary; the final summary session only runs when this is given
+        chunk_timeout: Optional wall-clock seconds per chunk; a chunk that overruns
+            is stopped and the next chunk resumes the session
+        run_timeout: Optional wall-clock seconds for the whole run
+        cancel_token: Optional token for cooperative cancellation by the caller
+        budget: Optional budget governor; past its soft limit summaries are built
+            locally, at its hard limit the run stops after the current chunk
+        chunk_feedback: Optional async hook called after each chunk that did not
+            complete with cwd and the paths the chunk changed (None without a
+            change tracker); returned text (e.g. affected test failures) is
+            appended to the next continuation prompt
+        compact_after_chunks: Optional K; every K chunks the run continues in a
+            fresh session seeded with a state digest (changed files, chunk
+            summaries, TODOs) instead of resuming the ever-growing session
+        change_tracker: Optional tracker snapshotted after every chunk; the exact
+            files changed (with line stats) are appended to chunk summaries
+        stop_after_idle_chunks: Optional N; with a change tracker, stop early
+            (STOP_NO_CHANGES) after N consecutive chunks that changed no files
+        stall_detector: Optional detector for looping agents; a stalled chunk
+            adds a nudge to the next continuation prompt, and continued stalling
+            stops the run (STOP_STALLED, details in stall_detector.last_verdict)
+        history_size: Maximum MessageRecords kept per chunk for summaries and
+            stall detection; full messages are only yielded, never retained
+        base_session_id: Optional pre-explored session (see base_session) that
+            the first chunk, and any compacted chunk, forks instead of starting cold
+        search_index: Optional CodeSearchIndex offered to the agent as indexed
+            search tools in place of Glob and Grep
+        symbol_index: Optional SymbolIndex offered to the agent as symbol
+            navigation tools, which the first prompt tells it to use
+        prompt_programs: Optional PromptPrograms that write the chunk and final
+            summaries instead of summary agent sessions; without it, summary
+            sessions are recorded as program examples (see prompt_programs)
     """
     if cwd is None:
         cwd = os.getcwd()
 
-    # Clean up any leftover completion marker from previous runs
-    cleanup_completion_marker(cwd)
+    if strategy.on_start is not None:
+        strategy.on_start(cwd)
+
+    if change_tracker is not None and not change_tracker.started:
+        await asyncio.to_thread(change_tracker.start)
+
+    loop = asyncio.get_running_loop()
+    run_deadline = loop.time() + run_timeout if run_timeout is not None else None
+    route = route_for(strategy.call_type)
 
     session_id = None
     all_chunk_summaries = []
+    # Per-chunk summaries for compaction digests, even without on_chunk_complete
+    digest_summaries = []
+    stopped_early = False
+    feedback = None
+    idle_chunks = 0
 
     for chunk_num in range(max_chunks):
+        if cancel_token is not None and cancel_token.cancelled:
+            stopped_early = True
+            break
+        if budget is not None and budget.state == BUDGET_HARD:
+            # Earlier calls (base session, planning) may have used the budget up
+            print(f"Budget hard limit reached, skipping chunk {chunk_num + 1}")
+            if cancel_token is not None:
+                cancel_token.cancel(STOP_BUDGET)
+            stopped_early = True
+            break
+
         # Build prompt - initial or continuation
+        search_options = {"search_tools": True} if search_index is not None else {}
         if chunk_num == 0:
-            prompt = build_prompt(title, body, cwd)
+            if symbol_index is not None:
+                prompt = strategy.build_prompt(title, body, cwd, symbol_tools=True, **search_options)
+            else:
+                prompt = strategy.build_prompt(title, body, cwd, **search_options)
         else:
-            prompt = build_continuation_prompt(title, body, cwd)
-
-        # Collect messages from this chunk
-        chunk_messages = []
-
-        # Run this chunk, resuming session if we have one
-        async for message in run_claude(prompt, cwd, turns_per_chunk, resume=session_id):
-            # Capture session_id from init message
-            if session_id is None:
-                session_id = extract_session_id(message)
-            chunk_messages.append(message)
-            yield message
+            prompt = strategy.build_continuation_prompt(title, body, cwd, **search_options)
+            if compact_after_chunks and chunk_num % compact_after_chunks == 0:
+                digest = await asyncio.to_thread(build_state_digest, cwd, digest_summaries)
+                prompt = f"{prompt}\n\n{digest}"
+                session_id = None
+                print(f"Compacting context: chunk {chunk_num + 1} starts a fresh session")
+            if feedback:
+                prompt = f"{prompt}\n\n{feedback}"
+
+        # Compact records of this chunk's messages (a ring buffer, so large
+        # tool results are never held and long chunks stay bounded)
+        chunk_messages = message_history(history_size)
+
+        # Run this chunk, resuming session if we have one. A fresh session
+        # forks the base session when given; if the base cannot be resumed
+        # (e.g. it expired), the chunk is retried cold.
+        while True:
+            fork = session_id is None and base_session_id is not None
+            interrupted = None
+            try:
+                async for message in stream_until(
+                    run_claude(
+                        prompt,
+                        cwd,
+                        route.turns(turns_per_chunk),
+                        resume=base_session_id if fork else session_id,
+                        allowed_tools=strategy.allowed_tools,
+                        max_budget_usd=budget.remaining_usd if budget else None,
+                        fork_session=fork,
+                        search_index=search_index,
+                        symbol_index=symbol_index,
+                        model=route.model,
+                    ),
+                    chunk_deadline(run_deadline, chunk_timeout),
+                    cancel_token,
+                ):
+                    # Capture session_id from init message
+                    if session_id is None:
+                        session_id = extract_session_id(message)
+                    if budget is not None:
+                        budget.record(strategy.call_type, message)
+                    chunk_messages.extend(compact_message(message))
+                    yield message
+            except StreamInterrupted as e:
+                interrupted = e.reason
+                if run_deadline is not None and loop.time() >= run_deadline:
+                    interrupted = STOP_RUN_TIMEOUT
+                print(f"Chunk {chunk_num + 1} interrupted: {interrupted}")
+            except Exception as e:
+                if not fork:
+                    raise
+                print(f"Error forking base session: {e}")
+
+            if fork and session_id is None and interrupted is None:
+                print(f"Could not resume base session {base_session_id}, continuing without it")
+                base_session_id = None
+                chunk_messages.clear()
+                continue
+            break
+
+        if interrupted is None and budget is not None and budget.state == BUDGET_HARD:
+            interrupted = STOP_BUDGET
+            print(f"Budget hard limit reached after chunk {chunk_num + 1}")
+
+        changes = None
+        if change_tracker is not None:
+            changes = await asyncio.to_thread(change_tracker.update)
+            idle_chunks = 0 if changes else idle_chunks + 1
+            if (
+                interrupted is None
+                and stop_after_idle_chunks
+                and idle_chunks >= stop_after_idle_chunks
+                and not strategy.is_complete(cwd)
+            ):
+                interrupted = STOP_NO_CHANGES
+                print(f"No file changes in {idle_chunks} chunk(s), stopping")
+
+        nudge = None
+        if stall_detector is not None:
+            verdict = stall_detector.observe_chunk(chunk_messages, changes)
+            if verdict.stop and interrupted is None and not strategy.is_complete(cwd):
+                interrupted = STOP_STALLED
+                print(f"Agent stalled for {verdict.stalled_chunks} chunk(s): {verdict.reason}")
+            nudge = verdict.nudge
+
+        stopping = interrupted is not None and interrupted != STOP_CHUNK_TIMEOUT
 
         # Generate summary for this chunk
+        summary = None
         if on_chunk_complete:
             try:
-                summary_prompt = build_chunk_summary_prompt(
-                    title, body, chunk_messages, chunk_num, cwd
-                )
-                summary = await run_summary_agent(summary_prompt, cwd)
+                if stopping or (budget is not None and budget.state != BUDGET_OK):
+                    # Summarise locally so a stopped or over-budget run does not
+                    # spend more time or money on a summary session
+                    summary = extract_turn_summary(chunk_messages)
+                elif prompt_programs is not None:
+                    activity = extract_turn_summary(chunk_messages)
+                    try:
+                        summary = await asyncio.wait_for(
+                            prompt_programs.chunk_summary(title, body, activity, CALL_CHUNK_SUMMARY, budget),
+                            remaining_time(run_deadline),
+                        )
+                    except Exception as e:
+                        print(f"Error running chunk summary program, summarising locally: {e}")
+                        summary = activity
+                else:
+                    summary_prompt = strategy.build_summary_prompt(
+                        title, body, chunk_messages, chunk_num, cwd
+                    )
+                    summary = await asyncio.wait_for(
+                        run_summary_agent(summary_prompt, cwd, budget=budget),
+                        remaining_time(run_deadline),
+                    )
+                    record_summary_example(
+                        PROGRAM_CHUNK_SUMMARY,
+                        {"task": format_task(title, body), "activity": extract_turn_summary(chunk_messages)},
+                        summary,
+                    )
+                summary = append_file_changes(summary, changes)
                 all_chunk_summaries.append(summary)
                 await on_chunk_complete(chunk_num, summary)
             except Exception as e:
                 print(f"Error generating/posting chunk summary: {e}")
                 # Continue execution even if summary fails
+        if summary is None:
+            summary = append_file_changes(extract_turn_summary(chunk_messages), changes)
+        digest_summaries.append(summary)
+
+        # Check if the agent signalled completion
+        if strategy.is_complete(cwd):
+            if strategy.on_complete is not None:
+                strategy.on_complete(cwd)
+            break
+
+        if stopping:
+            if cancel_token is not None:
+                cancel_token.cancel(interrupted)
+            stopped_early = True
+            break
+
+        # Gather feedback for the next chunk
+        feedback = None
+        if chunk_feedback and chunk_num + 1 < max_chunks:
+            try:
+                changed_paths = changes.paths if changes is not None else None
+                feedback = await asyncio.wait_for(chunk_feedback(cwd, changed_paths), remaining_time(run_deadline))
+            except Exception as e:
+                print(f"Error gathering chunk feedback: {e}")
+        if nudge:
+            feedback = f"{feedback}\n\n{nudge}" if feedback else nudge
+
+    if strategy.persist_session and session_id:
+        save_session_id(cwd, session_id)
+
+    # Completed, hit max_chunks or stopped early - report results once
+    await finalise_chunked_run(
+        title,
+        body,
+        cwd,
+        all_chunk_summaries,
+        on_final_complete,
+        on_final_summary,
+        allow_summary_session=not stopped_early,
+        budget=budget,
+        prompt_programs=prompt_programs,
+    )
 
-        # Check if agent signalled completion
-        if is_complete(cwd):
-            cleanup_completion_marker(cwd)
-            # Generate final summary
-            if on_final_complete and all_chunk_summaries:
-                try:
-                    final_prompt = build_final_summary_prompt(
-                        title, body, all_chunk_summaries, cwd
-                    )
-                    final_summary = await run_summary_agent(final_prompt, cwd)
-                    await on_final_complete(all_chunk_summaries)
-                except Exception as e:
-                    print(f"Error generating/posting final summary: {e}")
+
+async def run_claude_chunked(
+    title: str,
+    body: str,
+    cwd: str | None = None,
+    turns_per_chunk: int = DEFAULT_TURNS_PER_CHUNK,
+    max_chunks: int = DEFAULT_MAX_CHUNKS,
+    on_chunk_complete: Callable[[int, str], Awaitable[None]] | None = None,
+    on_final_complete: Callable[[list[str]], Awaitable[None]] | None = None,
+    on_final_summary: Callable[[str], Awaitable[None]] | None = None,
+    chunk_timeout: float | None = None,
+    run_timeout: float | None = None,
+    cancel_token: CancellationToken | None = None,
+    budget: BudgetGovernor | None = None,
+    chunk_feedback: Callable[[str, list[str] | None], Awaitable[str | None]] | None = None,
+    compact_after_chunks: int | None = None,
+    change_tracker: ChangeTracker | None = None,
+    stop_after_idle_chunks: int | None = None,
+    stall_detector: StallDetector | None = None,
+    base_session_id: str | None = None,
+    search_index: CodeSearchIndex | None = None,
+    symbol_index: SymbolIndex | None = None,
+    prompt_programs: PromptPrograms | None = None,
+):
+    """Run Claude in chunks, allowing more turns for complex tasks.
+
+    Stops when the completion marker file is created (agent signals done),
+    max_chunks is reached or the run is stopped early. See run_chunk_engine
+    for the arguments.
+    """
+    async for message in run_chunk_engine(
+        IMPLEMENT_STRATEGY,
+        title,
+        body,
+        cwd,
+        turns_per_chunk=turns_per_chunk,
+        max_chunks=max_chunks,
+        on_chunk_complete=on_chunk_complete,
+        on_final_complete=on_final_complete,
+        on_final_summary=on_final_summary,
+        chunk_timeout=chunk_timeout,
+        run_timeout=run_timeout,
+        cancel_token=cancel_token,
+        budget=budget,
+        chunk_feedback=chunk_feedback,
+        compact_after_chunks=compact_after_chunks,
+        change_tracker=change_tracker,
+        stop_after_idle_chunks=stop_after_idle_chunks,
+        stall_detector=stall_detector,
+        base_session_id=base_session_id,
+        search_index=search_index,
+        symbol_index=symbol_index,
+        prompt_programs=prompt_programs,
+    ):
+        yield message
+
+
+IMPLEMENT_STRATEGY = ChunkStrategy(
+    call_type=CALL_IMPLEMENT,
+    build_prompt=build_prompt,
+    build_continuation_prompt=build_continuation_prompt,
+    is_complete=is_complete,
+    # Clean up any leftover completion marker from previous runs, and ours when done
+    on_start=cleanup_completion_marker,
+    on_complete=cleanup_completion_marker,
+    persist_session=True,
+)
+
+
+async def run_claude_single(
+    title: str,
+    body: str,
+    cwd: str | None = None,
+    max_turns: int = DEFAULT_SINGLE_SESSION_TURNS,
+    run_timeout: float | None = None,
+    cancel_token: CancellationToken | None = None,
+    budget: BudgetGovernor | None = None,
+    change_tracker: ChangeTracker | None = None,
+    search_index: CodeSearchIndex | None = None,
+    symbol_index: SymbolIndex | None = None,
+):
+    """Run one lean session for a trivial issue.
+
+    Unlike run_claude_chunked there is no completion marker, no continuation
+    chunks and no summary sessions, so the only agent call is the edit itself.
+    If the run is stopped early, cancel_token (when given) carries the reason.
+    The session_id is saved to SESSION_FILE, like run_claude_chunked does.
+
+    Args:
+        title: Task title
+        body: Task description
+        cwd: Working directory
+        max_turns: Turn cap for the session
+        run_timeout: Optional wall-clock seconds for the run
+        cancel_token: Optional token for cooperative cancellation by the caller
+        budget: Optional budget governor recording the session's usage
+        change_tracker: Optional tracker, snapshotted before and after the session
+        search_index: Optional CodeSearchIndex offered as indexed search tools
+        symbol_index: Optional SymbolIndex offered as symbol navigation tools
+    """
+    if cwd is None:
+        cwd = os.getcwd()
+
+    if change_tracker is not None and not change_tracker.started:
+        await asyncio.to_thread(change_tracker.start)
+
+    if budget is not None and budget.state == BUDGET_HARD:
+        print("Budget hard limit reached, skipping the session")
+        if cancel_token is not None:
+            cancel_token.cancel(STOP_BUDGET)
+        return
+
+    deadline = asyncio.get_running_loop().time() + run_timeout if run_timeout is not None else None
+    route = route_for(CALL_IMPLEMENT)
+    session_id = None
+    try:
+        async for message in stream_until(
+            run_claude(
+                build_lean_prompt(
+                    title, body, cwd, symbol_tools=symbol_index is not None, search_tools=search_index is not None
+                ),
+                cwd,
+                route.turns(max_turns),
+                max_budget_usd=budget.remaining_usd if budget else None,
+                search_index=search_index,
+                symbol_index=symbol_index,
+                model=route.model,
+            ),
+            deadline,
+            cancel_token,
+        ):
+            if session_id is None:
+                session_id = extract_session_id(message)
+            if budget is not None:
+                budget.record(CALL_IMPLEMENT, message)
+            yield message
+    except StreamInterrupted as e:
+        reason = STOP_RUN_TIMEOUT if e.reason == STOP_CHUNK_TIMEOUT else e.reason
+        print(f"Single session interrupted: {reason}")
+        if cancel_token is not None:
+            cancel_token.cancel(reason)
+
+    if session_id:
+        save_session_id(cwd, session_id)
+
+    if change_tracker is not None:
+        await asyncio.to_thread(change_tracker.update)
+
+
+def description_write_hooks(description_path: Path) -> dict:
+    """PreToolUse hooks confining a PR description session to writing description_path.
+
+    The description is written while the branch is pushed, so edits to any
+    other file would be lost; they and shell commands are denied.
+    """
+    description_path = description_path.resolve()
+
+    def deny(reason: str) -> dict:
+        return {
+            "hookSpecificOutput": {
+                "hookEventName": "PreToolUse",
+                "permissionDecision": "deny",
+                "permissionDecisionReason": reason,
+            }
+        }
+
+    async def guard_write(input_data, tool_use_id, context):
+        tool_input = input_data.get("tool_input") or {}
+        path = tool_input.get("file_path") or tool_input.get("notebook_path")
+        if path and (description_path.parent / path).resolve() == description_path:
+            return {}
+        return deny(f"Only {description_path.name} may be written now; the changes are already committed.")
+
+    async def deny_shell(input_data, tool_use_id, context):
+        return deny(f"Shell commands are not available while writing {description_path.name}.")
+
+    return {
+        "PreToolUse": [
+            HookMatcher(matcher=EDIT_TOOL_MATCHER, hooks=[guard_write]),
+            HookMatcher(matcher=SHELL_TOOL_MATCHER, hooks=[deny_shell]),
+        ]
+    }
+
+
+async def run_pr_description(
+    title: str,
+    body: str,
+    diff: str,
+    issue_number: int,
+    cwd: str | None = None,
+    budget: BudgetGovernor | None = None,
+    resume: bool = True,
+    prompt_programs: PromptPrograms | None = None,
+):
+    """Write PR_DESCRIPTION_FILE, preferably by resuming the implementing session.
+
+    With resume, the session saved in SESSION_FILE gets one short description
+    turn, which avoids a cold session and re-sending the issue and diff. The
+    resumed session keeps its own model so its prompt cache is reused; only
+    the fresh session follows the CALL_PR_DESCRIPTION route. If no
+    session was saved, or the resumed session fails or writes no description,
+    the pr_description program (with prompt_programs) or else a fresh session
+    is given the issue and the diff instead. Either session may only write
+    the description (see description_write_hooks).
+
+    Args:
+        title: Issue title
+        body: Issue body
+        diff: Diff of the changes, used by the fresh-session fallback
+        issue_number: Issue number the PR closes
+        cwd: Working directory
+        budget: Optional budget governor recording usage (CALL_PR_DESCRIPTION)
+        resume: Try resuming the implementing session first
+        prompt_programs: Optional PromptPrograms that write the description from
+            the diff in place of a fresh session
+    """
+    if cwd is None:
+        cwd = os.getcwd()
+    description_path = Path(cwd) / PR_DESCRIPTION_FILE
+    hooks = description_write_hooks(description_path)
+
+    if budget is not None and budget.state == BUDGET_HARD:
+        print("Budget hard limit reached, skipping PR description generation")
+        return
+
+    session_id = load_session_id(cwd) if resume else None
+    if session_id:
+        if description_path.exists():
+            description_path.unlink()
+        try:
+            async for message in run_claude(
+                build_pr_description_resume_prompt(issue_number, cwd),
+                cwd,
+                max_turns=2,
+                resume=session_id,
+                allowed_tools=["Write"],
+                max_budget_usd=budget.remaining_usd if budget else None,
+                hooks=hooks,
+            ):
+                if budget is not None:
+                    budget.record(CALL_PR_DESCRIPTION, message)
+                yield message
+        except Exception as e:
+            print(f"Error resuming implementation session: {e}")
+        if description_path.exists():
+            print(f"Wrote PR description by resuming session {session_id}")
+            return
+        print("Resumed session wrote no PR description, falling back to the diff")
+        if budget is not None and budget.state == BUDGET_HARD:
+            print("Budget hard limit reached, skipping the fallback")
             return
 
-    # If we get here, we hit max_chunks without completion
-    # Still generate final summary
-    if on_final_complete and all_chunk_summaries:
+    closes_line = f"Closes #{issue_number}"
+    if prompt_programs is not None:
         try:
-            final_prompt = build_final_summary_prompt(
-                title, body, all_chunk_summaries, cwd
-            )
-            final_summary = await run_summary_agent(final_prompt, cwd)
-            await on_final_complete(all_chunk_summaries)
+            description = await prompt_programs.pr_description(title, body, diff, CALL_PR_DESCRIPTION, budget)
+            if description:
+                description_path.write_text(f"{closes_line}\n\n{description}\n")
+                print("Wrote PR description with the pr_description program")
+                return
         except Exception as e:
-            print(f"Error generating/posting final summary: {e}")
+            print(f"Error running PR description program, falling back to a session: {e}")
+
+    prompt = build_pr_description_prompt(title, body, diff, issue_number, cwd)
+    # A fresh session on the routed (lighter) model with fewer turns for this simpler task
+    route = route_for(CALL_PR_DESCRIPTION)
+    async for message in run_claude(
+        prompt,
+        cwd,
+        max_turns=route.turns(None) or 3,
+        max_budget_usd=budget.remaining_usd if budget else None,
+        model=route.model,
+        hooks=hooks,
+    ):
+        if budget is not None:
+            budget.record(CALL_PR_DESCRIPTION, message)
+        yield message
+
+    if description_path.exists():
+        description = description_path.read_text().strip()
+        if description.startswith(closes_line):
+            description = description[len(closes_line):].strip()
+        record_example(
+            PROGRAM_PR_DESCRIPTION, {"task": format_task(title, body), "diff": truncate_diff(diff)}, description
+        )
+
 
+def build_plan_prompt(
+    title: str,
+    body: str,
+    cwd: str | None = None,
+    focus: str | None = None,
+    plan_file_name: str = ".plan.md",
+    symbol_tools: bool = False,
+    search_tools: bool = False,
+) -> str:
+    """Build prompt for generating an implementation plan.
 
-def build_plan_prompt(title: str, body: str, cwd: str | None = None) -> str:
-    """Build prompt for generating an implementation plan."""
+    Args:
+        title: Issue title
+        body: Issue body
+        cwd: Working directory
+        focus: Optional exploration focus, used to diversify parallel planners
+        plan_file_name: File (relative to cwd) the plan should be written to
+        symbol_tools: Tell the agent to navigate with the symbol index tools
+        search_tools: Name the indexed search tools instead of Glob and Grep
+    """
     if not title:
         raise ValueError("Title is required")
 
@@ -429,21 +1548,30 @@ def build_plan_prompt(title: str, body: str, cwd: str | None = None) -> str:
     if cwd is None:
         cwd = os.getcwd()
 
-    plan_file = f"{cwd}/.plan.md"
+    plan_file = f"{cwd}/{plan_file_name}"
 
     # Handle empty body gracefully
     issue_content = f"# {title}"
     if body and body.strip():
         issue_content = f"{issue_content}\n\n{body}"
 
+    focus_section = ""
+    if focus:
+        focus_section = f"""
+EXPLORATION FOCUS: Concentrate your exploration on {focus}. Keep exploration brief - you have a small turn budget.
+"""
+
+    navigation_section = f"{SYMBOL_NAVIGATION_INSTRUCTIONS}\n\n" if symbol_tools else ""
+    find_tool, search_tool = search_tool_names(search_tools)
+
     return f"""You are a planning agent. Your task is to analyze the issue and create a detailed implementation plan.
 
 Working directory: {cwd}
 
-IMPORTANT: You MUST use the file editing tools (Read, Edit, Write, Glob, Grep) to explore the codebase and create the plan.
-
+IMPORTANT: You MUST use the file editing tools (Read, Edit, Write, {find_tool}, {search_tool}) to explore the codebase and create the plan.
+{focus_section}
 Steps to follow:
-1. Use Glob and Grep to explore the codebase structure
+1. Use {find_tool} and {search_tool} to explore the codebase structure
 2. Use Read to examine relevant files
 3. Analyze the issue requirements
 4. Create a detailed implementation plan in markdown format
@@ -452,7 +1580,10 @@ Steps to follow:
 The plan should include:
 - **Overview**: Brief summary of what needs to be done
 - **Files to modify/create**: List of files that will be changed or created
-- **Implementation steps**: Numbered list of specific steps to implement the feature
+- **Implementation steps**: Numbered list of specific steps to implement the feature. Under each step, add a
+  `Files:` line with the files that step changes and a `Depends on:` line with the numbers of earlier steps
+  it needs (or `none`). Steps that change different files should not depend on each other unless they must,
+  so they can be implemented in parallel
 - **Testing approach**: How to verify the changes work
 - **Potential risks/considerations**: Any gotchas or edge cases to watch out for
 
@@ -462,7 +1593,7 @@ All file paths must be absolute paths within the working directory.
 
 When you have finished creating the plan, write it to: {plan_file}
 
-## Issue to plan for:
+{navigation_section}## Issue to plan for:
 
 {issue_content}"""
 
@@ -478,7 +1609,8 @@ async def run_claude_plan(title: str, body: str, cwd: str | None = None, max_tur
     prompt = build_plan_prompt(title, body, cwd)
 
     # Run with limited turns - planning should be faster than implementation
-    async for message in run_claude(prompt, cwd, max_turns):
+    route = route_for(CALL_PLAN)
+    async for message in run_claude(prompt, cwd, route.turns(max_turns), model=route.model):
         yield message
 
 
@@ -493,9 +1625,10 @@ def is_plan_complete(cwd: str) -> bool:
     return plan_path.exists()
 
 
-def build_plan_continuation_prompt(title: str, body: str, cwd: str) -> str:
+def build_plan_continuation_prompt(title: str, body: str, cwd: str, search_tools: bool = False) -> str:
     """Build a continuation prompt for when the planning agent needs more turns."""
     plan_file = f"{cwd}/{PLAN_FILE}"
+    find_tool, search_tool = search_tool_names(search_tools)
 
     # Handle empty body gracefully
     issue_content = f"# {title}"
@@ -509,7 +1642,7 @@ Review what you've learned so far and continue creating the plan.
 Working directory: {cwd}
 
 Remember:
-- Use Glob, Grep, and Read to explore the codebase
+- Use {find_tool}, {search_tool}, and Read to explore the codebase
 - When you have enough information, write the plan to: {plan_file}
 - The plan should include: Overview, Files to modify/create, Implementation steps, Testing approach, Potential risks
 
@@ -526,84 +1659,51 @@ async def run_claude_plan_chunked(
     max_chunks: int = DEFAULT_PLAN_MAX_CHUNKS,
     on_chunk_complete: Callable[[int, str], Awaitable[None]] | None = None,
     on_final_complete: Callable[[list[str]], Awaitable[None]] | None = None,
+    on_final_summary: Callable[[str], Awaitable[None]] | None = None,
+    chunk_timeout: float | None = None,
+    run_timeout: float | None = None,
+    cancel_token: CancellationToken | None = None,
+    budget: BudgetGovernor | None = None,
+    chunk_feedback: Callable[[str, list[str] | None], Awaitable[str | None]] | None = None,
+    compact_after_chunks: int | None = None,
+    base_session_id: str | None = None,
+    search_index: CodeSearchIndex | None = None,
+    symbol_index: SymbolIndex | None = None,
+    prompt_programs: PromptPrograms | None = None,
 ):
     """Run Claude planning in chunks, allowing more turns for complex exploration.
 
-    Uses session resume to continue the conversation across chunks,
-    preserving context from previous turns.
-
-    Yields messages from each chunk. Stops when:
-    - The .plan.md file is created (agent signals done)
-    - max_chunks is reached
-
-    Args:
-        title: Task title
-        body: Task description
-        cwd: Working directory
-        turns_per_chunk: Number of turns per chunk
-        max_chunks: Maximum number of chunks
-        on_chunk_complete: Optional callback called after each chunk with (chunk_num, summary)
-        on_final_complete: Optional callback called at end with list of all summaries
+    Stops when the .plan.md file is created (agent signals done), max_chunks
+    is reached or the run is stopped early. See run_chunk_engine for the
+    arguments.
     """
-    if cwd is None:
-        cwd = os.getcwd()
-
-    session_id = None
-    all_chunk_summaries = []
-
-    for chunk_num in range(max_chunks):
-        # Build prompt - initial or continuation
-        if chunk_num == 0:
-            prompt = build_plan_prompt(title, body, cwd)
-        else:
-            prompt = build_plan_continuation_prompt(title, body, cwd)
-
-        # Collect messages from this chunk
-        chunk_messages = []
-
-        # Run this chunk, resuming session if we have one
-        async for message in run_claude(prompt, cwd, turns_per_chunk, resume=session_id):
-            # Capture session_id from init message
-            if session_id is None:
-                session_id = extract_session_id(message)
-            chunk_messages.append(message)
-            yield message
-
-        # Generate summary for this chunk
-        if on_chunk_complete:
-            try:
-                summary_prompt = build_chunk_summary_prompt(
-                    title, body, chunk_messages, chunk_num, cwd
-                )
-                summary = await run_summary_agent(summary_prompt, cwd)
-                all_chunk_summaries.append(summary)
-                await on_chunk_complete(chunk_num, summary)
-            except Exception as e:
-                print(f"Error generating/posting chunk summary: {e}")
-                # Continue execution even if summary fails
+    async for message in run_chunk_engine(
+        PLAN_STRATEGY,
+        title,
+        body,
+        cwd,
+        turns_per_chunk=turns_per_chunk,
+        max_chunks=max_chunks,
+        on_chunk_complete=on_chunk_complete,
+        on_final_complete=on_final_complete,
+        on_final_summary=on_final_summary,
+        chunk_timeout=chunk_timeout,
+        run_timeout=run_timeout,
+        cancel_token=cancel_token,
+        budget=budget,
+        chunk_feedback=chunk_feedback,
+        compact_after_chunks=compact_after_chunks,
+        base_session_id=base_session_id,
+        search_index=search_index,
+        symbol_index=symbol_index,
+        prompt_programs=prompt_programs,
+    ):
+        yield message
 
-        # Check if agent created the plan file
-        if is_plan_complete(cwd):
-            # Generate final summary
-            if on_final_complete and all_chunk_summaries:
-                try:
-                    final_prompt = build_final_summary_prompt(
-                        title, body, all_chunk_summaries, cwd
-                    )
-                    final_summary = await run_summary_agent(final_prompt, cwd)
-                    await on_final_complete(all_chunk_summaries)
-                except Exception as e:
-                    print(f"Error generating/posting final summary: {e}")
-            return
 
-    # If we get here, we hit max_chunks without completing the plan
-    # Still generate final summary
-    if on_final_complete and all_chunk_summaries:
-        try:
-            final_prompt = build_final_summary_prompt(
-                title, body, all_chunk_summaries, cwd
-            )
-            final_summary = await run_summary_agent(final_prompt, cwd)
-            await on_final_complete(all_chunk_summaries)
-        except Exception as e:
-            print(f"Error generating/posting final summary: {e}")
+PLAN_STRATEGY = ChunkStrategy(
+    call_type=CALL_PLAN,
+    build_prompt=build_plan_prompt,
+    build_continuation_prompt=build_plan_continuation_prompt,
+    is_complete=is_plan_complete,
+)
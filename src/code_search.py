@@ -0,0 +1,371 @@
+"""In-process trigram and path index that serves agent code search over MCP.
+
+The index is built once per worktree. It then stays current through a
+PostToolUse hook that re-indexes files the agent edits, so searches never
+rescan the tree. Only candidate files (those containing every trigram of the
+pattern's literal parts) are matched, from texts kept in memory.
+"""
+
+import os
+import re
+import stat as stat_module
+from pathlib import Path
+from typing import Iterable
+
+from claude_agent_sdk import create_sdk_mcp_server, tool
+from claude_agent_sdk.types import HookMatcher
+
+from change_tracker import SKIP_DIRS
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+
+SERVER_NAME = "code_index"
+SEARCH_CODE_TOOL = f"mcp__{SERVER_NAME}__search_code"
+FIND_FILES_TOOL = f"mcp__{SERVER_NAME}__find_files"
+SEARCH_TOOLS = [SEARCH_CODE_TOOL, FIND_FILES_TOOL]
+# Built-in tools the indexed tools replace when preferred
+REPLACED_TOOLS = ["Glob", "Grep"]
+EDIT_TOOL_MATCHER = "Edit|Write|MultiEdit|NotebookEdit"
+
+DEFAULT_MAX_FILE_BYTES = 1024 * 1024
+DEFAULT_MAX_CACHED_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_RESULTS = 100
+MAX_LINE_CHARS = 300
+
+
+def trigrams(text: str) -> set[str]:
+    """Return the lowercased trigrams of text."""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def required_trigrams(pattern: str) -> set[str] | None:
+    """Return trigrams every match of a regex must contain, or None if unknown.
+
+    Only runs of plain literals at the top level of the pattern are used, so
+    alternations, classes and optional parts never exclude a real match.
+
+    Raises:
+        re.error: If the pattern is not a valid regular expression
+    """
+    runs, current = [], []
+    for op, value in sre_parse.parse(pattern):
+        if op is sre_parse.LITERAL:
+            current.append(chr(value))
+        else:
+            runs.append("".join(current))
+            current = []
+    runs.append("".join(current))
+
+    required = set()
+    for run in runs:
+        required |= trigrams(run)
+    return required or None
+
+
+def glob_to_regex(pattern: str) -> re.Pattern:
+    """Compile a Glob-tool style pattern (*, **, ?, [...], {a,b}) to a regex on relative paths."""
+    i, out = 0, []
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            out.append("[^/]*")
+        elif char == "?":
+            out.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(char))
+            else:
+                out.append(pattern[i:end + 1].replace("[!", "[^", 1))
+                i = end
+        elif char == "{":
+            end = pattern.find("}", i + 1)
+            if end == -1:
+                out.append(re.escape(char))
+            else:
+                options = pattern[i + 1:end].split(",")
+                out.append("(?:" + "|".join(re.escape(option) for option in options) + ")")
+                i = end
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+class CodeSearchIndex:
+    """Trigram index of file contents plus a path index for one worktree.
+
+    Postings are only ever added to: a re-indexed file keeps its old trigrams,
+    which at worst makes it a candidate that then fails the regex check. File
+    texts are kept in memory (up to max_cached_bytes) so matching candidates
+    needs no disk reads.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+        max_cached_bytes: int = DEFAULT_MAX_CACHED_BYTES,
+    ):
+        self.root = Path(root).resolve()
+        self.max_file_bytes = max_file_bytes
+        self.max_cached_bytes = max_cached_bytes
+        self._ids: dict[str, int] = {}
+        self._paths: list[str | None] = []
+        self._postings: dict[str, set[int]] = {}
+        self._texts: dict[int, str] = {}
+        self._cached_bytes = 0
+        self._sorted_paths: list[str] | None = None
+
+    @classmethod
+    def build(
+        cls,
+        root: str,
+        max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+        max_cached_bytes: int = DEFAULT_MAX_CACHED_BYTES,
+    ) -> "CodeSearchIndex":
+        """Walk the worktree and index every file."""
+        index = cls(root, max_file_bytes, max_cached_bytes)
+        for dirpath, dirnames, filenames in os.walk(index.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.endswith(".egg-info")]
+            for filename in filenames:
+                index._index_file((Path(dirpath) / filename).relative_to(index.root).as_posix())
+        return index
+
+    @property
+    def file_count(self) -> int:
+        return len(self._ids)
+
+    @property
+    def trigram_count(self) -> int:
+        return len(self._postings)
+
+    def _relative(self, path: str) -> str | None:
+        full = Path(path) if os.path.isabs(path) else self.root / path
+        try:
+            return full.resolve().relative_to(self.root).as_posix()
+        except ValueError:
+            return None
+
+    def _read(self, rel: str) -> str | None:
+        path = self.root / rel
+        try:
+            stat = path.stat()
+            if not stat_module.S_ISREG(stat.st_mode) or stat.st_size > self.max_file_bytes:
+                return None
+            data = path.read_bytes()
+        except OSError:
+            return None
+        if b"\0" in data[:8192]:
+            return None
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+
+    def _index_file(self, rel: str) -> None:
+        file_id = self._ids.get(rel)
+        if file_id is None:
+            file_id = len(self._paths)
+            self._ids[rel] = file_id
+            self._paths.append(rel)
+            self._sorted_paths = None
+        self._uncache(file_id)
+        text = self._read(rel)
+        if text is None:
+            return
+        for trigram in trigrams(text):
+            self._postings.setdefault(trigram, set()).add(file_id)
+        if self._cached_bytes + len(text) <= self.max_cached_bytes:
+            self._texts[file_id] = text
+            self._cached_bytes += len(text)
+
+    def _uncache(self, file_id: int) -> None:
+        text = self._texts.pop(file_id, None)
+        if text is not None:
+            self._cached_bytes -= len(text)
+
+    def _text(self, rel: str) -> str | None:
+        text = self._texts.get(self._ids[rel])
+        return text if text is not None else self._read(rel)
+
+    def update(self, paths: Iterable[str]) -> None:
+        """Re-index edited files and drop deleted ones (absolute or worktree-relative paths)."""
+        for path in paths:
+            rel = self._relative(path)
+            if rel is None:
+                continue
+            if (self.root / rel).is_file():
+                self._index_file(rel)
+            elif rel in self._ids:
+                file_id = self._ids.pop(rel)
+                self._paths[file_id] = None
+                self._uncache(file_id)
+                self._sorted_paths = None
+
+    def files(self) -> list[str]:
+        """Return all indexed paths, sorted."""
+        if self._sorted_paths is None:
+            self._sorted_paths = sorted(self._ids)
+        return self._sorted_paths
+
+    def find_files(self, pattern: str, max_results: int = DEFAULT_MAX_RESULTS) -> list[str]:
+        """Return indexed paths matching a glob pattern such as "src/**/*.py"."""
+        regex = glob_to_regex(pattern)
+        matches = []
+        for path in self.files():
+            if regex.match(path):
+                matches.append(path)
+                if len(matches) >= max_results:
+                    break
+        return matches
+
+    def search(
+        self,
+        pattern: str,
+        path_glob: str | None = None,
+        ignore_case: bool = False,
+        max_results: int = DEFAULT_MAX_RESULTS,
+    ) -> list[tuple[str, int, str]]:
+        """Return (path, line number, line) for lines matching a regex.
+
+        Raises:
+            re.error: If the pattern is not a valid regular expression
+        """
+        flags = re.IGNORECASE if ignore_case else 0
+        regex = re.compile(pattern, flags)
+        # Searching the whole text jumps straight to candidate lines; each is then
+        # checked on its own so results match line-by-line (Grep) semantics
+        text_regex = re.compile(pattern, flags | re.MULTILINE)
+        required = required_trigrams(pattern)
+        if required is None:
+            candidates = self.files()
+        else:
+            postings = sorted((self._postings.get(t, set()) for t in required), key=len)
+            ids = set.intersection(*postings)
+            candidates = sorted(path for path in (self._paths[i] for i in ids) if path is not None)
+        if path_glob:
+            path_regex = glob_to_regex(path_glob)
+            candidates = [path for path in candidates if path_regex.match(path)]
+
+        results = []
+        for path in candidates:
+            text = self._text(path)
+            if text is None:
+                continue
+            pos = counted = 0
+            line_number = 1
+            while pos <= len(text) and (match := text_regex.search(text, pos)):
+                start = text.rfind("\n", 0, match.start()) + 1
+                end = text.find("\n", match.start())
+                end = len(text) if end == -1 else end
+                line_number += text.count("\n", counted, start)
+                counted = start
+                line = text[start:end]
+                if regex.search(line):
+                    results.append((path, line_number, line[:MAX_LINE_CHARS]))
+                    if len(results) >= max_results:
+                        return results
+                pos = end + 1
+        return results
+
+
+_indexes: dict[str, CodeSearchIndex] = {}
+
+
+def get_search_index(cwd: str) -> CodeSearchIndex:
+    """Return the process-wide index for a worktree, building it on first use."""
+    root = os.path.realpath(cwd)
+    if root not in _indexes:
+        _indexes[root] = CodeSearchIndex.build(root)
+    return _indexes[root]
+
+
+def _text_result(text: str, is_error: bool = False) -> dict:
+    result = {"content": [{"type": "text", "text": text}]}
+    if is_error:
+        result["is_error"] = True
+    return result
+
+
+def search_tools(index: CodeSearchIndex) -> list:
+    """Return the search_code and find_files tool definitions for an index."""
+
+    @tool(
+        "search_code",
+        "Search file contents with a regular expression (like Grep, but answered from a prebuilt index in "
+        "milliseconds). Returns matching lines as path:line: text.",
+        {
+            "type": "object",
+            "properties": {
+                "pattern": {"type": "string", "description": "Python regular expression"},
+                "path_glob": {"type": "string", "description": "Only search paths matching this glob, e.g. src/**/*.py"},
+                "ignore_case": {"type": "boolean"},
+                "max_results": {"type": "integer"},
+            },
+            "required": ["pattern"],
+        },
+    )
+    async def search_code(args):
+        try:
+            matches = index.search(
+                args["pattern"],
+                args.get("path_glob"),
+                bool(args.get("ignore_case")),
+                int(args.get("max_results") or DEFAULT_MAX_RESULTS),
+            )
+        except re.error as e:
+            return _text_result(f"Invalid regular expression: {e}", is_error=True)
+        if not matches:
+            return _text_result("No matches found")
+        return _text_result("\n".join(f"{path}:{line_number}: {line}" for path, line_number, line in matches))
+
+    @tool(
+        "find_files",
+        "Find files by glob pattern, e.g. **/*.py or src/**/test_*.py (like Glob, but answered from a prebuilt "
+        "index). Paths are relative to the working directory.",
+        {
+            "type": "object",
+            "properties": {
+                "pattern": {"type": "string"},
+                "max_results": {"type": "integer"},
+            },
+            "required": ["pattern"],
+        },
+    )
+    async def find_files(args):
+        paths = index.find_files(args["pattern"], int(args.get("max_results") or DEFAULT_MAX_RESULTS))
+        return _text_result("\n".join(paths) if paths else "No files found")
+
+    return [search_code, find_files]
+
+
+def create_search_server(index: CodeSearchIndex):
+    """Create the in-process MCP server exposing the index's search tools."""
+    return create_sdk_mcp_server(SERVER_NAME, tools=search_tools(index))
+
+
+def index_update_hooks(index: CodeSearchIndex) -> dict:
+    """PostToolUse hooks that re-index files as soon as the agent edits them."""
+
+    async def reindex_edited_file(input_data, tool_use_id, context):
+        tool_input = input_data.get("tool_input") or {}
+        path = tool_input.get("file_path") or tool_input.get("notebook_path")
+        if path:
+            index.update([path])
+        return {}
+
+    return {"PostToolUse": [HookMatcher(matcher=EDIT_TOOL_MATCHER, hooks=[reindex_edited_file])]}
@@ -0,0 +1,80 @@
+"""Compact state digests that let a chunked run continue in a fresh session."""
+
+import subprocess
+from pathlib import Path
+
+
+MAX_SUMMARY_CHARS = 1500
+MAX_TODOS = 20
+
+_TODO_MARKERS = ("TODO", "FIXME", "XXX")
+
+
+def _git(cwd: str, *args: str) -> str:
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+    return result.stdout if result.returncode == 0 else ""
+
+
+def git_diffstat(cwd: str) -> str:
+    """Return `git diff --stat` against HEAD plus untracked files, or "" outside git."""
+    stat = _git(cwd, "diff", "--stat", "HEAD").rstrip()
+    untracked = _git(cwd, "ls-files", "--others", "--exclude-standard").split()
+    lines = [stat] if stat else []
+    lines.extend(f" {path} (new file)" for path in untracked if not Path(path).name.startswith("."))
+    return "\n".join(lines)
+
+
+def added_todos(cwd: str, limit: int = MAX_TODOS) -> list[str]:
+    """Return TODO/FIXME lines the agent has added since HEAD."""
+    todos = []
+    for line in _git(cwd, "diff", "--unified=0", "HEAD").splitlines():
+        if line.startswith("+") and not line.startswith("+++"):
+            text = line[1:].strip()
+            if any(marker in text for marker in _TODO_MARKERS):
+                todos.append(text)
+    for path in _git(cwd, "ls-files", "--others", "--exclude-standard").split():
+        try:
+            content = (Path(cwd) / path).read_text(errors="ignore")
+        except OSError:
+            continue
+        todos.extend(line.strip() for line in content.splitlines() if any(m in line for m in _TODO_MARKERS))
+    return todos[:limit]
+
+
+def _truncate(text: str, limit: int) -> str:
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit].rstrip() + "\n...(truncated)"
+
+
+def build_state_digest(cwd: str, chunk_summaries: list[str]) -> str:
+    """Build the digest that replaces the resumed conversation history.
+
+    The plan is not repeated here: it is part of the task body, which the
+    continuation prompt already includes.
+
+    Args:
+        cwd: Working directory (a git checkout for the diffstat and TODOs)
+        chunk_summaries: One summary per chunk run so far
+
+    Returns:
+        Markdown digest of the changed files, chunk summaries and TODOs
+    """
+    sections = ["# State So Far",
+                "You are continuing earlier work in a fresh session. This digest replaces the previous conversation."]
+
+    diffstat = git_diffstat(cwd)
+    sections.append(f"## Files Changed\n```\n{diffstat}\n```" if diffstat else "## Files Changed\nNo changes yet.")
+
+    if chunk_summaries:
+        progress = "\n\n".join(
+            f"### Chunk {i + 1}\n{_truncate(summary, MAX_SUMMARY_CHARS)}"
+            for i, summary in enumerate(chunk_summaries)
+        )
+        sections.append(f"## Progress\n{progress}")
+
+    todos = added_todos(cwd)
+    if todos:
+        sections.append("## Outstanding TODOs\n" + "\n".join(f"- {todo}" for todo in todos))
+
+    sections.append("Re-read any file before editing it; do not assume its contents from this digest.")
+    return "\n\n".join(sections)
@@ -0,0 +1,233 @@
+"""Commit, push and open the pull request for an agent run, in the runner's process.
+
+This replaces the workflow's shell steps (status check, commit, push, a separate
+PR description process, gh pr create). The agent's branch is created locally and
+only pushed once it has a commit. The PR description is written while the push
+is in flight, and the PR is opened through a pooled GitHubClient.
+"""
+
+import asyncio
+import json
+import os
+import re
+import subprocess
+from dataclasses import dataclass
+
+from budget import BudgetGovernor, BUDGET_HARD
+from change_tracker import ChangeSet
+from claude_runner import run_pr_description, PR_DESCRIPTION_FILE
+from github_api import GitHubClient
+from prompt_programs import PromptPrograms
+
+
+BRANCH_PREFIX = "agent/issue-"
+SLUG_WORDS = 5
+DEFAULT_REMOTE = "origin"
+# Commit identity used when the checkout has none configured
+BOT_NAME = "github-actions[bot]"
+BOT_EMAIL = "github-actions[bot]@users.noreply.github.com"
+
+
+class GitError(Exception):
+    """Raised when a git command fails."""
+
+
+@dataclass
+class FinaliseResult:
+    """Outcome of finalise_run.
+
+    Attributes:
+        branch: The agent's branch
+        commit: The commit made, or None when the agent changed nothing
+        pull_request_url: URL of the opened PR, or None if none was opened
+    """
+
+    branch: str
+    commit: str | None = None
+    pull_request_url: str | None = None
+
+
+def _git(cwd: str, *args: str, input: str | None = None) -> str:
+    result = subprocess.run(["git", *args], cwd=cwd, input=input, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise GitError(f"git {args[0]} failed: {result.stderr.strip() or result.stdout.strip()}")
+    return result.stdout.strip()
+
+
+def branch_name(issue_number: int, title: str) -> str:
+    """Return the agent branch for an issue: agent/issue-<number>-<first five title words>."""
+    words = re.sub(r"[^a-z0-9 ]", "", title.lower()).split()[:SLUG_WORDS]
+    slug = "-".join(words)
+    return f"{BRANCH_PREFIX}{issue_number}-{slug}" if slug else f"{BRANCH_PREFIX}{issue_number}"
+
+
+def current_branch(cwd: str) -> str:
+    """Return the checked-out branch."""
+    return _git(cwd, "rev-parse", "--abbrev-ref", "HEAD")
+
+
+def create_branch(cwd: str, issue_number: int, title: str) -> str:
+    """Create and check out the agent branch locally; nothing is pushed until finalise_run."""
+    branch = branch_name(issue_number, title)
+    _git(cwd, "checkout", "-B", branch)
+    return branch
+
+
+def _ignored_paths(cwd: str, paths: list[str]) -> set[str]:
+    """Return the paths git ignores (run state, caches, build output)."""
+    result = subprocess.run(
+        ["git", "check-ignore", "--stdin"], cwd=cwd, input="\n".join(paths), capture_output=True, text=True
+    )
+    return set(result.stdout.split())
+
+
+def stage_changes(cwd: str, changes: ChangeSet | None = None) -> bool:
+    """Stage the files the agent changed and return whether anything is staged.
+
+    Args:
+        cwd: Working directory
+        changes: The run's changes (see change_tracker); when None, the whole
+            working tree is staged
+
+    Returns:
+        True if there are staged changes to commit
+    """
+    if changes is None:
+        print("No recorded changes found, staging the whole working tree")
+        _git(cwd, "add", "-A")
+    else:
+        paths = [path for path in changes.paths if path not in _ignored_paths(cwd, changes.paths)]
+        if paths:
+            print(f"Staging {len(paths)} changed file(s) (+{changes.added_lines} -{changes.removed_lines}):")
+            print(changes.format_markdown())
+            _git(cwd, "add", "-A", "--", *paths)
+
+    return subprocess.run(["git", "diff", "--cached", "--quiet"], cwd=cwd).returncode != 0
+
+
+def commit_changes(cwd: str, title: str, issue_number: int) -> str:
+    """Commit the staged changes and return the commit hash."""
+    identity = []
+    if subprocess.run(["git", "config", "user.email"], cwd=cwd, capture_output=True).returncode != 0:
+        identity = ["-c", f"user.name={BOT_NAME}", "-c", f"user.email={BOT_EMAIL}"]
+    _git(cwd, *identity, "commit", "-q", "-m", f"feat: {title}", "-m", f"Closes #{issue_number}")
+    return _git(cwd, "rev-parse", "HEAD")
+
+
+async def push_branch(cwd: str, branch: str, remote: str = DEFAULT_REMOTE) -> None:
+    """Push the branch to the remote and set it as upstream.
+
+    Raises:
+        GitError: If the push fails
+    """
+    process = await asyncio.create_subprocess_exec(
+        "git", "push", "--set-upstream", remote, f"HEAD:refs/heads/{branch}",
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    stdout, _ = await process.communicate()
+    if process.returncode != 0:
+        raise GitError(f"git push failed: {stdout.decode(errors='replace').strip()}")
+    print(f"Pushed {branch} to {remote}")
+
+
+async def write_pr_description(
+    title: str,
+    body: str,
+    diff: str,
+    issue_number: int,
+    cwd: str,
+    budget: BudgetGovernor | None = None,
+    prompt_programs: PromptPrograms | None = None,
+    resume: bool = True,
+) -> str:
+    """Write the PR description (see run_pr_description) and return it.
+
+    Never raises: when the budget is exhausted or generation fails, the
+    description is just the closing line.
+    """
+    closes_line = f"Closes #{issue_number}"
+    if budget is not None and budget.state == BUDGET_HARD:
+        print("Budget hard limit reached, skipping PR description generation")
+        return closes_line
+
+    description_path = os.path.join(cwd, PR_DESCRIPTION_FILE)
+    try:
+        async for message in run_pr_description(
+            title, body, diff, issue_number, cwd, budget=budget, resume=resume, prompt_programs=prompt_programs
+        ):
+            print(json.dumps(message, default=str))
+    except Exception as e:
+        print(f"Error generating PR description: {e}")
+    if not os.path.exists(description_path):
+        return closes_line
+    with open(description_path) as f:
+        return f.read().strip() or closes_line
+
+
+async def finalise_run(
+    title: str,
+    body: str,
+    issue_number: int,
+    cwd: str,
+    branch: str,
+    base: str,
+    client: GitHubClient | None = None,
+    changes: ChangeSet | None = None,
+    budget: BudgetGovernor | None = None,
+    prompt_programs: PromptPrograms | None = None,
+    resume: bool = True,
+) -> FinaliseResult:
+    """Commit the agent's changes, push the branch and open the pull request.
+
+    Nothing is committed or pushed when the agent changed nothing. The PR
+    description is generated concurrently with the push; the PR is opened
+    once both are done.
+
+    Args:
+        title: Issue title, used for the commit and PR titles
+        body: Issue body
+        issue_number: Issue number the PR closes
+        cwd: Working directory, checked out on branch
+        branch: The agent branch (see create_branch)
+        base: Branch the PR merges into
+        client: GitHubClient for the repository; without one no PR is opened
+        changes: The run's changes to stage; None stages the whole tree
+        budget: Optional budget governor shared with the PR description
+        prompt_programs: Optional PromptPrograms for the PR description fallback
+        resume: Write the description by resuming the implementing session
+
+    Raises:
+        GitError: If committing or pushing fails
+    """
+    result = FinaliseResult(branch)
+    if not await asyncio.to_thread(stage_changes, cwd, changes):
+        print("::warning::Agent made no changes to the codebase")
+        return result
+
+    diff = await asyncio.to_thread(_git, cwd, "diff", "--cached")
+    print(await asyncio.to_thread(_git, cwd, "diff", "--cached", "--stat"))
+    result.commit = await asyncio.to_thread(commit_changes, cwd, title, issue_number)
+    print(f"Committed {result.commit[:12]} on {branch}")
+
+    pushed, description = await asyncio.gather(
+        push_branch(cwd, branch),
+        write_pr_description(title, body, diff, issue_number, cwd, budget, prompt_programs, resume),
+        return_exceptions=True,
+    )
+    if budget is not None:
+        budget.save(cwd)
+    if isinstance(pushed, BaseException):
+        raise pushed
+    if isinstance(description, BaseException):
+        description = f"Closes #{issue_number}"
+
+    if client is None:
+        print("No GitHub client, skipping pull request creation")
+        return result
+    pull_request = await client.create_pull_request(title, branch, base, description)
+    if pull_request is not None:
+        result.pull_request_url = pull_request.get("html_url")
+        print(f"Opened pull request {result.pull_request_url}")
+    return result
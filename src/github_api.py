@@ -1,7 +1,13 @@
-"""GitHub API helper functions for posting issue comments."""
+"""GitHub API helpers: issue comments, a pooled per-run client and per-issue run leases."""
 
-import httpx
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from typing import Optional
+from urllib.parse import quote
+
+import httpx
 
 
 async def post_issue_comment(
@@ -93,3 +99,346 @@ async def get_issue(
     except Exception as e:
         print(f"Unexpected error fetching GitHub issue: {e}")
         return None
+
+
+GITHUB_API_URL = "https://api.github.com"
+
+
+class GitHubClient:
+    """GitHub REST client for one repository that pools its connections.
+
+    Unlike the module-level helpers, which open a new connection per call, a
+    client keeps one httpx connection pool for all of a run's requests. Use it
+    as an async context manager, or call close() when done.
+    """
+
+    def __init__(
+        self,
+        owner: str,
+        repo: str,
+        token: str,
+        api_url: str = GITHUB_API_URL,
+        timeout: float = 30.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.owner = owner
+        self.repo = repo
+        self._client = httpx.AsyncClient(
+            base_url=api_url,
+            headers={
+                "Accept": "application/vnd.github.v3+json",
+                "Authorization": f"Bearer {token}",
+                "X-GitHub-Api-Version": "2022-11-28",
+            },
+            timeout=timeout,
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "GitHubClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        await self._client.aclose()
+
+    @property
+    def repo_path(self) -> str:
+        return f"/repos/{self.owner}/{self.repo}"
+
+    async def _request(self, action: str, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        """Send a request, returning None (after printing why) if it fails."""
+        try:
+            response = await self._client.request(method, path, **kwargs)
+            response.raise_for_status()
+            return response
+        except httpx.HTTPStatusError as e:
+            print(f"Error {action}: HTTP {e.response.status_code}")
+            print(f"Response: {e.response.text}")
+            return None
+        except httpx.RequestError as e:
+            print(f"Error {action}: {e}")
+            return None
+        except Exception as e:
+            print(f"Unexpected error {action}: {e}")
+            return None
+
+    async def create_pull_request(self, title: str, head: str, base: str, body: str) -> Optional[dict]:
+        """Open a pull request.
+
+        Args:
+            title: Pull request title
+            head: Branch with the changes
+            base: Branch to merge into
+            body: Pull request description (markdown supported)
+
+        Returns:
+            The pull request data if it was opened successfully, None otherwise
+        """
+        response = await self._request(
+            "creating pull request",
+            "POST",
+            f"{self.repo_path}/pulls",
+            json={"title": title, "head": head, "base": base, "body": body},
+        )
+        return response.json() if response is not None else None
+
+    async def get_issue(self, issue_number: int) -> Optional[dict]:
+        """Fetch an issue, or None on failure."""
+        response = await self._request("fetching GitHub issue", "GET", f"{self.repo_path}/issues/{issue_number}")
+        return response.json() if response is not None else None
+
+    async def list_issue_comments(self, issue_number: int) -> Optional[list[dict]]:
+        """Fetch all comments on an issue, oldest first, following pagination; None on failure."""
+        comments = []
+        url = f"{self.repo_path}/issues/{issue_number}/comments"
+        params = {"per_page": 100}
+        while url:
+            response = await self._request("listing GitHub comments", "GET", url, params=params)
+            if response is None:
+                return None
+            comments.extend(response.json())
+            # The next page URL already carries the query parameters
+            url, params = response.links.get("next", {}).get("url"), None
+        return comments
+
+    async def create_issue_comment(self, issue_number: int, body: str) -> Optional[dict]:
+        """Post a comment on an issue and return it, or None on failure."""
+        response = await self._request(
+            "posting GitHub comment", "POST", f"{self.repo_path}/issues/{issue_number}/comments", json={"body": body}
+        )
+        return response.json() if response is not None else None
+
+    async def update_issue_comment(self, comment_id: int, body: str) -> bool:
+        """Replace the body of an issue comment. Returns True if it was updated."""
+        response = await self._request(
+            "updating GitHub comment", "PATCH", f"{self.repo_path}/issues/comments/{comment_id}", json={"body": body}
+        )
+        return response is not None
+
+    async def delete_issue_comment(self, comment_id: int) -> bool:
+        """Delete an issue comment. Returns True if it was deleted."""
+        response = await self._request(
+            "deleting GitHub comment", "DELETE", f"{self.repo_path}/issues/comments/{comment_id}"
+        )
+        return response is not None
+
+    async def add_labels(self, issue_number: int, labels: list[str]) -> bool:
+        """Add labels to an issue. Returns True on success."""
+        response = await self._request(
+            "adding labels", "POST", f"{self.repo_path}/issues/{issue_number}/labels", json={"labels": labels}
+        )
+        return response is not None
+
+    async def remove_label(self, issue_number: int, label: str) -> bool:
+        """Remove a label from an issue. Returns True on success."""
+        response = await self._request(
+            "removing label", "DELETE", f"{self.repo_path}/issues/{issue_number}/labels/{quote(label, safe='')}"
+        )
+        return response is not None
+
+    async def swap_labels(self, issue_number: int, remove: list[str], add: list[str]) -> bool:
+        """Remove the issue's labels in remove and add those in add. Returns True if the labels were added."""
+        issue = await self.get_issue(issue_number)
+        present = {label["name"] for label in (issue or {}).get("labels", [])}
+        for label in remove:
+            if label in present:
+                await self.remove_label(issue_number, label)
+        return await self.add_labels(issue_number, add) if add else True
+
+
+# Issue labels driving the agent workflows, and the state labels each run moves through
+LABEL_PLAN = "ai:plan"
+LABEL_PLANNING = "ai:planning"
+LABEL_PLANNED = "ai:planned"
+LABEL_PLAN_FAILED = "ai:plan-failed"
+LABEL_IMPLEMENT = "ai:implement"
+LABEL_IN_PROGRESS = "ai:in-progress"
+LABEL_COMPLETED = "ai:completed"
+LABEL_FAILED = "ai:failed"
+
+
+async def swap_issue_labels(
+    owner: str, repo: str, issue_number: int, token: str, remove: list[str], add: list[str]
+) -> bool:
+    """Swap an issue's labels (see GitHubClient.swap_labels) with a short-lived client."""
+    async with GitHubClient(owner, repo, token) as client:
+        return await client.swap_labels(issue_number, remove, add)
+
+
+LEASE_PATTERN = re.compile(r"<!-- agent-run-lease run_id=(\S+) expires_at=(\d+) -->")
+DEFAULT_LEASE_SECONDS = 7200
+
+
+class LeaseError(Exception):
+    """Raised when a lease cannot be claimed because the GitHub API failed."""
+
+
+@dataclass
+class RunLease:
+    """An agent run's claim on an issue.
+
+    Attributes:
+        issue_number: The claimed issue
+        run_id: Id of the run holding the lease (e.g. GITHUB_RUN_ID)
+        comment_id: Id of the lease comment
+        expires_at: Unix time after which other runs may take the issue over
+    """
+
+    issue_number: int
+    run_id: str
+    comment_id: int
+    expires_at: int
+
+
+def format_lease_comment(run_id: str, expires_at: int) -> str:
+    """Format a lease comment: a visible note plus a machine-readable marker."""
+    expires = datetime.fromtimestamp(expires_at, timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    return (
+        f"🔒 Agent run `{run_id}` is working on this issue (lease expires {expires}).\n\n"
+        f"<!-- agent-run-lease run_id={run_id} expires_at={expires_at} -->"
+    )
+
+
+def parse_lease_comment(comment: dict) -> Optional[tuple[str, int]]:
+    """Return (run_id, expires_at) from a lease comment, or None for any other comment."""
+    match = LEASE_PATTERN.search(comment.get("body") or "")
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+async def _live_leases(client: GitHubClient, issue_number: int, now: float) -> list[RunLease]:
+    comments = await client.list_issue_comments(issue_number)
+    if comments is None:
+        raise LeaseError(f"could not list comments on issue #{issue_number}")
+    leases = []
+    for comment in comments:
+        parsed = parse_lease_comment(comment)
+        if parsed is not None and parsed[1] > now:
+            leases.append(RunLease(issue_number, parsed[0], comment["id"], parsed[1]))
+    return leases
+
+
+async def claim_run_lease(
+    client: GitHubClient,
+    issue_number: int,
+    run_id: str,
+    claim_label: str,
+    trigger_label: Optional[str] = None,
+    lease_seconds: int = DEFAULT_LEASE_SECONDS,
+) -> Optional[RunLease]:
+    """Claim an issue for one agent run, so duplicate triggers back off.
+
+    GitHub has no atomic label update, so the claim is a compare-and-set
+    decided by lease comments. If the issue already has claim_label and a live
+    lease held by another run, the claim fails at once without writing
+    anything. Otherwise the run posts a lease comment, and the live lease with
+    the lowest comment id wins: ids are assigned in order by GitHub, so
+    concurrent claimers all agree on the winner. Losers delete their comment.
+    The winner swaps trigger_label for claim_label. Expired leases (from runs
+    that died without releasing) are ignored.
+
+    Args:
+        client: GitHubClient for the repository
+        issue_number: Issue to claim
+        run_id: Id of this run; a re-run with the same id reclaims its lease
+        claim_label: Label marking the issue as being worked on (e.g. ai:in-progress)
+        trigger_label: Optional label that started the run, removed on success
+        lease_seconds: How long the lease holds without being released
+
+    Returns:
+        The lease if this run won the issue, None if another run holds it
+
+    Raises:
+        LeaseError: If the GitHub API fails, so the outcome is unknown
+    """
+    issue = await client.get_issue(issue_number)
+    if issue is None:
+        raise LeaseError(f"could not fetch issue #{issue_number}")
+    labels = {label["name"] for label in issue.get("labels", [])}
+
+    if claim_label in labels:
+        held = [lease for lease in await _live_leases(client, issue_number, time.time()) if lease.run_id != run_id]
+        if held:
+            print(f"Issue #{issue_number} is already claimed by run {held[0].run_id}")
+            return None
+
+    expires_at = int(time.time()) + lease_seconds
+    comment = await client.create_issue_comment(issue_number, format_lease_comment(run_id, expires_at))
+    if comment is None:
+        raise LeaseError(f"could not post a lease comment on issue #{issue_number}")
+
+    leases = await _live_leases(client, issue_number, time.time())
+    winner = min(leases, key=lambda lease: lease.comment_id, default=None)
+    if winner is None or winner.run_id != run_id:
+        await client.delete_issue_comment(comment["id"])
+        print(f"Issue #{issue_number} was claimed by run {winner.run_id if winner else 'unknown'}")
+        return None
+    if winner.comment_id != comment["id"]:
+        # A re-run of the same run already holds the lease
+        await client.delete_issue_comment(comment["id"])
+
+    if not await client.add_labels(issue_number, [claim_label]):
+        raise LeaseError(f"could not add {claim_label} to issue #{issue_number}")
+    if trigger_label and trigger_label in labels:
+        await client.remove_label(issue_number, trigger_label)
+    print(f"Claimed issue #{issue_number} for run {run_id} until {winner.expires_at}")
+    return winner
+
+
+async def release_run_lease(client: GitHubClient, issue_number: int, run_id: str) -> bool:
+    """Delete the run's lease comments so a later trigger can claim the issue.
+
+    Labels are left alone; the workflow sets the final labels.
+
+    Returns:
+        True if every lease comment of the run was deleted
+    """
+    comments = await client.list_issue_comments(issue_number)
+    if comments is None:
+        return False
+    released = True
+    for comment in comments:
+        parsed = parse_lease_comment(comment)
+        if parsed is not None and parsed[0] == run_id:
+            released = await client.delete_issue_comment(comment["id"]) and released
+    return released
+
+
+PLAN_HEADER = "## 🤖 Implementation Plan"
+# The plan runs from the header to the comment's footer (a rule or the next steps)
+PLAN_PATTERN = re.compile(re.escape(PLAN_HEADER) + r"\n\n([\s\S]*?)(?:\n\n---|\n\n\*\*Next steps)")
+
+
+def format_plan_comment(plan: str) -> str:
+    """Format a plan as the plan comment the plan workflow posts."""
+    return (
+        f"{PLAN_HEADER}\n\n{plan}\n\n---\n\n**Next steps:**\n"
+        "- Comment `/apply` to start implementation based on this plan\n"
+        "- Comment `/close` to close this issue and cancel the plan"
+    )
+
+
+def extract_plan(comment_body: str) -> Optional[str]:
+    """Return the plan from a plan comment's body, or None if it has none."""
+    match = PLAN_PATTERN.search(comment_body or "")
+    return match.group(1).strip() if match else None
+
+
+async def fetch_plan(client: GitHubClient, issue_number: int) -> Optional[str]:
+    """Return the plan from the issue's first plan comment, or None (also on failure)."""
+    comments = await client.list_issue_comments(issue_number)
+    for comment in comments or []:
+        plan = extract_plan(comment.get("body") or "")
+        if plan is not None:
+            return plan
+    return None
+
+
+async def fetch_issue_plan(owner: str, repo: str, issue_number: int, token: str) -> Optional[str]:
+    """Fetch an issue's plan (see fetch_plan) with a short-lived client."""
+    async with GitHubClient(owner, repo, token) as client:
+        return await fetch_plan(client, issue_number)
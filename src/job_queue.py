@@ -0,0 +1,459 @@
+"""Concurrency-limited async job queue for plan and implement runs, persisted to SQLite."""
+
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from change_tracker import ChangeTracker
+from claude_runner import CancellationToken, PLAN_FILE, run_claude_chunked, run_claude_plan_chunked
+from finalise import GitError, commit_changes, create_branch, current_branch, finalise_run, stage_changes
+from github_api import (
+    LABEL_COMPLETED,
+    LABEL_FAILED,
+    LABEL_IN_PROGRESS,
+    LABEL_PLAN_FAILED,
+    LABEL_PLANNED,
+    LABEL_PLANNING,
+    GitHubClient,
+    format_plan_comment,
+)
+
+
+JOB_PLAN = "plan"
+JOB_IMPLEMENT = "implement"
+JOB_KINDS = (JOB_PLAN, JOB_IMPLEMENT)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+DEFAULT_DB_PATH = Path.home() / ".cache" / "rome" / "jobs.db"
+DEFAULT_WORKTREE_DIR = Path.home() / ".cache" / "rome" / "worktrees"
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_PER_REPO_LIMIT = 1
+DEFAULT_POLL_INTERVAL = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    repo TEXT NOT NULL,
+    issue_number INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    title TEXT NOT NULL,
+    body TEXT NOT NULL DEFAULT '',
+    cwd TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+"""
+
+
+@dataclass
+class Job:
+    """A queued plan or implement request for one issue."""
+
+    id: int
+    repo: str
+    issue_number: int
+    kind: str
+    title: str
+    body: str
+    cwd: str | None
+    priority: int
+    status: str
+    created_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+
+
+def default_db_path() -> Path:
+    """Return the queue database path (JOB_QUEUE_DB or ~/.cache/rome/jobs.db)."""
+    return Path(os.environ.get("JOB_QUEUE_DB") or DEFAULT_DB_PATH)
+
+
+def default_worktree_dir() -> Path:
+    """Return the directory job worktrees are created in (JOB_WORKTREE_DIR or ~/.cache/rome/worktrees)."""
+    return Path(os.environ.get("JOB_WORKTREE_DIR") or DEFAULT_WORKTREE_DIR)
+
+
+class JobStore:
+    """SQLite persistence for jobs."""
+
+    def __init__(self, path: str | Path = ":memory:"):
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path), isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        if str(path) != ":memory:":
+            # Lets the CLI read while a worker process writes
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _job(self, row: sqlite3.Row | None) -> Job | None:
+        return Job(**dict(row)) if row is not None else None
+
+    def get(self, job_id: int) -> Job | None:
+        return self._job(self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def find_active(self, repo: str, issue_number: int, kind: str) -> Job | None:
+        """Return the queued or running job for this issue and kind, if any."""
+        row = self.conn.execute(
+            "SELECT * FROM jobs WHERE repo = ? AND issue_number = ? AND kind = ? AND status IN (?, ?)",
+            (repo, issue_number, kind, *ACTIVE_STATUSES),
+        ).fetchone()
+        return self._job(row)
+
+    def add(
+        self,
+        repo: str,
+        issue_number: int,
+        kind: str,
+        title: str,
+        body: str = "",
+        cwd: str | None = None,
+        priority: int = 0,
+    ) -> tuple[Job, bool]:
+        """Add a job unless an identical one is active. Returns (job, created)."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        # BEGIN IMMEDIATE makes the duplicate check and insert atomic across processes
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = self.find_active(repo, issue_number, kind)
+            if existing is not None:
+                self.conn.execute("COMMIT")
+                return existing, False
+            cursor = self.conn.execute(
+                "INSERT INTO jobs (repo, issue_number, kind, title, body, cwd, priority, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (repo, issue_number, kind, title, body or "", cwd, priority, STATUS_QUEUED, time.time()),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return self.get(cursor.lastrowid), True
+
+    def active_for_issue(self, repo: str, issue_number: int) -> list[Job]:
+        """Return queued and running jobs of any kind for an issue."""
+        rows = self.conn.execute(
+            "SELECT * FROM jobs WHERE repo = ? AND issue_number = ? AND status IN (?, ?) ORDER BY id",
+            (repo, issue_number, *ACTIVE_STATUSES),
+        ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def queued(self) -> list[Job]:
+        """Return queued jobs, highest priority first, then oldest first."""
+        rows = self.conn.execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY priority DESC, created_at, id",
+            (STATUS_QUEUED,),
+        ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def list(self, limit: int = 50) -> list[Job]:
+        rows = self.conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def set_status(self, job_id: int, status: str, error: str | None = None) -> None:
+        now = time.time()
+        if status == STATUS_RUNNING:
+            self.conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (status, now, job_id))
+        else:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                (status, now, error, job_id),
+            )
+
+    def requeue_interrupted(self) -> int:
+        """Put jobs left running by a crashed worker back in the queue."""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?",
+            (STATUS_QUEUED, STATUS_RUNNING),
+        )
+        return cursor.rowcount
+
+
+def pick_next_job(
+    queued: list[Job],
+    running_per_repo: dict[str, int],
+    repo_limit: Callable[[str], int],
+    last_kind: str | None,
+) -> Job | None:
+    """Choose the next job to start.
+
+    Only jobs whose repository is under its concurrency cap are eligible. The
+    highest priority wins; within that priority, plan and implement jobs
+    alternate so neither kind starves the other; otherwise oldest first.
+    """
+    eligible = [job for job in queued if running_per_repo.get(job.repo, 0) < repo_limit(job.repo)]
+    if not eligible:
+        return None
+
+    top_priority = eligible[0].priority
+    tier = [job for job in eligible if job.priority == top_priority]
+    if last_kind is not None:
+        for job in tier:
+            if job.kind != last_kind:
+                return job
+    return tier[0]
+
+
+def add_worktree(checkout: str, job: Job, root: Path | None = None) -> str:
+    """Add a detached worktree of the checkout's HEAD for one job and return its path.
+
+    Jobs for the same repository never share a working tree, so they can run
+    concurrently and never build on each other's uncommitted changes.
+
+    Raises:
+        GitError: If the checkout is not a git repository
+    """
+    path = (root or default_worktree_dir()) / job.repo.replace("/", "-") / f"job-{job.id}"
+    # Left behind by a worker that crashed while running this job
+    remove_worktree(checkout, str(path))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    result = subprocess.run(
+        ["git", "worktree", "add", "--detach", str(path), "HEAD"], cwd=checkout, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise GitError(f"git worktree add failed: {result.stderr.strip()}")
+    return str(path)
+
+
+def remove_worktree(checkout: str, path: str) -> None:
+    """Remove a job worktree; its branch and commits stay in the repository."""
+    subprocess.run(["git", "worktree", "remove", "--force", path], cwd=checkout, capture_output=True)
+    shutil.rmtree(path, ignore_errors=True)
+    subprocess.run(["git", "worktree", "prune"], cwd=checkout, capture_output=True)
+
+
+async def _finish_implement(job: Job, cwd: str, branch: str, base: str, tracker: ChangeTracker, token: str | None):
+    if token is None:
+        # Without a token nothing is pushed, but the work is kept on the local branch
+        if await asyncio.to_thread(stage_changes, cwd, tracker.cumulative()):
+            commit = await asyncio.to_thread(commit_changes, cwd, job.title, job.issue_number)
+            print(f"Job {job.id}: no GITHUB_TOKEN, committed {commit[:12]} on local branch {branch}")
+        return
+    owner, _, name = job.repo.partition("/")
+    async with GitHubClient(owner, name, token) as client:
+        result = await finalise_run(
+            job.title, job.body, job.issue_number, cwd, branch, base, client, changes=tracker.cumulative()
+        )
+    if result.commit is not None and result.pull_request_url is None:
+        raise RuntimeError("Could not open the pull request")
+
+
+async def _finish_plan(job: Job, cwd: str, token: str | None):
+    plan_path = Path(cwd) / PLAN_FILE
+    if not plan_path.exists():
+        raise RuntimeError("No plan was written")
+    plan = plan_path.read_text().strip()
+    if token is None:
+        print(f"Job {job.id}: no GITHUB_TOKEN, plan not posted:\n{plan}")
+        return
+    owner, _, name = job.repo.partition("/")
+    async with GitHubClient(owner, name, token) as client:
+        if await client.create_issue_comment(job.issue_number, format_plan_comment(plan)) is None:
+            raise RuntimeError("Could not post the plan comment")
+
+
+async def _label_outcome(job: Job, token: str | None, succeeded: bool):
+    """Replace the issue's in-progress label with the outcome label, as the workflows do."""
+    if not token:
+        return
+    if job.kind == JOB_PLAN:
+        remove, add = LABEL_PLANNING, LABEL_PLANNED if succeeded else LABEL_PLAN_FAILED
+    else:
+        remove, add = LABEL_IN_PROGRESS, LABEL_COMPLETED if succeeded else LABEL_FAILED
+    owner, _, name = job.repo.partition("/")
+    async with GitHubClient(owner, name, token) as client:
+        await client.swap_labels(job.issue_number, [remove], [add])
+
+
+async def run_job(
+    job: Job,
+    cancel_token: CancellationToken,
+    github_token: str | None = None,
+    worktree_dir: Path | None = None,
+) -> None:
+    """Default job runner: drive the plan or implement chunked runner in a worktree of its own.
+
+    Implement jobs work on the agent branch; their changes are committed, pushed
+    and opened as a pull request as in the implement workflow (see
+    finalise.finalise_run). Plan jobs post the plan as the issue's plan comment.
+    Without a token (github_token, PR_TOKEN or GITHUB_TOKEN) commits stay on
+    the local branch and plans are only printed. The worktree is removed afterwards.
+    """
+    checkout = job.cwd or os.getcwd()
+    token = github_token or os.environ.get("PR_TOKEN") or os.environ.get("GITHUB_TOKEN")
+    cwd = await asyncio.to_thread(add_worktree, checkout, job, worktree_dir)
+    try:
+        if job.kind == JOB_PLAN:
+            async for message in run_claude_plan_chunked(job.title, job.body, cwd, cancel_token=cancel_token):
+                print(json.dumps({"job": job.id, "message": message}, default=str))
+            if not cancel_token.cancelled:
+                await _finish_plan(job, cwd, token)
+                await _label_outcome(job, token, succeeded=True)
+            return
+
+        base = await asyncio.to_thread(current_branch, checkout)
+        branch = await asyncio.to_thread(create_branch, cwd, job.issue_number, job.title)
+        tracker = ChangeTracker(cwd)
+        async for message in run_claude_chunked(
+            job.title, job.body, cwd, cancel_token=cancel_token, change_tracker=tracker
+        ):
+            print(json.dumps({"job": job.id, "message": message}, default=str))
+        if not cancel_token.cancelled:
+            await _finish_implement(job, cwd, branch, base, tracker, token)
+            await _label_outcome(job, token, succeeded=True)
+    except Exception:
+        await _label_outcome(job, token, succeeded=False)
+        raise
+    finally:
+        await asyncio.to_thread(remove_worktree, checkout, cwd)
+
+
+class JobQueue:
+    """Dispatches queued jobs to runners under global and per-repo concurrency caps."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        runner: Callable[[Job, CancellationToken], Awaitable[None]] = run_job,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        per_repo_limit: int = DEFAULT_PER_REPO_LIMIT,
+        repo_limits: dict[str, int] | None = None,
+    ):
+        self.store = store
+        self.runner = runner
+        self.max_concurrency = max_concurrency
+        self.per_repo_limit = per_repo_limit
+        self.repo_limits = repo_limits or {}
+        self.running: dict[int, asyncio.Task] = {}
+        self._tokens: dict[int, CancellationToken] = {}
+        self._running_jobs: dict[int, Job] = {}
+        self._last_kind: str | None = None
+        self._wakeup = asyncio.Event()
+
+    def repo_limit(self, repo: str) -> int:
+        return self.repo_limits.get(repo, self.per_repo_limit)
+
+    def submit(
+        self,
+        repo: str,
+        issue_number: int,
+        kind: str,
+        title: str,
+        body: str = "",
+        cwd: str | None = None,
+        priority: int = 0,
+    ) -> tuple[Job, bool]:
+        """Queue a job (deduplicated per issue and kind) and wake the dispatcher."""
+        job, created = self.store.add(repo, issue_number, kind, title, body, cwd, priority)
+        if created:
+            self._wakeup.set()
+        return job, created
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued or running job. Returns False if it was not active.
+
+        Running jobs are cancelled cooperatively through their CancellationToken,
+        so the runner still closes its stream and reports partial results.
+        """
+        job = self.store.get(job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return False
+        token = self._tokens.get(job_id)
+        if token is not None:
+            token.cancel()
+        else:
+            self.store.set_status(job_id, STATUS_CANCELLED)
+        return True
+
+    def _running_per_repo(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for job in self._running_jobs.values():
+            counts[job.repo] = counts.get(job.repo, 0) + 1
+        return counts
+
+    def _sync_cancellations(self) -> None:
+        # Jobs cancelled in the database by another process (e.g. the CLI)
+        for job_id, token in list(self._tokens.items()):
+            job = self.store.get(job_id)
+            if job is not None and job.status == STATUS_CANCELLED:
+                token.cancel()
+
+    def _dispatch(self) -> None:
+        while len(self.running) < self.max_concurrency:
+            job = pick_next_job(self.store.queued(), self._running_per_repo(), self.repo_limit, self._last_kind)
+            if job is None:
+                return
+            self._last_kind = job.kind
+            self.store.set_status(job.id, STATUS_RUNNING)
+            self._running_jobs[job.id] = job
+            self._tokens[job.id] = CancellationToken()
+            self.running[job.id] = asyncio.create_task(self._execute(job, self._tokens[job.id]))
+
+    async def _execute(self, job: Job, cancel_token: CancellationToken) -> None:
+        try:
+            await self.runner(job, cancel_token)
+            status = STATUS_CANCELLED if cancel_token.cancelled else STATUS_SUCCEEDED
+            self.store.set_status(job.id, status)
+        except asyncio.CancelledError:
+            self.store.set_status(job.id, STATUS_CANCELLED)
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            self.store.set_status(job.id, STATUS_FAILED, str(e))
+        finally:
+            self.running.pop(job.id, None)
+            self._running_jobs.pop(job.id, None)
+            self._tokens.pop(job.id, None)
+            self._wakeup.set()
+
+    async def run(self, stop_when_idle: bool = False, poll_interval: float = DEFAULT_POLL_INTERVAL) -> None:
+        """Dispatch jobs until cancelled (or, with stop_when_idle, until the queue drains).
+
+        Args:
+            stop_when_idle: Return once nothing is queued or running
+            poll_interval: Seconds between database checks for jobs submitted
+                or cancelled by other processes
+        """
+        recovered = self.store.requeue_interrupted()
+        if recovered:
+            print(f"Requeued {recovered} job(s) interrupted by a previous worker")
+
+        try:
+            while True:
+                self._wakeup.clear()
+                self._sync_cancellations()
+                self._dispatch()
+                if stop_when_idle and not self.running and not self.store.queued():
+                    return
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for token in list(self._tokens.values()):
+                token.cancel()
+            if self.running:
+                await asyncio.gather(*self.running.values(), return_exceptions=True)
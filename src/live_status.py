@@ -0,0 +1,149 @@
+"""Live status comment that follows the agent's tool use as messages arrive."""
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+from claude_agent_sdk.types import AssistantMessage, ToolUseBlock
+
+from claude_runner import describe_tool_use
+from github_api import GitHubClient
+
+
+DEFAULT_MIN_INTERVAL = 10.0
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_MAX_LINES = 12
+
+
+def status_lines(message) -> list[str]:
+    """Turn one SDK message into short status lines (no LLM involved)."""
+    if not isinstance(message, AssistantMessage):
+        return []
+    lines = []
+    for block in message.content:
+        if isinstance(block, ToolUseBlock):
+            description = describe_tool_use(block.name, block.input)
+            if description:
+                lines.append(description)
+    return lines
+
+
+def format_status(lines: list[str], actions: int, title: str, footer: str | None = None) -> str:
+    """Render the live status comment body."""
+    recent = "\n".join(f"- {line}" for line in lines) if lines else "- Starting up..."
+    footer = footer or "*Updates live while the agent works. Progress summaries follow after each chunk.*"
+    return f"""## 🤖 {title}
+
+**{actions} action(s) so far.** Most recent:
+
+{recent}
+
+---
+{footer}"""
+
+
+class LiveStatus:
+    """Debounced, rate-limited status updates built from tool-use messages.
+
+    observe() is cheap and never blocks on the network: publishing happens in
+    a background task once activity has been quiet for `debounce` seconds, and
+    never more often than once every `min_interval` seconds. Steady activity
+    cannot hold an update back for longer than `min_interval` after the first
+    unpublished change.
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[str], Awaitable[None]],
+        title: str = "Agent is working",
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+        debounce: float = DEFAULT_DEBOUNCE,
+        max_lines: int = DEFAULT_MAX_LINES,
+    ):
+        self.publish = publish
+        self.title = title
+        self.min_interval = min_interval
+        self.debounce = debounce
+        self.lines: deque[str] = deque(maxlen=max_lines)
+        self.actions = 0
+        self.publishes = 0
+        self._last_activity = 0.0
+        self._first_unpublished = 0.0
+        self._last_publish: float | None = None
+        self._pending: asyncio.Task | None = None
+        self._publishing = False
+        self._dirty = False
+
+    def render(self, footer: str | None = None) -> str:
+        return format_status(list(self.lines), self.actions, self.title, footer)
+
+    def observe(self, message) -> None:
+        """Record a message and schedule a status update if it used a tool."""
+        lines = status_lines(message)
+        if not lines:
+            return
+        self.lines.extend(lines)
+        self.actions += len(lines)
+        self._last_activity = time.monotonic()
+        if not self._dirty:
+            self._first_unpublished = self._last_activity
+        self._dirty = True
+        if self._pending is None or self._pending.done():
+            self._pending = asyncio.create_task(self._flush_when_due())
+
+    def _next_publish_time(self) -> float:
+        # Debounce, but publish within min_interval of the first unpublished change
+        due = min(self._last_activity + self.debounce, self._first_unpublished + self.min_interval)
+        if self._last_publish is not None:
+            due = max(due, self._last_publish + self.min_interval)
+        return due
+
+    async def _flush_when_due(self) -> None:
+        # New activity pushes the debounce deadline back, so re-check after each sleep
+        while (delay := self._next_publish_time() - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        await self._publish()
+
+    async def _publish(self, footer: str | None = None) -> None:
+        self._dirty = False
+        self._last_publish = time.monotonic()
+        self.publishes += 1
+        self._publishing = True
+        try:
+            await self.publish(self.render(footer))
+        except Exception as e:
+            print(f"Error updating live status: {e}")
+        finally:
+            self._publishing = False
+
+    async def close(self, footer: str | None = None) -> None:
+        """Cancel any scheduled update and publish the final state once.
+
+        An update already being published is awaited, not cancelled: a
+        cancelled comment create could leave a second comment behind.
+
+        Args:
+            footer: Replacement footer for the final update, e.g. "Finished"
+        """
+        if self._pending is not None and not self._pending.done():
+            if not self._publishing:
+                self._pending.cancel()
+            await asyncio.gather(self._pending, return_exceptions=True)
+        if self._dirty or footer:
+            await self._publish(footer)
+
+
+def github_comment_publisher(client: GitHubClient, issue_number: int) -> Callable[[str], Awaitable[None]]:
+    """Publish by creating one issue comment, then editing it in place (the caller closes client)."""
+    comment_id: int | None = None
+
+    async def publish(body: str) -> None:
+        nonlocal comment_id
+        if comment_id is None:
+            comment = await client.create_issue_comment(issue_number, body)
+            comment_id = comment["id"] if comment else None
+        else:
+            await client.update_issue_comment(comment_id, body)
+
+    return publish
@@ -0,0 +1,112 @@
+"""Compact records of SDK messages, so runners never hold large tool results."""
+
+from collections import deque
+from dataclasses import dataclass
+
+from claude_agent_sdk.types import (
+    AssistantMessage,
+    ResultMessage,
+    SystemMessage,
+    TextBlock,
+    ToolResultBlock,
+    ToolUseBlock,
+    UserMessage,
+)
+
+
+ROLE_ASSISTANT = "assistant"
+ROLE_TOOL_RESULT = "tool_result"
+ROLE_USER = "user"
+ROLE_SYSTEM = "system"
+ROLE_RESULT = "result"
+ROLE_OTHER = "other"
+
+PREVIEW_CHARS = 500
+PARAM_CHARS = 200
+DEFAULT_HISTORY_SIZE = 200
+
+
+@dataclass(slots=True)
+class MessageRecord:
+    """One content block of an SDK message, reduced to what the runners use.
+
+    Attributes:
+        role: ROLE_* constant
+        tool_name: Tool name for tool calls, else None
+        tool_input: Tool call parameters with long strings truncated
+        size: Length in characters of the original text or tool result
+        preview: Truncated text (assistant text, tool result or final result)
+    """
+
+    role: str
+    tool_name: str | None = None
+    tool_input: dict | None = None
+    size: int = 0
+    preview: str = ""
+
+
+def _truncate(text: str, limit: int) -> str:
+    # Slicing copies only `limit` characters, so the original can be freed
+    return text if len(text) <= limit else text[:limit]
+
+
+def _compact_input(tool_input: dict) -> dict:
+    return {
+        key: _truncate(value, PARAM_CHARS) if isinstance(value, str) else value
+        for key, value in tool_input.items()
+        if isinstance(value, (str, int, float, bool)) or value is None
+    }
+
+
+def _result_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(item.get("text", "") for item in content if isinstance(item, dict))
+    return ""
+
+
+def compact_message(message) -> list[MessageRecord]:
+    """Convert one SDK message into compact records (one per content block)."""
+    if isinstance(message, AssistantMessage):
+        records = []
+        for block in message.content:
+            if isinstance(block, ToolUseBlock):
+                records.append(MessageRecord(ROLE_ASSISTANT, block.name, _compact_input(block.input)))
+            elif isinstance(block, TextBlock):
+                records.append(MessageRecord(ROLE_ASSISTANT, size=len(block.text),
+                                             preview=_truncate(block.text, PREVIEW_CHARS)))
+        return records
+    if isinstance(message, UserMessage):
+        if isinstance(message.content, str):
+            return [MessageRecord(ROLE_USER, size=len(message.content),
+                                  preview=_truncate(message.content, PREVIEW_CHARS))]
+        records = []
+        for block in message.content:
+            if isinstance(block, ToolResultBlock):
+                text = _result_text(block.content)
+                records.append(MessageRecord(ROLE_TOOL_RESULT, size=len(text),
+                                             preview=_truncate(text, PREVIEW_CHARS)))
+        return records
+    if isinstance(message, SystemMessage):
+        return [MessageRecord(ROLE_SYSTEM, preview=message.subtype)]
+    if isinstance(message, ResultMessage):
+        text = message.result or ""
+        return [MessageRecord(ROLE_RESULT, size=len(text), preview=_truncate(text, PREVIEW_CHARS))]
+    return [MessageRecord(ROLE_OTHER, preview=_truncate(str(message), PREVIEW_CHARS))]
+
+
+def compact_messages(messages) -> list[MessageRecord]:
+    """Compact a sequence that may mix SDK messages and existing records."""
+    records = []
+    for message in messages:
+        if isinstance(message, MessageRecord):
+            records.append(message)
+        else:
+            records.extend(compact_message(message))
+    return records
+
+
+def message_history(maxlen: int = DEFAULT_HISTORY_SIZE) -> deque:
+    """Ring buffer for a chunk's records; the oldest are dropped past maxlen."""
+    return deque(maxlen=maxlen)
@@ -0,0 +1,255 @@
+"""Speculative parallel planning: several short planning sessions, best plan wins."""
+
+import asyncio
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from budget import BudgetGovernor, BUDGET_HARD
+from code_search import CodeSearchIndex
+from symbol_index import SymbolIndex
+from claude_runner import (
+    build_plan_prompt,
+    run_claude,
+    stream_until,
+    extract_session_id,
+    route_for,
+    CancellationToken,
+    StreamInterrupted,
+    PLAN_FILE,
+    CALL_PLAN,
+)
+
+
+DEFAULT_PLAN_CANDIDATES = 3
+DEFAULT_CANDIDATE_TURNS = 12
+
+# Exploration focuses handed out to candidates in order (wrapping around)
+PLAN_FOCUSES = [
+    "the modules and entry points most directly affected by the issue",
+    "the existing tests and how similar features are tested",
+    "configuration, data flow and edge cases the change could break",
+    "similar existing features whose patterns the change should follow",
+]
+
+_STEP_PATTERN = re.compile(r"^\s*\d+[.)]\s+\S", re.MULTILINE)
+_PATH_PATTERN = re.compile(r"[\w./-]+\.[A-Za-z0-9]{1,6}\b")
+
+
+@dataclass
+class PlanCandidate:
+    """A plan produced by one planning session, with its ranking heuristics."""
+
+    index: int
+    focus: str
+    plan_file_name: str
+    text: str = ""
+    files: set[str] = field(default_factory=set)
+    steps: int = 0
+
+    @property
+    def score(self) -> tuple[int, int]:
+        """Ranking key: plans covering more real files, then with more steps, win."""
+        return (len(self.files), self.steps)
+
+
+def candidate_plan_file(index: int) -> str:
+    """Return the plan file name used by candidate index."""
+    return f".plan-candidate-{index + 1}.md"
+
+
+def count_plan_steps(plan_text: str) -> int:
+    """Count numbered list items in a plan."""
+    return len(_STEP_PATTERN.findall(plan_text))
+
+
+def find_plan_files(plan_text: str, cwd: str) -> set[str]:
+    """Return the repository files mentioned in a plan, relative to cwd.
+
+    Only paths that exist in the working tree are counted, so invented paths
+    do not improve a plan's score.
+    """
+    root = Path(cwd)
+    files = set()
+    for match in _PATH_PATTERN.findall(plan_text):
+        if os.path.isabs(match):
+            candidate = os.path.relpath(match, root)
+        else:
+            candidate = match.removeprefix("./")
+        if candidate.startswith(".."):
+            continue
+        if (root / candidate).is_file():
+            files.add(candidate)
+    return files
+
+
+def score_plan(candidate: PlanCandidate, cwd: str) -> PlanCandidate:
+    """Fill in the candidate's text, files and step count from its plan file."""
+    plan_path = Path(cwd) / candidate.plan_file_name
+    if plan_path.exists():
+        candidate.text = plan_path.read_text()
+        candidate.files = find_plan_files(candidate.text, cwd)
+        candidate.steps = count_plan_steps(candidate.text)
+    return candidate
+
+
+def rank_plans(candidates: list[PlanCandidate]) -> list[PlanCandidate]:
+    """Return candidates that produced a plan, best first (ties keep launch order)."""
+    produced = [c for c in candidates if c.text.strip()]
+    return sorted(produced, key=lambda c: c.score, reverse=True)
+
+
+async def _run_candidate(
+    candidate: PlanCandidate,
+    title: str,
+    body: str,
+    cwd: str,
+    max_turns: int,
+    queue: asyncio.Queue,
+    deadline: float | None,
+    cancel_token: CancellationToken | None,
+    budget: BudgetGovernor | None,
+    base_session_id: str | None = None,
+    search_index: CodeSearchIndex | None = None,
+    symbol_index: SymbolIndex | None = None,
+) -> None:
+    prompt = build_plan_prompt(
+        title,
+        body,
+        cwd,
+        focus=candidate.focus,
+        plan_file_name=candidate.plan_file_name,
+        symbol_tools=symbol_index is not None,
+        search_tools=search_index is not None,
+    )
+    if budget is not None and budget.state == BUDGET_HARD:
+        print(f"Budget hard limit reached, skipping plan candidate {candidate.index + 1}")
+        return
+
+    route = route_for(CALL_PLAN)
+    session_id = None
+    try:
+        async for message in stream_until(
+            run_claude(
+                prompt,
+                cwd,
+                route.turns(max_turns),
+                resume=base_session_id,
+                max_budget_usd=budget.remaining_usd if budget else None,
+                fork_session=base_session_id is not None,
+                search_index=search_index,
+                symbol_index=symbol_index,
+                model=route.model,
+            ),
+            deadline,
+            cancel_token,
+        ):
+            if session_id is None:
+                session_id = extract_session_id(message)
+            if budget is not None:
+                budget.record(CALL_PLAN, message)
+            await queue.put(message)
+    except StreamInterrupted as e:
+        print(f"Plan candidate {candidate.index + 1} interrupted: {e.reason}")
+        return
+    except Exception as e:
+        print(f"Plan candidate {candidate.index + 1} failed: {e}")
+
+    if base_session_id is not None and session_id is None:
+        print(f"Plan candidate {candidate.index + 1} could not fork the base session, retrying without it")
+        await _run_candidate(
+            candidate, title, body, cwd, max_turns, queue, deadline, cancel_token, budget,
+            search_index=search_index, symbol_index=symbol_index,
+        )
+
+
+async def run_claude_plan_parallel(
+    title: str,
+    body: str,
+    cwd: str | None = None,
+    num_candidates: int = DEFAULT_PLAN_CANDIDATES,
+    max_turns: int = DEFAULT_CANDIDATE_TURNS,
+    on_plans_ranked: Callable[[list[PlanCandidate]], Awaitable[None]] | None = None,
+    run_timeout: float | None = None,
+    cancel_token: CancellationToken | None = None,
+    budget: BudgetGovernor | None = None,
+    base_session_id: str | None = None,
+    search_index: CodeSearchIndex | None = None,
+    symbol_index: SymbolIndex | None = None,
+):
+    """Run several short planning sessions concurrently and keep the best plan.
+
+    Each candidate explores with a different focus and writes its own plan file.
+    When all sessions finish, plans are ranked by files covered and step count,
+    the best is written to .plan.md and the candidate files are removed.
+
+    Yields messages from all candidates as they arrive.
+
+    Args:
+        title: Task title
+        body: Task description
+        cwd: Working directory
+        num_candidates: Number of concurrent planning sessions
+        max_turns: Turn cap for each session
+        on_plans_ranked: Optional async callback called with the ranked candidates
+        run_timeout: Optional wall-clock seconds for all sessions
+        cancel_token: Optional token for cooperative cancellation by the caller
+        budget: Optional budget governor shared by all sessions
+        base_session_id: Optional pre-explored session that every candidate forks
+        search_index: Optional CodeSearchIndex shared by all candidates as search tools
+        symbol_index: Optional SymbolIndex shared by all candidates as navigation tools
+    """
+    if cwd is None:
+        cwd = os.getcwd()
+
+    candidates = [
+        PlanCandidate(i, PLAN_FOCUSES[i % len(PLAN_FOCUSES)], candidate_plan_file(i))
+        for i in range(num_candidates)
+    ]
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + run_timeout if run_timeout is not None else None
+    queue: asyncio.Queue = asyncio.Queue()
+
+    tasks = [
+        asyncio.create_task(
+            _run_candidate(
+                candidate, title, body, cwd, max_turns, queue, deadline, cancel_token, budget, base_session_id,
+                search_index, symbol_index,
+            )
+        )
+        for candidate in candidates
+    ]
+    all_done = asyncio.gather(*tasks)
+    all_done.add_done_callback(lambda _: queue.put_nowait(None))
+
+    try:
+        while (message := await queue.get()) is not None:
+            yield message
+    finally:
+        if not all_done.done():
+            all_done.cancel()
+            await asyncio.gather(all_done, return_exceptions=True)
+
+    ranked = rank_plans([score_plan(candidate, cwd) for candidate in candidates])
+    if ranked:
+        (Path(cwd) / PLAN_FILE).write_text(ranked[0].text)
+        print(
+            f"Selected plan candidate {ranked[0].index + 1} "
+            f"({len(ranked[0].files)} files, {ranked[0].steps} steps)"
+        )
+    else:
+        print("No plan candidate produced a plan")
+
+    for candidate in candidates:
+        candidate_path = Path(cwd) / candidate.plan_file_name
+        if candidate_path.exists():
+            candidate_path.unlink()
+
+    if on_plans_ranked:
+        try:
+            await on_plans_ranked(ranked)
+        except Exception as e:
+            print(f"Error posting plan ranking: {e}")
@@ -0,0 +1,644 @@
+"""Plan-driven parallel implementation: independent plan steps run as concurrent sub-sessions.
+
+The plan's implementation steps are parsed into a DAG annotated with the files
+each step changes. Steps whose files overlap, or that the plan says depend on
+each other, are ordered; the rest run concurrently in the same worktree, each
+restricted to its own files. A write ledger blocks writes to files owned by
+another running step and records overlapping writes. A short integration
+session then reconciles the results.
+"""
+
+import asyncio
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from claude_agent_sdk.types import AssistantMessage, HookMatcher, TextBlock
+
+from budget import BudgetGovernor, BUDGET_HARD
+from change_tracker import ChangeTracker
+from code_search import CodeSearchIndex, EDIT_TOOL_MATCHER
+from symbol_index import SymbolIndex
+from parallel_plan import find_plan_files
+from claude_runner import (
+    run_claude,
+    stream_until,
+    extract_session_id,
+    save_session_id,
+    route_for,
+    CancellationToken,
+    StreamInterrupted,
+    SYMBOL_NAVIGATION_INSTRUCTIONS,
+    search_tool_names,
+    SHELL_TOOL_MATCHER,
+    STOP_RUN_TIMEOUT,
+    STOP_CHUNK_TIMEOUT,
+    STOP_BUDGET,
+    CALL_STEP,
+    CALL_INTEGRATE,
+)
+
+
+DEFAULT_MAX_PARALLEL_STEPS = 4
+DEFAULT_STEP_TURNS = 15
+DEFAULT_INTEGRATION_TURNS = 8
+MAX_STEP_SUMMARY_CHARS = 500
+
+# Step outcomes
+STEP_DONE = "done"
+STEP_FAILED = "failed"
+STEP_SKIPPED = "skipped"
+
+_STEPS_SECTION = re.compile(r"implementation steps", re.IGNORECASE)
+# Other sections of the plan format requested by build_plan_prompt
+_OTHER_SECTION = re.compile(
+    r"^\s*(?:#{1,6}\s+|[-*]\s+)?\**\s*(?:overview|files to modify|testing approach|testing|potential risks|risks)\b",
+    re.IGNORECASE,
+)
+_STEP_ITEM = re.compile(r"^(\s*)(?:#{1,6}\s+)?\**(?:step\s+)?(\d+)[.):]\**\s*(.*)$", re.IGNORECASE)
+_FILES_LINE = re.compile(r"^\s*[-*]?\s*\**files?\**\s*:\**\s*(.*)$", re.IGNORECASE)
+_DEPENDS_LINE = re.compile(r"^\s*[-*]?\s*\**depends on\**\s*:\**\s*(.*)$", re.IGNORECASE)
+_LIST_ITEM = re.compile(r"^\s*[-*]\s+(.*)$")
+_PATH = re.compile(r"[\w./-]+\.[A-Za-z0-9]{1,6}\b")
+
+
+@dataclass
+class PlanStep:
+    """One implementation step of a plan.
+
+    Attributes:
+        number: The step's number in the plan
+        text: The step's full text
+        files: Files the step changes, relative to the working directory
+        depends_on: Numbers of earlier steps that must finish first (explicit
+            and inferred; see build_step_graph)
+    """
+
+    number: int
+    text: str
+    files: set[str] = field(default_factory=set)
+    depends_on: set[int] = field(default_factory=set)
+
+
+@dataclass
+class WriteConflict:
+    """A write by one step to a file another step owns.
+
+    Blocked conflicts were refused because the owner was still running; the
+    others were allowed but overlap a finished step the writer did not depend on.
+    """
+
+    path: str
+    step: int
+    owner: int
+    blocked: bool
+
+    def format(self) -> str:
+        if self.blocked:
+            return f"`{self.path}`: step {self.step}'s write was blocked while step {self.owner} owned the file"
+        return f"`{self.path}`: written by step {self.step} after step {self.owner}, which it does not depend on"
+
+
+@dataclass
+class StepResult:
+    """Outcome of one step's sub-session."""
+
+    step: PlanStep
+    status: str
+    written: set[str] = field(default_factory=set)
+    summary: str = ""
+    session_id: str | None = None
+
+    def format(self) -> str:
+        line = f"Step {self.step.number} ({self.status})"
+        if self.written:
+            line += f": wrote {', '.join(f'`{path}`' for path in sorted(self.written))}"
+        if self.summary:
+            line += f" - {self.summary}"
+        return line
+
+
+def _relative_path(path: str, cwd: str) -> str | None:
+    root = Path(cwd).resolve()
+    full = Path(path) if os.path.isabs(path) else root / path.removeprefix("./")
+    try:
+        return full.resolve().relative_to(root).as_posix()
+    except ValueError:
+        return None
+
+
+def _step_sections(plan_text: str) -> list[str]:
+    """Return the lines of the plan's implementation steps section (or the whole plan)."""
+    lines = plan_text.splitlines()
+    start = next((i for i, line in enumerate(lines) if _STEPS_SECTION.search(line)), None)
+    if start is None:
+        return lines
+    section = []
+    for line in lines[start + 1:]:
+        if _OTHER_SECTION.match(line):
+            break
+        section.append(line)
+    return section
+
+
+def _parse_files(lines: list[str], cwd: str) -> set[str] | None:
+    """Return the paths of a step's Files: annotation, or None if it has none."""
+    for i, line in enumerate(lines):
+        match = _FILES_LINE.match(line)
+        if not match:
+            continue
+        listed = [match.group(1)]
+        if not match.group(1).strip():
+            # Files listed as bullets under the annotation
+            for following in lines[i + 1:]:
+                item = _LIST_ITEM.match(following)
+                if not item or _DEPENDS_LINE.match(following):
+                    break
+                listed.append(item.group(1))
+        files = set()
+        for path in _PATH.findall(" ".join(listed)):
+            relative = _relative_path(path, cwd)
+            if relative is not None:
+                files.add(relative)
+        return files
+    return None
+
+
+def _parse_depends(lines: list[str]) -> set[int]:
+    for line in lines:
+        match = _DEPENDS_LINE.match(line)
+        if match:
+            return {int(number) for number in re.findall(r"\d+", match.group(1))}
+    return set()
+
+
+def parse_plan_steps(plan_text: str, cwd: str) -> list[PlanStep]:
+    """Parse a plan's numbered implementation steps with their files and dependencies.
+
+    Files come from each step's `Files:` annotation; without one, the existing
+    repository files the step mentions are used. Dependencies come from
+    `Depends on:` annotations. Nested numbered lists are part of their step.
+    """
+    steps, current, indent = [], None, None
+    for line in _step_sections(plan_text):
+        match = _STEP_ITEM.match(line)
+        if match and (indent is None or len(match.group(1)) <= indent):
+            indent = len(match.group(1))
+            current = [int(match.group(2)), [match.group(3)]]
+            steps.append(current)
+        elif current is not None:
+            current[1].append(line)
+
+    parsed = []
+    for number, lines in steps:
+        text = "\n".join(lines).strip()
+        files = _parse_files(lines, cwd)
+        if files is None:
+            files = find_plan_files(text, cwd)
+        parsed.append(PlanStep(number, text, files, _parse_depends(lines)))
+
+    if len({step.number for step in parsed}) < len(parsed):
+        # Restarted numbering: dependencies can't be resolved, so build_step_graph infers them all
+        for i, step in enumerate(parsed):
+            step.number, step.depends_on = i + 1, set()
+    return parsed
+
+
+def build_step_graph(steps: list[PlanStep]) -> list[PlanStep]:
+    """Complete each step's dependencies so concurrent steps never share files.
+
+    A step depends on the earlier steps it names, on every earlier step that
+    changes one of its files, and, if either has no known files, on every
+    earlier step (so such steps run alone). References to later or unknown
+    steps are dropped, which keeps the graph acyclic.
+    """
+    for i, step in enumerate(steps):
+        earlier = {other.number for other in steps[:i]}
+        step.depends_on &= earlier
+        for other in steps[:i]:
+            if not step.files or not other.files or step.files & other.files:
+                step.depends_on.add(other.number)
+    return steps
+
+
+def step_ancestors(steps: list[PlanStep]) -> dict[int, set[int]]:
+    """Return every step's transitive dependencies."""
+    ancestors: dict[int, set[int]] = {}
+    for step in steps:
+        ancestors[step.number] = set(step.depends_on)
+        for dependency in step.depends_on:
+            ancestors[step.number] |= ancestors.get(dependency, set())
+    return ancestors
+
+
+def step_levels(steps: list[PlanStep]) -> list[list[PlanStep]]:
+    """Group steps into levels that can run together (each after all earlier levels)."""
+    level_of: dict[int, int] = {}
+    levels: list[list[PlanStep]] = []
+    for step in steps:
+        level = 1 + max((level_of[d] for d in step.depends_on if d in level_of), default=-1)
+        level_of[step.number] = level
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(step)
+    return levels
+
+
+def is_parallelisable(steps: list[PlanStep]) -> bool:
+    """Return True if at least two steps can run at the same time."""
+    return any(len(level) > 1 for level in step_levels(steps))
+
+
+class WriteLedger:
+    """Tracks which step owns each file while sub-sessions share one worktree.
+
+    A running step owns its planned files and every file it writes. Writes to
+    a file owned by another running step are blocked (through a PreToolUse
+    hook); writes to a file last owned by a finished step the writer does not
+    depend on are allowed but recorded as overlaps. Shell commands could write
+    files the ledger never sees, so step sessions may not run them.
+    """
+
+    def __init__(self, cwd: str, steps: list[PlanStep]):
+        self.cwd = cwd
+        self.ancestors = step_ancestors(steps)
+        self.owners: dict[str, int] = {}
+        self.running: set[int] = set()
+        self.written: dict[int, set[str]] = {}
+        self.conflicts: list[WriteConflict] = []
+
+    def start(self, step: PlanStep) -> None:
+        self.running.add(step.number)
+        self.written.setdefault(step.number, set())
+        for path in step.files:
+            if self.owners.get(path) not in self.running:
+                self.owners[path] = step.number
+
+    def finish(self, step: PlanStep) -> None:
+        self.running.discard(step.number)
+
+    def _record(self, conflict: WriteConflict) -> None:
+        if conflict not in self.conflicts:
+            self.conflicts.append(conflict)
+
+    def check_write(self, step: PlanStep, path: str) -> WriteConflict | None:
+        """Record a write by a step; return the conflict if it must be blocked."""
+        relative = _relative_path(path, self.cwd)
+        if relative is None:
+            return None
+        owner = self.owners.get(relative)
+        if owner is not None and owner != step.number:
+            if owner in self.running:
+                conflict = WriteConflict(relative, step.number, owner, blocked=True)
+                self._record(conflict)
+                return conflict
+            if owner not in self.ancestors.get(step.number, set()):
+                self._record(WriteConflict(relative, step.number, owner, blocked=False))
+        self.owners[relative] = step.number
+        self.written.setdefault(step.number, set()).add(relative)
+        return None
+
+    def hooks(self, step: PlanStep) -> dict:
+        """PreToolUse hooks that apply check_write to the step's edits and deny shell commands.
+
+        Shell commands are denied because the ledger only sees the paths of editing tool calls.
+        """
+
+        async def guard_write(input_data, tool_use_id, context):
+            tool_input = input_data.get("tool_input") or {}
+            path = tool_input.get("file_path") or tool_input.get("notebook_path")
+            conflict = self.check_write(step, path) if path else None
+            if conflict is None:
+                return {}
+            return {
+                "hookSpecificOutput": {
+                    "hookEventName": "PreToolUse",
+                    "permissionDecision": "deny",
+                    "permissionDecisionReason": (
+                        f"{conflict.path} belongs to step {conflict.owner}, which another agent is implementing "
+                        "right now. Leave it; the integration pass will reconcile it."
+                    ),
+                }
+            }
+
+        async def deny_shell(input_data, tool_use_id, context):
+            return {
+                "hookSpecificOutput": {
+                    "hookEventName": "PreToolUse",
+                    "permissionDecision": "deny",
+                    "permissionDecisionReason": (
+                        "Shell commands are not available while steps run in parallel. Use Edit and Write; "
+                        "the integration pass can run commands."
+                    ),
+                }
+            }
+
+        return {
+            "PreToolUse": [
+                HookMatcher(matcher=EDIT_TOOL_MATCHER, hooks=[guard_write]),
+                HookMatcher(matcher=SHELL_TOOL_MATCHER, hooks=[deny_shell]),
+            ]
+        }
+
+
+def _issue_content(title: str, body: str) -> str:
+    if body and body.strip():
+        return f"# {title}\n\n{body}"
+    return f"# {title}"
+
+
+def build_step_prompt(
+    title: str,
+    body: str,
+    plan_text: str,
+    step: PlanStep,
+    cwd: str,
+    symbol_tools: bool = False,
+    search_tools: bool = False,
+) -> str:
+    """Build the prompt for one step's sub-session."""
+    files = "\n".join(f"- {cwd}/{path}" for path in sorted(step.files))
+    navigation_section = f"{SYMBOL_NAVIGATION_INSTRUCTIONS}\n\n" if symbol_tools else ""
+    find_tool, search_tool = search_tool_names(search_tools)
+    return f"""You are one of several agents implementing a plan in parallel, each on its own step, in the same working directory.
+
+Working directory: {cwd}
+
+IMPORTANT: You MUST use the file editing tools (Read, Edit, Write, {find_tool}, {search_tool}) to make the changes.
+
+## Your step: Step {step.number}
+{step.text}
+
+## Files you own
+{files}
+
+Only create or modify these files. Other agents are editing other files at the same time, and writes to files they own are blocked. If your step needs a change elsewhere, do not make it: mention it in your final message and an integration pass will reconcile it.
+
+Implement only your step. When it is done, reply with one short paragraph summarising what you changed.
+
+{navigation_section}## Full plan (for context only)
+{plan_text}
+
+## Issue
+{_issue_content(title, body)}"""
+
+
+def build_integration_prompt(
+    title: str,
+    body: str,
+    plan_text: str,
+    results: list[StepResult],
+    conflicts: list[WriteConflict],
+    cwd: str,
+) -> str:
+    """Build the prompt for the session that reconciles the parallel steps."""
+    step_lines = "\n".join(f"- {result.format()}" for result in results)
+    conflict_lines = "\n".join(f"- {conflict.format()}" for conflict in conflicts) or "- None"
+    return f"""Several agents have just implemented the steps of the plan below in parallel, each restricted to its own files. Reconcile their work.
+
+Working directory: {cwd}
+
+1. Read the changed files and make them consistent with each other (imports, names, signatures, call sites)
+2. Finish any step marked failed or skipped
+3. Resolve the conflicts listed below: make the blocked changes and check that overlapping writes fit together
+4. Keep edits minimal and do not redo completed steps
+
+## Step results
+{step_lines}
+
+## Conflicts
+{conflict_lines}
+
+## Plan
+{plan_text}
+
+## Issue
+{_issue_content(title, body)}"""
+
+
+def _last_text(message) -> str | None:
+    if not isinstance(message, AssistantMessage):
+        return None
+    texts = [block.text for block in message.content if isinstance(block, TextBlock) and block.text.strip()]
+    return texts[-1].strip() if texts else None
+
+
+async def _run_step(
+    step: PlanStep,
+    title: str,
+    body: str,
+    plan_text: str,
+    cwd: str,
+    ledger: WriteLedger,
+    queue: asyncio.Queue,
+    max_turns: int,
+    deadline: float | None,
+    cancel_token: CancellationToken | None,
+    budget: BudgetGovernor | None,
+    base_session_id: str | None,
+    search_index: CodeSearchIndex | None,
+    symbol_index: SymbolIndex | None,
+) -> StepResult:
+    result = StepResult(step, STEP_DONE)
+    route = route_for(CALL_STEP)
+    ledger.start(step)
+    try:
+        async for message in stream_until(
+            run_claude(
+                build_step_prompt(
+                    title, body, plan_text, step, cwd,
+                    symbol_tools=symbol_index is not None, search_tools=search_index is not None,
+                ),
+                cwd,
+                route.turns(max_turns),
+                resume=base_session_id,
+                max_budget_usd=budget.remaining_usd if budget else None,
+                fork_session=base_session_id is not None,
+                search_index=search_index,
+                symbol_index=symbol_index,
+                model=route.model,
+                hooks=ledger.hooks(step),
+            ),
+            deadline,
+            cancel_token,
+        ):
+            if result.session_id is None:
+                result.session_id = extract_session_id(message)
+            if budget is not None:
+                budget.record(CALL_STEP, message)
+            text = _last_text(message)
+            if text:
+                result.summary = text[:MAX_STEP_SUMMARY_CHARS]
+            await queue.put(message)
+    except StreamInterrupted as e:
+        print(f"Step {step.number} interrupted: {e.reason}")
+        result.status = STEP_FAILED
+    except Exception as e:
+        print(f"Step {step.number} failed: {e}")
+        result.status = STEP_FAILED
+    finally:
+        ledger.finish(step)
+    result.written = set(ledger.written.get(step.number, set()))
+    return result
+
+
+async def run_plan_steps(
+    title: str,
+    body: str,
+    plan_text: str,
+    cwd: str | None = None,
+    max_parallel: int = DEFAULT_MAX_PARALLEL_STEPS,
+    turns_per_step: int = DEFAULT_STEP_TURNS,
+    integration_turns: int = DEFAULT_INTEGRATION_TURNS,
+    on_final_complete: Callable[[list[str]], Awaitable[None]] | None = None,
+    run_timeout: float | None = None,
+    cancel_token: CancellationToken | None = None,
+    budget: BudgetGovernor | None = None,
+    change_tracker: ChangeTracker | None = None,
+    base_session_id: str | None = None,
+    search_index: CodeSearchIndex | None = None,
+    symbol_index: SymbolIndex | None = None,
+):
+    """Implement a plan by running its independent steps as concurrent sub-sessions.
+
+    Steps start as soon as the steps they depend on have finished, up to
+    max_parallel at a time. A step whose dependency failed is skipped and
+    left to the integration session, which runs last and whose session_id is
+    saved to SESSION_FILE. If the run is stopped early, cancel_token (when
+    given) carries the reason.
+
+    Yields messages from all sessions as they arrive.
+
+    Args:
+        title: Task title
+        body: Task description
+        plan_text: The plan, with numbered implementation steps
+        cwd: Working directory
+        max_parallel: Maximum concurrent step sessions (at least 1)
+        turns_per_step: Turn cap for each step session
+        integration_turns: Turn cap for the integration session
+        on_final_complete: Optional async callback called with one summary
+            line per step (and per conflict)
+        run_timeout: Optional wall-clock seconds for the whole run
+        cancel_token: Optional token for cooperative cancellation by the caller
+        budget: Optional budget governor shared by all sessions
+        change_tracker: Optional tracker, snapshotted before and after the run
+        base_session_id: Optional pre-explored session that every step forks
+        search_index: Optional CodeSearchIndex shared by all sessions as search tools
+        symbol_index: Optional SymbolIndex shared by all sessions as navigation tools
+    """
+    if cwd is None:
+        cwd = os.getcwd()
+    # With no slot free the scheduler would wait forever for a step to finish
+    max_parallel = max(1, max_parallel)
+
+    steps = build_step_graph(parse_plan_steps(plan_text, cwd))
+    print(f"Plan has {len(steps)} step(s) in {len(step_levels(steps))} level(s)")
+
+    if change_tracker is not None and not change_tracker.started:
+        await asyncio.to_thread(change_tracker.start)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + run_timeout if run_timeout is not None else None
+    ledger = WriteLedger(cwd, steps)
+    queue: asyncio.Queue = asyncio.Queue()
+    results: dict[int, StepResult] = {}
+
+    def stopped() -> bool:
+        # No session is started once the budget is used up, even without a token
+        if budget is not None and budget.state == BUDGET_HARD:
+            if cancel_token is not None:
+                cancel_token.cancel(STOP_BUDGET)
+            return True
+        return cancel_token is not None and cancel_token.cancelled
+
+    async def schedule() -> None:
+        pending = list(steps)
+        running: dict[asyncio.Task, PlanStep] = {}
+        while pending or running:
+            for step in list(pending):
+                if not step.depends_on <= results.keys():
+                    continue
+                if stopped() or any(results[d].status != STEP_DONE for d in step.depends_on):
+                    pending.remove(step)
+                    results[step.number] = StepResult(step, STEP_SKIPPED)
+                elif len(running) < max_parallel:
+                    pending.remove(step)
+                    task = asyncio.create_task(_run_step(
+                        step, title, body, plan_text, cwd, ledger, queue, turns_per_step, deadline,
+                        cancel_token, budget, base_session_id, search_index, symbol_index,
+                    ))
+                    running[task] = step
+            if not running:
+                # Skipping a step can unblock (and so skip) its dependants
+                continue
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                step = running.pop(task)
+                results[step.number] = task.result()
+
+    scheduler = asyncio.create_task(schedule())
+    scheduler.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while (message := await queue.get()) is not None:
+            yield message
+    finally:
+        if not scheduler.done():
+            scheduler.cancel()
+            await asyncio.gather(scheduler, return_exceptions=True)
+    scheduler.result()
+
+    ordered = [results[step.number] for step in steps]
+    for result in ordered:
+        print(result.format())
+    for conflict in ledger.conflicts:
+        print(f"Conflict: {conflict.format()}")
+
+    session_id = None
+    if not stopped():
+        route = route_for(CALL_INTEGRATE)
+        try:
+            async for message in stream_until(
+                run_claude(
+                    build_integration_prompt(title, body, plan_text, ordered, ledger.conflicts, cwd),
+                    cwd,
+                    route.turns(integration_turns),
+                    max_budget_usd=budget.remaining_usd if budget else None,
+                    search_index=search_index,
+                    symbol_index=symbol_index,
+                    model=route.model,
+                ),
+                deadline,
+                cancel_token,
+            ):
+                if session_id is None:
+                    session_id = extract_session_id(message)
+                if budget is not None:
+                    budget.record(CALL_INTEGRATE, message)
+                yield message
+        except StreamInterrupted as e:
+            reason = STOP_RUN_TIMEOUT if e.reason == STOP_CHUNK_TIMEOUT else e.reason
+            print(f"Integration session interrupted: {reason}")
+            if cancel_token is not None:
+                cancel_token.cancel(reason)
+        except Exception as e:
+            print(f"Integration session failed: {e}")
+
+    # The PR description resumes the integration session, which has seen every step's result
+    if session_id is None:
+        session_id = next((r.session_id for r in reversed(ordered) if r.session_id), None)
+    if session_id:
+        save_session_id(cwd, session_id)
+
+    if change_tracker is not None:
+        await asyncio.to_thread(change_tracker.update)
+
+    if on_final_complete is not None:
+        summaries = [result.format() for result in ordered]
+        summaries += [f"Conflict: {conflict.format()}" for conflict in ledger.conflicts]
+        try:
+            await on_final_complete(summaries)
+        except Exception as e:
+            print(f"Error in final completion callback: {e}")
@@ -0,0 +1,338 @@
+"""Compiled DSPy programs for the summary and PR description prompts.
+
+Chunk summaries, final summaries and fresh PR descriptions normally run an
+agent session with a hand-written prompt. With the optional dspy extra
+(`uv sync --extra dspy`) they can run as DSPy programs instead: a typed
+signature plus few-shot demos, called directly on a cheaper model without the
+agent's system prompt and tool definitions.
+
+Programs are compiled offline from examples recorded during agent runs
+(PROMPT_EXAMPLES_DIR) and cached on disk as versioned JSON files, named by
+program, spec version and a digest of the examples they were compiled from.
+dspy is only imported when a program is compiled or run.
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from budget import BudgetGovernor
+
+
+PROGRAM_CHUNK_SUMMARY = "chunk_summary"
+PROGRAM_FINAL_SUMMARY = "final_summary"
+PROGRAM_PR_DESCRIPTION = "pr_description"
+
+DEFAULT_MODEL = "anthropic/claude-haiku-4-5"
+DEFAULT_MAX_TOKENS = 1024
+DEFAULT_MAX_DEMOS = 3
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "rome" / "prompt-programs"
+# Names the selected compilation of each program; checkouts give every file the same mtime
+MANIFEST_FILE = "programs.json"
+# Keeps the PR description input bounded; the agent fallback sees the full diff
+MAX_DIFF_CHARS = 30000
+
+
+@dataclass
+class ProgramSpec:
+    """A prompt program's signature.
+
+    Attributes:
+        name: Program name, used in cache and example file names
+        version: Bump when inputs, output or instructions change, so cached
+            compilations of the old spec are no longer loaded
+        inputs: Input field names
+        output: Output field name
+        instructions: Task instructions (the signature's docstring)
+    """
+
+    name: str
+    version: int
+    inputs: tuple[str, ...]
+    output: str
+    instructions: str
+
+    @property
+    def signature(self) -> str:
+        return f"{', '.join(self.inputs)} -> {self.output}"
+
+
+PROGRAM_SPECS = {
+    PROGRAM_CHUNK_SUMMARY: ProgramSpec(
+        PROGRAM_CHUNK_SUMMARY,
+        1,
+        ("task", "activity"),
+        "summary",
+        "Summarise one chunk of a coding agent's work on a task from its activity log. Write two markdown "
+        "sections: '## ✅ Completed This Chunk' with 2-4 specific bullet points, and '## 📋 Remaining Work' "
+        "with 1-3 bullet points, or 'All work appears to be complete.'. Bullet points only.",
+    ),
+    PROGRAM_FINAL_SUMMARY: ProgramSpec(
+        PROGRAM_FINAL_SUMMARY,
+        1,
+        ("task", "chunk_summaries"),
+        "summary",
+        "Summarise a coding agent's whole run on a task from its per-chunk summaries. Write two markdown "
+        "sections: '## 📊 Summary of All Changes' with 3-5 bullet points on the overall outcome, and "
+        "'## 🎯 Completion Status' stating factually whether the task was completed.",
+    ),
+    PROGRAM_PR_DESCRIPTION: ProgramSpec(
+        PROGRAM_PR_DESCRIPTION,
+        1,
+        ("task", "diff"),
+        "description",
+        "Write a pull request description for the diff that resolves the task: a '## Summary' section with "
+        "2-3 concise, factual bullet points describing what was done. No test plan section.",
+    ),
+}
+
+
+def dspy_available() -> bool:
+    """Return True if the optional dspy extra is installed."""
+    return importlib.util.find_spec("dspy") is not None
+
+
+def _dspy():
+    try:
+        import dspy
+    except ImportError as e:
+        raise RuntimeError("Prompt programs need the dspy extra: uv sync --extra dspy") from e
+    return dspy
+
+
+def format_task(title: str, body: str | None) -> str:
+    """Format an issue as the task input of a program."""
+    return f"{title}\n\n{body}" if body and body.strip() else title
+
+
+def format_chunk_summaries(chunk_summaries: list[str]) -> str:
+    """Format chunk summaries as the chunk_summaries input of the final summary program."""
+    return "\n\n".join(f"### Chunk {i + 1}\n{summary}" for i, summary in enumerate(chunk_summaries))
+
+
+def truncate_diff(diff: str) -> str:
+    """Cut a diff to MAX_DIFF_CHARS for the PR description program."""
+    if len(diff) <= MAX_DIFF_CHARS:
+        return diff
+    return f"{diff[:MAX_DIFF_CHARS]}\n... (diff truncated)"
+
+
+def default_cache_dir() -> Path:
+    """Return the compiled program directory (PROMPT_PROGRAM_DIR or ~/.cache/rome/prompt-programs)."""
+    return Path(os.environ.get("PROMPT_PROGRAM_DIR") or DEFAULT_CACHE_DIR)
+
+
+def record_example(name: str, inputs: dict, output: str, examples_dir: Path | None = None) -> None:
+    """Append an (inputs, output) example for a program to <examples_dir>/<name>.jsonl.
+
+    examples_dir defaults to PROMPT_EXAMPLES_DIR; nothing is recorded when
+    neither is set, or when the output is empty.
+    """
+    if examples_dir is None:
+        examples_dir = Path(os.environ["PROMPT_EXAMPLES_DIR"]) if os.environ.get("PROMPT_EXAMPLES_DIR") else None
+    if examples_dir is None or not output.strip():
+        return
+    try:
+        examples_dir.mkdir(parents=True, exist_ok=True)
+        with open(examples_dir / f"{name}.jsonl", "a") as f:
+            f.write(json.dumps({"inputs": inputs, "output": output, "recorded_at": time.time()}) + "\n")
+    except OSError as e:
+        print(f"Warning: Could not record {name} example: {e}")
+
+
+def load_examples(name: str, examples_dir: Path) -> list[dict]:
+    """Load recorded examples for a program, skipping malformed lines."""
+    path = examples_dir / f"{name}.jsonl"
+    if not path.exists():
+        return []
+    spec = PROGRAM_SPECS[name]
+    examples = []
+    for line in path.read_text().splitlines():
+        try:
+            example = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(example, dict) and set(spec.inputs) <= set(example.get("inputs", {})) and example.get("output"):
+            examples.append(example)
+    return examples
+
+
+def program_path(
+    name: str,
+    examples: list[dict],
+    max_demos: int = DEFAULT_MAX_DEMOS,
+    cache_dir: Path | None = None,
+) -> Path:
+    """Return the cache file for a program compiled from examples."""
+    spec = PROGRAM_SPECS[name]
+    canonical = json.dumps([max_demos, [[e["inputs"], e["output"]] for e in examples]], sort_keys=True)
+    digest = hashlib.sha256(canonical.encode()).hexdigest()[:12]
+    return (cache_dir or default_cache_dir()) / f"{name}-v{spec.version}-{digest}.json"
+
+
+def _load_manifest(cache_dir: Path) -> dict:
+    path = cache_dir / MANIFEST_FILE
+    if not path.exists():
+        return {}
+    try:
+        manifest = json.loads(path.read_text())
+    except ValueError as e:
+        print(f"Warning: Could not read {path}: {e}")
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def select_compiled_program(name: str, path: Path) -> None:
+    """Record path as the compilation of the program to load from its directory."""
+    manifest = _load_manifest(path.parent)
+    manifest[name] = path.name
+    (path.parent / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+
+
+def find_compiled_program(name: str, cache_dir: Path | None = None) -> Path | None:
+    """Return the selected compilation of the program's current spec version, or None.
+
+    The manifest names the compilation (by version and examples digest) that
+    was compiled last. Without a manifest entry for the current version, a
+    single compilation of that version is used; several are ambiguous.
+    """
+    spec = PROGRAM_SPECS[name]
+    cache_dir = cache_dir or default_cache_dir()
+    prefix = f"{name}-v{spec.version}-"
+    selected = _load_manifest(cache_dir).get(name)
+    if isinstance(selected, str) and selected.startswith(prefix) and (cache_dir / selected).exists():
+        return cache_dir / selected
+    paths = sorted(cache_dir.glob(f"{prefix}*.json"))
+    if len(paths) > 1:
+        print(f"Warning: {len(paths)} compilations of {name} v{spec.version} in {cache_dir} and none selected "
+              f"in {MANIFEST_FILE}; recompile with compile_prompt_programs.py")
+        return None
+    return paths[0] if paths else None
+
+
+def compile_program(
+    name: str,
+    examples: list[dict],
+    max_demos: int = DEFAULT_MAX_DEMOS,
+    cache_dir: Path | None = None,
+) -> Path:
+    """Compile a program from recorded examples, cache it and select it for loading.
+
+    Compilation is offline: LabeledFewShot takes the newest max_demos
+    examples as demos without calling a model. Returns the cached program's path.
+    """
+    dspy = _dspy()
+    spec = PROGRAM_SPECS[name]
+    trainset = [
+        dspy.Example(**example["inputs"], **{spec.output: example["output"]}).with_inputs(*spec.inputs)
+        for example in reversed(examples)
+    ]
+    student = dspy.Predict(dspy.Signature(spec.signature, spec.instructions))
+    program = dspy.LabeledFewShot(k=max_demos).compile(student, trainset=trainset, sample=False)
+    path = program_path(name, examples, max_demos, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    program.save(str(path))
+    select_compiled_program(name, path)
+    return path
+
+
+class PromptPrograms:
+    """Runs the summary and PR description programs on a (cheaper) model.
+
+    Cached compilations are loaded when present; otherwise a program runs
+    with its instructions alone. Usage is recorded against the budget like
+    agent calls.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        cache_dir: Path | None = None,
+    ):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.cache_dir = cache_dir
+        self._lm = None
+        self._programs: dict = {}
+
+    @classmethod
+    def from_env(cls) -> "PromptPrograms | None":
+        """Create from PROMPT_PROGRAMS / PROMPT_PROGRAM_MODEL, or None when disabled or dspy is missing."""
+        if os.environ.get("PROMPT_PROGRAMS", "").lower() not in ("1", "true", "yes"):
+            return None
+        if not dspy_available():
+            print("Warning: PROMPT_PROGRAMS is set but dspy is not installed (uv sync --extra dspy)")
+            return None
+        return cls(model=os.environ.get("PROMPT_PROGRAM_MODEL") or DEFAULT_MODEL)
+
+    def program(self, name: str):
+        """Return the program, loading its cached compilation on first use."""
+        if name not in self._programs:
+            dspy = _dspy()
+            spec = PROGRAM_SPECS[name]
+            program = dspy.Predict(dspy.Signature(spec.signature, spec.instructions))
+            path = find_compiled_program(name, self.cache_dir)
+            if path is not None:
+                program.load(str(path))
+                print(f"Loaded compiled {name} program from {path}")
+            else:
+                print(f"No compiled {name} program in {self.cache_dir or default_cache_dir()}, running without demos")
+            self._programs[name] = program
+        return self._programs[name]
+
+    def _run_sync(self, name: str, inputs: dict) -> tuple[str, list[dict]]:
+        dspy = _dspy()
+        if self._lm is None:
+            self._lm = dspy.LM(self.model, max_tokens=self.max_tokens)
+        # A per-call copy keeps each call's history (and so its usage) separate
+        lm = self._lm.copy()
+        with dspy.context(lm=lm):
+            prediction = self.program(name)(**inputs)
+        return getattr(prediction, PROGRAM_SPECS[name].output), lm.history
+
+    async def run(self, name: str, call_type: str, budget: BudgetGovernor | None = None, **inputs) -> str:
+        """Run a program in a worker thread and record its usage and latency under call_type."""
+        start = time.monotonic()
+        output, history = await asyncio.to_thread(self._run_sync, name, inputs)
+        if budget is not None:
+            usages = [entry.get("usage") or {} for entry in history]
+            budget.record_usage(
+                call_type,
+                sum(entry.get("cost") or 0.0 for entry in history),
+                sum(usage.get("prompt_tokens", 0) or 0 for usage in usages),
+                sum(usage.get("completion_tokens", 0) or 0 for usage in usages),
+                duration_ms=int((time.monotonic() - start) * 1000),
+                model=self.model,
+            )
+        return (output or "").strip()
+
+    async def chunk_summary(
+        self, title: str, body: str, activity: str, call_type: str, budget: BudgetGovernor | None = None
+    ) -> str:
+        return await self.run(
+            PROGRAM_CHUNK_SUMMARY, call_type, budget, task=format_task(title, body), activity=activity
+        )
+
+    async def final_summary(
+        self, title: str, body: str, chunk_summaries: list[str], call_type: str, budget: BudgetGovernor | None = None
+    ) -> str:
+        return await self.run(
+            PROGRAM_FINAL_SUMMARY,
+            call_type,
+            budget,
+            task=format_task(title, body),
+            chunk_summaries=format_chunk_summaries(chunk_summaries),
+        )
+
+    async def pr_description(
+        self, title: str, body: str, diff: str, call_type: str, budget: BudgetGovernor | None = None
+    ) -> str:
+        return await self.run(
+            PROGRAM_PR_DESCRIPTION, call_type, budget, task=format_task(title, body), diff=truncate_diff(diff)
+        )
@@ -0,0 +1,216 @@
+"""Offline simulator of the Claude Agent SDK message stream for load testing.
+
+Emits realistic SystemMessage/AssistantMessage/UserMessage/ResultMessage
+streams with configurable latency and tool-use patterns, honours session
+resume and writes the completion marker (or plan file) named in the prompt,
+so the runners can be exercised at scale without API calls.
+"""
+
+import asyncio
+import os
+import random
+import re
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from claude_agent_sdk import ClaudeAgentOptions
+from claude_agent_sdk.types import (
+    AssistantMessage,
+    ResultMessage,
+    SystemMessage,
+    TextBlock,
+    ToolResultBlock,
+    ToolUseBlock,
+    UserMessage,
+)
+
+
+BACKEND_SDK = "sdk"
+BACKEND_SIMULATOR = "simulator"
+
+DEFAULT_TOOL_PATTERN = ["Glob", "Grep", "Read", "Read", "Edit"]
+
+# Absolute file the prompt asks the agent to write when done (marker, plan, PR description)
+_TARGET_PATTERN = re.compile(r"to: (/\S+)")
+
+
+@dataclass
+class SimulatorConfig:
+    """Behaviour of the simulated agent.
+
+    Attributes:
+        message_latency: Seconds between messages
+        latency_jitter: Random +/- fraction applied to each latency
+        tool_pattern: Tool names used in turn order (cycled)
+        complete_after_turns: Total turns in a session before the agent writes its
+            target file and finishes; resumed sessions keep counting
+        tool_result_size: Characters in each simulated tool result
+        cost_per_turn: Simulated USD cost per turn, reported in ResultMessage
+        tokens_per_turn: Simulated input tokens per turn (grows with session length)
+        context_latency: Extra seconds per turn for every 1000 tokens of session
+            context, so long resumed sessions get slower like real ones
+        seed: Random seed for reproducible runs
+    """
+
+    message_latency: float = 0.0
+    latency_jitter: float = 0.0
+    tool_pattern: list[str] = field(default_factory=lambda: list(DEFAULT_TOOL_PATTERN))
+    complete_after_turns: int = 15
+    tool_result_size: int = 2000
+    cost_per_turn: float = 0.01
+    tokens_per_turn: int = 1000
+    context_latency: float = 0.0
+    seed: int | None = None
+
+    @classmethod
+    def from_env(cls) -> "SimulatorConfig":
+        """Create a config from SIMULATOR_* environment variables."""
+        config = cls()
+        for name, cast in [
+            ("message_latency", float),
+            ("latency_jitter", float),
+            ("complete_after_turns", int),
+            ("tool_result_size", int),
+            ("cost_per_turn", float),
+            ("tokens_per_turn", int),
+            ("context_latency", float),
+            ("seed", int),
+        ]:
+            value = os.environ.get(f"SIMULATOR_{name.upper()}")
+            if value:
+                setattr(config, name, cast(value))
+        pattern = os.environ.get("SIMULATOR_TOOL_PATTERN")
+        if pattern:
+            config.tool_pattern = [tool.strip() for tool in pattern.split(",") if tool.strip()]
+        return config
+
+
+class SdkSimulator:
+    """In-process stand-in for claude_agent_sdk.query with session state."""
+
+    def __init__(self, config: SimulatorConfig | None = None):
+        self.config = config or SimulatorConfig()
+        self.random = random.Random(self.config.seed)
+        # session_id -> total turns taken in that session
+        self.sessions: dict[str, int] = {}
+        self.queries = 0
+
+    async def _pause(self, context_turns: int = 0) -> None:
+        context_tokens = self.config.tokens_per_turn * context_turns
+        latency = self.config.message_latency + self.config.context_latency * context_tokens / 1000
+        if latency <= 0:
+            return
+        jitter = latency * self.config.latency_jitter
+        await asyncio.sleep(max(0.0, latency + self.random.uniform(-jitter, jitter)))
+
+    def _tool_input(self, tool_name: str, cwd: str, turn: int) -> dict:
+        file_path = f"{cwd}/src/module_{turn % 7}.py"
+        if tool_name in ("Read", "Edit", "Write"):
+            return {"file_path": file_path}
+        if tool_name == "Glob":
+            return {"pattern": "**/*.py"}
+        if tool_name == "Grep":
+            return {"pattern": f"def func_{turn}"}
+        return {}
+
+    async def query(self, *, prompt, options: ClaudeAgentOptions):
+        """Simulate one query() call. Signature matches claude_agent_sdk.query."""
+        self.queries += 1
+        if not isinstance(prompt, str):
+            # Streamed prompt (used with in-process MCP tools)
+            prompt = "\n".join([message["message"]["content"] async for message in prompt])
+        cwd = str(options.cwd) if options.cwd else os.getcwd()
+
+        if options.resume and options.resume not in self.sessions:
+            yield ResultMessage(
+                subtype="error_during_execution",
+                duration_ms=0,
+                duration_api_ms=0,
+                is_error=True,
+                num_turns=0,
+                session_id=options.resume,
+                result=f"No conversation found with session ID: {options.resume}",
+            )
+            return
+
+        if options.resume and not options.fork_session:
+            session_id = options.resume
+        else:
+            session_id = str(uuid.uuid4())
+            self.sessions[session_id] = self.sessions.get(options.resume, 0) if options.resume else 0
+
+        yield SystemMessage(subtype="init", data={"type": "system", "subtype": "init", "session_id": session_id})
+
+        target = _TARGET_PATTERN.search(prompt)
+        max_turns = options.max_turns or self.config.complete_after_turns
+        turns = 0
+        finished = False
+
+        if target is None:
+            # No file to write (e.g. summary prompts): answer with text only
+            await self._pause()
+            yield AssistantMessage(
+                content=[TextBlock(text="- Simulated summary of the work so far.")],
+                model="simulator",
+            )
+            turns = 1
+            finished = True
+        else:
+            while turns < max_turns:
+                total_turns = self.sessions[session_id] + turns + 1
+                await self._pause(context_turns=total_turns)
+                if total_turns >= self.config.complete_after_turns:
+                    target_path = Path(target.group(1))
+                    target_path.parent.mkdir(parents=True, exist_ok=True)
+                    content = "DONE" if target_path.name.startswith(".claude") else "# Simulated\n\n1. Step one\n"
+                    target_path.write_text(content)
+                    tool_use = ToolUseBlock(id=f"tool-{uuid.uuid4().hex[:8]}", name="Write",
+                                            input={"file_path": str(target_path), "content": content})
+                    finished = True
+                else:
+                    pattern = self.config.tool_pattern or DEFAULT_TOOL_PATTERN
+                    tool_name = pattern[(total_turns - 1) % len(pattern)]
+                    tool_use = ToolUseBlock(id=f"tool-{uuid.uuid4().hex[:8]}", name=tool_name,
+                                            input=self._tool_input(tool_name, cwd, total_turns))
+
+                yield AssistantMessage(content=[TextBlock(text=f"Turn {total_turns}"), tool_use], model="simulator")
+                await self._pause()
+                yield UserMessage(content=[ToolResultBlock(tool_use_id=tool_use.id,
+                                                           content="x" * self.config.tool_result_size)])
+                turns += 1
+                if finished:
+                    break
+
+        previous_turns = self.sessions.get(session_id, 0)
+        self.sessions[session_id] = previous_turns + turns
+        # Resumed sessions re-send the whole history, so input tokens grow with length
+        input_tokens = sum(self.config.tokens_per_turn * (previous_turns + i + 1) for i in range(turns))
+
+        yield ResultMessage(
+            subtype="success" if finished else "error_max_turns",
+            duration_ms=int(turns * self.config.message_latency * 2000),
+            duration_api_ms=int(turns * self.config.message_latency * 1000),
+            is_error=False,
+            num_turns=turns,
+            session_id=session_id,
+            total_cost_usd=round(turns * self.config.cost_per_turn, 6),
+            usage={"input_tokens": input_tokens, "output_tokens": 200 * turns},
+        )
+
+
+_default_simulator: SdkSimulator | None = None
+
+
+def get_simulator() -> SdkSimulator:
+    """Return the process-wide simulator, configured from the environment on first use."""
+    global _default_simulator
+    if _default_simulator is None:
+        _default_simulator = SdkSimulator(SimulatorConfig.from_env())
+    return _default_simulator
+
+
+def set_simulator(simulator: SdkSimulator | None) -> None:
+    """Replace the process-wide simulator (None resets it)."""
+    global _default_simulator
+    _default_simulator = simulator
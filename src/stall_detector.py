@@ -0,0 +1,135 @@
+"""Detects agents that loop without making progress across chunks."""
+
+import difflib
+import hashlib
+import json
+from dataclasses import dataclass, field
+
+from change_tracker import ChangeSet
+from message_records import ROLE_ASSISTANT, MessageRecord, compact_messages
+
+
+EDITING_TOOLS = {"Edit", "Write", "MultiEdit", "NotebookEdit"}
+
+DEFAULT_REPEAT_RATIO = 0.5
+DEFAULT_TEXT_SIMILARITY = 0.9
+DEFAULT_NUDGE_AFTER = 1
+DEFAULT_STOP_AFTER = 2
+
+
+def tool_call_hash(record: MessageRecord) -> str:
+    """Stable hash of a tool call's name and (compacted) input."""
+    payload = json.dumps({"name": record.tool_name, "input": record.tool_input}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+@dataclass
+class StallVerdict:
+    """Assessment of the latest chunk.
+
+    Attributes:
+        stalled_chunks: Consecutive chunks judged as making no progress
+        reasons: Why the latest chunk was judged stalled (empty if it was not)
+        nudge: Text to append to the next continuation prompt, if any
+        stop: True when the run should be terminated
+    """
+
+    stalled_chunks: int = 0
+    reasons: list[str] = field(default_factory=list)
+    nudge: str | None = None
+    stop: bool = False
+
+    @property
+    def reason(self) -> str:
+        return "; ".join(self.reasons)
+
+
+def build_nudge(reasons: list[str]) -> str:
+    """Build the continuation-prompt nudge for a stalled chunk."""
+    details = "\n".join(f"- {reason}" for reason in reasons)
+    return f"""## ⚠️ Progress Check
+Your last chunk made no progress:
+{details}
+
+Do not repeat reads or searches you have already done. Decide on a concrete change and make it now with Edit or Write. If the task is already complete, signal completion as instructed above."""
+
+
+class StallDetector:
+    """Scores each chunk and escalates from a prompt nudge to early termination.
+
+    A chunk is stalled when it changed no files and the agent was looping:
+    most of its tool calls repeat earlier calls, its text is nearly identical
+    to the previous chunk's, or it made no tool calls at all.
+    """
+
+    def __init__(
+        self,
+        repeat_ratio: float = DEFAULT_REPEAT_RATIO,
+        text_similarity: float = DEFAULT_TEXT_SIMILARITY,
+        nudge_after: int = DEFAULT_NUDGE_AFTER,
+        stop_after: int = DEFAULT_STOP_AFTER,
+    ):
+        self.repeat_ratio = repeat_ratio
+        self.text_similarity = text_similarity
+        self.nudge_after = nudge_after
+        self.stop_after = stop_after
+        self.seen_calls: set[str] = set()
+        self.previous_text = ""
+        self.stalled_chunks = 0
+        self.last_verdict = StallVerdict()
+
+    def observe_chunk(self, messages, changes: ChangeSet | None = None) -> StallVerdict:
+        """Assess one chunk.
+
+        Args:
+            messages: MessageRecords (or SDK messages) from the chunk
+            changes: Exact file changes from a ChangeTracker; without one, any
+                Edit/Write call counts as a change
+
+        Returns:
+            The verdict for this chunk
+        """
+        calls = []
+        texts = []
+        for record in compact_messages(messages):
+            if record.role != ROLE_ASSISTANT:
+                continue
+            if record.tool_name:
+                calls.append(record)
+            else:
+                texts.append(record.preview)
+
+        repeated = 0
+        for call in calls:
+            digest = tool_call_hash(call)
+            if digest in self.seen_calls:
+                repeated += 1
+            self.seen_calls.add(digest)
+
+        changed = bool(changes) if changes is not None else any(call.tool_name in EDITING_TOOLS for call in calls)
+        text = "\n".join(texts)
+        similarity = (
+            difflib.SequenceMatcher(None, self.previous_text, text).ratio()
+            if self.previous_text and text else 0.0
+        )
+        self.previous_text = text
+
+        reasons = []
+        if not changed:
+            if not calls:
+                reasons.append("made no tool calls")
+            elif repeated / len(calls) >= self.repeat_ratio:
+                reasons.append(f"repeated {repeated} of {len(calls)} tool calls already made earlier")
+            if similarity >= self.text_similarity:
+                reasons.append(f"responses were {similarity:.0%} identical to the previous chunk")
+            if reasons:
+                reasons.append("changed no files")
+
+        self.stalled_chunks = self.stalled_chunks + 1 if reasons else 0
+        verdict = StallVerdict(stalled_chunks=self.stalled_chunks, reasons=reasons)
+        if reasons:
+            verdict.stop = self.stalled_chunks >= self.stop_after
+            if not verdict.stop and self.stalled_chunks >= self.nudge_after:
+                verdict.nudge = build_nudge(reasons)
+        self.last_verdict = verdict
+        return verdict
@@ -0,0 +1,431 @@
+"""Python symbol index (definitions, references, outlines) served to agents over MCP.
+
+Every Python file in the worktree is parsed once with ast. Agents can then ask
+where a symbol is defined, where a name is used, or what a file contains,
+with line ranges, and Read only those lines instead of whole files. Like the
+code search index, it is kept current by a PostToolUse hook that re-parses
+files the agent edits.
+"""
+
+import ast
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+from claude_agent_sdk import create_sdk_mcp_server, tool
+from claude_agent_sdk.types import AssistantMessage, HookMatcher, ToolUseBlock
+
+from change_tracker import SKIP_DIRS
+from code_search import EDIT_TOOL_MATCHER, glob_to_regex
+
+
+SERVER_NAME = "code_symbols"
+FIND_DEFINITION_TOOL = f"mcp__{SERVER_NAME}__find_definition"
+FIND_REFERENCES_TOOL = f"mcp__{SERVER_NAME}__find_references"
+FILE_OUTLINE_TOOL = f"mcp__{SERVER_NAME}__file_outline"
+SYMBOL_TOOLS = [FIND_DEFINITION_TOOL, FIND_REFERENCES_TOOL, FILE_OUTLINE_TOOL]
+
+KIND_CLASS = "class"
+KIND_FUNCTION = "function"
+KIND_METHOD = "method"
+KIND_VARIABLE = "variable"
+
+DEFAULT_MAX_FILE_BYTES = 1024 * 1024
+DEFAULT_MAX_RESULTS = 50
+MAX_LINE_CHARS = 200
+
+
+def _line_range(start: int, end: int) -> str:
+    return str(start) if start == end else f"{start}-{end}"
+
+
+@dataclass
+class Symbol:
+    """A class, function, method or module/class-level variable definition.
+
+    Attributes:
+        name: Unqualified name, e.g. "run"
+        qualname: Name qualified by enclosing classes and functions, e.g. "Runner.run"
+        kind: KIND_CLASS, KIND_FUNCTION, KIND_METHOD or KIND_VARIABLE
+        path: File path relative to the worktree root
+        start_line: First line, including decorators
+        end_line: Last line
+        signature: "def run(self, cwd)" or "class Runner(Base)"; empty for variables
+        depth: Nesting depth (0 for top-level definitions)
+    """
+
+    name: str
+    qualname: str
+    kind: str
+    path: str
+    start_line: int
+    end_line: int
+    signature: str = ""
+    depth: int = 0
+
+    def format(self) -> str:
+        label = self.signature or self.qualname
+        if self.signature and self.qualname != self.name:
+            label = f"{label}  [{self.qualname}]"
+        return f"{self.path}:{_line_range(self.start_line, self.end_line)} {self.kind} {label}"
+
+
+@dataclass
+class FileSymbols:
+    """Symbols and name uses parsed from one file."""
+
+    symbols: list[Symbol] = field(default_factory=list)
+    references: dict[str, list[int]] = field(default_factory=dict)
+    error: str | None = None
+
+
+def _signature(node: ast.AST) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases] + [ast.unparse(kw) for kw in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def _assigned_names(node: ast.AST) -> list[str]:
+    if isinstance(node, ast.Assign):
+        targets = node.targets
+    elif isinstance(node, ast.AnnAssign):
+        targets = [node.target]
+    else:
+        return []
+    names = []
+    while targets:
+        target = targets.pop(0)
+        if isinstance(target, ast.Name):
+            names.append(target.id)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            targets.extend(target.elts)
+        elif isinstance(target, ast.Starred):
+            targets.append(target.value)
+    return names
+
+
+class _Collector(ast.NodeVisitor):
+    """Collects definitions and name uses from a module."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.symbols: list[Symbol] = []
+        self.references: dict[str, list[int]] = {}
+        self._scope: list[tuple[str, str]] = []  # (name, kind) of enclosing definitions
+
+    def _add_reference(self, name: str, line: int) -> None:
+        lines = self.references.setdefault(name, [])
+        if not lines or lines[-1] != line:
+            lines.append(line)
+
+    def _define(self, node: ast.AST, kind: str) -> None:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        qualname = ".".join([name for name, _ in self._scope] + [node.name])
+        self.symbols.append(Symbol(
+            node.name, qualname, kind, self.path, start, node.end_lineno, _signature(node), len(self._scope)
+        ))
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._define(node, KIND_CLASS)
+        for child in node.decorator_list + node.bases + node.keywords:
+            self.visit(child)
+        self._scope.append((node.name, KIND_CLASS))
+        for child in node.body:
+            self.visit(child)
+        self._scope.pop()
+
+    def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        in_class = bool(self._scope) and self._scope[-1][1] == KIND_CLASS
+        self._define(node, KIND_METHOD if in_class else KIND_FUNCTION)
+        for child in node.decorator_list + [node.args] + ([node.returns] if node.returns else []):
+            self.visit(child)
+        self._scope.append((node.name, KIND_FUNCTION))
+        for child in node.body:
+            self.visit(child)
+        self._scope.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def generic_visit(self, node: ast.AST) -> None:
+        # Variables are only indexed at module and class level, where they are API
+        if not self._scope or self._scope[-1][1] == KIND_CLASS:
+            qualprefix = [name for name, _ in self._scope]
+            for name in _assigned_names(node):
+                self.symbols.append(Symbol(
+                    name, ".".join(qualprefix + [name]), KIND_VARIABLE, self.path,
+                    node.lineno, node.end_lineno, depth=len(self._scope),
+                ))
+        super().generic_visit(node)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        self._add_reference(node.id, node.lineno)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        self._add_reference(node.attr, node.end_lineno)
+        self.visit(node.value)
+
+    def visit_alias(self, node: ast.alias) -> None:
+        self._add_reference(node.name.rsplit(".", 1)[-1], node.lineno)
+
+
+def parse_symbols(source: str, path: str) -> FileSymbols:
+    """Parse one file's source into its symbols and name uses."""
+    try:
+        tree = ast.parse(source, filename=path)
+    except (SyntaxError, ValueError) as e:
+        return FileSymbols(error=f"{type(e).__name__}: {e}")
+    collector = _Collector(path)
+    collector.visit(tree)
+    return FileSymbols(collector.symbols, collector.references)
+
+
+class SymbolIndex:
+    """Definitions and references of every Python file in one worktree.
+
+    Inverted maps from name to definitions and to referencing files are kept
+    alongside the per-file results, so a re-parsed file first withdraws its
+    old entries.
+    """
+
+    def __init__(self, root: str, max_file_bytes: int = DEFAULT_MAX_FILE_BYTES):
+        self.root = Path(root).resolve()
+        self.max_file_bytes = max_file_bytes
+        self._files: dict[str, FileSymbols] = {}
+        self._definitions: dict[str, list[Symbol]] = {}
+        self._references: dict[str, set[str]] = {}
+
+    @classmethod
+    def build(cls, root: str, max_file_bytes: int = DEFAULT_MAX_FILE_BYTES) -> "SymbolIndex":
+        """Walk the worktree and parse every Python file."""
+        index = cls(root, max_file_bytes)
+        for dirpath, dirnames, filenames in os.walk(index.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.endswith(".egg-info")]
+            for filename in filenames:
+                if filename.endswith(".py"):
+                    index._index_file((Path(dirpath) / filename).relative_to(index.root).as_posix())
+        return index
+
+    @property
+    def file_count(self) -> int:
+        return len(self._files)
+
+    @property
+    def symbol_count(self) -> int:
+        return sum(len(entry.symbols) for entry in self._files.values())
+
+    def _relative(self, path: str) -> str | None:
+        full = Path(path) if os.path.isabs(path) else self.root / path
+        try:
+            return full.resolve().relative_to(self.root).as_posix()
+        except ValueError:
+            return None
+
+    def _read(self, rel: str) -> str | None:
+        path = self.root / rel
+        try:
+            if path.stat().st_size > self.max_file_bytes:
+                return None
+            return path.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def _remove(self, rel: str) -> None:
+        entry = self._files.pop(rel, None)
+        if entry is None:
+            return
+        for symbol in entry.symbols:
+            remaining = [s for s in self._definitions.get(symbol.name, []) if s.path != rel]
+            if remaining:
+                self._definitions[symbol.name] = remaining
+            else:
+                self._definitions.pop(symbol.name, None)
+        for name in entry.references:
+            paths = self._references.get(name)
+            if paths is not None:
+                paths.discard(rel)
+                if not paths:
+                    del self._references[name]
+
+    def _index_file(self, rel: str) -> None:
+        self._remove(rel)
+        source = self._read(rel)
+        if source is None:
+            return
+        entry = parse_symbols(source, rel)
+        self._files[rel] = entry
+        for symbol in entry.symbols:
+            self._definitions.setdefault(symbol.name, []).append(symbol)
+        for name in entry.references:
+            self._references.setdefault(name, set()).add(rel)
+
+    def update(self, paths: Iterable[str]) -> None:
+        """Re-parse edited Python files and drop deleted ones (absolute or worktree-relative paths)."""
+        for path in paths:
+            rel = self._relative(path)
+            if rel is None or not rel.endswith(".py"):
+                continue
+            if (self.root / rel).is_file():
+                self._index_file(rel)
+            else:
+                self._remove(rel)
+
+    def definitions(self, name: str) -> list[Symbol]:
+        """Return definitions of a name, or of a qualified name such as "Runner.run"."""
+        candidates = self._definitions.get(name.rsplit(".", 1)[-1], [])
+        if "." in name:
+            candidates = [s for s in candidates if s.qualname == name or s.qualname.endswith(f".{name}")]
+        return sorted(candidates, key=lambda s: (s.path, s.start_line))
+
+    def references(
+        self,
+        name: str,
+        path_glob: str | None = None,
+        max_results: int = DEFAULT_MAX_RESULTS,
+    ) -> list[tuple[str, int, str]]:
+        """Return (path, line number, line) for each line that uses a name.
+
+        Uses are bare names, attribute accesses (obj.name) and imports; the
+        definition itself is not a use.
+        """
+        name = name.rsplit(".", 1)[-1]
+        paths = sorted(self._references.get(name, ()))
+        if path_glob:
+            path_regex = glob_to_regex(path_glob)
+            paths = [path for path in paths if path_regex.match(path)]
+        results = []
+        for path in paths:
+            source = self._read(path)
+            lines = source.splitlines() if source is not None else []
+            for line_number in self._files[path].references[name]:
+                text = lines[line_number - 1].strip() if line_number <= len(lines) else ""
+                results.append((path, line_number, text[:MAX_LINE_CHARS]))
+                if len(results) >= max_results:
+                    return results
+        return results
+
+    def outline(self, path: str) -> FileSymbols | None:
+        """Return the parsed symbols of a file, or None if it is not indexed."""
+        rel = self._relative(path)
+        return self._files.get(rel) if rel is not None else None
+
+
+_indexes: dict[str, SymbolIndex] = {}
+
+
+def get_symbol_index(cwd: str) -> SymbolIndex:
+    """Return the process-wide symbol index for a worktree, building it on first use."""
+    root = os.path.realpath(cwd)
+    if root not in _indexes:
+        _indexes[root] = SymbolIndex.build(root)
+    return _indexes[root]
+
+
+def _text_result(text: str, is_error: bool = False) -> dict:
+    result = {"content": [{"type": "text", "text": text}]}
+    if is_error:
+        result["is_error"] = True
+    return result
+
+
+def symbol_tools(index: SymbolIndex) -> list:
+    """Return the find_definition, find_references and file_outline tool definitions."""
+
+    @tool(
+        "find_definition",
+        "Find where a Python class, function, method or module-level variable is defined. Accepts a "
+        "name (run) or qualified name (Runner.run). Returns path:start-end with the signature; Read "
+        "just that line range.",
+        {"name": str},
+    )
+    async def find_definition(args):
+        symbols = index.definitions(args["name"])
+        if not symbols:
+            return _text_result(f"No definition of {args['name']} found")
+        return _text_result("\n".join(symbol.format() for symbol in symbols[:DEFAULT_MAX_RESULTS]))
+
+    @tool(
+        "find_references",
+        "Find lines in Python files that use a name (calls, attribute access, imports). Returns "
+        "path:line: code.",
+        {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "path_glob": {"type": "string", "description": "Only search paths matching this glob, e.g. src/**"},
+                "max_results": {"type": "integer"},
+            },
+            "required": ["name"],
+        },
+    )
+    async def find_references(args):
+        matches = index.references(
+            args["name"], args.get("path_glob"), int(args.get("max_results") or DEFAULT_MAX_RESULTS)
+        )
+        if not matches:
+            return _text_result(f"No references to {args['name']} found")
+        return _text_result("\n".join(f"{path}:{line_number}: {line}" for path, line_number, line in matches))
+
+    @tool(
+        "file_outline",
+        "List the classes, functions, methods and module-level variables of a Python file with their "
+        "line ranges, without reading the whole file.",
+        {"path": str},
+    )
+    async def file_outline(args):
+        entry = index.outline(args["path"])
+        if entry is None:
+            return _text_result(f"{args['path']} is not an indexed Python file", is_error=True)
+        if entry.error:
+            return _text_result(f"Could not parse {args['path']}: {entry.error}", is_error=True)
+        if not entry.symbols:
+            return _text_result(f"{args['path']} defines no symbols")
+        lines = [
+            f"{'  ' * s.depth}{_line_range(s.start_line, s.end_line)} {s.signature or s.name}"
+            for s in sorted(entry.symbols, key=lambda s: s.start_line)
+        ]
+        return _text_result("\n".join(lines))
+
+    return [find_definition, find_references, file_outline]
+
+
+def create_symbol_server(index: SymbolIndex):
+    """Create the in-process MCP server exposing the index's symbol tools."""
+    return create_sdk_mcp_server(SERVER_NAME, tools=symbol_tools(index))
+
+
+def symbol_update_hooks(index: SymbolIndex) -> dict:
+    """PostToolUse hooks that re-parse Python files as soon as the agent edits them."""
+
+    async def reparse_edited_file(input_data, tool_use_id, context):
+        path = (input_data.get("tool_input") or {}).get("file_path")
+        if path:
+            index.update([path])
+        return {}
+
+    return {"PostToolUse": [HookMatcher(matcher=EDIT_TOOL_MATCHER, hooks=[reparse_edited_file])]}
+
+
+class ReadCounter:
+    """Counts Read calls in a message stream, and how many read only a line range.
+
+    Attributes:
+        reads: Read calls observed
+        ranged_reads: Read calls with an offset or limit
+    """
+
+    def __init__(self):
+        self.reads = 0
+        self.ranged_reads = 0
+
+    def observe(self, message) -> None:
+        if not isinstance(message, AssistantMessage):
+            return
+        for block in message.content:
+            if isinstance(block, ToolUseBlock) and block.name == "Read":
+                self.reads += 1
+                if block.input.get("offset") or block.input.get("limit"):
+                    self.ranged_reads += 1
@@ -0,0 +1,166 @@
+"""Cheap local triage of issues into execution tiers, before any agent call."""
+
+import re
+from dataclasses import dataclass, field
+
+from claude_runner import DEFAULT_MAX_CHUNKS, DEFAULT_SINGLE_SESSION_TURNS, DEFAULT_TURNS_PER_CHUNK
+from parallel_plan import count_plan_steps
+
+
+TIER_TRIVIAL = "trivial"
+TIER_NORMAL = "normal"
+TIER_LARGE = "large"
+TIERS = (TIER_TRIVIAL, TIER_NORMAL, TIER_LARGE)
+
+# Trivial issues: no plan, a short body, at most one mentioned path, a small-fix keyword in the
+# title and no large keyword anywhere. Words that also name features or broad changes (e.g.
+# "comment", "rename") are left out: the lean session has no continuation
+TRIVIAL_MAX_BODY_CHARS = 400
+TRIVIAL_MAX_PATHS = 1
+TRIVIAL_KEYWORDS = ("typo", "typos", "spelling", "wording", "bump", "docstring", "readme")
+
+# Large issues: any one of these is enough
+LARGE_MIN_BODY_CHARS = 3000
+LARGE_MIN_PATHS = 6
+LARGE_MIN_PLAN_STEPS = 8
+LARGE_KEYWORDS = ("refactor", "migrate", "migration", "redesign", "rewrite", "overhaul", "architecture")
+
+_URL_PATTERN = re.compile(r"https?://\S+")
+# Paths with a directory or a file extension, e.g. src/app.py, README.md, .github/workflows/
+# (but not slash-separated words such as read/write)
+_PATH_PATTERN = re.compile(
+    r"(?<![\w/.-])(?:\.?[\w-]+/)+(?:[\w-]+\.[A-Za-z]{1,5}\b)?(?![\w-])"
+    r"|(?<![\w/.-])\.?[\w-]+\.[A-Za-z]{2,5}\b"
+)
+
+
+@dataclass
+class TierSettings:
+    """How a tier is executed.
+
+    Attributes:
+        single_session: Run one lean session (no completion marker, no summary
+            sessions) instead of the chunked runner
+        max_turns: Turn cap for the single session
+        turns_per_chunk: Turns per chunk for the chunked runner
+        max_chunks: Maximum chunks for the chunked runner
+    """
+
+    single_session: bool = False
+    max_turns: int = DEFAULT_SINGLE_SESSION_TURNS
+    turns_per_chunk: int = DEFAULT_TURNS_PER_CHUNK
+    max_chunks: int = DEFAULT_MAX_CHUNKS
+
+
+TIER_SETTINGS = {
+    TIER_TRIVIAL: TierSettings(single_session=True),
+    TIER_NORMAL: TierSettings(),
+    TIER_LARGE: TierSettings(max_chunks=8),
+}
+
+
+@dataclass
+class TriageResult:
+    """The tier chosen for an issue and the signals behind it."""
+
+    tier: str
+    reasons: list[str] = field(default_factory=list)
+    body_chars: int = 0
+    paths: list[str] = field(default_factory=list)
+    plan_steps: int = 0
+
+    @property
+    def settings(self) -> TierSettings:
+        return TIER_SETTINGS[self.tier]
+
+    @property
+    def reason(self) -> str:
+        return "; ".join(self.reasons)
+
+
+def mentioned_paths(text: str) -> list[str]:
+    """Return the distinct file or directory paths mentioned in text, in order."""
+    text = _URL_PATTERN.sub(" ", text)
+    paths = []
+    for match in _PATH_PATTERN.findall(text):
+        path = match.rstrip(".")
+        if path and path not in paths:
+            paths.append(path)
+    return paths
+
+
+def _keyword(text: str, keywords: tuple[str, ...]) -> str | None:
+    words = set(re.findall(r"[a-z]+", text.lower()))
+    return next((keyword for keyword in keywords if keyword in words), None)
+
+
+def triage_issue(title: str, body: str | None, plan: str | None = None) -> TriageResult:
+    """Classify an issue as trivial, normal or large from local heuristics only.
+
+    Args:
+        title: Issue title
+        body: Issue body (without the plan)
+        plan: Implementation plan text, if the issue has one
+
+    Returns:
+        The tier with the reasons that decided it
+    """
+    body = body or ""
+    text = f"{title}\n{body}"
+    result = TriageResult(
+        tier=TIER_NORMAL,
+        body_chars=len(body.strip()),
+        paths=mentioned_paths(f"{text}\n{plan or ''}"),
+        plan_steps=count_plan_steps(plan) if plan else 0,
+    )
+
+    large = []
+    if result.plan_steps >= LARGE_MIN_PLAN_STEPS:
+        large.append(f"plan has {result.plan_steps} steps")
+    if result.body_chars >= LARGE_MIN_BODY_CHARS:
+        large.append(f"body is {result.body_chars} characters")
+    if len(result.paths) >= LARGE_MIN_PATHS:
+        large.append(f"{len(result.paths)} paths mentioned")
+    keyword = _keyword(title, LARGE_KEYWORDS)
+    if keyword:
+        large.append(f"title mentions '{keyword}'")
+    if large:
+        result.tier = TIER_LARGE
+        result.reasons = large
+        return result
+
+    if plan:
+        result.reasons = ["has a plan"]
+        return result
+    if result.body_chars > TRIVIAL_MAX_BODY_CHARS:
+        result.reasons = [f"body is {result.body_chars} characters"]
+        return result
+    if len(result.paths) > TRIVIAL_MAX_PATHS:
+        result.reasons = [f"{len(result.paths)} paths mentioned"]
+        return result
+
+    # Short and narrow - trivial only if the title also reads like a small fix. A
+    # single target path is not enough: short feature requests name one too,
+    # and the lean session has no continuation if the work turns out bigger
+    keyword = _keyword(body, LARGE_KEYWORDS)
+    if keyword:
+        result.reasons = [f"body mentions '{keyword}'"]
+        return result
+    keyword = _keyword(title, TRIVIAL_KEYWORDS)
+    if keyword:
+        result.tier = TIER_TRIVIAL
+        result.reasons = [f"body is {result.body_chars} characters", "no plan", f"title mentions '{keyword}'"]
+        if result.paths:
+            result.reasons.append(f"targets {result.paths[0]}")
+        return result
+
+    result.reasons = ["short issue without a small-fix keyword"]
+    return result
+
+
+def format_tier_report(result: TriageResult, elapsed_seconds: float, cost_usd: float) -> str:
+    """Format the tier with its latency and cost as a markdown line."""
+    return (
+        f"**Tier:** {result.tier} ({result.reason}) · "
+        f"**Latency:** {elapsed_seconds:.0f}s · **Cost:** ${cost_usd:.4f}"
+    )
@@ -0,0 +1,319 @@
+"""Asyncio GitHub webhook receiver that queues plan and implement jobs in-process.
+
+Reproduces the trigger rules of agent-plan.yml, agent-implement.yml and
+comment-handler.yml so a long-running service can start agent runs without an
+Actions runner cold start per event.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from claude_runner import append_plan
+from github_api import (
+    LABEL_COMPLETED,
+    LABEL_FAILED,
+    LABEL_IMPLEMENT,
+    LABEL_IN_PROGRESS,
+    LABEL_PLAN,
+    LABEL_PLAN_FAILED,
+    LABEL_PLANNED,
+    LABEL_PLANNING,
+    fetch_issue_plan,
+    post_issue_comment,
+    swap_issue_labels,
+)
+from job_queue import JOB_IMPLEMENT, JOB_PLAN, JobQueue
+
+
+ACTION_PLAN = "plan"
+ACTION_IMPLEMENT = "implement"
+ACTION_APPLY = "apply"
+ACTION_APPLY_WITHOUT_PLAN = "apply_without_plan"
+ACTION_CLOSE = "close"
+
+# An issue carrying one of these was already picked up, so its title tag no longer triggers
+# (otherwise every edit of a tagged issue would queue the run again)
+PLAN_STATE_LABELS = {LABEL_PLANNING, LABEL_PLANNED, LABEL_PLAN_FAILED, LABEL_IN_PROGRESS, LABEL_COMPLETED}
+IMPLEMENT_STATE_LABELS = {LABEL_IN_PROGRESS, LABEL_COMPLETED, LABEL_FAILED}
+
+NO_PLAN_COMMENT = (
+    "⚠️ This issue does not have a plan yet. Please add the `ai:plan` label first to generate a plan."
+)
+
+MAX_BODY_BYTES = 25 * 1024 * 1024  # GitHub caps webhook payloads at 25 MB
+
+
+@dataclass
+class WebhookAction:
+    """Something a webhook event asks the agent service to do."""
+
+    action: str
+    repo: str
+    issue_number: int
+    title: str
+    body: str
+    comment_id: int | None = None
+
+
+def _title_triggers(title: str, tag: str) -> bool:
+    # Actions' contains()/startsWith() compare case-insensitively
+    title = title.lower()
+    return f"[{tag}]" in title or f"@{tag.replace(':', '-')}" in title or title.startswith(tag)
+
+
+def _issue_action(action: str, payload: dict, issue: dict, repo: str) -> WebhookAction:
+    return WebhookAction(
+        action=action,
+        repo=repo,
+        issue_number=issue["number"],
+        title=issue.get("title") or "",
+        body=issue.get("body") or "",
+        comment_id=(payload.get("comment") or {}).get("id"),
+    )
+
+
+def route_event(event: str, payload: dict) -> list[WebhookAction]:
+    """Apply the workflow trigger rules to a webhook event.
+
+    Args:
+        event: Value of the X-GitHub-Event header
+        payload: Parsed webhook payload
+
+    Returns:
+        Actions to perform, empty when the event triggers nothing
+    """
+    issue = payload.get("issue")
+    if not issue:
+        return []
+    repo = payload.get("repository", {}).get("full_name", "")
+    if issue.get("author_association") != "OWNER":
+        return []
+
+    if event == "issues":
+        if payload.get("action") not in ("labeled", "opened", "edited"):
+            return []
+        label = (payload.get("label") or {}).get("name")
+        title = issue.get("title") or ""
+        labels = {label["name"] for label in issue.get("labels", [])}
+        actions = []
+        if label == LABEL_PLAN or (_title_triggers(title, LABEL_PLAN) and not labels & PLAN_STATE_LABELS):
+            actions.append(_issue_action(ACTION_PLAN, payload, issue, repo))
+        if label == LABEL_IMPLEMENT or (
+            _title_triggers(title, LABEL_IMPLEMENT) and not labels & IMPLEMENT_STATE_LABELS
+        ):
+            actions.append(_issue_action(ACTION_IMPLEMENT, payload, issue, repo))
+        return actions
+
+    if event == "issue_comment":
+        comment = payload.get("comment") or {}
+        if payload.get("action") != "created" or issue.get("pull_request") is not None:
+            return []
+        if (comment.get("user") or {}).get("login") != (issue.get("user") or {}).get("login"):
+            return []
+        command = comment.get("body")
+        if command == "/apply":
+            labels = {label["name"] for label in issue.get("labels", [])}
+            action = ACTION_APPLY if LABEL_PLANNED in labels else ACTION_APPLY_WITHOUT_PLAN
+            return [_issue_action(action, payload, issue, repo)]
+        if command == "/close":
+            return [_issue_action(ACTION_CLOSE, payload, issue, repo)]
+
+    return []
+
+
+def verify_signature(secret: str, body: bytes, signature: str | None) -> bool:
+    """Check an X-Hub-Signature-256 header against the raw request body."""
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.removeprefix("sha256="))
+
+
+class JobDispatcher:
+    """Turns webhook actions into job queue operations."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        checkouts: dict[str, str],
+        github_token: str | None = None,
+        post_comment: Callable[..., Awaitable[bool]] = post_issue_comment,
+        fetch_plan: Callable[..., Awaitable[str | None]] = fetch_issue_plan,
+        swap_labels: Callable[..., Awaitable[bool]] = swap_issue_labels,
+    ):
+        """
+        Args:
+            queue: Job queue that runs the agents
+            checkouts: Repository full name -> local checkout directory
+            github_token: Token for replying on issues, fetching plans and
+                updating labels (all skipped without one)
+            post_comment: Comment poster, replaceable in tests
+            fetch_plan: Plan comment fetcher, replaceable in tests
+            swap_labels: Label updater, replaceable in tests
+        """
+        self.queue = queue
+        self.checkouts = checkouts
+        self.github_token = github_token
+        self.post_comment = post_comment
+        self.fetch_plan = fetch_plan
+        self.swap_labels = swap_labels
+
+    async def _claim_labels(self, action: WebhookAction, kind: str) -> None:
+        """Swap the trigger labels for the in-progress label, as the workflows do when a run starts."""
+        if not self.github_token:
+            return
+        owner, repo = action.repo.split("/", 1)
+        if kind == JOB_PLAN:
+            remove, add = [LABEL_PLAN, LABEL_PLAN_FAILED], [LABEL_PLANNING]
+        else:
+            remove, add = [LABEL_IMPLEMENT, LABEL_PLANNED, LABEL_FAILED], [LABEL_IN_PROGRESS]
+        await self.swap_labels(owner, repo, action.issue_number, self.github_token, remove, add)
+
+    async def _implement_body(self, action: WebhookAction) -> str:
+        """Return the issue body with its plan comment appended, as agent-implement.yml does."""
+        if not self.github_token:
+            return action.body
+        owner, repo = action.repo.split("/", 1)
+        plan = await self.fetch_plan(owner, repo, action.issue_number, self.github_token)
+        if plan is None:
+            return action.body
+        print(f"Found implementation plan for {action.repo}#{action.issue_number}")
+        return append_plan(action.body, plan)
+
+    async def dispatch(self, action: WebhookAction) -> None:
+        cwd = self.checkouts.get(action.repo)
+        if cwd is None:
+            print(f"Ignoring {action.action} for {action.repo}#{action.issue_number}: no checkout configured")
+            return
+
+        if action.action in (ACTION_PLAN, ACTION_IMPLEMENT, ACTION_APPLY):
+            kind = JOB_PLAN if action.action == ACTION_PLAN else JOB_IMPLEMENT
+            body = action.body if kind == JOB_PLAN else await self._implement_body(action)
+            job, created = self.queue.submit(action.repo, action.issue_number, kind, action.title, body, cwd)
+            state = "Queued" if created else "Already queued"
+            print(f"{state} {kind} job {job.id} for {action.repo}#{action.issue_number}")
+            if created:
+                await self._claim_labels(action, kind)
+        elif action.action == ACTION_CLOSE:
+            for job in self.queue.store.active_for_issue(action.repo, action.issue_number):
+                self.queue.cancel(job.id)
+                print(f"Cancelled job {job.id} for {action.repo}#{action.issue_number}")
+        elif action.action == ACTION_APPLY_WITHOUT_PLAN and self.github_token:
+            owner, repo = action.repo.split("/", 1)
+            await self.post_comment(owner, repo, action.issue_number, NO_PLAN_COMMENT, self.github_token)
+
+
+async def handle_webhook(
+    event: str,
+    body: bytes,
+    signature: str | None,
+    secret: str | None,
+    dispatch: Callable[[WebhookAction], Awaitable[None]],
+) -> tuple[int, str]:
+    """Validate, route and dispatch one webhook delivery.
+
+    Returns:
+        (HTTP status, response text)
+    """
+    if secret and not verify_signature(secret, body, signature):
+        return 401, "invalid signature"
+    if event == "ping":
+        return 200, "pong"
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return 400, "invalid JSON"
+
+    actions = route_event(event, payload)
+    for action in actions:
+        await dispatch(action)
+    return (202, f"{len(actions)} action(s)") if actions else (204, "")
+
+
+_REASONS = {200: "OK", 202: "Accepted", 204: "No Content", 400: "Bad Request", 401: "Unauthorized",
+            404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+async def _respond(writer: asyncio.StreamWriter, status: int, text: str = "") -> None:
+    data = text.encode()
+    writer.write(
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        f"Content-Type: text/plain\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode()
+        + data
+    )
+    await writer.drain()
+    writer.close()
+
+
+def make_request_handler(
+    secret: str | None,
+    dispatch: Callable[[WebhookAction], Awaitable[None]],
+    path: str = "/webhook",
+) -> Callable[[asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]]:
+    """Build an asyncio.start_server callback serving POST {path} and GET /healthz."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers: dict[str, str] = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if len(request_line) < 2:
+                await _respond(writer, 400, "bad request")
+                return
+            method, target = request_line[0], request_line[1]
+            if method == "GET" and target == "/healthz":
+                await _respond(writer, 200, "ok")
+                return
+            if target != path:
+                await _respond(writer, 404, "not found")
+                return
+            if method != "POST":
+                await _respond(writer, 405, "method not allowed")
+                return
+
+            length = int(headers.get("content-length", "0"))
+            if length > MAX_BODY_BYTES:
+                await _respond(writer, 413, "payload too large")
+                return
+            body = await reader.readexactly(length)
+            status, text = await handle_webhook(
+                headers.get("x-github-event", ""),
+                body,
+                headers.get("x-hub-signature-256"),
+                secret,
+                dispatch,
+            )
+            await _respond(writer, status, text)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            print(f"Error handling webhook request: {e}")
+            writer.close()
+        except Exception as e:
+            # Dispatch or GitHub API failures must not escape the connection handler
+            print(f"Error dispatching webhook request: {e}")
+            try:
+                await _respond(writer, 500, "internal error")
+            except ConnectionError:
+                writer.close()
+
+    return handle
+
+
+async def start_webhook_server(
+    dispatch: Callable[[WebhookAction], Awaitable[None]],
+    secret: str | None = None,
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    path: str = "/webhook",
+) -> asyncio.Server:
+    """Start listening for webhook deliveries. Port 0 picks a free port."""
+    return await asyncio.start_server(make_request_handler(secret, dispatch, path), host, port)
@@ -0,0 +1,179 @@
+"""Tests for affected_tests module."""
+
+import asyncio
+import subprocess
+import tempfile
+from pathlib import Path
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from affected_tests import (
+    PytestResult,
+    affected_test_files,
+    build_import_graph,
+    format_test_feedback,
+    git_changed_files,
+    make_test_feedback,
+    parse_pytest_failures,
+    run_tests,
+    shard_tests,
+)
+
+
+def write(root: Path, relative: str, content: str = "") -> None:
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def make_project(tmpdir: str) -> Path:
+    root = Path(tmpdir)
+    write(root, "src/core.py", "def add(a, b):\n    return a + b\n")
+    write(root, "src/service.py", "from core import add\n\ndef total(xs):\n    return sum(xs)\n")
+    write(root, "src/other.py", "VALUE = 1\n")
+    write(root, "tests/test_service.py", "from service import total\n\ndef test_total():\n    assert total([1, 2]) == 3\n")
+    write(root, "tests/test_other.py", "import other\n\ndef test_value():\n    assert other.VALUE == 1\n")
+    write(root, "tests/conftest.py", "import sys, os\nsys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))\n")
+    return root
+
+
+def test_import_graph_resolves_src_modules():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = make_project(tmpdir)
+        graph = build_import_graph(tmpdir)
+        assert root / "src" / "core.py" in graph[root / "src" / "service.py"]
+        assert root / "src" / "service.py" in graph[root / "tests" / "test_service.py"]
+
+
+def test_affected_tests_follow_transitive_imports():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_project(tmpdir)
+        assert affected_test_files(["src/core.py"], tmpdir) == ["tests/test_service.py"]
+        assert affected_test_files(["src/other.py"], tmpdir) == ["tests/test_other.py"]
+        assert affected_test_files(["README.md"], tmpdir) == []
+
+
+def test_affected_tests_include_changed_tests_and_conftest():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_project(tmpdir)
+        assert affected_test_files(["tests/test_other.py"], tmpdir) == ["tests/test_other.py"]
+        assert affected_test_files(["tests/conftest.py"], tmpdir) == [
+            "tests/test_other.py",
+            "tests/test_service.py",
+        ]
+
+
+def test_shard_tests_round_robin():
+    assert shard_tests(["a", "b", "c", "d", "e"], 2) == [["a", "c", "e"], ["b", "d"]]
+    assert shard_tests(["a"], 4) == [["a"]]
+
+
+def test_parse_pytest_failures():
+    output = "..F\nFAILED tests/test_x.py::test_y - assert 1 == 2\nERROR tests/test_z.py\n1 failed"
+    assert parse_pytest_failures(output) == [
+        "FAILED tests/test_x.py::test_y - assert 1 == 2",
+        "ERROR tests/test_z.py",
+    ]
+
+
+def test_format_test_feedback():
+    assert "pass" in format_test_feedback(PytestResult(True, ["tests/test_a.py"]))
+    failing = format_test_feedback(PytestResult(False, ["tests/test_a.py"], ["FAILED tests/test_a.py::test_x"], "boom"))
+    assert "FAILING" in failing
+    assert "FAILED tests/test_a.py::test_x" in failing
+
+
+async def test_run_tests_reports_failures_across_shards():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        write(root, "test_ok.py", "def test_ok():\n    assert True\n")
+        write(root, "test_bad.py", "def test_bad():\n    assert 1 == 2\n")
+
+        result = await run_tests(["test_ok.py", "test_bad.py"], tmpdir, workers=2)
+
+        assert result.passed is False
+        assert len(result.failures) == 1
+        assert "test_bad.py::test_bad" in result.failures[0]
+
+        result = await run_tests(["test_ok.py"], tmpdir, workers=2)
+        assert result.passed is True
+
+
+async def test_run_tests_kills_shards_when_cancelled():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        pid_file = root / "pid"
+        write(
+            root,
+            "test_slow.py",
+            f"import os, time\n\ndef test_slow():\n    open({str(pid_file)!r}, 'w').write(str(os.getpid()))\n"
+            "    time.sleep(60)\n",
+        )
+
+        task = asyncio.create_task(run_tests(["test_slow.py"], tmpdir))
+        for _ in range(200):
+            if pid_file.exists() and pid_file.read_text():
+                break
+            await asyncio.sleep(0.05)
+        pid = int(pid_file.read_text())
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        with pytest.raises(ProcessLookupError):
+            os.kill(pid, 0)
+
+
+async def test_run_tests_with_no_files_passes():
+    result = await run_tests([], "/nonexistent")
+    assert result.passed is True
+
+
+def test_git_changed_files_lists_modified_and_untracked():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = make_project(tmpdir)
+        subprocess.run(["git", "init", "-q"], cwd=tmpdir, check=True)
+        subprocess.run(["git", "add", "-A"], cwd=tmpdir, check=True)
+        subprocess.run(
+            ["git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init"],
+            cwd=tmpdir,
+            check=True,
+        )
+        write(root, "src/core.py", "def add(a, b):\n    return a - b\n")
+        write(root, "src/new.py", "")
+        assert sorted(git_changed_files(tmpdir)) == ["src/core.py", "src/new.py"]
+
+
+async def test_make_test_feedback_runs_affected_tests():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = make_project(tmpdir)
+        write(root, "src/core.py", "def add(a, b):\n    return a - b\n")
+        write(root, "src/service.py", "from core import add\n\ndef total(xs):\n    return 0\n")
+
+        feedback = make_test_feedback(changed_files=lambda cwd: ["src/service.py"])
+        text = await feedback(tmpdir)
+
+        assert "FAILING" in text
+        assert "test_service.py::test_total" in text
+
+        no_changes = make_test_feedback(changed_files=lambda cwd: [])
+        assert await no_changes(tmpdir) is None
+
+
+async def test_make_test_feedback_prefers_the_chunk_changes():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = make_project(tmpdir)
+        write(root, "src/service.py", "from core import add\n\ndef total(xs):\n    return 0\n")
+
+        def fallback(cwd):
+            raise AssertionError("git status is only the fallback")
+
+        feedback = make_test_feedback(changed_files=fallback)
+        text = await feedback(tmpdir, ["src/service.py"])
+        assert "test_service.py::test_total" in text
+        # A chunk that changed nothing runs no tests, whatever changed earlier
+        assert await feedback(tmpdir, []) is None
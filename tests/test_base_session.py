@@ -0,0 +1,120 @@
+"""Tests for base_session module."""
+
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from claude_agent_sdk.types import AssistantMessage, TextBlock, ToolUseBlock
+
+from base_session import (
+    BaseSession,
+    FirstEditCounter,
+    OVERVIEW_FILE,
+    build_changes_note,
+    ensure_base_session,
+    find_base_session,
+    record_base_session,
+)
+from baseline_cache import tree_hash
+from sdk_simulator import SdkSimulator, SimulatorConfig, set_simulator
+
+
+def init_repo(tmpdir: str) -> str:
+    Path(tmpdir, "app.py").write_text("print('hello')\n")
+    subprocess.run(["git", "init", "-q"], cwd=tmpdir, check=True)
+    subprocess.run(["git", "add", "-A"], cwd=tmpdir, check=True)
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init"],
+        cwd=tmpdir,
+        check=True,
+    )
+    return subprocess.run(["git", "rev-parse", "HEAD"], cwd=tmpdir, capture_output=True, text=True).stdout.strip()
+
+
+def make_session(tmpdir: str, commit: str, **kwargs) -> BaseSession:
+    return BaseSession("base-1", os.path.realpath(tmpdir), tree_hash(tmpdir), commit, **kwargs)
+
+
+def test_find_base_session_matches_unchanged_tree():
+    with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as cache_dir:
+        commit = init_repo(tmpdir)
+        record_base_session(make_session(tmpdir, commit), Path(cache_dir))
+
+        session = find_base_session(tmpdir, cache_dir=Path(cache_dir))
+
+        assert session.session_id == "base-1"
+        assert session.changed_files == []
+
+
+def test_find_base_session_lists_files_changed_since_exploration():
+    with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as cache_dir:
+        commit = init_repo(tmpdir)
+        record_base_session(make_session(tmpdir, commit), Path(cache_dir))
+        Path(tmpdir, "app.py").write_text("print('changed')\n")
+        Path(tmpdir, "new.py").write_text("")
+
+        session = find_base_session(tmpdir, cache_dir=Path(cache_dir))
+
+        assert session.changed_files == ["app.py", "new.py"]
+        assert "- new.py" in build_changes_note(session)
+
+
+def test_find_base_session_expires_when_tree_changes_enough():
+    with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as cache_dir:
+        commit = init_repo(tmpdir)
+        record_base_session(make_session(tmpdir, commit), Path(cache_dir))
+        for i in range(3):
+            Path(tmpdir, f"new_{i}.py").write_text("")
+
+        assert find_base_session(tmpdir, max_changed_files=2, cache_dir=Path(cache_dir)) is None
+        assert find_base_session(tmpdir, max_changed_files=3, cache_dir=Path(cache_dir)) is not None
+
+
+def test_find_base_session_expires_with_age_and_unknown_commits():
+    with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as cache_dir:
+        commit = init_repo(tmpdir)
+        record_base_session(make_session(tmpdir, commit, created_at=time.time() - 100), Path(cache_dir))
+        assert find_base_session(tmpdir, max_age_seconds=10, cache_dir=Path(cache_dir)) is None
+
+        record_base_session(make_session(tmpdir, "0" * 40), Path(cache_dir))
+        assert find_base_session(tmpdir, cache_dir=Path(cache_dir)) is None
+
+
+async def test_ensure_base_session_explores_once_then_reuses():
+    with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as cache_dir:
+        init_repo(tmpdir)
+        simulator = SdkSimulator(SimulatorConfig(complete_after_turns=3))
+        set_simulator(simulator)
+        os.environ["CLAUDE_SDK_BACKEND"] = "simulator"
+        try:
+            first = await ensure_base_session(tmpdir, max_turns=5, cache_dir=Path(cache_dir))
+            second = await ensure_base_session(tmpdir, max_turns=5, cache_dir=Path(cache_dir))
+        finally:
+            del os.environ["CLAUDE_SDK_BACKEND"]
+            set_simulator(None)
+
+        assert simulator.queries == 1
+        assert first.session_id == second.session_id
+        assert first.exploration_turns == 3
+        # The overview only ends the exploration; it is not left in the checkout
+        assert not Path(tmpdir, OVERVIEW_FILE).exists()
+
+
+async def test_ensure_base_session_skips_non_git_directories():
+    with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as cache_dir:
+        assert await ensure_base_session(tmpdir, cache_dir=Path(cache_dir)) is None
+
+
+def test_first_edit_counter_counts_turns_until_first_edit():
+    counter = FirstEditCounter()
+    for name in ["Glob", "Read", "Edit", "Read"]:
+        counter.observe(AssistantMessage(
+            content=[TextBlock(text="..."), ToolUseBlock(id="t", name=name, input={})], model="claude"
+        ))
+
+    assert counter.first_edit_turn == 3
@@ -0,0 +1,94 @@
+"""Tests for baseline_cache module."""
+
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from baseline_cache import (
+    baseline_key,
+    has_passing_baseline,
+    prune_cache,
+    record_baseline,
+    run_baseline_tests,
+)
+
+
+def init_repo(tmpdir: str) -> None:
+    Path(tmpdir, "uv.lock").write_text("lock v1")
+    Path(tmpdir, "test_sample.py").write_text("def test_ok():\n    assert True\n")
+    subprocess.run(["git", "init", "-q"], cwd=tmpdir, check=True)
+    subprocess.run(["git", "add", "-A"], cwd=tmpdir, check=True)
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init"],
+        cwd=tmpdir,
+        check=True,
+    )
+
+
+def test_baseline_key_changes_with_lock_file_and_dirty_tree():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        init_repo(tmpdir)
+        key = baseline_key(tmpdir)
+        assert key is not None
+
+        Path(tmpdir, "uv.lock").write_text("lock v2")
+        # Dirty tree is never cacheable
+        assert baseline_key(tmpdir) is None
+
+        subprocess.run(
+            ["git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qam", "bump"],
+            cwd=tmpdir,
+            check=True,
+        )
+        assert baseline_key(tmpdir) not in (None, key)
+
+
+def test_baseline_key_none_outside_git():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        assert baseline_key(tmpdir) is None
+
+
+def test_record_and_lookup():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = Path(cache_dir)
+        assert has_passing_baseline("abc", cache) is False
+        record_baseline("abc", True, 1.5, cache)
+        assert has_passing_baseline("abc", cache) is True
+        record_baseline("failed", False, 1.0, cache)
+        assert has_passing_baseline("failed", cache) is False
+
+
+def test_prune_cache_keeps_newest_entries():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = Path(cache_dir)
+        for i in range(5):
+            path = cache / f"key{i}.json"
+            path.write_text("{}")
+            os.utime(path, (i, i))
+        prune_cache(cache, max_entries=2)
+        assert sorted(p.name for p in cache.glob("*.json")) == ["key3.json", "key4.json"]
+
+
+def test_run_baseline_tests_skips_second_run_for_same_tree():
+    with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as cache_dir:
+        init_repo(tmpdir)
+        marker = Path(cache_dir) / "runs.txt"
+        command = [sys.executable, "-c", f"open({str(marker)!r}, 'a').write('run\\n')"]
+
+        assert run_baseline_tests(tmpdir, command, Path(cache_dir)) == 0
+        assert run_baseline_tests(tmpdir, command, Path(cache_dir)) == 0
+        assert marker.read_text().count("run") == 1
+
+
+def test_run_baseline_tests_does_not_cache_failures():
+    with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as cache_dir:
+        init_repo(tmpdir)
+        command = [sys.executable, "-c", "raise SystemExit(1)"]
+
+        assert run_baseline_tests(tmpdir, command, Path(cache_dir)) == 1
+        assert run_baseline_tests(tmpdir, command, Path(cache_dir)) == 1
+        assert list(Path(cache_dir).glob("*.json")) == []
@@ -0,0 +1,136 @@
+"""Tests for budget module."""
+
+import tempfile
+from pathlib import Path
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from budget import BudgetGovernor, BUDGET_FILE, BUDGET_OK, BUDGET_SOFT, BUDGET_HARD
+from claude_agent_sdk.types import AssistantMessage, ResultMessage, TextBlock
+
+
+def make_result(cost: float, input_tokens: int = 100, output_tokens: int = 50) -> ResultMessage:
+    return ResultMessage(
+        subtype="success",
+        duration_ms=1000,
+        duration_api_ms=900,
+        is_error=False,
+        num_turns=1,
+        session_id="session-1",
+        total_cost_usd=cost,
+        usage={"input_tokens": input_tokens, "output_tokens": output_tokens},
+    )
+
+
+def test_record_adds_cost_and_tokens_per_call_type():
+    budget = BudgetGovernor()
+    budget.record("implement", make_result(0.5))
+    budget.record("implement", make_result(0.25))
+    budget.record("chunk_summary", make_result(0.01, 10, 5))
+
+    assert budget.usage["implement"].calls == 2
+    assert budget.usage["implement"].cost_usd == 0.75
+    assert budget.usage["chunk_summary"].total_tokens == 15
+    assert budget.total_cost_usd == 0.76
+    assert budget.total_tokens == 315
+
+
+def test_record_ignores_non_result_messages():
+    budget = BudgetGovernor()
+    budget.record("implement", {"type": "message"})
+    assert budget.usage == {}
+    assert budget.total_cost_usd == 0
+
+
+def test_record_handles_missing_cost_and_usage():
+    budget = BudgetGovernor()
+    message = make_result(0.0)
+    message.total_cost_usd = None
+    message.usage = None
+    budget.record("implement", message)
+    assert budget.usage["implement"].calls == 1
+    assert budget.total_cost_usd == 0
+
+
+def test_record_usage_adds_usage_without_a_result_message():
+    budget = BudgetGovernor()
+    budget.record_usage("chunk_summary", 0.002, input_tokens=800, output_tokens=120)
+    budget.record_usage("chunk_summary", 0.001)
+    usage = budget.usage["chunk_summary"]
+    assert usage.calls == 2
+    assert usage.cost_usd == 0.003
+    assert usage.total_tokens == 920
+
+
+def test_state_transitions_through_soft_and_hard_limits():
+    budget = BudgetGovernor(soft_limit_usd=1.0, hard_limit_usd=2.0)
+    assert budget.state == BUDGET_OK
+    assert budget.remaining_usd == 2.0
+
+    budget.record("implement", make_result(1.2))
+    assert budget.state == BUDGET_SOFT
+
+    budget.record("implement", make_result(1.0))
+    assert budget.state == BUDGET_HARD
+    assert budget.remaining_usd == 0.0
+
+
+def test_no_limits_never_leaves_ok_state():
+    budget = BudgetGovernor()
+    budget.record("implement", make_result(1000.0))
+    assert budget.state == BUDGET_OK
+    assert budget.remaining_usd is None
+
+
+def test_format_breakdown_lists_call_types_and_total():
+    budget = BudgetGovernor()
+    budget.record("implement", make_result(0.5))
+    budget.record("final_summary", make_result(0.02))
+    breakdown = budget.format_breakdown()
+    assert "| implement | 1 |" in breakdown
+    assert "| final_summary | 1 |" in breakdown
+    assert "$0.5200" in breakdown
+
+
+def test_breakdown_reports_model_and_average_latency():
+    budget = BudgetGovernor()
+    budget.record("chunk_summary", AssistantMessage(content=[TextBlock(text="ok")], model="claude-haiku"))
+    budget.record("chunk_summary", make_result(0.01))
+    budget.record("chunk_summary", make_result(0.01))
+    budget.record_usage("pr_description", 0.002, 10, 5, duration_ms=500, model="haiku")
+
+    assert budget.usage["chunk_summary"].model == "claude-haiku"
+    assert budget.usage["chunk_summary"].average_latency_s == 1.0
+    breakdown = budget.format_breakdown()
+    assert "| chunk_summary | 2 | claude-haiku | 300 | 1.0 | $0.0200 |" in breakdown
+    assert "| pr_description | 1 | haiku | 15 | 0.5 | $0.0020 |" in breakdown
+
+
+def test_from_dict_accepts_usage_without_latency():
+    budget = BudgetGovernor.from_dict({"usage": {"implement": {"calls": 1, "cost_usd": 0.5}}})
+    assert budget.usage["implement"].duration_ms == 0
+    assert budget.usage["implement"].model is None
+
+
+def test_save_and_load_round_trip():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        budget = BudgetGovernor(soft_limit_usd=1.0, hard_limit_usd=3.0)
+        budget.record("implement", make_result(0.5))
+        budget.save(tmpdir)
+        assert (Path(tmpdir) / BUDGET_FILE).exists()
+
+        loaded = BudgetGovernor.load(tmpdir)
+        assert loaded.hard_limit_usd == 3.0
+        assert loaded.total_cost_usd == 0.5
+        assert loaded.usage["implement"].input_tokens == 100
+
+
+def test_load_falls_back_to_env(monkeypatch):
+    monkeypatch.setenv("BUDGET_SOFT_LIMIT_USD", "1.5")
+    monkeypatch.setenv("BUDGET_HARD_LIMIT_USD", "invalid")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        budget = BudgetGovernor.load(tmpdir)
+        assert budget.soft_limit_usd == 1.5
+        assert budget.hard_limit_usd is None
@@ -0,0 +1,161 @@
+"""Tests for change_tracker module."""
+
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from change_tracker import (
+    CHANGES_FILE,
+    STATUS_ADDED,
+    STATUS_DELETED,
+    STATUS_MODIFIED,
+    ChangeSet,
+    ChangeTracker,
+    FileChange,
+    line_stats,
+    load_changes,
+)
+
+
+def test_line_stats():
+    assert line_stats("a\nb\nc\n", "a\nB\nc\nd\n") == (2, 1)
+    assert line_stats("", "x\ny\n") == (2, 0)
+
+
+def test_tracker_reports_added_modified_and_deleted_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        (root / "src").mkdir()
+        (root / "src" / "app.py").write_text("one\ntwo\n")
+        (root / "old.txt").write_text("bye\n")
+
+        tracker = ChangeTracker(tmpdir)
+        tracker.start()
+        assert not tracker.update()
+
+        (root / "src" / "app.py").write_text("one\n2\nthree\n")
+        (root / "new.py").write_text("x = 1\n")
+        (root / "old.txt").unlink()
+        changes = tracker.update()
+
+        assert {change.path: change.status for change in changes.changes} == {
+            "new.py": STATUS_ADDED,
+            "old.txt": STATUS_DELETED,
+            "src/app.py": STATUS_MODIFIED,
+        }
+        app = next(change for change in changes.changes if change.path == "src/app.py")
+        assert (app.added_lines, app.removed_lines) == (2, 1)
+        assert not tracker.update()
+
+
+def test_tracker_skips_run_state_and_cache_dirs():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        tracker = ChangeTracker(tmpdir)
+        tracker.start()
+
+        (root / ".claude-complete").write_text("DONE")
+        (root / "__pycache__").mkdir()
+        (root / "__pycache__" / "x.pyc").write_bytes(b"\0\1")
+        (root / ".github").mkdir()
+        (root / ".github" / "ci.yml").write_text("on: push\n")
+
+        assert tracker.update().paths == [".github/ci.yml"]
+
+
+def test_tracker_only_rehashes_files_with_new_mtime_or_size():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        for i in range(5):
+            (root / f"f{i}.py").write_text(f"v{i}\n")
+        tracker = ChangeTracker(tmpdir)
+        tracker.start()
+
+        (root / "f3.py").write_text("changed\n")
+        with patch("change_tracker._read_file", wraps=__import__("change_tracker")._read_file) as read:
+            changes = tracker.update()
+        assert changes.paths == ["f3.py"]
+        assert [call.args[0].name for call in read.call_args_list] == ["f3.py"]
+
+
+def test_rescanning_changed_files_keeps_text_cache_bounded():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "app.py"
+        path.write_text("x" * 30 + "\n")
+        tracker = ChangeTracker(tmpdir, max_cached_bytes=100)
+        tracker.start()
+
+        for i in range(10):
+            path.write_text(f"{i}\n" + "x" * 30 + "\n")
+            [change] = tracker.update().changes
+            # Replaced texts no longer count, so the new text is still cached
+            assert change.added_lines is not None
+
+        # The baseline and the latest text
+        assert tracker._cached_bytes == 31 + 33
+        path.unlink()
+        tracker.update()
+        assert tracker._cached_bytes == 31
+
+
+def test_touched_but_identical_file_is_not_a_change():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "app.py"
+        path.write_text("same\n")
+        tracker = ChangeTracker(tmpdir)
+        tracker.start()
+        os.utime(path, ns=(1, 1))
+        assert not tracker.update()
+
+
+def test_binary_files_have_no_line_stats():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tracker = ChangeTracker(tmpdir)
+        tracker.start()
+        (Path(tmpdir) / "logo.png").write_bytes(b"\x89PNG\0\0data")
+        changes = tracker.update()
+        assert changes.changes == [FileChange("logo.png", STATUS_ADDED)]
+        assert changes.format_markdown() == "- `logo.png` (added)"
+
+
+def test_cumulative_changes_and_save_round_trip():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        (root / "app.py").write_text("a\n")
+        tracker = ChangeTracker(tmpdir)
+        tracker.start()
+
+        (root / "app.py").write_text("a\nb\n")
+        tracker.update()
+        (root / "app.py").write_text("a\nb\nc\n")
+        (root / "tmp.py").write_text("x\n")
+        tracker.update()
+        (root / "tmp.py").unlink()
+        tracker.update()
+
+        cumulative = tracker.cumulative()
+        assert cumulative.format_markdown() == "- `app.py` (+2 -0)"
+
+        tracker.save()
+        assert (root / CHANGES_FILE).exists()
+        loaded = load_changes(tmpdir)
+        assert loaded.paths == ["app.py"]
+        assert loaded.added_lines == 2
+
+
+def test_load_changes_missing_file():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        assert load_changes(tmpdir) is None
+
+
+def test_change_set_format_markdown():
+    changes = ChangeSet([
+        FileChange("a.py", STATUS_MODIFIED, 3, 1),
+        FileChange("b.py", STATUS_ADDED, 10, 0),
+    ])
+    assert changes.format_markdown() == "- `a.py` (+3 -1)\n- `b.py` (added, +10 -0)"
+    assert ChangeSet().format_markdown() == "No file changes."
@@ -1,5 +1,9 @@
 """Tests for claude_runner module."""
 
+import asyncio
+import json
+
+import anyio
 import pytest
 from unittest.mock import patch
 import tempfile
@@ -13,6 +17,7 @@ from claude_runner import (
     build_prompt,
     build_pr_description_prompt,
     build_continuation_prompt,
+    build_lean_prompt,
     build_plan_prompt,
     build_plan_continuation_prompt,
     get_options,
@@ -20,6 +25,11 @@ from claude_runner import (
     run_summary_agent,
     run_claude_chunked,
     run_claude_plan_chunked,
+    run_claude_single,
+    run_pr_description,
+    description_write_hooks,
+    save_session_id,
+    load_session_id,
     is_complete,
     is_plan_complete,
     cleanup_completion_marker,
@@ -27,11 +37,51 @@ from claude_runner import (
     extract_turn_summary,
     build_chunk_summary_prompt,
     build_final_summary_prompt,
+    stream_until,
+    timeout_from_env,
+    run_chunk_engine,
+    ChunkStrategy,
+    IMPLEMENT_STRATEGY,
+    PLAN_STRATEGY,
+    CancellationToken,
+    StreamInterrupted,
     FILE_EDITING_TOOLS,
     COMPLETION_MARKER,
     PLAN_FILE,
+    PR_DESCRIPTION_FILE,
+    SESSION_FILE,
+    STOP_CANCELLED,
+    STOP_RUN_TIMEOUT,
+    STOP_CHUNK_TIMEOUT,
+    STOP_BUDGET,
+    STOP_NO_CHANGES,
+    STOP_STALLED,
+    CALL_IMPLEMENT,
+    CALL_FINAL_SUMMARY,
+    CALL_PR_DESCRIPTION,
+    CALL_CHUNK_SUMMARY,
+    CALL_PLAN,
+    CallRoute,
+    FAST_MODEL,
+    load_routes,
+    set_routes,
+    route_for,
+)
+from budget import BudgetGovernor
+from change_tracker import ChangeTracker
+from stall_detector import StallDetector
+from code_search import CodeSearchIndex, SEARCH_TOOLS, SERVER_NAME as SEARCH_SERVER_NAME
+from symbol_index import SymbolIndex, SYMBOL_TOOLS, SERVER_NAME as SYMBOL_SERVER_NAME
+from triage import TIER_SETTINGS, TIER_TRIVIAL
+from claude_agent_sdk.types import (
+    SystemMessage,
+    ResultMessage,
+    AssistantMessage,
+    UserMessage,
+    TextBlock,
+    ToolUseBlock,
+    ToolResultBlock,
 )
-from claude_agent_sdk.types import SystemMessage
 
 
 # build_prompt tests
@@ -138,6 +188,49 @@ def test_get_options_defaults_to_file_editing_tools():
     assert options.allowed_tools == FILE_EDITING_TOOLS
 
 
+def test_get_options_with_search_index_replaces_glob_and_grep():
+    with tempfile.TemporaryDirectory() as tmpdir, patch("claude_runner.create_search_server", return_value="server"):
+        options = get_options(tmpdir, search_index=CodeSearchIndex(tmpdir))
+    assert options.mcp_servers == {SEARCH_SERVER_NAME: "server"}
+    assert options.disallowed_tools == ["Glob", "Grep"]
+    assert options.allowed_tools == ["Read", "Edit", "Write"] + SEARCH_TOOLS
+    assert "PostToolUse" in options.hooks
+
+
+def test_get_options_with_search_index_can_keep_builtin_search():
+    with tempfile.TemporaryDirectory() as tmpdir, patch("claude_runner.create_search_server", return_value="server"):
+        options = get_options(tmpdir, search_index=CodeSearchIndex(tmpdir), prefer_indexed_search=False)
+    assert options.disallowed_tools == []
+    assert options.allowed_tools == FILE_EDITING_TOOLS + SEARCH_TOOLS
+
+
+def test_get_options_with_symbol_index_adds_symbol_tools():
+    with tempfile.TemporaryDirectory() as tmpdir, patch("claude_runner.create_symbol_server", return_value="symbols"):
+        options = get_options(tmpdir, symbol_index=SymbolIndex(tmpdir))
+    assert options.mcp_servers == {SYMBOL_SERVER_NAME: "symbols"}
+    assert options.allowed_tools == FILE_EDITING_TOOLS + SYMBOL_TOOLS
+    assert options.disallowed_tools == []
+    assert len(options.hooks["PostToolUse"]) == 1
+
+
+def test_get_options_combines_search_and_symbol_indexes():
+    with (
+        tempfile.TemporaryDirectory() as tmpdir,
+        patch("claude_runner.create_search_server", return_value="search"),
+        patch("claude_runner.create_symbol_server", return_value="symbols"),
+    ):
+        options = get_options(tmpdir, search_index=CodeSearchIndex(tmpdir), symbol_index=SymbolIndex(tmpdir))
+    assert options.mcp_servers == {SEARCH_SERVER_NAME: "search", SYMBOL_SERVER_NAME: "symbols"}
+    assert options.allowed_tools == ["Read", "Edit", "Write"] + SEARCH_TOOLS + SYMBOL_TOOLS
+    assert len(options.hooks["PostToolUse"]) == 2
+
+
+def test_get_options_without_search_index_has_no_mcp_servers():
+    options = get_options()
+    assert options.mcp_servers == {}
+    assert options.hooks is None
+
+
 # extract_session_id tests
 
 def test_extract_session_id_from_init_message():
@@ -192,6 +285,28 @@ async def test_run_claude_yields_all_messages():
         assert messages[2]["content"] == "Third"
 
 
+async def test_run_claude_streams_prompt_with_search_index():
+    prompts = []
+
+    async def mock_query(*args, prompt, **kwargs):
+        prompts.append(prompt)
+        yield {"type": "message"}
+
+    with (
+        tempfile.TemporaryDirectory() as tmpdir,
+        patch("claude_runner.query", mock_query),
+        patch("claude_runner.create_search_server", return_value="server"),
+    ):
+        async for _ in run_claude("Plain prompt", tmpdir):
+            pass
+        async for _ in run_claude("Indexed prompt", tmpdir, search_index=CodeSearchIndex(tmpdir)):
+            pass
+
+    assert prompts[0] == "Plain prompt"
+    streamed = [message async for message in prompts[1]]
+    assert streamed[0]["message"] == {"role": "user", "content": "Indexed prompt"}
+
+
 # build_prompt completion signal tests
 
 def test_build_prompt_includes_completion_signal():
@@ -353,6 +468,28 @@ def test_build_plan_prompt_includes_issue_content():
     assert "My Body" in result
 
 
+def test_build_prompts_mention_symbol_tools_only_when_offered():
+    for build in (build_prompt, build_lean_prompt, build_plan_prompt):
+        assert "find_definition" not in build("My Title", "My Body", "/test/dir")
+        result = build("My Title", "My Body", "/test/dir", symbol_tools=True)
+        assert "find_definition" in result
+        assert "file_outline" in result
+        assert result.endswith("My Body")
+
+
+def test_build_prompts_name_indexed_search_tools_only_when_offered():
+    for build in (build_prompt, build_lean_prompt, build_plan_prompt):
+        assert "Glob" in build("My Title", "My Body", "/test/dir")
+        result = build("My Title", "My Body", "/test/dir", search_tools=True)
+        assert "find_files" in result and "search_code" in result
+        assert "Glob" not in result and "Grep" not in result
+    for build in (build_continuation_prompt, build_plan_continuation_prompt):
+        assert "Glob" in build("My Title", "My Body", "/test/dir")
+        result = build("My Title", "My Body", "/test/dir", search_tools=True)
+        assert "find_files" in result and "search_code" in result
+        assert "Glob" not in result and "Grep" not in result
+
+
 def test_build_plan_prompt_handles_empty_body():
     result = build_plan_prompt("Title Only", "", "/test/dir")
     assert "# Title Only" in result
@@ -469,6 +606,24 @@ def test_extract_turn_summary_with_empty_messages():
     assert result == "No significant activity recorded"
 
 
+def test_extract_turn_summary_with_tool_use_blocks():
+    messages = [
+        AssistantMessage(
+            content=[
+                TextBlock(text="Let me look at the handler"),
+                ToolUseBlock(id="t1", name="Read", input={"file_path": "/repo/src/app.py"}),
+            ],
+            model="claude",
+        ),
+        AssistantMessage(
+            content=[ToolUseBlock(id="t2", name="Edit", input={"file_path": "/repo/src/app.py"})],
+            model="claude",
+        ),
+    ]
+    result = extract_turn_summary(messages)
+    assert result == "- Note: Let me look at the handler...\n- Read app.py\n- Modified app.py"
+
+
 def test_build_chunk_summary_prompt_includes_title():
     messages = []
     prompt = build_chunk_summary_prompt("Test Title", "Test Body", messages, 0, "/tmp")
@@ -514,7 +669,7 @@ async def test_run_summary_agent_uses_unrestricted_tools():
     with tempfile.TemporaryDirectory() as tmpdir:
         captured_allowed_tools = None
 
-        async def mock_run_claude(prompt, cwd, max_turns, allowed_tools=None):
+        async def mock_run_claude(prompt, cwd, max_turns, allowed_tools=None, model=None):
             nonlocal captured_allowed_tools
             captured_allowed_tools = allowed_tools
             # Return a mock AssistantMessage with text in content blocks
@@ -627,3 +782,1248 @@ async def test_run_claude_chunked_with_callbacks():
 
                 # Should have called final callback
                 assert len(final_calls) == 1
+
+
+# Cancellation and wall-clock budget tests
+
+async def test_stream_until_yields_all_messages_without_limits():
+    async def stream():
+        for i in range(3):
+            yield i
+
+    messages = [msg async for msg in stream_until(stream())]
+    assert messages == [0, 1, 2]
+
+
+async def test_stream_until_closes_stream_on_deadline():
+    closed = False
+
+    async def stream():
+        nonlocal closed
+        try:
+            yield "first"
+            await asyncio.sleep(10)
+            yield "never"
+        finally:
+            closed = True
+
+    messages = []
+    deadline = asyncio.get_running_loop().time() + 0.05
+    with pytest.raises(StreamInterrupted) as exc_info:
+        async for msg in stream_until(stream(), deadline):
+            messages.append(msg)
+
+    assert messages == ["first"]
+    assert exc_info.value.reason == STOP_CHUNK_TIMEOUT
+    assert closed
+
+
+async def test_stream_until_stops_on_cancellation():
+    token = CancellationToken()
+
+    async def stream():
+        yield "first"
+        await asyncio.sleep(10)
+        yield "never"
+
+    with pytest.raises(StreamInterrupted) as exc_info:
+        async for msg in stream_until(stream(), cancel_token=token):
+            token.cancel()
+
+    assert exc_info.value.reason == STOP_CANCELLED
+
+
+def task_group_stream(closed: list | None = None, delay: float = 10):
+    """A stream that holds an anyio task group open, like the SDK's query()."""
+
+    async def stream():
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(anyio.sleep_forever)
+            try:
+                yield "first"
+                await anyio.sleep(delay)
+                yield "second"
+            finally:
+                if closed is not None:
+                    closed.append(True)
+                tg.cancel_scope.cancel()
+
+    return stream()
+
+
+async def test_stream_until_reads_task_group_stream_in_consumer_task():
+    messages = [msg async for msg in stream_until(task_group_stream(delay=0))]
+    assert messages == ["first", "second"]
+
+
+async def test_stream_until_stops_task_group_stream_on_deadline():
+    closed = []
+    messages = []
+    deadline = asyncio.get_running_loop().time() + 0.05
+    with pytest.raises(StreamInterrupted) as exc_info:
+        async for msg in stream_until(task_group_stream(closed), deadline):
+            messages.append(msg)
+
+    assert messages == ["first"]
+    assert exc_info.value.reason == STOP_CHUNK_TIMEOUT
+    assert closed == [True]
+
+
+async def test_stream_until_cancellation_interrupts_pending_task_group_read():
+    token = CancellationToken()
+    closed = []
+    asyncio.get_running_loop().call_later(0.05, token.cancel, STOP_BUDGET)
+
+    with pytest.raises(StreamInterrupted) as exc_info:
+        async for msg in stream_until(task_group_stream(closed), cancel_token=token):
+            pass
+
+    assert exc_info.value.reason == STOP_BUDGET
+    assert closed == [True]
+
+
+def test_cancellation_token_keeps_first_reason():
+    token = CancellationToken()
+    assert token.cancelled is False
+    token.cancel("first")
+    token.cancel("second")
+    assert token.cancelled is True
+    assert token.reason == "first"
+
+
+def test_timeout_from_env(monkeypatch):
+    monkeypatch.setenv("TEST_TIMEOUT", "12.5")
+    assert timeout_from_env("TEST_TIMEOUT") == 12.5
+    monkeypatch.setenv("TEST_TIMEOUT", "not-a-number")
+    assert timeout_from_env("TEST_TIMEOUT") is None
+    monkeypatch.setenv("TEST_TIMEOUT", "0")
+    assert timeout_from_env("TEST_TIMEOUT") is None
+    monkeypatch.delenv("TEST_TIMEOUT")
+    assert timeout_from_env("TEST_TIMEOUT") is None
+
+
+async def test_run_claude_chunked_chunk_timeout_resumes_next_chunk():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        call_count = 0
+
+        async def mock_query(prompt, options):
+            nonlocal call_count
+            call_count += 1
+            if call_count == 1:
+                yield SystemMessage(subtype="init", data={"session_id": "slow-session"})
+                # Simulate a hung tool call
+                await asyncio.sleep(10)
+            (Path(tmpdir) / COMPLETION_MARKER).write_text("DONE")
+            yield {"type": "message", "content": "done", "resume": options.resume}
+
+        with patch("claude_runner.query", mock_query):
+            messages = []
+            async for msg in run_claude_chunked("Title", "Body", tmpdir, max_chunks=3, chunk_timeout=0.05):
+                messages.append(msg)
+
+        assert call_count == 2
+        assert messages[-1]["resume"] == "slow-session"
+
+
+async def test_run_claude_chunked_run_timeout_reports_partial_results():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        closed = False
+        chunk_calls = []
+        final_calls = []
+
+        async def mock_query(*args, **kwargs):
+            nonlocal closed
+            try:
+                yield {"type": "message", "content": "work"}
+                await asyncio.sleep(10)
+            finally:
+                closed = True
+
+        async def mock_summary_agent(*args, **kwargs):
+            raise AssertionError("Summary agent should not run after the run deadline")
+
+        async def on_chunk(chunk_num, summary):
+            chunk_calls.append(chunk_num)
+
+        async def on_final(summaries):
+            final_calls.append(summaries)
+
+        token = CancellationToken()
+        with patch("claude_runner.query", mock_query):
+            with patch("claude_runner.run_summary_agent", mock_summary_agent):
+                async for _ in run_claude_chunked(
+                    "Title",
+                    "Body",
+                    tmpdir,
+                    max_chunks=3,
+                    on_chunk_complete=on_chunk,
+                    on_final_complete=on_final,
+                    run_timeout=0.05,
+                    cancel_token=token,
+                ):
+                    pass
+
+        assert closed
+        assert chunk_calls == [0]
+        assert len(final_calls) == 1
+        assert token.reason == STOP_RUN_TIMEOUT
+
+
+async def test_run_claude_chunked_cancellation_stops_and_closes_stream():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        call_count = 0
+        closed = False
+        final_calls = []
+
+        async def mock_query(*args, **kwargs):
+            nonlocal call_count, closed
+            call_count += 1
+            try:
+                yield {"type": "message", "content": "work"}
+                await asyncio.sleep(10)
+            finally:
+                closed = True
+
+        async def on_chunk(chunk_num, summary):
+            pass
+
+        async def on_final(summaries):
+            final_calls.append(summaries)
+
+        token = CancellationToken()
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_chunked(
+                "Title",
+                "Body",
+                tmpdir,
+                max_chunks=3,
+                on_chunk_complete=on_chunk,
+                on_final_complete=on_final,
+                cancel_token=token,
+            ):
+                token.cancel()
+
+        assert call_count == 1
+        assert closed
+        assert len(final_calls) == 1
+        assert token.reason == STOP_CANCELLED
+
+
+async def test_run_claude_plan_chunked_honours_cancellation():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        call_count = 0
+
+        async def mock_query(*args, **kwargs):
+            nonlocal call_count
+            call_count += 1
+            yield {"type": "message", "content": "exploring"}
+            await asyncio.sleep(10)
+
+        token = CancellationToken()
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_plan_chunked("Title", "Body", tmpdir, max_chunks=3, cancel_token=token):
+                token.cancel()
+
+        assert call_count == 1
+
+
+# Budget governor integration tests
+
+def make_result_message(cost: float) -> ResultMessage:
+    return ResultMessage(
+        subtype="success",
+        duration_ms=1000,
+        duration_api_ms=900,
+        is_error=False,
+        num_turns=1,
+        session_id="session-1",
+        total_cost_usd=cost,
+        usage={"input_tokens": 100, "output_tokens": 50},
+    )
+
+
+def test_get_options_accepts_max_budget():
+    options = get_options(max_budget_usd=1.5)
+    assert options.max_budget_usd == 1.5
+
+
+@pytest.fixture
+def reset_routes():
+    set_routes(None)
+    yield
+    set_routes(None)
+
+
+def test_get_options_sets_model_only_when_given():
+    assert get_options().model is None
+    assert get_options(model="haiku").model == "haiku"
+
+
+def test_default_routes_send_lightweight_calls_to_fast_model(reset_routes, monkeypatch):
+    monkeypatch.delenv("MODEL_ROUTES_FILE", raising=False)
+    routes = load_routes()
+    assert routes[CALL_IMPLEMENT] == CallRoute()
+    assert routes[CALL_PLAN] == CallRoute()
+    assert routes[CALL_CHUNK_SUMMARY] == CallRoute(FAST_MODEL, 3)
+    assert routes[CALL_FINAL_SUMMARY].model == FAST_MODEL
+    assert routes[CALL_PR_DESCRIPTION].model == FAST_MODEL
+    assert route_for("unknown") == CallRoute()
+
+
+def test_load_routes_applies_file_then_environment(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "routes.json"
+        path.write_text(json.dumps({
+            "implement": {"model": "opus", "max_turns": 20},
+            "chunk_summary": {"model": "default"},
+            "triage": {"model": "haiku", "max_turns": 1},
+        }))
+        monkeypatch.setenv("MODEL_ROUTES_FILE", str(path))
+        monkeypatch.setenv("MODEL_IMPLEMENT", "sonnet")
+        monkeypatch.setenv("MAX_TURNS_PR_DESCRIPTION", "5")
+        monkeypatch.setenv("MAX_TURNS_FINAL_SUMMARY", "many")
+
+        routes = load_routes()
+
+    assert routes[CALL_IMPLEMENT] == CallRoute("sonnet", 20)
+    assert routes[CALL_CHUNK_SUMMARY] == CallRoute(None, 3)
+    assert routes["triage"] == CallRoute("haiku", 1)
+    assert routes[CALL_PR_DESCRIPTION] == CallRoute(FAST_MODEL, 5)
+    assert routes[CALL_FINAL_SUMMARY] == CallRoute(FAST_MODEL, 3)
+
+
+def test_load_routes_names_the_variable_of_an_invalid_override(monkeypatch, capsys):
+    monkeypatch.delenv("MODEL_ROUTES_FILE", raising=False)
+    monkeypatch.setenv("MODEL_IMPLEMENT", "opus")
+    monkeypatch.setenv("MAX_TURNS_IMPLEMENT", "many")
+
+    assert load_routes()[CALL_IMPLEMENT] == CallRoute("opus")
+    assert "from MAX_TURNS_IMPLEMENT" in capsys.readouterr().out
+
+
+def test_route_turns_only_lower_the_callers_turns():
+    assert CallRoute(max_turns=20).turns(5) == 5
+    assert CallRoute(max_turns=3).turns(5) == 3
+    assert CallRoute(max_turns=3).turns(None) == 3
+    assert CallRoute().turns(5) == 5
+
+
+def test_load_routes_ignores_unreadable_file(monkeypatch):
+    monkeypatch.setenv("MODEL_ROUTES_FILE", "/nonexistent/routes.json")
+    assert load_routes()[CALL_CHUNK_SUMMARY] == CallRoute(FAST_MODEL, 3)
+
+
+async def test_run_summary_agent_uses_routed_model(reset_routes):
+    set_routes({CALL_FINAL_SUMMARY: CallRoute("haiku", 2)})
+    captured = []
+
+    async def mock_query(prompt, options):
+        captured.append(options)
+        yield AssistantMessage(content=[TextBlock(text="Summary")], model="claude-haiku")
+        yield make_result_message(0.01)
+
+    budget = BudgetGovernor()
+    with tempfile.TemporaryDirectory() as tmpdir, patch("claude_runner.query", mock_query):
+        result = await run_summary_agent("prompt", tmpdir, budget=budget, call_type=CALL_FINAL_SUMMARY)
+
+    assert result == "Summary"
+    assert captured[0].model == "haiku"
+    assert captured[0].max_turns == 2
+    assert budget.usage[CALL_FINAL_SUMMARY].model == "claude-haiku"
+
+
+async def test_run_claude_chunked_uses_implement_route(reset_routes):
+    set_routes({CALL_IMPLEMENT: CallRoute("opus", 4)})
+    captured = []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        async def mock_query(prompt, options):
+            captured.append(options)
+            (Path(tmpdir) / COMPLETION_MARKER).touch()
+            yield make_result_message(0.01)
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_chunked("Title", "Body", tmpdir, turns_per_chunk=10):
+                pass
+
+    assert captured[0].model == "opus"
+    assert captured[0].max_turns == 4
+
+
+async def test_run_claude_single_keeps_tier_turns_below_the_route_cap(reset_routes):
+    settings = TIER_SETTINGS[TIER_TRIVIAL]
+    set_routes({CALL_IMPLEMENT: CallRoute("opus", settings.max_turns + 10)})
+    captured = []
+
+    async def mock_query(prompt, options):
+        captured.append(options)
+        yield make_result_message(0.01)
+
+    with tempfile.TemporaryDirectory() as tmpdir, patch("claude_runner.query", mock_query):
+        [m async for m in run_claude_single("Title", "Body", tmpdir, max_turns=settings.max_turns)]
+
+    assert captured[0].model == "opus"
+    assert captured[0].max_turns == settings.max_turns
+
+
+async def test_run_claude_chunked_stops_at_hard_budget():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        captured_options = []
+        final_calls = []
+
+        async def mock_query(prompt, options):
+            captured_options.append(options)
+            yield make_result_message(0.6)
+
+        async def on_chunk(chunk_num, summary):
+            pass
+
+        async def on_final(summaries):
+            final_calls.append(summaries)
+
+        async def mock_summary_agent(*args, **kwargs):
+            return "LLM summary"
+
+        budget = BudgetGovernor(hard_limit_usd=1.0)
+        token = CancellationToken()
+        with patch("claude_runner.query", mock_query):
+            with patch("claude_runner.run_summary_agent", mock_summary_agent):
+                async for _ in run_claude_chunked(
+                    "Title",
+                    "Body",
+                    tmpdir,
+                    max_chunks=5,
+                    on_chunk_complete=on_chunk,
+                    on_final_complete=on_final,
+                    cancel_token=token,
+                    budget=budget,
+                ):
+                    pass
+
+        # Second chunk pushes cost past the hard limit, so the run stops there
+        assert len(captured_options) == 2
+        assert captured_options[0].max_budget_usd == 1.0
+        assert captured_options[1].max_budget_usd == 0.4
+        assert budget.usage[CALL_IMPLEMENT].calls == 2
+        assert token.reason == STOP_BUDGET
+        assert len(final_calls) == 1
+
+
+def exhausted_budget() -> BudgetGovernor:
+    budget = BudgetGovernor(hard_limit_usd=1.0)
+    budget.record_usage(CALL_PLAN, 1.0, 0, 0)
+    return budget
+
+
+async def test_exhausted_budget_starts_no_sessions():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        calls = []
+
+        async def mock_query(prompt, options):
+            calls.append(options)
+            yield make_result_message(0.1)
+
+        save_session_id(tmpdir, "impl-session")
+        chunked_token = CancellationToken()
+        single_token = CancellationToken()
+        with patch("claude_runner.query", mock_query):
+            [m async for m in run_claude_chunked(
+                "Title", "Body", tmpdir, cancel_token=chunked_token, budget=exhausted_budget()
+            )]
+            [m async for m in run_claude_single(
+                "Title", "Body", tmpdir, cancel_token=single_token, budget=exhausted_budget()
+            )]
+            [m async for m in run_pr_description("Title", "Body", "diff", 7, tmpdir, budget=exhausted_budget())]
+
+        assert calls == []
+        assert chunked_token.reason == STOP_BUDGET
+        assert single_token.reason == STOP_BUDGET
+
+
+async def test_run_claude_chunked_soft_budget_uses_local_summaries():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        summary_agent_calls = 0
+        summaries = []
+
+        async def mock_query(*args, **kwargs):
+            yield make_result_message(0.6)
+
+        async def mock_summary_agent(*args, **kwargs):
+            nonlocal summary_agent_calls
+            summary_agent_calls += 1
+            return "LLM summary"
+
+        async def on_chunk(chunk_num, summary):
+            summaries.append(summary)
+
+        budget = BudgetGovernor(soft_limit_usd=0.5)
+        with patch("claude_runner.query", mock_query):
+            with patch("claude_runner.run_summary_agent", mock_summary_agent):
+                async for _ in run_claude_chunked(
+                    "Title", "Body", tmpdir, max_chunks=2, on_chunk_complete=on_chunk, budget=budget
+                ):
+                    pass
+
+        assert summary_agent_calls == 0
+        assert summaries == ["No significant activity recorded"] * 2
+
+
+async def test_run_summary_agent_records_budget():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        async def mock_run_claude(*args, **kwargs):
+            yield make_result_message(0.02)
+
+        budget = BudgetGovernor()
+        with patch("claude_runner.run_claude", mock_run_claude):
+            await run_summary_agent("Prompt", tmpdir, budget=budget, call_type=CALL_FINAL_SUMMARY)
+
+        assert budget.usage[CALL_FINAL_SUMMARY].cost_usd == 0.02
+
+
+# Model invocation count tests
+
+@pytest.mark.parametrize(
+    "with_chunk_callback, with_final_complete, with_final_summary, expected_calls",
+    [
+        # 2 chunks, no summaries requested
+        (False, False, False, 2),
+        # 2 chunks + 2 chunk summaries
+        (True, False, False, 4),
+        # on_final_complete alone must not start a final summary session
+        (True, True, False, 4),
+        # Only a final summary consumer triggers the extra session
+        (True, True, True, 5),
+        (True, False, True, 5),
+    ],
+)
+async def test_run_claude_chunked_model_invocations(
+    with_chunk_callback, with_final_complete, with_final_summary, expected_calls
+):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prompts = []
+        final_summaries = []
+
+        async def mock_query(prompt, options):
+            prompts.append(prompt)
+            yield AssistantMessage(content=[TextBlock(text="text")], model="claude")
+
+        async def on_chunk(chunk_num, summary):
+            pass
+
+        async def on_final(summaries):
+            pass
+
+        async def on_final_summary(summary):
+            final_summaries.append(summary)
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_chunked(
+                "Title",
+                "Body",
+                tmpdir,
+                max_chunks=2,
+                on_chunk_complete=on_chunk if with_chunk_callback else None,
+                on_final_complete=on_final if with_final_complete else None,
+                on_final_summary=on_final_summary if with_final_summary else None,
+            ):
+                pass
+
+        assert len(prompts) == expected_calls
+        final_prompts = [p for p in prompts if "final summary" in p]
+        assert len(final_prompts) == (1 if with_final_summary else 0)
+        if with_final_summary:
+            assert final_summaries == ["text"]
+
+
+async def test_run_claude_plan_chunked_skips_final_summary_without_consumer():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prompts = []
+        final_calls = []
+
+        async def mock_query(prompt, options):
+            prompts.append(prompt)
+            (Path(tmpdir) / PLAN_FILE).write_text("# Plan")
+            yield AssistantMessage(content=[TextBlock(text="text")], model="claude")
+
+        async def on_chunk(chunk_num, summary):
+            pass
+
+        async def on_final(summaries):
+            final_calls.append(summaries)
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_plan_chunked(
+                "Title", "Body", tmpdir, on_chunk_complete=on_chunk, on_final_complete=on_final
+            ):
+                pass
+
+        # One planning chunk + one chunk summary, no final summary session
+        assert len(prompts) == 2
+        assert final_calls == [["text"]]
+
+
+# Chunk engine tests
+
+async def test_run_chunk_engine_uses_strategy():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prompts = []
+        captured_options = []
+        hooks = []
+        done_file = Path(tmpdir) / "review.md"
+
+        async def mock_query(prompt, options):
+            prompts.append(prompt)
+            captured_options.append(options)
+            if len(prompts) == 2:
+                done_file.write_text("LGTM")
+            yield {"type": "message", "content": "reviewing"}
+
+        strategy = ChunkStrategy(
+            call_type="review",
+            build_prompt=lambda title, body, cwd: f"Review: {title}",
+            build_continuation_prompt=lambda title, body, cwd: f"Keep reviewing: {title}",
+            is_complete=lambda cwd: done_file.exists(),
+            on_start=lambda cwd: hooks.append("start"),
+            on_complete=lambda cwd: hooks.append("complete"),
+            allowed_tools=["Read", "Write"],
+        )
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_chunk_engine(strategy, "PR 1", "", tmpdir, max_chunks=5):
+                pass
+
+        assert prompts == ["Review: PR 1", "Keep reviewing: PR 1"]
+        assert captured_options[0].allowed_tools == ["Read", "Write"]
+        assert hooks == ["start", "complete"]
+
+
+async def test_run_claude_chunked_offers_symbol_tools():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prompts = []
+        captured_options = []
+
+        async def mock_query(prompt, options):
+            prompts.append(prompt)
+            captured_options.append(options)
+            Path(tmpdir, COMPLETION_MARKER).write_text("DONE")
+            yield {"type": "message", "content": "working"}
+
+        with (
+            patch("claude_runner.query", mock_query),
+            patch("claude_runner.create_symbol_server", return_value="symbols"),
+        ):
+            async for _ in run_claude_chunked("Task", "Body", tmpdir, symbol_index=SymbolIndex(tmpdir)):
+                pass
+
+        first_prompt = [message async for message in prompts[0]][0]["message"]["content"]
+        assert "find_definition" in first_prompt
+        assert captured_options[0].mcp_servers == {SYMBOL_SERVER_NAME: "symbols"}
+
+
+async def test_run_claude_chunked_names_indexed_search_tools():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prompts = []
+
+        async def mock_query(prompt, options):
+            prompts.append([message async for message in prompt][0]["message"]["content"])
+            yield {"type": "message", "content": "working"}
+
+        with (
+            patch("claude_runner.query", mock_query),
+            patch("claude_runner.create_search_server", return_value="search"),
+        ):
+            async for _ in run_claude_plan_chunked(
+                "Task", "Body", tmpdir, max_chunks=2, search_index=CodeSearchIndex(tmpdir)
+            ):
+                pass
+
+        assert "Use find_files and search_code" in prompts[0]
+        assert "Use find_files, search_code, and Read" in prompts[-1]
+        assert not any("Glob" in prompt for prompt in prompts)
+
+
+def test_runner_strategies_are_configured():
+    assert IMPLEMENT_STRATEGY.is_complete is is_complete
+    assert IMPLEMENT_STRATEGY.call_type == CALL_IMPLEMENT
+    assert PLAN_STRATEGY.is_complete is is_plan_complete
+    assert PLAN_STRATEGY.build_prompt is build_plan_prompt
+
+
+async def test_run_claude_chunked_appends_chunk_feedback_to_next_prompt():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prompts = []
+        feedback_calls = 0
+
+        async def mock_query(prompt, options):
+            prompts.append(prompt)
+            yield {"type": "message", "content": "work"}
+
+        async def feedback(cwd, changed):
+            nonlocal feedback_calls
+            feedback_calls += 1
+            assert changed is None
+            return "## Test Results\n\nFAILED tests/test_x.py::test_y"
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_chunked("Title", "Body", tmpdir, max_chunks=2, chunk_feedback=feedback):
+                pass
+
+        # Feedback is only gathered when another chunk will run
+        assert feedback_calls == 1
+        assert "FAILED tests/test_x.py::test_y" not in prompts[0]
+        assert prompts[1].endswith("FAILED tests/test_x.py::test_y")
+
+
+async def test_run_claude_chunked_gives_chunk_feedback_the_chunk_changes():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        written = iter(["a.py", "b.py", "c.py"])
+        seen = []
+
+        async def mock_query(prompt, options):
+            (Path(tmpdir) / next(written, "summary.md")).write_text("x = 1\n")
+            yield {"type": "message", "content": "work"}
+
+        async def feedback(cwd, changed):
+            seen.append(changed)
+            return None
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_chunked(
+                "Title", "Body", tmpdir, max_chunks=3, chunk_feedback=feedback, change_tracker=ChangeTracker(tmpdir)
+            ):
+                pass
+
+        # Only the files changed in each chunk, not everything since the run started
+        assert seen == [["a.py"], ["b.py"]]
+
+
+async def test_run_claude_chunked_compaction_starts_fresh_session_with_digest():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prompts = []
+        captured_options = []
+
+        async def mock_query(prompt, options):
+            prompts.append(prompt)
+            captured_options.append(options)
+            yield SystemMessage(subtype="init", data={"session_id": f"session-{len(prompts)}"})
+            yield AssistantMessage(
+                content=[ToolUseBlock(id="t", name="Edit", input={"file_path": f"{tmpdir}/app.py"})],
+                model="claude",
+            )
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_chunked("Title", "Body", tmpdir, max_chunks=4, compact_after_chunks=2):
+                pass
+
+        # Chunk 3 drops the resumed history; chunk 4 resumes the new session
+        assert [options.resume for options in captured_options] == [None, "session-1", None, "session-3"]
+        assert "# State So Far" in prompts[2]
+        assert "### Chunk 2\n- Modified app.py" in prompts[2]
+        assert "# State So Far" not in prompts[1] and "# State So Far" not in prompts[3]
+
+
+async def test_run_claude_chunked_reports_changes_and_stops_when_idle():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        calls = 0
+        summaries = []
+
+        async def mock_query(prompt, options):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                (Path(tmpdir) / "app.py").write_text("print('hi')\n")
+            yield {"type": "message", "content": "work"}
+
+        async def on_chunk_complete(chunk_num, summary):
+            summaries.append(summary)
+
+        token = CancellationToken()
+        with patch("claude_runner.query", mock_query), \
+             patch("claude_runner.run_summary_agent", return_value="Summary"):
+            async for _ in run_claude_chunked(
+                "Title", "Body", tmpdir,
+                max_chunks=5,
+                on_chunk_complete=on_chunk_complete,
+                cancel_token=token,
+                change_tracker=ChangeTracker(tmpdir),
+                stop_after_idle_chunks=2,
+            ):
+                pass
+
+        # Chunk 1 changed a file, chunks 2 and 3 did not
+        assert calls == 3
+        assert token.reason == STOP_NO_CHANGES
+        assert summaries[0] == "Summary\n\n**Files changed:**\n- `app.py` (added, +1 -0)"
+        assert summaries[2].endswith("**Files changed:**\nNo file changes.")
+
+
+async def test_run_claude_chunked_nudges_then_stops_stalled_agent():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prompts = []
+
+        async def mock_query(prompt, options):
+            prompts.append(prompt)
+            yield AssistantMessage(
+                content=[ToolUseBlock(id="t", name="Read", input={"file_path": f"{tmpdir}/app.py"})],
+                model="claude",
+            )
+
+        token = CancellationToken()
+        detector = StallDetector()
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_chunked(
+                "Title", "Body", tmpdir, max_chunks=5, cancel_token=token, stall_detector=detector
+            ):
+                pass
+
+        # Chunk 2 repeats chunk 1 (nudge), chunk 3 repeats again (stop)
+        assert len(prompts) == 3
+        assert "Progress Check" not in prompts[1]
+        assert "## ⚠️ Progress Check" in prompts[2]
+        assert token.reason == STOP_STALLED
+        assert "changed no files" in detector.last_verdict.reason
+
+
+async def test_run_claude_chunked_does_not_retain_large_tool_results():
+    import tracemalloc
+
+    turns = 50
+    result_size = 1024 * 1024
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        async def mock_query(prompt, options):
+            for turn in range(turns):
+                yield AssistantMessage(
+                    content=[
+                        TextBlock(text=f"Reading file {turn}"),
+                        ToolUseBlock(id=f"t{turn}", name="Read", input={"file_path": f"{tmpdir}/f{turn}.py"}),
+                    ],
+                    model="claude",
+                )
+                # A fresh 1 MB tool result per turn, as a whole-file Read would produce
+                yield UserMessage(content=[ToolResultBlock(tool_use_id=f"t{turn}", content="x" * result_size)])
+
+        summaries = []
+
+        async def on_chunk_complete(chunk_num, summary):
+            summaries.append(summary)
+
+        tracemalloc.start()
+        try:
+            with patch("claude_runner.query", mock_query):
+                async for _ in run_claude_chunked(
+                    "Title", "Body", tmpdir,
+                    max_chunks=1,
+                    on_chunk_complete=on_chunk_complete,
+                    # Past the soft limit, so the chunk summary is built locally from the records
+                    budget=BudgetGovernor(soft_limit_usd=0.0),
+                    stall_detector=StallDetector(),
+                ):
+                    pass
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # Retaining the messages would peak above 50 MB; only a few are alive at once
+        assert peak < 8 * result_size
+        assert "- Read f49.py" in summaries[0]
+
+
+# run_claude_single tests
+
+def test_build_lean_prompt_has_no_completion_signal():
+    result = build_lean_prompt("Fix typo", "In README.md", "/test/dir")
+
+    assert "Working directory: /test/dir" in result
+    assert "# Fix typo" in result
+    assert "In README.md" in result
+    assert COMPLETION_MARKER not in result
+
+
+async def test_run_claude_single_runs_one_session_without_summaries():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        calls = []
+
+        async def mock_query(prompt, options):
+            calls.append((prompt, options))
+            (Path(tmpdir) / "README.md").write_text("fixed\n")
+            yield make_result_message(0.02)
+
+        budget = BudgetGovernor()
+        tracker = ChangeTracker(tmpdir)
+        with patch("claude_runner.query", mock_query), \
+                patch("claude_runner.run_summary_agent") as summary_agent:
+            messages = [m async for m in run_claude_single(
+                "Fix typo", "", tmpdir, max_turns=4, budget=budget, change_tracker=tracker
+            )]
+
+        assert len(messages) == 1
+        assert len(calls) == 1
+        assert calls[0][1].max_turns == 4
+        assert COMPLETION_MARKER not in calls[0][0]
+        summary_agent.assert_not_called()
+        assert budget.usage[CALL_IMPLEMENT].calls == 1
+        assert tracker.cumulative().paths == ["README.md"]
+
+
+async def test_run_claude_single_reports_run_timeout():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        async def mock_query(prompt, options):
+            yield {"type": "message"}
+            await asyncio.sleep(10)
+            yield {"type": "message"}
+
+        token = CancellationToken()
+        with patch("claude_runner.query", mock_query):
+            messages = [m async for m in run_claude_single(
+                "Fix typo", "", tmpdir, run_timeout=0.05, cancel_token=token
+            )]
+
+        assert len(messages) == 1
+        assert token.reason == STOP_RUN_TIMEOUT
+
+
+# PR description session reuse tests
+
+async def test_run_claude_chunked_saves_final_session_id():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        async def mock_query(prompt, options):
+            yield SystemMessage(subtype="init", data={"session_id": "impl-session"})
+            (Path(tmpdir) / COMPLETION_MARKER).write_text("DONE")
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_chunked("Title", "Body", tmpdir):
+                pass
+
+        assert load_session_id(tmpdir) == "impl-session"
+
+
+async def test_run_claude_plan_chunked_does_not_save_session_id():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        async def mock_query(prompt, options):
+            yield SystemMessage(subtype="init", data={"session_id": "plan-session"})
+            (Path(tmpdir) / PLAN_FILE).write_text("# Plan")
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_plan_chunked("Title", "Body", tmpdir):
+                pass
+
+        assert not (Path(tmpdir) / SESSION_FILE).exists()
+
+
+async def test_run_pr_description_resumes_saved_session():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        save_session_id(tmpdir, "impl-session")
+        calls = []
+
+        async def mock_query(prompt, options):
+            calls.append(([m async for m in prompt][0]["message"]["content"], options))
+            (Path(tmpdir) / PR_DESCRIPTION_FILE).write_text("Closes #7")
+            yield make_result_message(0.01)
+
+        budget = BudgetGovernor()
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_pr_description("Title", "Body", "diff --git a/x b/x", 7, tmpdir, budget=budget):
+                pass
+
+        assert len(calls) == 1
+        prompt, options = calls[0]
+        assert options.resume == "impl-session"
+        assert options.allowed_tools == ["Write"]
+        # Write is confined to the description by hook; allowed_tools alone does not restrict it
+        assert [m.matcher for m in options.hooks["PreToolUse"]] == ["Edit|Write|MultiEdit|NotebookEdit", "Bash"]
+        assert "Closes #7" in prompt
+        assert "diff --git" not in prompt
+        # The resumed session keeps its own model so its prompt cache is reused
+        assert options.model is None
+        assert budget.usage[CALL_PR_DESCRIPTION].calls == 1
+
+
+async def test_description_write_hooks_only_allow_the_description():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        description_path = Path(tmpdir) / PR_DESCRIPTION_FILE
+        guard_write, deny_shell = (m.hooks[0] for m in description_write_hooks(description_path)["PreToolUse"])
+
+        async def decision(hook, tool_input):
+            output = await hook({"tool_input": tool_input}, "tool-1", None)
+            return output.get("hookSpecificOutput", {}).get("permissionDecision")
+
+        assert await decision(guard_write, {"file_path": str(description_path)}) is None
+        assert await decision(guard_write, {"file_path": PR_DESCRIPTION_FILE}) is None
+        assert await decision(guard_write, {"file_path": str(Path(tmpdir) / "src" / "app.py")}) == "deny"
+        assert await decision(guard_write, {"file_path": "../" + PR_DESCRIPTION_FILE}) == "deny"
+        assert await decision(deny_shell, {"command": "git commit -am wip"}) == "deny"
+
+
+async def test_run_pr_description_falls_back_to_diff_without_session():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        calls = []
+
+        async def mock_query(prompt, options):
+            calls.append(([m async for m in prompt][0]["message"]["content"], options))
+            yield {"type": "message"}
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_pr_description("Title", "Body", "diff --git a/x b/x", 7, tmpdir):
+                pass
+
+        assert len(calls) == 1
+        assert calls[0][1].resume is None
+        assert "diff --git a/x b/x" in calls[0][0]
+
+
+async def test_run_pr_description_fallback_uses_routed_model(reset_routes):
+    set_routes({CALL_PR_DESCRIPTION: CallRoute("haiku", 2)})
+    with tempfile.TemporaryDirectory() as tmpdir:
+        calls = []
+
+        async def mock_query(prompt, options):
+            calls.append(options)
+            yield {"type": "message"}
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_pr_description("Title", "Body", "diff --git a/x b/x", 7, tmpdir, resume=False):
+                pass
+
+    assert calls[0].model == "haiku"
+    assert calls[0].max_turns == 2
+
+
+async def test_run_pr_description_falls_back_when_resume_writes_nothing():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        save_session_id(tmpdir, "expired-session")
+        # A stale description from an earlier run must not count as written
+        (Path(tmpdir) / PR_DESCRIPTION_FILE).write_text("stale")
+        calls = []
+
+        async def mock_query(prompt, options):
+            calls.append(options)
+            if options.resume:
+                raise RuntimeError("No conversation found")
+            (Path(tmpdir) / PR_DESCRIPTION_FILE).write_text("Closes #7")
+            yield {"type": "message"}
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_pr_description("Title", "Body", "diff", 7, tmpdir):
+                pass
+
+        assert [options.resume for options in calls] == ["expired-session", None]
+        assert (Path(tmpdir) / PR_DESCRIPTION_FILE).read_text() == "Closes #7"
+
+
+async def test_run_pr_description_without_resume_uses_diff():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        save_session_id(tmpdir, "impl-session")
+        calls = []
+
+        async def mock_query(prompt, options):
+            calls.append(options)
+            yield {"type": "message"}
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_pr_description("Title", "Body", "diff", 7, tmpdir, resume=False):
+                pass
+
+        assert [options.resume for options in calls] == [None]
+
+
+# Base session tests
+
+async def test_run_claude_chunked_forks_base_session_for_first_chunk():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        captured = []
+
+        async def mock_query(prompt, options):
+            captured.append(options)
+            if len(captured) == 1:
+                yield SystemMessage(subtype="init", data={"session_id": "forked"})
+            yield {"type": "message"}
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_chunked("Title", "Body", tmpdir, max_chunks=2, base_session_id="base"):
+                pass
+
+        assert (captured[0].resume, captured[0].fork_session) == ("base", True)
+        assert (captured[1].resume, captured[1].fork_session) == ("forked", False)
+
+
+async def test_run_claude_chunked_retries_cold_when_base_session_is_gone():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        captured = []
+
+        async def mock_query(prompt, options):
+            captured.append(options)
+            if options.resume == "expired":
+                raise RuntimeError("No conversation found with session ID: expired")
+            yield SystemMessage(subtype="init", data={"session_id": "cold"})
+            (Path(tmpdir) / COMPLETION_MARKER).write_text("DONE")
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_chunked("Title", "Body", tmpdir, max_chunks=1, base_session_id="expired"):
+                pass
+
+        assert [options.resume for options in captured] == ["expired", None]
+        assert load_session_id(tmpdir) == "cold"
+
+
+# Prompt program tests
+
+class FakePromptPrograms:
+    """Stands in for PromptPrograms; records calls and usage like the real programs."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    async def _run(self, name, call_type, budget, output):
+        self.calls.append(name)
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        if budget is not None:
+            budget.record_usage(call_type, 0.001, input_tokens=500, output_tokens=100)
+        return output
+
+    async def chunk_summary(self, title, body, activity, call_type, budget=None):
+        return await self._run("chunk_summary", call_type, budget, f"Program summary of: {activity}")
+
+    async def final_summary(self, title, body, chunk_summaries, call_type, budget=None):
+        return await self._run("final_summary", call_type, budget, f"Program final of {len(chunk_summaries)}")
+
+    async def pr_description(self, title, body, diff, call_type, budget=None):
+        return await self._run("pr_description", call_type, budget, "## Summary\n- Did the thing")
+
+
+async def test_run_claude_chunked_writes_summaries_with_prompt_programs():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prompts = []
+        chunk_summaries = []
+        final_summaries = []
+
+        async def mock_query(prompt, options):
+            prompts.append(prompt)
+            yield AssistantMessage(
+                content=[ToolUseBlock(id="1", name="Edit", input={"file_path": f"{tmpdir}/app.py"})], model="sonnet"
+            )
+            Path(tmpdir, COMPLETION_MARKER).write_text("DONE")
+
+        async def on_chunk(chunk_num, summary):
+            chunk_summaries.append(summary)
+
+        async def on_final_summary(summary):
+            final_summaries.append(summary)
+
+        programs = FakePromptPrograms()
+        budget = BudgetGovernor()
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_chunked(
+                "Title",
+                "Body",
+                tmpdir,
+                on_chunk_complete=on_chunk,
+                on_final_summary=on_final_summary,
+                budget=budget,
+                prompt_programs=programs,
+            ):
+                pass
+
+        # Only the implementing session ran; no summary sessions
+        assert len(prompts) == 1
+        assert programs.calls == ["chunk_summary", "final_summary"]
+        assert chunk_summaries == ["Program summary of: - Modified app.py"]
+        assert final_summaries == ["Program final of 1"]
+        assert budget.usage[CALL_FINAL_SUMMARY].calls == 1
+
+
+async def test_run_claude_chunked_summarises_locally_when_program_fails():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        chunk_summaries = []
+
+        async def mock_query(prompt, options):
+            yield AssistantMessage(content=[TextBlock(text="Working on it")], model="sonnet")
+            Path(tmpdir, COMPLETION_MARKER).write_text("DONE")
+
+        async def on_chunk(chunk_num, summary):
+            chunk_summaries.append(summary)
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_chunked(
+                "Title", "Body", tmpdir, on_chunk_complete=on_chunk, prompt_programs=FakePromptPrograms(fail=True)
+            ):
+                pass
+
+        assert chunk_summaries == ["- Note: Working on it..."]
+
+
+async def test_summary_sessions_are_recorded_as_program_examples(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as examples_dir:
+        monkeypatch.setenv("PROMPT_EXAMPLES_DIR", examples_dir)
+
+        async def mock_query(prompt, options):
+            yield AssistantMessage(content=[TextBlock(text="Working on it")], model="sonnet")
+            Path(tmpdir, COMPLETION_MARKER).write_text("DONE")
+
+        async def mock_summary_agent(prompt, cwd, max_turns=3, budget=None, call_type=None):
+            return "Final summary" if call_type == CALL_FINAL_SUMMARY else "## ✅ Completed This Chunk\n- Worked"
+
+        async def on_chunk(chunk_num, summary):
+            pass
+
+        async def on_final_summary(summary):
+            pass
+
+        with patch("claude_runner.query", mock_query), patch("claude_runner.run_summary_agent", mock_summary_agent):
+            async for _ in run_claude_chunked(
+                "Title", "Body", tmpdir, on_chunk_complete=on_chunk, on_final_summary=on_final_summary
+            ):
+                pass
+
+        lines = Path(examples_dir, "chunk_summary.jsonl").read_text().splitlines()
+        assert len(lines) == 1
+        example = json.loads(lines[0])
+        assert example["inputs"] == {"task": "Title\n\nBody", "activity": "- Note: Working on it..."}
+        assert example["output"] == "## ✅ Completed This Chunk\n- Worked"
+        assert json.loads(Path(examples_dir, "final_summary.jsonl").read_text())["output"] == "Final summary"
+
+
+async def test_run_pr_description_uses_program_instead_of_fresh_session():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        calls = []
+
+        async def mock_query(prompt, options):
+            calls.append(prompt)
+            yield {"type": "message"}
+
+        programs = FakePromptPrograms()
+        budget = BudgetGovernor()
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_pr_description(
+                "Title", "Body", "diff --git a/x b/x", 7, tmpdir, budget=budget, prompt_programs=programs
+            ):
+                pass
+
+        assert calls == []
+        assert (Path(tmpdir) / PR_DESCRIPTION_FILE).read_text() == "Closes #7\n\n## Summary\n- Did the thing\n"
+        assert budget.usage[CALL_PR_DESCRIPTION].calls == 1
+
+
+async def test_run_pr_description_falls_back_to_session_when_program_fails(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as examples_dir:
+        monkeypatch.setenv("PROMPT_EXAMPLES_DIR", examples_dir)
+        calls = []
+
+        async def mock_query(prompt, options):
+            calls.append(prompt)
+            (Path(tmpdir) / PR_DESCRIPTION_FILE).write_text("Closes #7\n\n## Summary\n- Session wrote this")
+            yield {"type": "message"}
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_pr_description(
+                "Title", "Body", "diff --git a/x b/x", 7, tmpdir, prompt_programs=FakePromptPrograms(fail=True)
+            ):
+                pass
+
+        assert len(calls) == 1
+        # The session's description becomes an example, without the Closes line
+        example = json.loads(Path(examples_dir, "pr_description.jsonl").read_text())
+        assert example["output"] == "## Summary\n- Session wrote this"
+        assert example["inputs"]["diff"] == "diff --git a/x b/x"
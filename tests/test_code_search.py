@@ -0,0 +1,201 @@
+"""Tests for code_search module."""
+
+import re
+import tempfile
+from pathlib import Path
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from code_search import (
+    CodeSearchIndex,
+    get_search_index,
+    glob_to_regex,
+    index_update_hooks,
+    required_trigrams,
+    search_tools,
+    trigrams,
+)
+
+
+def make_tree(root: str) -> None:
+    files = {
+        "src/app.py": "import os\n\ndef main():\n    return handler()\n",
+        "src/util/helpers.py": "def handler():\n    return 'Hello'\n",
+        "tests/test_app.py": "from app import main\n\ndef test_main():\n    assert main()\n",
+        "README.md": "# Project\n",
+        ".git/config": "handler = skipped\n",
+        "data.bin": "handler\0binary",
+    }
+    for rel, text in files.items():
+        path = Path(root) / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+# trigram tests
+
+def test_trigrams_are_lowercased():
+    assert trigrams("AbCd") == {"abc", "bcd"}
+
+
+def test_required_trigrams_uses_literal_runs():
+    assert required_trigrams(r"def \w+_handler") == trigrams("def ") | trigrams("_handler")
+
+
+def test_required_trigrams_returns_none_without_literals():
+    assert required_trigrams(r"foo|barbaz") is None
+    assert required_trigrams(r"\w+\d") is None
+
+
+def test_required_trigrams_raises_on_invalid_pattern():
+    with pytest.raises(re.error):
+        required_trigrams("(unclosed")
+
+
+# glob_to_regex tests
+
+def test_glob_double_star_matches_any_depth():
+    regex = glob_to_regex("**/*.py")
+    assert regex.match("app.py")
+    assert regex.match("src/util/helpers.py")
+    assert not regex.match("README.md")
+
+
+def test_glob_single_star_stays_in_one_directory():
+    regex = glob_to_regex("src/*.py")
+    assert regex.match("src/app.py")
+    assert not regex.match("src/util/helpers.py")
+
+
+def test_glob_braces_and_classes():
+    assert glob_to_regex("*.{md,txt}").match("README.md")
+    assert glob_to_regex("test_[!x]*.py").match("test_app.py")
+    assert not glob_to_regex("test_[!x]*.py").match("test_xyz.py")
+
+
+# CodeSearchIndex tests
+
+def test_build_skips_git_and_binary_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = CodeSearchIndex.build(tmpdir)
+        assert ".git/config" not in index.files()
+        paths = [path for path, _, _ in index.search("handler")]
+        assert "data.bin" not in paths
+        assert paths == ["src/app.py", "src/util/helpers.py"]
+
+
+def test_search_returns_line_numbers_and_lines():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = CodeSearchIndex.build(tmpdir)
+        assert index.search(r"def \w+\(\)", path_glob="tests/**") == [("tests/test_app.py", 3, "def test_main():")]
+
+
+def test_search_matches_each_line_once():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        Path(tmpdir, "a.py").write_text("x = 1\nfoo foo foo\nfoo\n")
+        index = CodeSearchIndex.build(tmpdir)
+        assert index.search("foo") == [("a.py", 2, "foo foo foo"), ("a.py", 3, "foo")]
+
+
+def test_search_ignore_case_and_max_results():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = CodeSearchIndex.build(tmpdir)
+        assert index.search("hello") == []
+        assert index.search("hello", ignore_case=True) == [("src/util/helpers.py", 2, "    return 'Hello'")]
+        assert len(index.search("handler", max_results=1)) == 1
+
+
+def test_search_without_literals_scans_all_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = CodeSearchIndex.build(tmpdir)
+        assert [path for path, _, _ in index.search(r"^#|^import")] == ["README.md", "src/app.py"]
+
+
+def test_search_reads_files_beyond_the_cache():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = CodeSearchIndex.build(tmpdir, max_cached_bytes=0)
+        assert [path for path, _, _ in index.search("handler")] == ["src/app.py", "src/util/helpers.py"]
+
+
+def test_find_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = CodeSearchIndex.build(tmpdir)
+        assert index.find_files("**/*.py") == ["src/app.py", "src/util/helpers.py", "tests/test_app.py"]
+        assert index.find_files("*.md") == ["README.md"]
+        assert index.find_files("**/*.py", max_results=1) == ["src/app.py"]
+
+
+def test_update_reindexes_edited_added_and_deleted_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = CodeSearchIndex.build(tmpdir)
+        Path(tmpdir, "src/app.py").write_text("def main():\n    return 'NewMarker'\n")
+        Path(tmpdir, "src/new.py").write_text("NewMarker = 1\n")
+        Path(tmpdir, "src/util/helpers.py").unlink()
+        index.update([str(Path(tmpdir) / "src/app.py"), "src/new.py", "src/util/helpers.py", "/elsewhere/x.py"])
+
+        assert index.search("NewMarker") == [("src/app.py", 2, "    return 'NewMarker'"), ("src/new.py", 1, "NewMarker = 1")]
+        # Stale postings for app.py no longer match the edited text
+        assert index.search("import os") == []
+        assert "src/util/helpers.py" not in index.find_files("**/*.py")
+
+
+def test_get_search_index_is_cached_per_worktree():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        assert get_search_index(tmpdir) is get_search_index(tmpdir + "/")
+
+
+# MCP tool and hook tests
+
+def _tools(index: CodeSearchIndex) -> dict:
+    return {tool.name: tool.handler for tool in search_tools(index)}
+
+
+async def test_search_code_tool_formats_matches():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        tools = _tools(CodeSearchIndex.build(tmpdir))
+        result = await tools["search_code"]({"pattern": "def handler"})
+        assert result["content"][0]["text"] == "src/util/helpers.py:1: def handler():"
+        result = await tools["search_code"]({"pattern": "NoSuchThing"})
+        assert result["content"][0]["text"] == "No matches found"
+
+
+async def test_search_code_tool_reports_invalid_pattern():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tools = _tools(CodeSearchIndex.build(tmpdir))
+        result = await tools["search_code"]({"pattern": "(unclosed"})
+        assert result["is_error"] is True
+        assert "Invalid regular expression" in result["content"][0]["text"]
+
+
+async def test_find_files_tool():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        tools = _tools(CodeSearchIndex.build(tmpdir))
+        result = await tools["find_files"]({"pattern": "tests/*.py"})
+        assert result["content"][0]["text"] == "tests/test_app.py"
+
+
+async def test_index_update_hook_reindexes_edited_file():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = CodeSearchIndex.build(tmpdir)
+        matcher = index_update_hooks(index)["PostToolUse"][0]
+        assert "Edit" in matcher.matcher and "Write" in matcher.matcher
+
+        path = Path(tmpdir) / "src/app.py"
+        path.write_text("HookMarker = True\n")
+        await matcher.hooks[0]({"tool_name": "Edit", "tool_input": {"file_path": str(path)}}, "tool-1", None)
+        assert index.search("HookMarker") == [("src/app.py", 1, "HookMarker = True")]
@@ -0,0 +1,66 @@
+"""Tests for compaction module."""
+
+import subprocess
+import tempfile
+from pathlib import Path
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from compaction import added_todos, build_state_digest, git_diffstat
+
+
+def make_git_repo(tmpdir: str) -> None:
+    def git(*args):
+        subprocess.run(["git", *args], cwd=tmpdir, check=True, capture_output=True)
+
+    git("init", "-q")
+    git("config", "user.email", "test@example.com")
+    git("config", "user.name", "Test")
+    (Path(tmpdir) / "app.py").write_text("def main():\n    pass\n")
+    git("add", "app.py")
+    git("commit", "-qm", "init")
+
+
+def test_git_diffstat_lists_modified_and_new_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_git_repo(tmpdir)
+        (Path(tmpdir) / "app.py").write_text("def main():\n    return 1\n")
+        (Path(tmpdir) / "util.py").write_text("x = 1\n")
+        (Path(tmpdir) / ".claude-complete").write_text("DONE")
+
+        stat = git_diffstat(tmpdir)
+        assert "app.py" in stat
+        assert "util.py (new file)" in stat
+        assert ".claude-complete" not in stat
+
+
+def test_added_todos_only_reports_new_lines():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_git_repo(tmpdir)
+        (Path(tmpdir) / "app.py").write_text("def main():\n    # TODO: handle errors\n    pass\n")
+        (Path(tmpdir) / "new.py").write_text("# FIXME wire this up\n")
+
+        assert added_todos(tmpdir) == ["# TODO: handle errors", "# FIXME wire this up"]
+
+
+def test_build_state_digest_sections():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_git_repo(tmpdir)
+        (Path(tmpdir) / "app.py").write_text("def main():\n    # TODO: finish\n    pass\n")
+
+        digest = build_state_digest(tmpdir, ["- Read app.py", "x" * 5000])
+
+        assert digest.startswith("# State So Far")
+        assert "## Files Changed" in digest and "app.py" in digest
+        assert "### Chunk 1\n- Read app.py" in digest
+        assert "...(truncated)" in digest
+        assert "## Outstanding TODOs\n- # TODO: finish" in digest
+
+
+def test_build_state_digest_outside_git():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        digest = build_state_digest(tmpdir, [])
+        assert "No changes yet." in digest
+        assert "## Progress" not in digest
@@ -0,0 +1,249 @@
+"""Tests for finalise module, against a local bare git remote and a stub GitHub API."""
+
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from budget import BudgetGovernor, BUDGET_FILE
+from change_tracker import ChangeSet, ChangeTracker
+from claude_runner import PR_DESCRIPTION_FILE, save_session_id
+from finalise import (
+    GitError,
+    branch_name,
+    create_branch,
+    current_branch,
+    finalise_run,
+    stage_changes,
+)
+from github_api import GitHubClient
+
+
+def git(cwd, *args) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def init_checkout(root: str) -> tuple[str, str]:
+    """Create a bare remote and a checkout of it with one commit on main."""
+    remote = os.path.join(root, "remote.git")
+    checkout = os.path.join(root, "checkout")
+    git(root, "init", "-q", "--bare", "-b", "main", remote)
+    git(root, "clone", "-q", remote, checkout)
+    git(checkout, "checkout", "-q", "-b", "main")
+    Path(checkout, "app.py").write_text("print('hello')\n")
+    Path(checkout, ".gitignore").write_text(".claude-*.json\n")
+    git(checkout, "add", "-A")
+    git(checkout, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+    git(checkout, "push", "-q", "origin", "main")
+    return remote, checkout
+
+
+class StubGitHub:
+    """Records pull request requests and answers like the GitHub API."""
+
+    def __init__(self, status_code: int = 201):
+        self.status_code = status_code
+        self.requests: list[httpx.Request] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        payload = json.loads(request.content)
+        return httpx.Response(
+            self.status_code,
+            json={"number": 1, "html_url": "https://github.com/o/r/pull/1", "head": {"ref": payload["head"]}},
+        )
+
+    def client(self) -> GitHubClient:
+        return GitHubClient("o", "r", "token", transport=httpx.MockTransport(self.handler))
+
+
+def make_description_query(cwd: str, text: str, calls: list | None = None):
+    async def mock_query(prompt, options):
+        if calls is not None:
+            calls.append(options)
+        Path(cwd, PR_DESCRIPTION_FILE).write_text(text)
+        yield {"type": "message"}
+
+    return mock_query
+
+
+def test_branch_name_uses_first_five_title_words():
+    assert branch_name(7, "Fix: the Login page's (broken) redirect loop now!") == "agent/issue-7-fix-the-login-pages-broken"
+    assert branch_name(8, "!!!") == "agent/issue-8"
+
+
+def test_create_branch_is_local_only():
+    with tempfile.TemporaryDirectory() as root:
+        remote, checkout = init_checkout(root)
+        branch = create_branch(checkout, 7, "Add feature")
+
+        assert current_branch(checkout) == branch
+        assert git(remote, "branch", "--list", branch) == ""
+
+
+def test_stage_changes_stages_only_tracked_changes():
+    with tempfile.TemporaryDirectory() as root:
+        _, checkout = init_checkout(root)
+        tracker = ChangeTracker(checkout)
+        tracker.start()
+        Path(checkout, "app.py").write_text("print('changed')\n")
+        Path(checkout, ".claude-session.json").write_text("{}")
+        tracker.update()
+        Path(checkout, "unrelated.txt").write_text("not from the agent")
+
+        assert stage_changes(checkout, tracker.cumulative())
+        assert git(checkout, "diff", "--cached", "--name-only") == "app.py"
+
+
+def test_stage_changes_without_changes():
+    with tempfile.TemporaryDirectory() as root:
+        _, checkout = init_checkout(root)
+        assert not stage_changes(checkout, ChangeSet())
+        assert not stage_changes(checkout, None)
+
+
+async def test_finalise_run_commits_pushes_and_opens_pull_request():
+    with tempfile.TemporaryDirectory() as root:
+        remote, checkout = init_checkout(root)
+        branch = create_branch(checkout, 7, "Add feature")
+        Path(checkout, "app.py").write_text("print('feature')\n")
+        stub = StubGitHub()
+        budget = BudgetGovernor()
+
+        query = make_description_query(checkout, "Closes #7\n\n## Summary\n- Added the feature")
+        with patch("claude_runner.query", query):
+            async with stub.client() as client:
+                result = await finalise_run(
+                    "Add feature", "Body", 7, checkout, branch, "main", client, budget=budget, resume=False
+                )
+
+        assert result.commit == git(remote, "rev-parse", branch)
+        assert git(checkout, "log", "-1", "--format=%s%n%b", result.commit).startswith("feat: Add feature\nCloses #7")
+        assert result.pull_request_url == "https://github.com/o/r/pull/1"
+        request = stub.requests[0]
+        assert request.url.path == "/repos/o/r/pulls"
+        assert request.headers["Authorization"] == "Bearer token"
+        assert json.loads(request.content) == {
+            "title": "Add feature",
+            "head": branch,
+            "base": "main",
+            "body": "Closes #7\n\n## Summary\n- Added the feature",
+        }
+        # The description is not part of the commit
+        assert PR_DESCRIPTION_FILE not in git(checkout, "show", "--name-only", "--format=", result.commit)
+        assert (Path(checkout) / BUDGET_FILE).exists()
+
+
+async def test_finalise_run_without_changes_pushes_nothing():
+    with tempfile.TemporaryDirectory() as root:
+        remote, checkout = init_checkout(root)
+        branch = create_branch(checkout, 7, "Add feature")
+        stub = StubGitHub()
+
+        async with stub.client() as client:
+            result = await finalise_run("Add feature", "", 7, checkout, branch, "main", client, changes=ChangeSet())
+
+        assert result.commit is None
+        assert result.pull_request_url is None
+        assert git(remote, "branch", "--list", branch) == ""
+        assert stub.requests == []
+
+
+async def test_finalise_run_writes_description_during_push():
+    with tempfile.TemporaryDirectory() as root:
+        _, checkout = init_checkout(root)
+        branch = create_branch(checkout, 7, "Add feature")
+        Path(checkout, "app.py").write_text("print('feature')\n")
+        description_started = asyncio.Event()
+
+        async def slow_push(cwd, branch):
+            # Only finishes once the description is underway, so running the
+            # two one after the other would time out
+            await asyncio.wait_for(description_started.wait(), 5)
+
+        async def mock_query(prompt, options):
+            description_started.set()
+            Path(checkout, PR_DESCRIPTION_FILE).write_text("Closes #7\n\nDone")
+            yield {"type": "message"}
+
+        stub = StubGitHub()
+        with patch("finalise.push_branch", slow_push), patch("claude_runner.query", mock_query):
+            async with stub.client() as client:
+                result = await finalise_run("Add feature", "", 7, checkout, branch, "main", client, resume=False)
+
+        assert result.pull_request_url is not None
+        assert json.loads(stub.requests[0].content)["body"] == "Closes #7\n\nDone"
+
+
+async def test_finalise_run_resumes_session_for_description():
+    with tempfile.TemporaryDirectory() as root:
+        _, checkout = init_checkout(root)
+        branch = create_branch(checkout, 7, "Add feature")
+        Path(checkout, "app.py").write_text("print('feature')\n")
+        save_session_id(checkout, "impl-session")
+        calls = []
+
+        query = make_description_query(checkout, "Closes #7\n\nResumed", calls)
+        with patch("claude_runner.query", query):
+            async with StubGitHub().client() as client:
+                await finalise_run("Add feature", "", 7, checkout, branch, "main", client)
+
+        assert calls[0].resume == "impl-session"
+
+
+async def test_finalise_run_falls_back_to_closing_line():
+    with tempfile.TemporaryDirectory() as root:
+        _, checkout = init_checkout(root)
+        branch = create_branch(checkout, 7, "Add feature")
+        Path(checkout, "app.py").write_text("print('feature')\n")
+
+        async def failing_query(prompt, options):
+            raise RuntimeError("API unavailable")
+            yield
+
+        stub = StubGitHub()
+        with patch("claude_runner.query", failing_query):
+            async with stub.client() as client:
+                result = await finalise_run("Add feature", "", 7, checkout, branch, "main", client, resume=False)
+
+        assert result.pull_request_url is not None
+        assert json.loads(stub.requests[0].content)["body"] == "Closes #7"
+
+
+async def test_finalise_run_raises_when_push_fails():
+    with tempfile.TemporaryDirectory() as root:
+        _, checkout = init_checkout(root)
+        git(checkout, "remote", "set-url", "origin", os.path.join(root, "missing.git"))
+        branch = create_branch(checkout, 7, "Add feature")
+        Path(checkout, "app.py").write_text("print('feature')\n")
+        stub = StubGitHub()
+
+        with patch("claude_runner.query", make_description_query(checkout, "Closes #7")):
+            async with stub.client() as client:
+                with pytest.raises(GitError, match="push"):
+                    await finalise_run("Add feature", "", 7, checkout, branch, "main", client, resume=False)
+
+        assert stub.requests == []
+
+
+async def test_finalise_run_reports_rejected_pull_request():
+    with tempfile.TemporaryDirectory() as root:
+        _, checkout = init_checkout(root)
+        branch = create_branch(checkout, 7, "Add feature")
+        Path(checkout, "app.py").write_text("print('feature')\n")
+
+        with patch("claude_runner.query", make_description_query(checkout, "Closes #7")):
+            async with StubGitHub(status_code=422).client() as client:
+                result = await finalise_run("Add feature", "", 7, checkout, branch, "main", client, resume=False)
+
+        assert result.commit is not None
+        assert result.pull_request_url is None
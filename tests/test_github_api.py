@@ -1,5 +1,12 @@
 """Tests for github_api module."""
 
+import asyncio
+import json
+import random
+import re
+import time
+
+import httpx
 import pytest
 from unittest.mock import patch, AsyncMock, Mock
 import sys
@@ -7,7 +14,19 @@ import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
-from github_api import post_issue_comment, get_issue
+from github_api import (
+    post_issue_comment,
+    get_issue,
+    GitHubClient,
+    LeaseError,
+    claim_run_lease,
+    release_run_lease,
+    format_lease_comment,
+    parse_lease_comment,
+    PLAN_HEADER,
+    extract_plan,
+    fetch_plan,
+)
 
 
 @pytest.fixture
@@ -134,3 +153,204 @@ async def test_get_issue_failure(mock_httpx_client):
 
     # Verify
     assert result is None
+
+
+class StubIssueApi:
+    """In-memory GitHub API for one issue's labels and comments.
+
+    Every request yields to the event loop for a random delay first, so
+    concurrent claimers interleave as they would against the real API.
+    """
+
+    def __init__(self, labels: list[str], max_latency: float = 0.02, page_size: int = 100):
+        self.labels = list(labels)
+        self.comments: list[dict] = []
+        self.max_latency = max_latency
+        self.page_size = page_size
+        self.next_id = 1
+        self.requests = 0
+        self.failing = False
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(random.uniform(0, self.max_latency))
+        if self.failing:
+            return httpx.Response(502)
+        path = request.url.path
+        if request.method == "GET" and re.fullmatch(r"/repos/o/r/issues/\d+", path):
+            return httpx.Response(200, json={"number": 1, "labels": [{"name": name} for name in self.labels]})
+        if path.endswith("/comments") and request.method == "GET":
+            page = int(request.url.params.get("page", 1))
+            start = (page - 1) * self.page_size
+            headers = {}
+            if start + self.page_size < len(self.comments):
+                headers["Link"] = f'<{request.url.copy_set_param("page", page + 1)}>; rel="next"'
+            return httpx.Response(200, json=self.comments[start:start + self.page_size], headers=headers)
+        if path.endswith("/comments") and request.method == "POST":
+            comment = {"id": self.next_id, "body": json.loads(request.content)["body"]}
+            self.next_id += 1
+            self.comments.append(comment)
+            return httpx.Response(201, json=comment)
+        if "/issues/comments/" in path and request.method == "PATCH":
+            comment_id = int(path.rsplit("/", 1)[1])
+            comment = next((c for c in self.comments if c["id"] == comment_id), None)
+            if comment is None:
+                return httpx.Response(404)
+            comment["body"] = json.loads(request.content)["body"]
+            return httpx.Response(200, json=comment)
+        if "/issues/comments/" in path and request.method == "DELETE":
+            comment_id = int(path.rsplit("/", 1)[1])
+            self.comments = [c for c in self.comments if c["id"] != comment_id]
+            return httpx.Response(204)
+        if path.endswith("/labels") and request.method == "POST":
+            self.labels += [name for name in json.loads(request.content)["labels"] if name not in self.labels]
+            return httpx.Response(200, json=[])
+        if "/labels/" in path and request.method == "DELETE":
+            name = httpx.URL(path).path.rsplit("/", 1)[1]
+            if name not in self.labels:
+                return httpx.Response(404)
+            self.labels.remove(name)
+            return httpx.Response(200, json=[])
+        return httpx.Response(404)
+
+    def client(self) -> GitHubClient:
+        return GitHubClient("o", "r", "token", transport=httpx.MockTransport(self.handler))
+
+    def leases(self) -> list[tuple[str, int]]:
+        return [lease for lease in map(parse_lease_comment, self.comments) if lease]
+
+
+def test_lease_comment_round_trip():
+    body = format_lease_comment("123", 1700000000)
+    assert parse_lease_comment({"body": body}) == ("123", 1700000000)
+    assert parse_lease_comment({"body": "just a comment"}) is None
+
+
+async def test_claim_run_lease_swaps_labels():
+    api = StubIssueApi(["ai:implement", "bug"])
+    async with api.client() as client:
+        lease = await claim_run_lease(client, 1, "run-1", "ai:in-progress", "ai:implement")
+
+    assert lease.run_id == "run-1"
+    assert lease.expires_at > time.time()
+    assert sorted(api.labels) == ["ai:in-progress", "bug"]
+    assert api.leases() == [("run-1", lease.expires_at)]
+
+
+async def test_client_creates_then_updates_comment():
+    api = StubIssueApi([], max_latency=0)
+    async with api.client() as client:
+        comment = await client.create_issue_comment(1, "Status")
+        assert await client.update_issue_comment(comment["id"], "Done")
+        assert not await client.update_issue_comment(999, "Gone")
+
+    assert [c["body"] for c in api.comments] == ["Done"]
+
+
+async def test_swap_labels_removes_only_present_labels():
+    api = StubIssueApi(["ai:in-progress", "bug"], max_latency=0)
+    async with api.client() as client:
+        assert await client.swap_labels(1, ["ai:in-progress", "ai:planning"], ["ai:completed"])
+
+    assert sorted(api.labels) == ["ai:completed", "bug"]
+    # One issue fetch, one removal and one addition - no request for the absent label
+    assert api.requests == 3
+
+
+async def test_concurrent_triggers_elect_exactly_one_run():
+    api = StubIssueApi(["ai:implement"])
+    random.seed(0)
+
+    async def trigger(run_id: str):
+        started = time.monotonic()
+        async with api.client() as client:
+            lease = await claim_run_lease(client, 1, run_id, "ai:in-progress", "ai:implement")
+        return lease, time.monotonic() - started
+
+    results = await asyncio.gather(*(trigger(f"run-{i}") for i in range(50)))
+
+    winners = [lease for lease, _ in results if lease is not None]
+    assert len(winners) == 1
+    assert all(elapsed < 1.0 for _, elapsed in results)
+    # Losers removed their lease comments; only the winner's remains
+    assert api.leases() == [(winners[0].run_id, winners[0].expires_at)]
+    assert api.labels == ["ai:in-progress"]
+
+
+async def test_later_trigger_exits_without_commenting():
+    api = StubIssueApi(["ai:implement"])
+    async with api.client() as client:
+        await claim_run_lease(client, 1, "run-1", "ai:in-progress", "ai:implement")
+        comments, requests = len(api.comments), api.requests
+
+        started = time.monotonic()
+        lease = await claim_run_lease(client, 1, "run-2", "ai:in-progress", "ai:implement")
+
+    assert lease is None
+    assert time.monotonic() - started < 1.0
+    assert len(api.comments) == comments
+    assert api.requests - requests == 2
+
+
+async def test_expired_lease_is_taken_over():
+    api = StubIssueApi(["ai:in-progress"])
+    api.comments.append({"id": 0, "body": format_lease_comment("crashed-run", int(time.time()) - 60)})
+    async with api.client() as client:
+        lease = await claim_run_lease(client, 1, "run-2", "ai:in-progress")
+
+    assert lease.run_id == "run-2"
+
+
+async def test_rerun_reclaims_its_own_lease():
+    api = StubIssueApi(["ai:implement"])
+    async with api.client() as client:
+        first = await claim_run_lease(client, 1, "run-1", "ai:in-progress", "ai:implement")
+        again = await claim_run_lease(client, 1, "run-1", "ai:in-progress", "ai:implement")
+
+    assert again.comment_id == first.comment_id
+    assert len(api.leases()) == 1
+
+
+async def test_leases_are_found_across_comment_pages():
+    api = StubIssueApi(["ai:in-progress"], page_size=2)
+    api.comments += [{"id": i, "body": f"progress {i}"} for i in range(1, 6)]
+    api.comments.append({"id": 6, "body": format_lease_comment("run-1", int(time.time()) + 600)})
+    api.next_id = 7
+    async with api.client() as client:
+        assert await claim_run_lease(client, 1, "run-2", "ai:in-progress") is None
+
+
+async def test_release_run_lease_lets_the_next_trigger_claim():
+    api = StubIssueApi(["ai:implement"])
+    async with api.client() as client:
+        await claim_run_lease(client, 1, "run-1", "ai:in-progress", "ai:implement")
+        assert await release_run_lease(client, 1, "run-1")
+        assert api.leases() == []
+
+        lease = await claim_run_lease(client, 1, "run-2", "ai:in-progress")
+
+    assert lease.run_id == "run-2"
+
+
+async def test_claim_run_lease_raises_when_api_fails():
+    api = StubIssueApi(["ai:implement"])
+    api.failing = True
+    async with api.client() as client:
+        with pytest.raises(LeaseError):
+            await claim_run_lease(client, 1, "run-1", "ai:in-progress", "ai:implement")
+
+
+async def test_fetch_plan_reads_first_plan_comment():
+    api = StubIssueApi([], max_latency=0)
+    api.comments += [
+        {"id": 1, "body": "Looks good"},
+        {"id": 2, "body": f"{PLAN_HEADER}\n\n1. Edit app.py\n2. Add tests\n\n---\n*Generated plan*"},
+        {"id": 3, "body": f"{PLAN_HEADER}\n\nA later plan\n\n**Next steps** comment /apply"},
+    ]
+    async with api.client() as client:
+        assert await fetch_plan(client, 1) == "1. Edit app.py\n2. Add tests"
+
+    assert extract_plan(f"{PLAN_HEADER}\n\nNo footer") is None
+    api.failing = True
+    async with api.client() as client:
+        assert await fetch_plan(client, 1) is None
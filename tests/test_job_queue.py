@@ -0,0 +1,227 @@
+"""Tests for job_queue module."""
+
+import asyncio
+import subprocess
+import tempfile
+from pathlib import Path
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from job_queue import (
+    JOB_IMPLEMENT,
+    JOB_PLAN,
+    STATUS_CANCELLED,
+    STATUS_FAILED,
+    STATUS_QUEUED,
+    STATUS_RUNNING,
+    STATUS_SUCCEEDED,
+    JobQueue,
+    add_worktree,
+    remove_worktree,
+    JobStore,
+    pick_next_job,
+    run_job,
+)
+from claude_runner import PLAN_FILE
+from sdk_simulator import SdkSimulator, SimulatorConfig, set_simulator
+
+
+def test_store_deduplicates_active_jobs():
+    store = JobStore()
+    first, created = store.add("o/r", 1, JOB_PLAN, "Issue")
+    again, created_again = store.add("o/r", 1, JOB_PLAN, "Issue")
+    other_kind, created_other = store.add("o/r", 1, JOB_IMPLEMENT, "Issue")
+
+    assert created and not created_again and created_other
+    assert again.id == first.id
+    assert other_kind.id != first.id
+
+    # Once finished, the same issue can be queued again
+    store.set_status(first.id, STATUS_SUCCEEDED)
+    requeued, created = store.add("o/r", 1, JOB_PLAN, "Issue")
+    assert created and requeued.id != first.id
+
+
+def test_store_rejects_unknown_kind():
+    store = JobStore()
+    try:
+        store.add("o/r", 1, "deploy", "Issue")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+def test_store_persists_and_requeues_interrupted_jobs():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "jobs.db"
+        store = JobStore(path)
+        job, _ = store.add("o/r", 1, JOB_IMPLEMENT, "Issue", "Body", "/tmp/x", 5)
+        store.set_status(job.id, STATUS_RUNNING)
+        store.close()
+
+        reopened = JobStore(path)
+        assert reopened.get(job.id).status == STATUS_RUNNING
+        assert reopened.requeue_interrupted() == 1
+        restored = reopened.get(job.id)
+        assert restored.status == STATUS_QUEUED
+        assert (restored.body, restored.cwd, restored.priority) == ("Body", "/tmp/x", 5)
+        reopened.close()
+
+
+def test_pick_next_job_prefers_priority_then_alternates_kinds():
+    store = JobStore()
+    store.add("o/a", 1, JOB_IMPLEMENT, "low", priority=0)
+    store.add("o/a", 2, JOB_IMPLEMENT, "high impl", priority=5)
+    store.add("o/a", 3, JOB_PLAN, "high plan", priority=5)
+
+    no_limit = lambda repo: 10
+    assert pick_next_job(store.queued(), {}, no_limit, None).title == "high impl"
+    assert pick_next_job(store.queued(), {}, no_limit, JOB_IMPLEMENT).title == "high plan"
+    assert pick_next_job(store.queued(), {}, no_limit, JOB_PLAN).title == "high impl"
+
+
+def test_pick_next_job_respects_repo_caps():
+    store = JobStore()
+    store.add("o/busy", 1, JOB_PLAN, "busy", priority=9)
+    store.add("o/idle", 2, JOB_PLAN, "idle")
+
+    limit = lambda repo: 1
+    assert pick_next_job(store.queued(), {"o/busy": 1}, limit, None).title == "idle"
+    assert pick_next_job(store.queued(), {"o/busy": 1, "o/idle": 1}, limit, None) is None
+
+
+async def test_queue_enforces_concurrency_caps():
+    store = JobStore()
+    active: dict[str, int] = {}
+    peak = {"total": 0, "o/a": 0}
+
+    async def runner(job, cancel_token):
+        active[job.repo] = active.get(job.repo, 0) + 1
+        peak["total"] = max(peak["total"], sum(active.values()))
+        peak["o/a"] = max(peak["o/a"], active.get("o/a", 0))
+        await asyncio.sleep(0.01)
+        active[job.repo] -= 1
+
+    queue = JobQueue(store, runner=runner, max_concurrency=3, per_repo_limit=1, repo_limits={"o/a": 2})
+    for issue in range(4):
+        queue.submit("o/a", issue, JOB_IMPLEMENT, f"a{issue}")
+        queue.submit(f"o/other{issue}", issue, JOB_PLAN, f"b{issue}")
+
+    await asyncio.wait_for(queue.run(stop_when_idle=True), 5)
+
+    assert peak["total"] == 3
+    assert peak["o/a"] == 2
+    assert all(job.status == STATUS_SUCCEEDED for job in store.list())
+
+
+async def test_queue_alternates_kinds_fairly():
+    store = JobStore()
+    order: list[str] = []
+
+    async def runner(job, cancel_token):
+        order.append(job.kind)
+
+    queue = JobQueue(store, runner=runner, max_concurrency=1, per_repo_limit=1)
+    for issue in range(3):
+        queue.submit("o/r", issue, JOB_IMPLEMENT, "impl")
+    for issue in range(3):
+        queue.submit("o/r", issue, JOB_PLAN, "plan")
+
+    await asyncio.wait_for(queue.run(stop_when_idle=True), 5)
+
+    assert order == [JOB_IMPLEMENT, JOB_PLAN] * 3
+
+
+async def test_queue_records_failures_and_cancellation():
+    store = JobStore()
+    started = asyncio.Event()
+
+    async def runner(job, cancel_token):
+        if job.title == "boom":
+            raise RuntimeError("runner exploded")
+        started.set()
+        await cancel_token.wait()
+
+    queue = JobQueue(store, runner=runner, max_concurrency=2, per_repo_limit=2)
+    failing, _ = queue.submit("o/r", 1, JOB_PLAN, "boom")
+    waiting, _ = queue.submit("o/r", 2, JOB_PLAN, "wait")
+    queued, _ = queue.submit("o/r", 3, JOB_PLAN, "never", priority=-1)
+
+    serving = asyncio.create_task(queue.run())
+    await asyncio.wait_for(started.wait(), 5)
+    assert queue.cancel(waiting.id)
+    assert not queue.cancel(failing.id)
+
+    # The cancelled job frees a slot, so the low-priority job starts; cancel it via the store
+    while store.get(queued.id).status != STATUS_RUNNING:
+        await asyncio.sleep(0.01)
+    store.set_status(queued.id, STATUS_CANCELLED)
+    queue._wakeup.set()
+    while queue.running:
+        await asyncio.sleep(0.01)
+    serving.cancel()
+    await asyncio.gather(serving, return_exceptions=True)
+
+    assert store.get(failing.id).status == STATUS_FAILED
+    assert store.get(failing.id).error == "runner exploded"
+    assert store.get(waiting.id).status == STATUS_CANCELLED
+    assert store.get(queued.id).status == STATUS_CANCELLED
+
+
+def git(cwd, *args) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def init_checkout(path: str) -> None:
+    git(path, "init", "-q", "-b", "main")
+    Path(path, "app.py").write_text("print('hello')\n")
+    git(path, "add", "-A")
+    git(path, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+
+
+async def test_run_job_drives_runners_in_separate_worktrees(monkeypatch):
+    set_simulator(SdkSimulator(SimulatorConfig(complete_after_turns=3)))
+    monkeypatch.setenv("CLAUDE_SDK_BACKEND", "simulator")
+    monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+    monkeypatch.delenv("PR_TOKEN", raising=False)
+    try:
+        with tempfile.TemporaryDirectory() as checkout, tempfile.TemporaryDirectory() as worktrees:
+            init_checkout(checkout)
+            monkeypatch.setenv("JOB_WORKTREE_DIR", worktrees)
+            store = JobStore()
+            queue = JobQueue(store, runner=run_job, per_repo_limit=2)
+            plan, _ = queue.submit("o/r", 1, JOB_PLAN, "Plan it", cwd=checkout)
+            implement, _ = queue.submit("o/r", 2, JOB_IMPLEMENT, "Do it", cwd=checkout)
+
+            await asyncio.wait_for(queue.run(stop_when_idle=True), 10)
+
+            assert store.get(plan.id).status == STATUS_SUCCEEDED
+            assert store.get(implement.id).status == STATUS_SUCCEEDED
+            # Neither job touched the checkout; the implement job's work is on its branch
+            assert git(checkout, "status", "--porcelain") == ""
+            assert not (Path(checkout) / PLAN_FILE).exists()
+            assert git(checkout, "rev-parse", "--abbrev-ref", "HEAD") == "main"
+            assert git(checkout, "branch", "--list", "agent/issue-2-do-it")
+            assert list(Path(worktrees).rglob("job-*")) == []
+    finally:
+        set_simulator(None)
+
+
+def test_add_worktree_gives_each_job_its_own_tree():
+    with tempfile.TemporaryDirectory() as checkout, tempfile.TemporaryDirectory() as worktrees:
+        init_checkout(checkout)
+        store = JobStore()
+        first, _ = store.add("o/r", 1, JOB_IMPLEMENT, "One", cwd=checkout)
+        second, _ = store.add("o/r", 2, JOB_IMPLEMENT, "Two", cwd=checkout)
+
+        paths = [add_worktree(checkout, job, Path(worktrees)) for job in (first, second)]
+        Path(paths[0], "app.py").write_text("changed\n")
+
+        assert paths[0] != paths[1]
+        assert Path(paths[1], "app.py").read_text() == "print('hello')\n"
+        for path in paths:
+            remove_worktree(checkout, path)
+        assert not Path(paths[0]).exists()
+        assert git(checkout, "worktree", "list").count("\n") == 0
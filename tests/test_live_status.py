@@ -0,0 +1,134 @@
+"""Tests for live_status module."""
+
+import asyncio
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from claude_agent_sdk.types import AssistantMessage, TextBlock, ToolUseBlock, UserMessage, ToolResultBlock
+
+from live_status import LiveStatus, format_status, github_comment_publisher, status_lines
+
+
+def tool_message(name: str, **tool_input) -> AssistantMessage:
+    return AssistantMessage(
+        content=[TextBlock(text="Working"), ToolUseBlock(id="t1", name=name, input=tool_input)],
+        model="claude",
+    )
+
+
+def test_status_lines_use_turn_summary_vocabulary():
+    assert status_lines(tool_message("Edit", file_path="/repo/src/x.py")) == ["Modified x.py"]
+    assert status_lines(tool_message("Write", file_path="/repo/new.py")) == ["Created new.py"]
+    assert status_lines(tool_message("Grep", pattern="foo")) == ["Searched code: foo"]
+    assert status_lines(tool_message("Glob", pattern="**/*.py")) == ["Searched for files: **/*.py"]
+    assert status_lines(tool_message("Bash", command="ls")) == []
+    assert status_lines(UserMessage(content=[ToolResultBlock(tool_use_id="t1", content="ok")])) == []
+
+
+def test_format_status_lists_recent_lines():
+    body = format_status(["Read a.py", "Modified a.py"], 7, "Agent is working")
+    assert "## 🤖 Agent is working" in body
+    assert "**7 action(s) so far.**" in body
+    assert "- Read a.py\n- Modified a.py" in body
+
+
+async def test_live_status_debounces_bursts():
+    published = []
+
+    async def publish(body):
+        published.append(body)
+
+    status = LiveStatus(publish, min_interval=1.0, debounce=0.05)
+    for i in range(5):
+        status.observe(tool_message("Read", file_path=f"/repo/f{i}.py"))
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.15)
+
+    # A burst of activity produces a single update containing all of it
+    assert len(published) == 1
+    assert "f0.py" in published[0] and "f4.py" in published[0]
+    await status.close()
+    assert len(published) == 1
+
+
+async def test_live_status_rate_limits_updates():
+    published = []
+
+    async def publish(body):
+        published.append(body)
+
+    status = LiveStatus(publish, min_interval=0.2, debounce=0.0, max_lines=3)
+    for i in range(20):
+        status.observe(tool_message("Edit", file_path=f"/repo/f{i}.py"))
+        await asyncio.sleep(0.02)
+    await status.close(footer="Done")
+
+    # ~0.4s of activity with a 0.2s interval: a handful of updates, not 20
+    assert 2 <= len(published) <= 4
+    assert published[-1].endswith("Done")
+    assert "**20 action(s) so far.**" in published[-1]
+    assert "f19.py" in published[-1] and "f16.py" not in published[-1]
+
+
+async def test_live_status_publishes_during_steady_activity():
+    published = []
+
+    async def publish(body):
+        published.append(body)
+
+    # Activity never pauses for the debounce, but updates still go out
+    status = LiveStatus(publish, min_interval=0.15, debounce=0.1)
+    for i in range(20):
+        status.observe(tool_message("Read", file_path=f"/repo/f{i}.py"))
+        await asyncio.sleep(0.03)
+
+    assert len(published) >= 2
+    await status.close()
+
+
+async def test_live_status_close_waits_for_in_flight_publish():
+    events = []
+
+    async def publish(body):
+        events.append("start")
+        await asyncio.sleep(0.1)
+        events.append("end")
+
+    status = LiveStatus(publish, min_interval=0.0, debounce=0.0)
+    status.observe(tool_message("Read", file_path="/repo/a.py"))
+    await asyncio.sleep(0.02)
+    await status.close(footer="Done")
+
+    # The first publish (e.g. a comment create) finishes before the final one starts
+    assert events == ["start", "end", "start", "end"]
+
+
+async def test_live_status_survives_publish_errors():
+    async def publish(body):
+        raise RuntimeError("API down")
+
+    status = LiveStatus(publish, min_interval=0.0, debounce=0.0)
+    status.observe(tool_message("Read", file_path="/repo/a.py"))
+    await asyncio.sleep(0.01)
+    await status.close(footer="Done")
+    assert status.publishes == 2
+
+
+async def test_github_comment_publisher_creates_then_edits():
+    calls = []
+
+    class Client:
+        async def create_issue_comment(self, issue_number, body):
+            calls.append(("create", issue_number, body))
+            return {"id": 555}
+
+        async def update_issue_comment(self, comment_id, body):
+            calls.append(("update", comment_id, body))
+            return True
+
+    publish = github_comment_publisher(Client(), 7)
+    await publish("first")
+    await publish("second")
+    assert calls == [("create", 7, "first"), ("update", 555, "second")]
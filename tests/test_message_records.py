@@ -0,0 +1,80 @@
+"""Tests for message_records module."""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from claude_agent_sdk.types import (
+    AssistantMessage,
+    ResultMessage,
+    SystemMessage,
+    TextBlock,
+    ToolResultBlock,
+    ToolUseBlock,
+    UserMessage,
+)
+
+from message_records import (
+    PARAM_CHARS,
+    PREVIEW_CHARS,
+    ROLE_ASSISTANT,
+    ROLE_OTHER,
+    ROLE_RESULT,
+    ROLE_SYSTEM,
+    ROLE_TOOL_RESULT,
+    MessageRecord,
+    compact_message,
+    compact_messages,
+    message_history,
+)
+
+
+def test_records_use_slots():
+    record = MessageRecord(ROLE_ASSISTANT)
+    assert not hasattr(record, "__dict__")
+
+
+def test_assistant_message_becomes_one_record_per_block():
+    message = AssistantMessage(
+        content=[
+            TextBlock(text="Fixing the bug"),
+            ToolUseBlock(id="t", name="Write", input={"file_path": "/a.py", "content": "x" * 10_000, "meta": {"k": 1}}),
+        ],
+        model="claude",
+    )
+    text, call = compact_message(message)
+    assert (text.role, text.preview, text.size) == (ROLE_ASSISTANT, "Fixing the bug", 14)
+    assert call.tool_name == "Write"
+    assert call.tool_input["file_path"] == "/a.py"
+    assert len(call.tool_input["content"]) == PARAM_CHARS
+    assert "meta" not in call.tool_input
+
+
+def test_tool_results_keep_only_a_preview():
+    message = UserMessage(content=[
+        ToolResultBlock(tool_use_id="t", content="y" * 1_000_000),
+        ToolResultBlock(tool_use_id="u", content=[{"type": "text", "text": "listed"}]),
+    ])
+    big, small = compact_message(message)
+    assert (big.role, big.size, len(big.preview)) == (ROLE_TOOL_RESULT, 1_000_000, PREVIEW_CHARS)
+    assert small.preview == "listed"
+
+
+def test_other_message_types():
+    assert compact_message(SystemMessage(subtype="init", data={}))[0].role == ROLE_SYSTEM
+    result = ResultMessage(subtype="success", duration_ms=1, duration_api_ms=1, is_error=False,
+                           num_turns=1, session_id="s", result="All done")
+    assert compact_message(result)[0].role == ROLE_RESULT
+    assert compact_message({"type": "message"})[0].role == ROLE_OTHER
+
+
+def test_compact_messages_passes_records_through():
+    record = MessageRecord(ROLE_ASSISTANT, preview="hi")
+    records = compact_messages([record, AssistantMessage(content=[TextBlock(text="x")], model="m")])
+    assert records[0] is record and len(records) == 2
+
+
+def test_message_history_is_bounded():
+    history = message_history(3)
+    history.extend(MessageRecord(ROLE_ASSISTANT, preview=str(i)) for i in range(10))
+    assert [record.preview for record in history] == ["7", "8", "9"]
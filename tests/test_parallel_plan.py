@@ -0,0 +1,140 @@
+"""Tests for parallel_plan module."""
+
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from parallel_plan import (
+    PlanCandidate,
+    candidate_plan_file,
+    count_plan_steps,
+    find_plan_files,
+    rank_plans,
+    run_claude_plan_parallel,
+)
+from budget import BudgetGovernor
+from claude_runner import PLAN_FILE, CALL_EXPLORE
+from claude_agent_sdk.types import SystemMessage
+
+
+def make_repo(tmpdir: str) -> None:
+    (Path(tmpdir) / "src").mkdir()
+    (Path(tmpdir) / "src" / "app.py").write_text("")
+    (Path(tmpdir) / "src" / "util.py").write_text("")
+    (Path(tmpdir) / ".github").mkdir()
+    (Path(tmpdir) / ".github" / "ci.yml").write_text("")
+
+
+def test_count_plan_steps_counts_numbered_items():
+    plan = "## Steps\n1. First\n2) Second\n  3. Third\nNot 4 a step\n"
+    assert count_plan_steps(plan) == 3
+
+
+def test_find_plan_files_only_counts_existing_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_repo(tmpdir)
+        plan = f"Edit src/app.py and {tmpdir}/src/util.py, ./.github/ci.yml and create src/new.py"
+        assert find_plan_files(plan, tmpdir) == {"src/app.py", "src/util.py", ".github/ci.yml"}
+
+
+def test_rank_plans_prefers_files_then_steps_and_drops_empty():
+    a = PlanCandidate(0, "a", "a.md", text="plan", files={"x.py"}, steps=9)
+    b = PlanCandidate(1, "b", "b.md", text="plan", files={"x.py", "y.py"}, steps=2)
+    c = PlanCandidate(2, "c", "c.md", text="plan", files={"x.py"}, steps=3)
+    empty = PlanCandidate(3, "d", "d.md")
+    assert [p.index for p in rank_plans([a, b, c, empty])] == [1, 0, 2]
+
+
+async def test_run_claude_plan_parallel_runs_candidates_concurrently_and_keeps_best():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_repo(tmpdir)
+        running = 0
+        max_running = 0
+        ranked_calls = []
+
+        async def mock_query(prompt, options):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            if candidate_plan_file(0) in prompt:
+                plan = "1. Edit src/app.py"
+                (Path(tmpdir) / candidate_plan_file(0)).write_text(plan)
+            elif candidate_plan_file(1) in prompt:
+                plan = "1. Edit src/app.py\n2. Edit src/util.py"
+                (Path(tmpdir) / candidate_plan_file(1)).write_text(plan)
+            running -= 1
+            yield {"type": "message", "content": "planned"}
+
+        async def on_ranked(ranked):
+            ranked_calls.append(ranked)
+
+        with patch("claude_runner.query", mock_query):
+            messages = []
+            async for msg in run_claude_plan_parallel(
+                "Title", "Body", tmpdir, num_candidates=3, on_plans_ranked=on_ranked
+            ):
+                messages.append(msg)
+
+        assert len(messages) == 3
+        assert max_running == 3
+        assert (Path(tmpdir) / PLAN_FILE).read_text() == "1. Edit src/app.py\n2. Edit src/util.py"
+        assert not any((Path(tmpdir) / candidate_plan_file(i)).exists() for i in range(3))
+        assert [c.index for c in ranked_calls[0]] == [1, 0]
+
+
+async def test_run_claude_plan_parallel_uses_distinct_focuses():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prompts = []
+
+        async def mock_query(prompt, options):
+            prompts.append(prompt)
+            yield {"type": "message"}
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_plan_parallel("Title", "Body", tmpdir, num_candidates=2, max_turns=5):
+                pass
+
+        assert len(prompts) == 2
+        focus_lines = {line for p in prompts for line in p.splitlines() if line.startswith("EXPLORATION FOCUS")}
+        assert len(focus_lines) == 2
+        assert not (Path(tmpdir) / PLAN_FILE).exists()
+
+
+async def test_run_claude_plan_parallel_skips_candidates_when_budget_is_used_up():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prompts = []
+
+        async def mock_query(prompt, options):
+            prompts.append(prompt)
+            yield {"type": "message"}
+
+        budget = BudgetGovernor(hard_limit_usd=1.0)
+        budget.record_usage(CALL_EXPLORE, 1.0, 0, 0)
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_plan_parallel("Title", "Body", tmpdir, num_candidates=2, budget=budget):
+                pass
+
+        assert prompts == []
+
+
+async def test_run_claude_plan_parallel_candidates_fork_base_session():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        captured = []
+
+        async def mock_query(prompt, options):
+            captured.append(options)
+            yield SystemMessage(subtype="init", data={"session_id": f"fork-{len(captured)}"})
+
+        with patch("claude_runner.query", mock_query):
+            async for _ in run_claude_plan_parallel(
+                "Title", "Body", tmpdir, num_candidates=2, max_turns=5, base_session_id="base"
+            ):
+                pass
+
+        assert [(o.resume, o.fork_session) for o in captured] == [("base", True), ("base", True)]
@@ -0,0 +1,355 @@
+"""Tests for parallel_steps module."""
+
+import asyncio
+import re
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from parallel_steps import (
+    PlanStep,
+    WriteLedger,
+    build_integration_prompt,
+    build_step_prompt,
+    build_step_graph,
+    is_parallelisable,
+    parse_plan_steps,
+    run_plan_steps,
+    step_levels,
+    StepResult,
+    STEP_DONE,
+    STEP_FAILED,
+    STEP_SKIPPED,
+)
+from budget import BudgetGovernor
+from change_tracker import ChangeTracker
+from claude_runner import CALL_STEP, CALL_INTEGRATE, load_session_id
+
+
+PLAN = """# Implementation Plan
+
+## Overview
+Add a report command.
+
+## Files to modify/create
+- src/app.py
+- src/util.py
+
+## Implementation steps
+1. Add the formatting helper
+   Files: src/util.py
+   Depends on: none
+2. Add the report model
+   Files:
+   - src/models.py
+3. Wire the command into the app
+   Files: src/app.py
+   Depends on: 1, 2
+   1. Parse the arguments
+   2. Call the helper
+
+## Testing approach
+1. Run the tests in tests/test_app.py
+"""
+
+
+def make_repo(tmpdir: str) -> None:
+    (Path(tmpdir) / "src").mkdir()
+    (Path(tmpdir) / "src" / "app.py").write_text("")
+    (Path(tmpdir) / "src" / "util.py").write_text("")
+
+
+async def read_prompt(prompt) -> str:
+    """Return the prompt text, whether passed as a string or streamed."""
+    if isinstance(prompt, str):
+        return prompt
+    return [message async for message in prompt][0]["message"]["content"]
+
+
+async def write_through_hook(options, path: str, text: str = "changed") -> bool:
+    """Write a file the way an Edit tool call would, if the PreToolUse hook allows it."""
+    hook = options.hooks["PreToolUse"][0].hooks[0]
+    decision = await hook({"tool_name": "Write", "tool_input": {"file_path": path}}, None, None)
+    if decision:
+        return False
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(text)
+    return True
+
+
+def step_number(prompt: str) -> int | None:
+    match = re.search(r"## Your step: Step (\d+)", prompt)
+    return int(match.group(1)) if match else None
+
+
+def test_parse_plan_steps_reads_files_and_dependencies():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_repo(tmpdir)
+        steps = parse_plan_steps(PLAN, tmpdir)
+
+        assert [step.number for step in steps] == [1, 2, 3]
+        assert [step.files for step in steps] == [{"src/util.py"}, {"src/models.py"}, {"src/app.py"}]
+        assert [step.depends_on for step in steps] == [set(), set(), {1, 2}]
+        # Nested numbered items belong to their step, and later sections are not steps
+        assert "Call the helper" in steps[2].text
+        assert "tests/test_app.py" not in steps[2].text
+
+
+def test_parse_plan_steps_falls_back_to_mentioned_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_repo(tmpdir)
+        plan = f"## Implementation steps\n1. Update src/app.py\n2. Update {tmpdir}/src/util.py and add src/new.py\n"
+        steps = parse_plan_steps(plan, tmpdir)
+
+        assert [step.files for step in steps] == [{"src/app.py"}, {"src/util.py"}]
+
+
+def test_parse_plan_steps_drops_paths_outside_the_worktree():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        plan = "## Implementation steps\n1. Edit\n   Files: ../other/app.py, ./src/app.py\n"
+        assert parse_plan_steps(plan, tmpdir)[0].files == {"src/app.py"}
+
+
+def test_build_step_graph_orders_shared_and_unknown_files():
+    steps = build_step_graph([
+        PlanStep(1, "a", {"a.py"}),
+        PlanStep(2, "b", {"b.py"}),
+        PlanStep(3, "c", {"a.py", "c.py"}),
+        PlanStep(4, "d", {"d.py"}, depends_on={2, 9}),
+        PlanStep(5, "e"),
+    ])
+
+    assert [step.depends_on for step in steps] == [set(), set(), {1}, {2}, {1, 2, 3, 4}]
+    assert [[step.number for step in level] for level in step_levels(steps)] == [[1, 2], [3, 4], [5]]
+    assert is_parallelisable(steps)
+    assert not is_parallelisable(build_step_graph([PlanStep(1, "a", {"a.py"}), PlanStep(2, "b", {"a.py"})]))
+
+
+async def test_write_ledger_blocks_files_owned_by_running_steps():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        first, second = PlanStep(1, "a", {"a.py"}), PlanStep(2, "b", {"b.py"})
+        ledger = WriteLedger(tmpdir, build_step_graph([first, second]))
+        ledger.start(first)
+        ledger.start(second)
+
+        hook = ledger.hooks(second)["PreToolUse"][0].hooks[0]
+        denied = await hook({"tool_input": {"file_path": f"{tmpdir}/a.py"}}, None, None)
+        allowed = await hook({"tool_input": {"file_path": f"{tmpdir}/b.py"}}, None, None)
+
+        assert denied["hookSpecificOutput"]["permissionDecision"] == "deny"
+        assert "step 1" in denied["hookSpecificOutput"]["permissionDecisionReason"]
+        assert allowed == {}
+        assert ledger.written == {1: set(), 2: {"b.py"}}
+        assert [(c.path, c.step, c.owner, c.blocked) for c in ledger.conflicts] == [("a.py", 2, 1, True)]
+
+
+async def test_write_ledger_denies_shell_commands():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        step = PlanStep(1, "a", {"a.py"})
+        ledger = WriteLedger(tmpdir, [step])
+        matchers = ledger.hooks(step)["PreToolUse"]
+        shell = next(matcher for matcher in matchers if matcher.matcher == "Bash")
+
+        denied = await shell.hooks[0]({"tool_name": "Bash", "tool_input": {"command": "echo x > b.py"}}, None, None)
+
+        assert denied["hookSpecificOutput"]["permissionDecision"] == "deny"
+
+
+def test_write_ledger_records_overlap_with_finished_independent_step():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        first, second = PlanStep(1, "a", {"a.py"}), PlanStep(2, "b", {"b.py"})
+        ledger = WriteLedger(tmpdir, build_step_graph([first, second]))
+        ledger.start(first)
+        ledger.check_write(first, "shared.py")
+        ledger.finish(first)
+        ledger.start(second)
+
+        assert ledger.check_write(second, "shared.py") is None
+        assert ledger.check_write(second, "shared.py") is None
+        assert [(c.path, c.step, c.owner, c.blocked) for c in ledger.conflicts] == [("shared.py", 2, 1, False)]
+
+
+def test_integration_prompt_lists_results_and_conflicts():
+    step = PlanStep(2, "b", {"b.py"})
+    ledger = WriteLedger("/repo", [PlanStep(1, "a", {"a.py"}), step])
+    ledger.start(PlanStep(1, "a", {"a.py"}))
+    ledger.check_write(step, "a.py")
+    prompt = build_integration_prompt(
+        "Title", "Body", PLAN, [StepResult(step, STEP_FAILED, {"b.py"}, "Added b")], ledger.conflicts, "/repo"
+    )
+
+    assert "Step 2 (failed): wrote `b.py` - Added b" in prompt
+    assert "`a.py`: step 2's write was blocked while step 1 owned the file" in prompt
+
+
+def test_step_prompt_names_indexed_search_tools_when_offered():
+    step = PlanStep(1, "a", {"a.py"})
+    assert "Glob, Grep" in build_step_prompt("Title", "Body", PLAN, step, "/repo")
+    prompt = build_step_prompt("Title", "Body", PLAN, step, "/repo", search_tools=True)
+    assert "(Read, Edit, Write, find_files, search_code)" in prompt
+    assert "Glob" not in prompt
+
+
+async def test_run_plan_steps_runs_independent_steps_concurrently():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_repo(tmpdir)
+        running = 0
+        max_running = 0
+        prompts = []
+
+        async def mock_query(prompt, options):
+            nonlocal running, max_running
+            text = await read_prompt(prompt)
+            prompts.append(text)
+            number = step_number(text)
+            if number is not None:
+                running += 1
+                max_running = max(max_running, running)
+                await asyncio.sleep(0.2)
+                path = {1: "src/util.py", 2: "src/models.py", 3: "src/app.py"}[number]
+                await write_through_hook(options, f"{tmpdir}/{path}")
+                running -= 1
+            yield {"type": "message", "content": "done"}
+
+        with patch("claude_runner.query", mock_query):
+            start = time.monotonic()
+            [m async for m in run_plan_steps("Title", "Body", PLAN, tmpdir)]
+            elapsed = time.monotonic() - start
+
+        # Steps 1 and 2 overlap, step 3 waits for both: two rounds instead of three
+        assert max_running == 2
+        assert elapsed < 0.55
+        assert sorted(step_number(p) for p in prompts[:2]) == [1, 2]
+        assert step_number(prompts[2]) == 3
+        assert "Reconcile their work" in prompts[3]
+        assert "- None" in prompts[3]
+        assert Path(tmpdir, "src/models.py").read_text() == "changed"
+
+
+async def test_run_plan_steps_respects_max_parallel():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        running = 0
+        max_running = 0
+        plan = "## Implementation steps\n" + "".join(f"{i}. Step\n   Files: f{i}.py\n" for i in range(1, 6))
+
+        async def mock_query(prompt, options):
+            nonlocal running, max_running
+            if step_number(await read_prompt(prompt)) is not None:
+                running += 1
+                max_running = max(max_running, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+            yield {"type": "message"}
+
+        with patch("claude_runner.query", mock_query):
+            [m async for m in run_plan_steps("Title", "", plan, tmpdir, max_parallel=2)]
+
+        assert max_running == 2
+
+
+async def test_run_plan_steps_runs_steps_with_non_positive_max_parallel():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        started = []
+        plan = "## Implementation steps\n1. A\n   Files: a.py\n2. B\n   Files: b.py\n"
+
+        async def mock_query(prompt, options):
+            number = step_number(await read_prompt(prompt))
+            if number is not None:
+                started.append(number)
+            yield {"type": "message"}
+
+        async def run():
+            return [m async for m in run_plan_steps("Title", "", plan, tmpdir, max_parallel=0)]
+
+        with patch("claude_runner.query", mock_query):
+            await asyncio.wait_for(run(), 5)
+
+        assert sorted(started) == [1, 2]
+
+
+async def test_run_plan_steps_skips_dependants_of_failed_steps():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_repo(tmpdir)
+        started = []
+        summaries = []
+
+        async def mock_query(prompt, options):
+            text = await read_prompt(prompt)
+            number = step_number(text)
+            if number is not None:
+                started.append(number)
+            if number == 1:
+                raise RuntimeError("API error")
+            yield {"type": "message"}
+
+        async def on_final(lines):
+            summaries.extend(lines)
+
+        with patch("claude_runner.query", mock_query):
+            [m async for m in run_plan_steps("Title", "", PLAN, tmpdir, on_final_complete=on_final)]
+
+        assert sorted(started) == [1, 2]
+        assert summaries == [f"Step 1 ({STEP_FAILED})", f"Step 2 ({STEP_DONE})", f"Step 3 ({STEP_SKIPPED})"]
+
+
+async def test_run_plan_steps_blocks_and_reports_conflicting_writes():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_repo(tmpdir)
+        plan = "## Implementation steps\n1. A\n   Files: a.py\n2. B\n   Files: b.py\n"
+        first_started = asyncio.Event()
+        integration_prompts = []
+        blocked = []
+
+        async def mock_query(prompt, options):
+            text = await read_prompt(prompt)
+            number = step_number(text)
+            if number == 1:
+                first_started.set()
+                await asyncio.sleep(0.05)
+                await write_through_hook(options, f"{tmpdir}/a.py")
+            elif number == 2:
+                await first_started.wait()
+                blocked.append(not await write_through_hook(options, f"{tmpdir}/a.py", "from step 2"))
+            else:
+                integration_prompts.append(text)
+            yield {"type": "message"}
+
+        with patch("claude_runner.query", mock_query):
+            [m async for m in run_plan_steps("Title", "", plan, tmpdir)]
+
+        assert blocked == [True]
+        assert Path(tmpdir, "a.py").read_text() == "changed"
+        assert "`a.py`: step 2's write was blocked while step 1 owned the file" in integration_prompts[0]
+
+
+async def test_run_plan_steps_records_budget_and_saves_integration_session():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_repo(tmpdir)
+        budget = BudgetGovernor()
+        tracker = ChangeTracker(tmpdir)
+        recorded = []
+
+        async def mock_query(prompt, options):
+            text = await read_prompt(prompt)
+            number = step_number(text)
+            if number is not None:
+                await write_through_hook(options, f"{tmpdir}/src/step{number}.py")
+            yield {"type": "message"}
+
+        def record(call_type, message):
+            recorded.append(call_type)
+
+        with patch("claude_runner.query", mock_query), \
+                patch("parallel_steps.extract_session_id", lambda m: "integration-session"), \
+                patch.object(budget, "record", record):
+            [m async for m in run_plan_steps("Title", "", PLAN, tmpdir, budget=budget, change_tracker=tracker)]
+
+        assert recorded.count(CALL_STEP) == 3
+        assert recorded.count(CALL_INTEGRATE) == 1
+        assert load_session_id(tmpdir) == "integration-session"
+        assert set(tracker.cumulative().paths) == {"src/step1.py", "src/step2.py", "src/step3.py"}
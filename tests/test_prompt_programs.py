@@ -0,0 +1,162 @@
+"""Tests for prompt_programs module."""
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import prompt_programs
+from prompt_programs import (
+    PromptPrograms,
+    PROGRAM_CHUNK_SUMMARY,
+    PROGRAM_PR_DESCRIPTION,
+    PROGRAM_SPECS,
+    MAX_DIFF_CHARS,
+    compile_program,
+    find_compiled_program,
+    format_chunk_summaries,
+    format_task,
+    load_examples,
+    program_path,
+    select_compiled_program,
+    record_example,
+    truncate_diff,
+)
+
+
+def chunk_example(i: int) -> dict:
+    return {"inputs": {"task": f"Task {i}", "activity": f"- Modified app_{i}.py"}, "output": f"Summary {i}"}
+
+
+# Input formatting tests
+
+def test_format_task_omits_empty_body():
+    assert format_task("Title", "") == "Title"
+    assert format_task("Title", None) == "Title"
+    assert format_task("Title", "Body") == "Title\n\nBody"
+
+
+def test_format_chunk_summaries_numbers_chunks():
+    assert format_chunk_summaries(["a", "b"]) == "### Chunk 1\na\n\n### Chunk 2\nb"
+
+
+def test_truncate_diff():
+    assert truncate_diff("short") == "short"
+    truncated = truncate_diff("x" * (MAX_DIFF_CHARS + 10))
+    assert truncated.startswith("x" * MAX_DIFF_CHARS)
+    assert truncated.endswith("(diff truncated)")
+
+
+def test_specs_have_matching_names_and_signatures():
+    for name, spec in PROGRAM_SPECS.items():
+        assert spec.name == name
+        assert spec.signature == f"{', '.join(spec.inputs)} -> {spec.output}"
+
+
+# Example recording tests
+
+def test_record_and_load_examples():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        examples_dir = Path(tmpdir) / "examples"
+        record_example(PROGRAM_CHUNK_SUMMARY, chunk_example(1)["inputs"], "Summary 1", examples_dir)
+        record_example(PROGRAM_CHUNK_SUMMARY, chunk_example(2)["inputs"], "  ", examples_dir)
+        with open(examples_dir / f"{PROGRAM_CHUNK_SUMMARY}.jsonl", "a") as f:
+            f.write("not json\n")
+            f.write(json.dumps({"inputs": {"task": "missing activity"}, "output": "x"}) + "\n")
+
+        examples = load_examples(PROGRAM_CHUNK_SUMMARY, examples_dir)
+        assert [(e["inputs"], e["output"]) for e in examples] == [(chunk_example(1)["inputs"], "Summary 1")]
+        assert load_examples(PROGRAM_PR_DESCRIPTION, examples_dir) == []
+
+
+def test_record_example_uses_env_dir(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setenv("PROMPT_EXAMPLES_DIR", tmpdir)
+        record_example(PROGRAM_CHUNK_SUMMARY, chunk_example(1)["inputs"], "Summary 1")
+        assert len(load_examples(PROGRAM_CHUNK_SUMMARY, Path(tmpdir))) == 1
+
+
+def test_record_example_without_dir_is_a_no_op(monkeypatch):
+    monkeypatch.delenv("PROMPT_EXAMPLES_DIR", raising=False)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.chdir(tmpdir)
+        record_example(PROGRAM_CHUNK_SUMMARY, chunk_example(1)["inputs"], "Summary 1")
+        assert list(Path(tmpdir).iterdir()) == []
+
+
+# Cache versioning tests
+
+def test_program_path_is_versioned_by_spec_examples_and_demos():
+    cache_dir = Path("/cache")
+    examples = [chunk_example(1)]
+    path = program_path(PROGRAM_CHUNK_SUMMARY, examples, 3, cache_dir)
+    assert path.parent == cache_dir
+    assert path.name.startswith(f"{PROGRAM_CHUNK_SUMMARY}-v{PROGRAM_SPECS[PROGRAM_CHUNK_SUMMARY].version}-")
+    assert program_path(PROGRAM_CHUNK_SUMMARY, examples, 3, cache_dir) == path
+    assert program_path(PROGRAM_CHUNK_SUMMARY, examples + [chunk_example(2)], 3, cache_dir) != path
+    assert program_path(PROGRAM_CHUNK_SUMMARY, examples, 2, cache_dir) != path
+
+
+def test_find_compiled_program_uses_the_selected_compilation():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_dir = Path(tmpdir)
+        version = PROGRAM_SPECS[PROGRAM_CHUNK_SUMMARY].version
+        assert find_compiled_program(PROGRAM_CHUNK_SUMMARY, cache_dir) is None
+
+        only = cache_dir / f"{PROGRAM_CHUNK_SUMMARY}-v{version}-aaa.json"
+        stale = cache_dir / f"{PROGRAM_CHUNK_SUMMARY}-v{version + 1}-ccc.json"
+        for path in (only, stale):
+            path.write_text("{}")
+        assert find_compiled_program(PROGRAM_CHUNK_SUMMARY, cache_dir) == only
+
+        # Equal mtimes after a checkout: several compilations need the manifest
+        other = cache_dir / f"{PROGRAM_CHUNK_SUMMARY}-v{version}-bbb.json"
+        other.write_text("{}")
+        assert find_compiled_program(PROGRAM_CHUNK_SUMMARY, cache_dir) is None
+
+        select_compiled_program(PROGRAM_CHUNK_SUMMARY, only)
+        os.utime(only, (time.time() - 60, time.time() - 60))
+        assert find_compiled_program(PROGRAM_CHUNK_SUMMARY, cache_dir) == only
+
+        # A selection from an older spec version is not loaded
+        select_compiled_program(PROGRAM_CHUNK_SUMMARY, stale)
+        assert find_compiled_program(PROGRAM_CHUNK_SUMMARY, cache_dir) is None
+
+
+# PromptPrograms tests
+
+def test_from_env_is_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("PROMPT_PROGRAMS", raising=False)
+    assert PromptPrograms.from_env() is None
+
+
+def test_from_env_requires_dspy(monkeypatch):
+    monkeypatch.setenv("PROMPT_PROGRAMS", "true")
+    monkeypatch.setattr(prompt_programs, "dspy_available", lambda: False)
+    assert PromptPrograms.from_env() is None
+
+
+def test_from_env_uses_configured_model(monkeypatch):
+    monkeypatch.setenv("PROMPT_PROGRAMS", "true")
+    monkeypatch.setenv("PROMPT_PROGRAM_MODEL", "anthropic/cheap-model")
+    monkeypatch.setattr(prompt_programs, "dspy_available", lambda: True)
+    assert PromptPrograms.from_env().model == "anthropic/cheap-model"
+
+
+def test_compile_program_caches_newest_examples_as_demos():
+    pytest.importorskip("dspy")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_dir = Path(tmpdir)
+        examples = [chunk_example(i) for i in range(5)]
+        path = compile_program(PROGRAM_CHUNK_SUMMARY, examples, max_demos=2, cache_dir=cache_dir)
+
+        assert path == program_path(PROGRAM_CHUNK_SUMMARY, examples, 2, cache_dir)
+        assert find_compiled_program(PROGRAM_CHUNK_SUMMARY, cache_dir) == path
+        program = PromptPrograms(cache_dir=cache_dir).program(PROGRAM_CHUNK_SUMMARY)
+        assert [demo["summary"] for demo in program.demos] == ["Summary 4", "Summary 3"]
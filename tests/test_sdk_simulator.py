@@ -0,0 +1,122 @@
+"""Tests for sdk_simulator module."""
+
+import tempfile
+from pathlib import Path
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sdk_simulator import SdkSimulator, SimulatorConfig, set_simulator
+from claude_runner import (
+    build_prompt,
+    get_options,
+    get_query,
+    run_claude_chunked,
+    COMPLETION_MARKER,
+)
+from claude_agent_sdk.types import (
+    AssistantMessage,
+    ResultMessage,
+    SystemMessage,
+    ToolUseBlock,
+    UserMessage,
+)
+
+
+@pytest.fixture
+def simulator(monkeypatch):
+    sim = SdkSimulator(SimulatorConfig(complete_after_turns=5, seed=1))
+    set_simulator(sim)
+    monkeypatch.setenv("CLAUDE_SDK_BACKEND", "simulator")
+    yield sim
+    set_simulator(None)
+
+
+async def collect(sim, prompt, options):
+    return [message async for message in sim.query(prompt=prompt, options=options)]
+
+
+async def test_simulator_emits_init_turns_and_result():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sim = SdkSimulator(SimulatorConfig(complete_after_turns=10))
+        messages = await collect(sim, build_prompt("Title", "Body", tmpdir), get_options(tmpdir, max_turns=3))
+
+        assert isinstance(messages[0], SystemMessage)
+        assert messages[0].subtype == "init"
+        assert isinstance(messages[1], AssistantMessage)
+        assert isinstance(messages[2], UserMessage)
+        assert isinstance(messages[-1], ResultMessage)
+        assert messages[-1].num_turns == 3
+        assert messages[-1].subtype == "error_max_turns"
+        tool_names = [b.name for m in messages if isinstance(m, AssistantMessage) for b in m.content if isinstance(b, ToolUseBlock)]
+        assert tool_names == ["Glob", "Grep", "Read"]
+
+
+async def test_simulator_resume_continues_session_and_writes_marker():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sim = SdkSimulator(SimulatorConfig(complete_after_turns=5))
+        prompt = build_prompt("Title", "Body", tmpdir)
+
+        first = await collect(sim, prompt, get_options(tmpdir, max_turns=3))
+        session_id = first[0].data["session_id"]
+        assert not (Path(tmpdir) / COMPLETION_MARKER).exists()
+
+        second = await collect(sim, prompt, get_options(tmpdir, max_turns=3, resume=session_id))
+        assert second[0].data["session_id"] == session_id
+        assert second[-1].subtype == "success"
+        assert second[-1].num_turns == 2
+        assert (Path(tmpdir) / COMPLETION_MARKER).read_text() == "DONE"
+        # Resumed turns re-send history, so input tokens grow
+        assert second[-1].usage["input_tokens"] > first[-1].usage["input_tokens"]
+
+
+async def test_simulator_rejects_unknown_resume():
+    sim = SdkSimulator()
+    messages = await collect(sim, "prompt", get_options(resume="missing"))
+    assert len(messages) == 1
+    assert messages[0].is_error is True
+
+
+async def test_simulator_answers_summary_prompts_with_text():
+    sim = SdkSimulator()
+    messages = await collect(sim, "Summarise this work", get_options(allowed_tools=None))
+    assert isinstance(messages[1], AssistantMessage)
+    assert messages[-1].subtype == "success"
+
+
+def test_get_query_selects_backend(monkeypatch):
+    monkeypatch.delenv("CLAUDE_SDK_BACKEND", raising=False)
+    assert get_query().__name__ == "query"
+    assert get_query("simulator").__self__.__class__ is SdkSimulator
+    with pytest.raises(ValueError, match="Unknown SDK backend"):
+        get_query("nope")
+
+
+def test_simulator_config_from_env(monkeypatch):
+    monkeypatch.setenv("SIMULATOR_MESSAGE_LATENCY", "0.2")
+    monkeypatch.setenv("SIMULATOR_COMPLETE_AFTER_TURNS", "7")
+    monkeypatch.setenv("SIMULATOR_TOOL_PATTERN", "Read, Edit")
+    config = SimulatorConfig.from_env()
+    assert config.message_latency == 0.2
+    assert config.complete_after_turns == 7
+    assert config.tool_pattern == ["Read", "Edit"]
+
+
+async def test_run_claude_chunked_against_simulator(simulator):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        summaries = []
+
+        async def on_chunk(chunk_num, summary):
+            summaries.append(summary)
+
+        async for _ in run_claude_chunked("Title", "Body", tmpdir, turns_per_chunk=3, on_chunk_complete=on_chunk):
+            pass
+
+        # 5 turns needed at 3 per chunk: two resumed chunks, each summarised
+        assert simulator.queries == 4
+        assert len(simulator.sessions) == 3
+        assert len(summaries) == 2
+        assert not (Path(tmpdir) / COMPLETION_MARKER).exists()
@@ -0,0 +1,82 @@
+"""Tests for stall_detector module."""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from claude_agent_sdk.types import AssistantMessage, TextBlock, ToolUseBlock
+
+from change_tracker import ChangeSet, FileChange, STATUS_MODIFIED
+from message_records import compact_message
+from stall_detector import StallDetector, tool_call_hash
+
+
+def turn(text: str, name: str | None = None, **tool_input) -> AssistantMessage:
+    content = [TextBlock(text=text)]
+    if name:
+        content.append(ToolUseBlock(id="t", name=name, input=tool_input))
+    return AssistantMessage(content=content, model="claude")
+
+
+def reading_chunk(text: str = "Let me look at the config again") -> list:
+    return [turn(text, "Read", file_path="/repo/config.py"), turn(text, "Grep", pattern="load_config")]
+
+
+def test_tool_call_hash_ignores_id_and_key_order():
+    a, b, c = (
+        compact_message(AssistantMessage(content=[ToolUseBlock(id=i, name="Grep", input=params)], model="claude"))[0]
+        for i, params in [("1", {"pattern": "x", "path": "src"}),
+                          ("2", {"path": "src", "pattern": "x"}),
+                          ("3", {"pattern": "y", "path": "src"})]
+    )
+    assert tool_call_hash(a) == tool_call_hash(b) != tool_call_hash(c)
+
+
+def test_first_exploration_chunk_is_not_stalled():
+    detector = StallDetector()
+    verdict = detector.observe_chunk(reading_chunk())
+    assert verdict.reasons == []
+    assert verdict.nudge is None and not verdict.stop
+
+
+def test_repeated_calls_nudge_then_stop():
+    detector = StallDetector()
+    detector.observe_chunk(reading_chunk("First look"))
+
+    second = detector.observe_chunk(reading_chunk("Checking a different angle now"))
+    assert "repeated 2 of 2 tool calls already made earlier" in second.reasons
+    assert "changed no files" in second.reasons
+    assert second.nudge is not None and "Progress Check" in second.nudge
+    assert not second.stop
+
+    third = detector.observe_chunk(reading_chunk("Trying once more"))
+    assert third.stop and third.stalled_chunks == 2
+    assert detector.last_verdict is third
+
+
+def test_file_changes_reset_the_stall_count():
+    detector = StallDetector()
+    detector.observe_chunk(reading_chunk())
+    assert detector.observe_chunk(reading_chunk()).stalled_chunks == 1
+
+    changes = ChangeSet([FileChange("config.py", STATUS_MODIFIED, 1, 0)])
+    verdict = detector.observe_chunk(reading_chunk(), changes)
+    assert verdict.stalled_chunks == 0 and not verdict.stop
+
+
+def test_edit_calls_count_as_progress_without_tracker():
+    detector = StallDetector()
+    detector.observe_chunk(reading_chunk())
+    chunk = reading_chunk() + [turn("Fixing it", "Edit", file_path="/repo/config.py")]
+    assert detector.observe_chunk(chunk).reasons == []
+
+
+def test_near_identical_text_and_silent_chunks_are_stalls():
+    detector = StallDetector()
+    text = "I need to understand how configuration loading works before changing it."
+    detector.observe_chunk([turn(text, "Read", file_path="/repo/a.py")])
+    verdict = detector.observe_chunk([turn(text + "!", "Read", file_path="/repo/b.py")])
+    assert any("identical to the previous chunk" in reason for reason in verdict.reasons)
+
+    verdict = StallDetector().observe_chunk([turn("Thinking...")])
+    assert "made no tool calls" in verdict.reasons
@@ -0,0 +1,228 @@
+"""Tests for symbol_index module."""
+
+import tempfile
+from pathlib import Path
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from claude_agent_sdk.types import AssistantMessage, ToolUseBlock
+
+from symbol_index import (
+    SymbolIndex,
+    ReadCounter,
+    get_symbol_index,
+    parse_symbols,
+    symbol_tools,
+    symbol_update_hooks,
+    KIND_CLASS,
+    KIND_FUNCTION,
+    KIND_METHOD,
+    KIND_VARIABLE,
+)
+
+
+APP_SOURCE = '''"""App module."""
+
+from util import helper
+
+LIMIT = 10
+
+
+class Runner(Base):
+    mode = "fast"
+
+    @property
+    def name(self) -> str:
+        return "runner"
+
+    async def run(self, cwd):
+        def inner():
+            local = 1
+            return local
+        return helper(cwd, LIMIT)
+
+
+def main():
+    Runner().run(".")
+'''
+
+UTIL_SOURCE = '''def helper(cwd, limit):
+    return cwd * limit
+'''
+
+
+def make_tree(root: str) -> None:
+    files = {
+        "app.py": APP_SOURCE,
+        "pkg/util.py": UTIL_SOURCE,
+        "pkg/broken.py": "def broken(:\n",
+        "README.md": "helper\n",
+    }
+    for rel, text in files.items():
+        path = Path(root) / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+# parse_symbols tests
+
+def test_parse_symbols_collects_definitions_with_line_ranges():
+    symbols = {s.qualname: s for s in parse_symbols(APP_SOURCE, "app.py").symbols}
+    assert symbols["Runner"].kind == KIND_CLASS
+    assert (symbols["Runner"].start_line, symbols["Runner"].end_line) == (8, 19)
+    assert symbols["Runner"].signature == "class Runner(Base)"
+    # Decorators are part of the range
+    assert (symbols["Runner.name"].kind, symbols["Runner.name"].start_line) == (KIND_METHOD, 11)
+    assert symbols["Runner.run"].signature == "async def run(self, cwd)"
+    assert symbols["Runner.run.inner"].kind == KIND_FUNCTION
+    assert symbols["main"].kind == KIND_FUNCTION
+    assert symbols["LIMIT"].kind == KIND_VARIABLE
+    assert symbols["Runner.mode"].kind == KIND_VARIABLE
+
+
+def test_parse_symbols_skips_function_locals():
+    qualnames = {s.qualname for s in parse_symbols(APP_SOURCE, "app.py").symbols}
+    assert not any(name.endswith("local") for name in qualnames)
+
+
+def test_parse_symbols_records_name_uses():
+    references = parse_symbols(APP_SOURCE, "app.py").references
+    assert references["helper"] == [3, 19]
+    assert references["run"] == [23]
+    assert references["LIMIT"] == [19]
+
+
+def test_parse_symbols_reports_syntax_errors():
+    result = parse_symbols("def broken(:\n", "broken.py")
+    assert result.symbols == []
+    assert result.error.startswith("SyntaxError")
+
+
+# SymbolIndex tests
+
+def test_build_indexes_only_python_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = SymbolIndex.build(tmpdir)
+        assert index.file_count == 3
+        assert index.outline("README.md") is None
+
+
+def test_definitions_by_name_and_qualified_name():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = SymbolIndex.build(tmpdir)
+        assert [(s.path, s.start_line) for s in index.definitions("helper")] == [("pkg/util.py", 1)]
+        assert [s.qualname for s in index.definitions("Runner.run")] == ["Runner.run"]
+        assert index.definitions("Other.run") == []
+        assert index.definitions("missing") == []
+
+
+def test_references_with_path_glob_and_max_results():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = SymbolIndex.build(tmpdir)
+        assert index.references("helper") == [
+            ("app.py", 3, "from util import helper"),
+            ("app.py", 19, "return helper(cwd, LIMIT)"),
+        ]
+        assert index.references("cwd", path_glob="pkg/**") == [("pkg/util.py", 2, "return cwd * limit")]
+        assert len(index.references("cwd", max_results=1)) == 1
+
+
+def test_update_replaces_and_removes_entries():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = SymbolIndex.build(tmpdir)
+        Path(tmpdir, "pkg/util.py").write_text("def renamed():\n    return helper\n")
+        Path(tmpdir, "app.py").unlink()
+        index.update([str(Path(tmpdir) / "pkg/util.py"), "app.py", "README.md"])
+
+        assert index.definitions("helper") == []
+        assert [s.name for s in index.definitions("renamed")] == ["renamed"]
+        assert index.definitions("Runner") == []
+        assert index.references("helper") == [("pkg/util.py", 2, "return helper")]
+
+
+def test_get_symbol_index_is_cached_per_worktree():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        assert get_symbol_index(tmpdir) is get_symbol_index(tmpdir + "/")
+
+
+# MCP tool and hook tests
+
+def _tools(index: SymbolIndex) -> dict:
+    return {tool.name: tool.handler for tool in symbol_tools(index)}
+
+
+async def test_find_definition_tool():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        tools = _tools(SymbolIndex.build(tmpdir))
+        result = await tools["find_definition"]({"name": "run"})
+        assert result["content"][0]["text"] == "app.py:15-19 method async def run(self, cwd)  [Runner.run]"
+        result = await tools["find_definition"]({"name": "missing"})
+        assert result["content"][0]["text"] == "No definition of missing found"
+
+
+async def test_find_references_tool():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        tools = _tools(SymbolIndex.build(tmpdir))
+        result = await tools["find_references"]({"name": "LIMIT"})
+        assert result["content"][0]["text"] == "app.py:19: return helper(cwd, LIMIT)"
+
+
+async def test_file_outline_tool():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        tools = _tools(SymbolIndex.build(tmpdir))
+        result = await tools["file_outline"]({"path": str(Path(tmpdir) / "app.py")})
+        assert result["content"][0]["text"].splitlines() == [
+            "5 LIMIT",
+            "8-19 class Runner(Base)",
+            "  9 mode",
+            "  11-13 def name(self) -> str",
+            "  15-19 async def run(self, cwd)",
+            "    16-18 def inner()",
+            "22-23 def main()",
+        ]
+
+
+async def test_file_outline_tool_reports_unparsable_and_unknown_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        tools = _tools(SymbolIndex.build(tmpdir))
+        result = await tools["file_outline"]({"path": "pkg/broken.py"})
+        assert result["is_error"] is True
+        assert "Could not parse" in result["content"][0]["text"]
+        result = await tools["file_outline"]({"path": "missing.py"})
+        assert result["is_error"] is True
+
+
+async def test_symbol_update_hook_reparses_edited_file():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_tree(tmpdir)
+        index = SymbolIndex.build(tmpdir)
+        matcher = symbol_update_hooks(index)["PostToolUse"][0]
+
+        path = Path(tmpdir) / "pkg/util.py"
+        path.write_text("def added():\n    pass\n")
+        await matcher.hooks[0]({"tool_name": "Write", "tool_input": {"file_path": str(path)}}, "tool-1", None)
+        assert [s.path for s in index.definitions("added")] == ["pkg/util.py"]
+
+
+# ReadCounter tests
+
+def test_read_counter_counts_ranged_reads():
+    counter = ReadCounter()
+    counter.observe(AssistantMessage(content=[
+        ToolUseBlock(id="1", name="Read", input={"file_path": "/a.py"}),
+        ToolUseBlock(id="2", name="Read", input={"file_path": "/b.py", "offset": 10, "limit": 20}),
+        ToolUseBlock(id="3", name="Edit", input={"file_path": "/a.py"}),
+    ], model="sonnet"))
+    counter.observe({"type": "message"})
+    assert (counter.reads, counter.ranged_reads) == (2, 1)
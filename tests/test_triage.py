@@ -0,0 +1,100 @@
+"""Tests for triage module."""
+
+import sys
+import os
+
+import pytest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from triage import (
+    triage_issue,
+    mentioned_paths,
+    format_tier_report,
+    TriageResult,
+    TIER_TRIVIAL,
+    TIER_NORMAL,
+    TIER_LARGE,
+    TIER_SETTINGS,
+)
+
+
+def test_mentioned_paths_finds_files_and_directories():
+    text = "Fix .github/workflows/ci.yml and README.md, see src/ (v1.2.3, e.g. read/write)"
+
+    assert mentioned_paths(text) == [".github/workflows/ci.yml", "README.md", "src/"]
+
+
+def test_mentioned_paths_ignores_urls():
+    assert mentioned_paths("See https://example.com/docs/page.html") == []
+
+
+def test_typo_fix_is_trivial():
+    result = triage_issue("Fix typo in README.md", "")
+
+    assert result.tier == TIER_TRIVIAL
+    assert result.settings.single_session
+    assert "title mentions 'typo'" in result.reasons
+
+
+def test_short_fix_targeting_one_file_is_trivial():
+    result = triage_issue("Bump the default timeout", "Set it to 30 seconds in src/app.py")
+
+    assert result.tier == TIER_TRIVIAL
+    assert "targets src/app.py" in result.reasons
+
+
+def test_short_feature_request_naming_one_file_is_normal():
+    result = triage_issue("Add CSV export", "Add an export command in src/cli.py")
+
+    assert result.tier == TIER_NORMAL
+    assert not result.settings.single_session
+    assert result.reasons == ["short issue without a small-fix keyword"]
+
+
+@pytest.mark.parametrize("title, body", [
+    ("Add comment support to issues API", "Users should be able to post comments on issues."),
+    ("Rename user model to account across the codebase", ""),
+    ("Fix typo in the runner", "While there, refactor the chunk loop."),
+])
+def test_small_fix_words_outside_a_small_fix_are_normal(title, body):
+    assert triage_issue(title, body).tier == TIER_NORMAL
+
+
+def test_short_issue_without_target_is_normal():
+    result = triage_issue("Add user authentication", "")
+
+    assert result.tier == TIER_NORMAL
+    assert not result.settings.single_session
+
+
+def test_issue_with_plan_is_never_trivial():
+    plan = "1. Fix the typo in README.md"
+
+    assert triage_issue("Fix typo", "", plan).tier == TIER_NORMAL
+
+
+def test_several_paths_are_normal():
+    result = triage_issue("Fix typo", "In a.py and b.py")
+
+    assert result.tier == TIER_NORMAL
+    assert result.reasons == ["2 paths mentioned"]
+
+
+def test_long_plan_is_large():
+    plan = "\n".join(f"{i}. Step {i}" for i in range(1, 10))
+    result = triage_issue("Add dark mode", "", plan)
+
+    assert result.tier == TIER_LARGE
+    assert result.plan_steps == 9
+    assert TIER_SETTINGS[TIER_LARGE].max_chunks > TIER_SETTINGS[TIER_NORMAL].max_chunks
+
+
+def test_long_body_and_large_keyword_are_large():
+    assert triage_issue("Add a feature", "x" * 3000).tier == TIER_LARGE
+    assert triage_issue("Refactor the runner", "").reasons == ["title mentions 'refactor'"]
+
+
+def test_format_tier_report():
+    report = format_tier_report(TriageResult(TIER_TRIVIAL, ["no plan"]), 42.4, 0.0312)
+
+    assert report == "**Tier:** trivial (no plan) · **Latency:** 42s · **Cost:** $0.0312"
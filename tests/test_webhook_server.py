@@ -0,0 +1,273 @@
+"""Tests for webhook_server module, driven by recorded webhook payloads."""
+
+import asyncio
+import hashlib
+import hmac
+import json
+from pathlib import Path
+
+import pytest
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from job_queue import JOB_IMPLEMENT, JOB_PLAN, STATUS_CANCELLED, STATUS_SUCCEEDED, STATUS_QUEUED, JobQueue, JobStore
+from webhook_server import (
+    ACTION_APPLY,
+    ACTION_APPLY_WITHOUT_PLAN,
+    ACTION_CLOSE,
+    ACTION_IMPLEMENT,
+    ACTION_PLAN,
+    NO_PLAN_COMMENT,
+    JobDispatcher,
+    handle_webhook,
+    route_event,
+    start_webhook_server,
+    verify_signature,
+)
+
+
+FIXTURES = Path(__file__).parent / "fixtures" / "webhooks"
+REPO = "josh-gree/mobile-agents"
+
+
+class RecordingLabels:
+    """Stands in for swap_issue_labels, recording each label swap."""
+
+    def __init__(self):
+        self.swaps = []
+
+    async def __call__(self, owner, repo, issue_number, token, remove, add):
+        self.swaps.append((f"{owner}/{repo}", issue_number, remove, add))
+        return True
+
+
+def load_fixture(name: str) -> tuple[str, dict]:
+    recorded = json.loads((FIXTURES / name).read_text())
+    return recorded["event"], recorded["payload"]
+
+
+def sign(secret: str, body: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+@pytest.mark.parametrize("fixture,expected", [
+    ("issues_labeled_plan.json", [ACTION_PLAN]),
+    ("issues_opened_title_implement.json", [ACTION_IMPLEMENT]),
+    ("issues_labeled_other.json", []),
+    ("issues_labeled_plan_contributor.json", []),
+    ("issue_comment_apply.json", [ACTION_APPLY]),
+    ("issue_comment_apply_no_plan.json", [ACTION_APPLY_WITHOUT_PLAN]),
+    ("issue_comment_close.json", [ACTION_CLOSE]),
+    ("issue_comment_apply_other_user.json", []),
+    ("issue_comment_apply_on_pr.json", []),
+])
+def test_route_event_reproduces_workflow_triggers(fixture, expected):
+    event, payload = load_fixture(fixture)
+    actions = route_event(event, payload)
+    assert [action.action for action in actions] == expected
+    for action in actions:
+        assert action.repo == REPO
+        assert action.issue_number == payload["issue"]["number"]
+
+
+@pytest.mark.parametrize("title,expected", [
+    ("ai:plan add caching", [ACTION_PLAN]),
+    ("Add caching @ai-plan", [ACTION_PLAN]),
+    ("Add caching [ai:plan]", [ACTION_PLAN]),
+    ("Add caching @AI-IMPLEMENT", [ACTION_IMPLEMENT]),
+    ("Add caching (not ai:plan)", []),
+])
+def test_route_event_title_tags(title, expected):
+    event, payload = load_fixture("issues_opened_title_implement.json")
+    payload["issue"]["title"] = title
+    assert [action.action for action in route_event(event, payload)] == expected
+
+
+@pytest.mark.parametrize("labels,expected", [
+    ([], [ACTION_IMPLEMENT]),
+    (["ai:in-progress"], []),
+    (["ai:completed"], []),
+    (["ai:failed"], []),
+])
+def test_route_event_skips_redelivered_edits_of_picked_up_issues(labels, expected):
+    event, payload = load_fixture("issues_opened_title_implement.json")
+    payload["action"] = "edited"
+    payload["issue"]["labels"] = [{"name": label} for label in labels]
+    assert [action.action for action in route_event(event, payload)] == expected
+
+
+def test_route_event_ignores_unrelated_issue_actions():
+    event, payload = load_fixture("issues_labeled_plan.json")
+    payload["action"] = "closed"
+    assert route_event(event, payload) == []
+
+
+def test_verify_signature():
+    body = b'{"zen": "Keep it logically awesome."}'
+    assert verify_signature("s3cret", body, sign("s3cret", body))
+    assert not verify_signature("s3cret", body, sign("other", body))
+    assert not verify_signature("s3cret", body, None)
+
+
+async def test_dispatcher_queues_deduplicates_and_cancels():
+    queue = JobQueue(JobStore())
+    dispatcher = JobDispatcher(queue, {REPO: "/checkouts/mobile-agents"})
+
+    for fixture in ("issues_labeled_plan.json", "issues_labeled_plan.json", "issue_comment_apply.json"):
+        event, payload = load_fixture(fixture)
+        for action in route_event(event, payload):
+            await dispatcher.dispatch(action)
+
+    jobs = queue.store.queued()
+    assert [(job.issue_number, job.kind) for job in jobs] == [(12, JOB_PLAN), (20, JOB_IMPLEMENT)]
+    assert all(job.cwd == "/checkouts/mobile-agents" for job in jobs)
+
+    event, payload = load_fixture("issue_comment_close.json")
+    payload["issue"]["number"] = 20
+    for action in route_event(event, payload):
+        await dispatcher.dispatch(action)
+
+    assert queue.store.get(jobs[0].id).status == STATUS_QUEUED
+    assert queue.store.get(jobs[1].id).status == STATUS_CANCELLED
+
+
+async def test_dispatcher_replies_when_applying_without_plan():
+    posted = []
+
+    async def post_comment(owner, repo, issue_number, body, token):
+        posted.append((owner, repo, issue_number, body, token))
+        return True
+
+    queue = JobQueue(JobStore())
+    dispatcher = JobDispatcher(queue, {REPO: "/checkouts"}, github_token="tok", post_comment=post_comment)
+    event, payload = load_fixture("issue_comment_apply_no_plan.json")
+    for action in route_event(event, payload):
+        await dispatcher.dispatch(action)
+
+    assert posted == [("josh-gree", "mobile-agents", 21, NO_PLAN_COMMENT, "tok")]
+    assert queue.store.queued() == []
+
+
+async def test_dispatcher_swaps_trigger_labels_when_queueing():
+    labels = RecordingLabels()
+    queue = JobQueue(JobStore())
+    dispatcher = JobDispatcher(queue, {REPO: "/checkouts"}, github_token="tok", swap_labels=labels)
+
+    for fixture in ("issues_labeled_plan.json", "issues_labeled_plan.json", "issues_opened_title_implement.json"):
+        event, payload = load_fixture(fixture)
+        for action in route_event(event, payload):
+            await dispatcher.dispatch(action)
+
+    assert labels.swaps == [
+        (REPO, 12, ["ai:plan", "ai:plan-failed"], ["ai:planning"]),
+        (REPO, 13, ["ai:implement", "ai:planned", "ai:failed"], ["ai:in-progress"]),
+    ]
+
+    # Once the job has finished, a re-delivered edit of the tagged issue does not queue it again
+    implement = queue.store.find_active(REPO, 13, JOB_IMPLEMENT)
+    queue.store.set_status(implement.id, STATUS_SUCCEEDED)
+    event, payload = load_fixture("issues_opened_title_implement.json")
+    payload["action"] = "edited"
+    payload["issue"]["labels"] = [{"name": "ai:completed"}]
+    for action in route_event(event, payload):
+        await dispatcher.dispatch(action)
+    assert len(labels.swaps) == 2
+    assert [job.issue_number for job in queue.store.queued()] == [12]
+
+
+async def test_dispatcher_ignores_repos_without_checkout():
+    queue = JobQueue(JobStore())
+    dispatcher = JobDispatcher(queue, {})
+    event, payload = load_fixture("issues_labeled_plan.json")
+    for action in route_event(event, payload):
+        await dispatcher.dispatch(action)
+    assert queue.store.queued() == []
+
+
+async def test_handle_webhook_status_codes():
+    dispatched = []
+
+    async def dispatch(action):
+        dispatched.append(action)
+
+    event, payload = load_fixture("issues_labeled_plan.json")
+    body = json.dumps(payload).encode()
+
+    assert (await handle_webhook(event, body, sign("s", body), "s", dispatch))[0] == 202
+    assert (await handle_webhook(event, body, sign("x", body), "s", dispatch))[0] == 401
+    assert (await handle_webhook("ping", b"{}", None, None, dispatch)) == (200, "pong")
+    assert (await handle_webhook("issues", b"not json", None, None, dispatch))[0] == 400
+    assert (await handle_webhook("push", b"{}", None, None, dispatch))[0] == 204
+    assert len(dispatched) == 1
+
+
+async def post(port: int, path: str, event: str, body: bytes, signature: str) -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: localhost\r\nX-GitHub-Event: {event}\r\n"
+        f"X-Hub-Signature-256: {signature}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+async def test_server_accepts_recorded_delivery_over_loopback():
+    queue = JobQueue(JobStore())
+    dispatcher = JobDispatcher(queue, {REPO: "/checkouts"})
+    server = await start_webhook_server(dispatcher.dispatch, secret="s", port=0)
+    port = server.sockets[0].getsockname()[1]
+
+    try:
+        event, payload = load_fixture("issues_opened_title_implement.json")
+        body = json.dumps(payload).encode()
+        response = await post(port, "/webhook", event, body, sign("s", body))
+        assert response.startswith(b"HTTP/1.1 202")
+
+        response = await post(port, "/elsewhere", event, body, sign("s", body))
+        assert response.startswith(b"HTTP/1.1 404")
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    assert [(job.issue_number, job.kind) for job in queue.store.queued()] == [(13, JOB_IMPLEMENT)]
+
+
+async def test_dispatcher_appends_plan_comment_to_applied_issue():
+    fetched = []
+
+    async def fetch_plan(owner, repo, issue_number, token):
+        fetched.append((owner, repo, issue_number, token))
+        return "1. Edit src/app.py"
+
+    queue = JobQueue(JobStore())
+    dispatcher = JobDispatcher(
+        queue, {REPO: "/checkouts"}, github_token="tok", fetch_plan=fetch_plan, swap_labels=RecordingLabels()
+    )
+    event, payload = load_fixture("issue_comment_apply.json")
+    for action in route_event(event, payload):
+        await dispatcher.dispatch(action)
+
+    [job] = queue.store.queued()
+    assert fetched == [("josh-gree", "mobile-agents", 20, "tok")]
+    assert job.body.startswith(payload["issue"]["body"] or "")
+    assert "## Implementation Plan\n\n1. Edit src/app.py" in job.body
+
+
+async def test_server_answers_500_when_dispatch_fails():
+    async def dispatch(action):
+        raise RuntimeError("GitHub API unavailable")
+
+    server = await start_webhook_server(dispatch, port=0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        event, payload = load_fixture("issues_labeled_plan.json")
+        response = await post(port, "/webhook", event, json.dumps(payload).encode(), "")
+        assert response.startswith(b"HTTP/1.1 500")
+    finally:
+        server.close()
+        await server.wait_closed()